@@ -1,53 +1,114 @@
 import os
 import json
 import re
+import time
 import traceback
-from flask import Flask, request, jsonify, render_template, send_from_directory
-from openai import OpenAI
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from flask import Response, g, request, jsonify, stream_with_context
 from dotenv import load_dotenv
 from pydantic import BaseModel
 
+import catalog
+import dietary
+import health
+import ingredient_index
+import job_queue
+import llm_router
+import llm_transport
+import menu_cache
+import menu_stream
+import metrics
+import model_tiers
+import plan_edits
+import plan_history
+import plan_store
+import prompts
+import semantic_cache
+import server
+import single_flight
+import speculation
+from grocery import grocery_list, structure as structure_grocery
+from menu_stream import GroceryItem, MenuModel, MenuStreamParser, MENU_SECTIONS, NOTES_FIELD
+
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-
-# Configure paths
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-FRONTEND_DIR = os.path.join(BASE_DIR, '..', 'frontend')
-TEMPLATES_DIR = os.path.join(FRONTEND_DIR, 'templates')
-STATIC_DIR = os.path.join(FRONTEND_DIR, 'static')
-
-app.template_folder = TEMPLATES_DIR
-app.static_folder = STATIC_DIR
+# Frontend pages and /static come from the shared factory
+app = server.create_app(__name__)
 
 # Initialize OpenAI client
 api_key = os.getenv('DEEPSEEK_API_KEY')
+REQUIRED_FIELDS = ['event_type', 'cuisine', 'formality', 'guest_count', 'level']
+# A prefetch needs the fields the form asks first; guest count and level have defaults there
+PREFETCH_FIELDS = ['event_type', 'cuisine', 'formality']
+SESSION_ID = re.compile(r'[A-Za-z0-9_-]{8,64}')
+BATCH_CONCURRENCY = int(os.getenv('BATCH_CONCURRENCY', 4))
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', 1000))
+PAID_JOB_PRIORITY = 10
+JOB_RETRY_AFTER = int(os.getenv('JOB_RETRY_AFTER', 30))
+PLAN_MODES = ('separate', 'combined')
+PLAN_MODE = os.getenv('PLAN_MODE', 'separate')
 if not api_key:
     print("⚠️ WARNING: DEEPSEEK_API_KEY not found in environment variables!")
 else:
     print("✅ DeepSeek API key loaded successfully")
 
-client = None
-if api_key:
-    try:
-        client = OpenAI(
-            base_url="https://openrouter.ai/api/v1",
-            api_key=api_key
-        )
-        # Test connection
-        test_response = client.models.list()
-        print("🔌 API Connection Test Successful")
-    except Exception as e:
-        print(f"🔴 API Connection Failed: {str(e)}")
-        client = None
+# Every LLM call goes through the router: fastest healthy provider, hedged after its p95
+llm = llm_router.create_router()
+
+def get_client():
+    """OpenRouter client (shared with the router's route); None without an API key"""
+    route = llm.routes.get("openrouter")
+    return route.client() if route else None
+
+# Provider reachability is checked in the background, never on the request path
+provider_health = {
+    name: health.HealthProbe(
+        name,
+        lambda route=route: route.client().models.list(),
+        interval=float(os.getenv('HEALTH_PROBE_INTERVAL', 60)),
+        down_interval=float(os.getenv('HEALTH_PROBE_DOWN_INTERVAL', 10))
+    )
+    for name, route in llm.routes.items() if route.tier == model_tiers.REASONING
+}
+
+# Response cache in front of the menu and grocery LLM calls
+response_cache = menu_cache.create_cache()
+
+# Near-duplicate events ("Italian cuisine" vs "italian") reuse a stored menu
+semantic_menus = semantic_cache.create_semantic_cache()
+
+# Identical concurrent LLM calls (across threads and worker processes) share one upstream request
+coalescer = single_flight.create_single_flight()
+
+# Per-serving ingredients for known dishes; grocery lists are scaled locally
+ingredients = ingredient_index.create_index()
+
+# Menus for the form's own combinations, warmed offline with `python catalog.py`
+menu_catalog = catalog.create_catalog(lambda event: generate_catalog_menu(event))
 
-class MenuModel(BaseModel):
-    appetizers: list[str]
-    main_courses: list[str]
-    desserts: list[str]
-    beverages: list[str]
-    preparation_notes: str
+# Allergen/diet tags for known dishes; dietary restrictions swap in catalog dishes locally
+diets = dietary.create_engine(ingredients, menu_catalog)
+
+# Finished plans, kept so PATCH /api/plan/<id> can edit them in place
+plans = plan_store.create_store()
+
+# Every generated plan, written in batches off the request path; GET /api/plans/search
+history = plan_history.create_history()
+
+# POST /api/plan?async=1 queues here; workers start with the first request
+job_requests = job_queue.create_queue(lambda payload: run_plan_job(payload))
+
+# Menus started from a partly filled form (POST /api/plan/prefetch) and claimed by the submit
+speculative_menus = speculation.create_speculation(lambda data, cancelled: speculate_menu(data, cancelled),
+                                                   busy=lambda: upstream_busy())
+
+class DishesModel(BaseModel):
+    dishes: list[str]
+
+class PlanModel(MenuModel):
+    """Menu and grocery list from one structured call (combined plan mode)"""
+    grocery_list: list[GroceryItem]
 
 def log_error(message, error=None):
     """Log errors with traceback"""
@@ -57,217 +118,551 @@ def log_error(message, error=None):
     print(error_msg)
     return error_msg
 
-def generate_with_deepseek(prompt, max_tokens=500):
-    """Generate content with DeepSeek API"""
-    if not client:
+def is_shareable(result):
+    """Only successful LLM results are shared with other processes"""
+    return not (isinstance(result, dict) and "error" in result)
+
+def coalesced(key, call):
+    return coalescer.do(key, call, is_shareable) if coalescer else call()
+
+def generate_with_deepseek(prompt, max_tokens=500, kind="text"):
+    """Generate content on the fastest healthy provider"""
+    if not llm.routes:
         return {"error": "API client not initialized"}
         
-    try:
-        response = client.chat.completions.create(
-            model="deepseek/deepseek-r1-0528:free",
-            # model="gpt-4.1",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            # max_tokens=max_tokens
-        )
-        print(response)
-        
-        return response.choices[0].message.content.strip()
-        
-    except Exception as e:
-        return {"error": log_error("DeepSeek API call failed", e)}
+    def call():
+        try:
+            return llm.complete(
+                [{"role": "user", "content": prompt}],
+                kind=kind,
+                temperature=0.7,
+                # max_tokens=max_tokens
+            )
+        except Exception as e:
+            return {"error": log_error("DeepSeek API call failed", e)}
 
+    return coalesced(menu_cache.digest(kind, prompt), call)
 
-def generate_menu_ai(prompt, max_tokens=500):
-    """Generate content with DeepSeek API"""
-    if not client:
+
+def generate_menu_ai(prompt, max_tokens=500, event=None):
+    """Generate a structured MenuModel on the fastest healthy provider, on the model tier the event needs"""
+    if not llm.routes:
         return {"error": "API client not initialized"}
         
     try:
-        response = client.beta.chat.completions.parse(
-            model="deepseek/deepseek-r1-0528:free",
-            # model="gpt-4.1",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=0.7,
-            response_format=MenuModel
+        return llm.complete(
+            [{"role": "user", "content": prompt}],
+            response_format=MenuModel,
+            kind="menu",
+            event=event,
+            temperature=0.7
         )
-        print("Response::",response)
-        
-        return response.choices[0].message
         
     except Exception as e:
         return {"error": log_error("DeepSeek API call failed", e)}
 
 
 
-def parse_menu_response(text):
-    """Convert text response to structured menu"""
-    menu = {
-        "appetizers": [],
-        "main_courses": [],
-        "desserts": [],
-        "beverages": [],
-        "preparation_notes": ""
-    }
-    
-    # Simple parsing logic
-    sections = {
-        "appetizers": r'appetizers?[:\s]*([\s\S]+?)(?=\n\s*main course|dessert|beverage|$)',
-        "main_courses": r'main courses?[:\s]*([\s\S]+?)(?=\n\s*dessert|beverage|$)',
-        "desserts": r'desserts?[:\s]*([\s\S]+?)(?=\n\s*beverage|$)',
-        "beverages": r'beverages?[:\s]*([\s\S]+?)(?=\n|$)',
-        "notes": r'notes?[:\s]*([\s\S]+)'
-    }
-    
-    for key, pattern in sections.items():
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            content = match.group(1).strip()
-            if key == "notes":
-                menu["preparation_notes"] = content
-            else:
-                # Split into items
-                items = [item.strip() for item in re.split(r'\n\s*[-*•]', content) if item.strip()]
-                menu[key] = items
-    
+def build_menu_prompt(data):
+    """Build the menu prompt for an event"""
+    return prompts.menu_prompt(data)
+
+def cached_menu(data, cache_key, use_cache=True):
+    """Catalog first, then an exact cache hit, then the closest near-duplicate event from the semantic cache,
+    then the event's unrestricted menu when the dietary engine can adapt all of it locally"""
+    if not use_cache:
+        return None
+    menu = menu_catalog.lookup(data) if menu_catalog else None
+    if menu:
+        return menu
+    menu = response_cache.get(cache_key) if response_cache else None
+    if not menu and semantic_menus:
+        menu, similarity = semantic_menus.lookup(data)
+        if menu:
+            print(f"🧠 Semantic cache hit (similarity {similarity:.2f})")
+            if response_cache:
+                response_cache.set(cache_key, menu)
+    if not menu:
+        adapted = dietary_menu(data)
+        if adapted and not adapted["uncovered"]:
+            print(f"🥗 Dietary restrictions met locally ({len(adapted['substituted'])} dishes swapped)")
+            menu = adapted["menu"]
+    return menu
+
+def dietary_menu(data):
+    """The event's unrestricted menu adapted to its dietary restrictions by the dietary engine, or None.
+
+    None when there are no restrictions, the engine cannot read them all, or
+    no unrestricted menu is cached; otherwise DietIndex.adapt()'s result.
+    """
+    if not diets:
+        return None
+    forbidden, unknown = dietary.parse(data.get('dietary_restrictions'))
+    if not forbidden or unknown:
+        return None
+    base = {**data, 'dietary_restrictions': 'none'}
+    menu = cached_menu(base, menu_cache.menu_key(base))
+    return diets.adapt(menu, forbidden, data.get('cuisine')) if menu else None
+
+def restricted_menu(data):
+    """A menu for an event with dietary restrictions from its unrestricted one: dishes swapped locally,
+    then one small LLM call per section for slots no catalog dish fits; None to generate from scratch"""
+    adapted = dietary_menu(data)
+    if not adapted:
+        return None
+    slots = sum(len(indexes) for indexes in adapted["uncovered"].values())
+    dishes = sum(len(adapted["menu"].get(section) or ()) for section in MENU_SECTIONS)
+    # Past half the menu, one full menu call is cheaper than a call per section
+    if slots * 2 > dishes:
+        return None
+    menu = adapted["menu"]
+    for section, indexes in adapted["uncovered"].items():
+        items = list(menu[section])
+        keep = [dish for index, dish in enumerate(items) if index not in indexes]
+        added = suggest_dishes(data, section, len(indexes), keep, [items[index] for index in indexes],
+                               data['dietary_restrictions'])
+        if isinstance(added, dict):
+            return None
+        for index, dish in zip(indexes, added):
+            items[index] = dish
+        menu = {**menu, section: items}
+    print(f"🥗 Dietary restrictions met with {len(adapted['substituted'])} swaps and {slots} new dishes")
     return menu
 
-def generate_menu(data):
+def store_menu(data, cache_key, menu):
+    if response_cache:
+        response_cache.set(cache_key, menu)
+    if semantic_menus:
+        semantic_menus.add(data, menu)
+
+def generate_menu(data, use_cache=True):
     """Generate menu with simplified instructions"""
     try:
-        prompt = f"""
-        Create a menu for a {data['formality']} {data['event_type']} event with {data['guest_count']} guests.
-        Cuisine style: {data['cuisine']}
-        Cooking Level: {data['level']}
-        
-        Provide the menu in this format:
-        
-        Appetizers:
-        - Appetizer 1
-        - Appetizer 2
-        
-        Main Courses:
-        - Main Course 1
-        - Main Course 2
-        
-        Desserts:
-        - Dessert 1
-        - Dessert 2
-        
-        Beverages:
-        - Beverage 1
-        - Beverage 2
-        
-        Notes: Preparation instructions or special notes
-        """
-        raw_response = generate_menu_ai(prompt)
-        
-        if isinstance(raw_response, dict) and "error" in raw_response:
-            return raw_response
+        cache_key = menu_cache.menu_key(data)
+        cached = cached_menu(data, cache_key, use_cache)
+        if cached:
+            return cached
+
+        def call():
+            menu = restricted_menu(data) if use_cache else None
+            if menu:
+                store_menu(data, cache_key, menu)
+                return menu
+            with metrics.stage("prompt_build"):
+                prompt = build_menu_prompt(data)
+            raw_response = generate_menu_ai(prompt, event=data)
             
-        print("🍽️ RAW MENU RESPONSE:\n", raw_response)
-        # return raw_response
-        return {
-            "appetizers": raw_response.parsed.appetizers,
-            "main_courses": raw_response.parsed.main_courses,
-            "desserts": raw_response.parsed.desserts,
-            "beverages": raw_response.parsed.beverages,
-            "preparation_notes": raw_response.parsed.preparation_notes
-        }
+            if isinstance(raw_response, dict) and "error" in raw_response:
+                return raw_response
+                
+            with metrics.stage("parse"):
+                menu = raw_response.model_dump()
+            store_menu(data, cache_key, menu)
+            return menu
+
+        # Requests that bypass the cache still want a fresh menu of their own
+        return coalesced(cache_key, call) if use_cache else call()
         
     except Exception as e:
         return {"error": log_error("Menu generation failed", e)}
 
-def generate_grocery_list(menu, guest_count):
-    """Generate simplified grocery list"""
+def generate_catalog_menu(event):
+    """Menu for a catalog combination, with the ingredients of every dish learned"""
+    event = {**event, 'guest_count': catalog.GUEST_COUNT}
+    menu = generate_menu_ai(build_menu_prompt(event), event=event)
+    if isinstance(menu, dict):
+        return menu
+    menu = menu.model_dump()
+    dishes = ingredient_index.menu_dishes(menu)
+    if not learn_unknown_dishes(dishes):
+        return {"error": f"No ingredients learned for: {', '.join(ingredients.unknown_dishes(dishes))}"}
+    return menu
+
+def build_grocery_prompt(menu, guest_count):
+    """Build the grocery list prompt for a (partial) menu"""
+    return prompts.grocery_prompt(menu, guest_count)
+
+def learn_unknown_dishes(sections):
+    """Ask the LLM for ingredients of dishes the index does not know; True once every dish is known"""
+    unknown = ingredients.unknown_dishes(sections)
+    if not unknown:
+        return True
+    print("🧾 Learning ingredients for:", ", ".join(unknown))
+    reply = generate_with_deepseek(ingredient_index.build_ingredient_prompt(unknown), kind="ingredients")
+    if isinstance(reply, str):
+        with metrics.stage("parse"):
+            ingredients.learn(reply)
+    return not ingredients.unknown_dishes(sections)
+
+def local_grocery_list(menu, guest_count):
+    """Grocery entries scaled from the ingredient index, learning unknown dishes first.
+
+    Returns None if some dishes are still unknown after asking the LLM.
+    """
+    dishes = ingredient_index.menu_dishes(menu)
+    if not learn_unknown_dishes(dishes):
+        return None
+    return ingredients.scale(dishes, int(guest_count))
+
+def grocery_text(grocery):
+    """Text of a grocery list: entries are rendered, an LLM's free text is kept as it is"""
+    return ingredient_index.render_grocery_text(grocery) if isinstance(grocery, list) else grocery
+
+def grocery_fields(grocery):
+    """Response fields for a grocery list: the text, and the merged GroceryList so clients need not parse it.
+
+    Entries (scaled from the index or from a combined plan) give both fields
+    directly; only an LLM's free-text list is parsed.
+    """
+    if isinstance(grocery, list):
+        return {"grocery_list": grocery_text(grocery), "grocery": grocery_list(grocery).model_dump()}
+    return {"grocery_list": grocery, "grocery": structure_grocery(grocery, ingredients.categories).model_dump()}
+
+def stored_grocery(plan):
+    """Grocery list of a stored plan: entries from its totals when it was scaled from the index, else its text"""
+    return ingredients.entries(plan["totals"]) if plan["totals"] is not None else plan["grocery"]
+
+def split_plan(plan):
+    """(menu, grocery entries) from a PlanModel; None if a section or the grocery list came back empty"""
+    plan = plan.model_dump()
+    entries = ingredient_index.grocery_entries(plan.pop('grocery_list'))
+    if not entries or not all(plan[section] for section in MENU_SECTIONS):
+        return None
+    return plan, entries
+
+def generate_combined_plan(data, use_cache=True):
+    """Menu and grocery list from one structured LLM call.
+
+    Returns (menu, grocery), (cached menu, None) when the menu is already
+    known and only the grocery list is missing, or None when the combined call
+    failed and the caller should fall back to the two-call path.
+    """
+    cache_key = menu_cache.menu_key(data)
+    menu = cached_menu(data, cache_key, use_cache)
+    if menu:
+        return menu, None
+    guest_count = int(data['guest_count'])
+
+    def call():
+        with metrics.stage("prompt_build"):
+            prompt = prompts.plan_prompt(data)
+        try:
+            plan = llm.complete([{"role": "user", "content": prompt}], response_format=PlanModel,
+                                kind="plan", event=data, temperature=0.7)
+        except Exception as e:
+            return {"error": log_error("Combined plan call failed", e)}
+        with metrics.stage("parse"):
+            split = split_plan(plan)
+        if split is None:
+            return {"error": "Combined plan came back incomplete"}
+        menu, grocery = split
+        store_menu(data, cache_key, menu)
+        if response_cache:
+            response_cache.set(menu_cache.grocery_key(menu, guest_count), grocery)
+        return {"menu": menu, "grocery_list": grocery}
+
+    plan_key = menu_cache.digest("plan", [cache_key, guest_count])
+    result = coalesced(plan_key, call) if use_cache else call()
+    if "error" in result:
+        print("⚠️ Combined plan failed, falling back to separate menu and grocery calls")
+        return None
+    return result["menu"], result["grocery_list"]
+
+def generate_grocery_list(menu, guest_count, use_cache=True):
+    """Grocery entries scaled from the index, else a free-text list from the LLM"""
     try:
         if not menu or not isinstance(menu, dict):
             return {"error": "Invalid menu input"}
             
-        menu_text = "\n".join(
-            [f"{section}:\n" + "\n".join(f"- {item}" for item in items)
-            for section, items in menu.items() if items]
-        )
-            
-        prompt = f"""
-        Create a grocery shopping list for {guest_count} people based on this menu:
-        {menu_text}
-        
-        Provide the list in this format:
-        - Item 1 (quantity)
-        - Item 2 (quantity)
-        - Item 3 (quantity)
-        """
-        return generate_with_deepseek(prompt)
+        grocery = local_grocery_list(menu, guest_count)
+        if grocery:
+            return grocery
+
+        # Fall back to a free-text list from the LLM
+        cache_key = menu_cache.grocery_key(menu, guest_count)
+        if response_cache and use_cache:
+            cached = response_cache.get(cache_key)
+            if cached:
+                return cached
+
+        with metrics.stage("prompt_build"):
+            prompt = build_grocery_prompt(menu, guest_count)
+        grocery = generate_with_deepseek(prompt, kind="grocery")
+        if response_cache and isinstance(grocery, str) and grocery:
+            response_cache.set(cache_key, grocery)
+        return grocery
     except Exception as e:
         return {"error": log_error("Grocery list generation failed", e)}
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+def valid_guest_count(value):
+    """A positive whole number of guests, as a JSON number or a string of digits"""
+    if isinstance(value, bool):
+        return False
+    if isinstance(value, int):
+        return value > 0
+    return isinstance(value, str) and re.fullmatch(r'\s*[0-9]+\s*', value) is not None and int(value) > 0
+
+def validate_plan_data(data):
+    """Return an error message if the plan request is incomplete, else None"""
+    if not data:
+        return "No data received"
+    if not isinstance(data, dict):
+        return "Request body must be a JSON object"
+    missing = [field for field in REQUIRED_FIELDS if field not in data or not data[field]]
+    if missing:
+        return f"Missing required fields: {', '.join(missing)}"
+    if not valid_guest_count(data['guest_count']):
+        return "guest_count must be a positive whole number"
+    if data.get('mode') is not None and data['mode'] not in PLAN_MODES:
+        return f"mode must be one of: {', '.join(PLAN_MODES)}"
+    return None
+
+def plan_mode(data, requested=None):
+    """?mode= wins over "mode" in the body, then PLAN_MODE; None if unknown"""
+    mode = requested or data.get('mode') or PLAN_MODE
+    return mode if mode in PLAN_MODES else None
+
+def build_plan(data, use_cache=True, mode=None, menu=None):
+    """Menu and grocery list for a validated request; returns (response body, HTTP status).
+
+    A menu the caller already has (a claimed speculation) skips menu generation.
+    """
+    started = time.perf_counter()
+    if menu:
+        plan = (menu, None)
+    else:
+        plan = generate_combined_plan(data, use_cache) if (mode or plan_mode(data)) == "combined" else None
+    # Generate menu (unless the combined call already did)
+    menu, grocery = plan if plan else (generate_menu(data, use_cache), None)
+    metrics.debug("🍽️ STRUCTURED MENU:", menu)
+    
+    # Check if menu generation failed
+    if "error" in menu:
+        return {
+            "status": "error",
+            "message": f"Menu generation failed: {menu['error']}"
+        }, 500
+        
+    if grocery is None:
+        with metrics.stage("grocery"):
+            grocery = generate_grocery_list(menu, data['guest_count'], use_cache)
+    metrics.debug("🛒 GROCERY LIST:", grocery if grocery else "None")
+    
+    if isinstance(grocery, dict) and "error" in grocery:
+        return {
+            "status": "error",
+            "message": f"Grocery list generation failed: {grocery['error']}"
+        }, 500
+    
+    # Prepare success response
+    response = {
+        "status": "success",
+        "message": "Here is your menu",
+        "plan_id": save_plan(data, menu, grocery, started),
+        "menu": menu,
+    }
+    
+    if grocery:
+        response.update(grocery_fields(grocery))
+    return response, 200
+
+def plan_totals(menu, guest_count, grocery):
+    """Ingredient totals behind grocery entries scaled from the index; None if the list came from the LLM"""
+    dishes = ingredient_index.menu_dishes(menu)
+    if not isinstance(grocery, list) or ingredients.unknown_dishes(dishes):
+        return None
+    totals = ingredients.totals(dishes, int(guest_count))
+    if ingredients.entries(totals) != grocery:
+        return None
+    return totals
+
+def save_plan(data, menu, grocery, started=None):
+    """Keep a finished plan for later edits and record it in the history; returns its id (None if it could not be stored)"""
+    plan_id = None
+    try:
+        with metrics.stage("plan_store"):
+            plan_id = plans.create(data, menu, grocery_text(grocery), plan_totals(menu, data['guest_count'], grocery))
+    except Exception as e:
+        log_error("Could not store plan", e)
+    if history:
+        latency_ms = round((time.perf_counter() - started) * 1000, 1) if started is not None else None
+        history.record(plan_id, data, menu, grocery_text(grocery), metrics.models_used(), latency_ms)
+    return plan_id
+
+def suggest_dishes(data, section, count, keep, avoid, constraint=None):
+    """count new dishes for one section from a small structured call, or an {"error": ...} dict"""
+    with metrics.stage("prompt_build"):
+        prompt = prompts.section_prompt(data, section, count, keep, avoid, constraint)
+    try:
+        result = llm.complete([{"role": "user", "content": prompt}], response_format=DishesModel,
+                              kind="section", event=data, temperature=0.7)
+    except Exception as e:
+        return {"error": log_error("Dish suggestion failed", e)}
+    dishes = [' '.join(dish.split()) for dish in result.dishes if dish.strip()]
+    if len(dishes) < count:
+        return {"error": f"Expected {count} new {section}, got {len(dishes)}"}
+    return dishes[:count]
+
+def grocery_changes(before, after):
+    """[{"name", "before", "after"}] for grocery entries that were added, removed or changed"""
+    def amounts(entries):
+        return {entry["name"]: f"{entry['quantity']} {entry['unit']}" for entry in entries}
+    old, new = amounts(before), amounts(after)
+    return [{"name": name, "before": old.get(name), "after": new.get(name)}
+            for name in sorted(old.keys() | new.keys()) if old.get(name) != new.get(name)]
+
+def apply_edit(plan, edit):
+    """(menu, grocery, totals, changes) after an edit, or an {"error": ...} dict.
+
+    Only the edited section goes to the LLM. A dietary constraint the dietary
+    engine can read keeps the dishes that already meet it and swaps in catalog
+    dishes first, so only the slots left go to the LLM. When the stored
+    grocery list was scaled from the ingredient index, the replaced dishes'
+    ingredients are subtracted and the new dishes' added; otherwise the list
+    is rebuilt.
+    """
+    data = plan["request"]
+    guest_count = int(data['guest_count'])
+    section = edit["section"]
+    items = list(plan["menu"][section])
+    positions = [edit["index"]] if edit["index"] is not None else list(range(len(items)))
+    replacements = {}
+    forbidden, unknown = dietary.parse(edit["constraint"]) if diets and edit["constraint"] else (0, ())
+    if forbidden and not unknown and edit["index"] is None:
+        adapted = diets.adapt(plan["menu"], forbidden, data.get('cuisine'), [section])
+        replacements = {swap["index"]: swap["added"] for swap in adapted["substituted"]}
+        positions = adapted["uncovered"].get(section, [])
+    if edit["dish"]:
+        replacements[positions[0]] = edit["dish"]
+    elif positions:
+        keep = [replacements.get(position, dish) for position, dish in enumerate(items) if position not in positions]
+        added = suggest_dishes(data, section, len(positions), keep, [items[position] for position in positions],
+                               edit["constraint"])
+        if isinstance(added, dict):
+            return added
+        replacements.update(zip(positions, added))
+    positions = sorted(replacements)
+    removed = [items[position] for position in positions]
+    added = [replacements[position] for position in positions]
+    for position, dish in zip(positions, added):
+        items[position] = dish
+    menu = {**plan["menu"], section: items}
+    changes = {"section": section, "removed": removed, "added": added, "grocery": None}
+
+    with metrics.stage("grocery"):
+        if plan["totals"] is not None and learn_unknown_dishes({section: added}):
+            # The section keeps its dish count, so every dish keeps its share of the servings
+            servings = ingredient_index.section_servings(guest_count, len(items))
+            totals = ingredients.fold(plan["totals"])
+            for ingredient_id, quantity in ingredients.dish_totals(removed, servings).items():
+                totals[ingredient_id] = totals.get(ingredient_id, 0.0) - quantity
+            ingredients.dish_totals(added, servings, totals)
+            totals = {ingredient_id: quantity for ingredient_id, quantity in totals.items() if quantity > 1e-6}
+            grocery = ingredients.entries(totals)
+            changes["grocery"] = grocery_changes(ingredients.entries(plan["totals"]), grocery)
+        else:
+            grocery = generate_grocery_list(menu, guest_count)
+            if isinstance(grocery, dict) and "error" in grocery:
+                return grocery
+            totals = plan_totals(menu, guest_count, grocery)
+    return menu, grocery, totals, changes
+
+def run_plan_job(payload):
+    """Job queue handler: the same plan as POST /api/plan, stored as the job result"""
+    token = metrics.start_model_log()
+    try:
+        response, _ = build_plan(payload["data"], payload["use_cache"], payload.get("mode"))
+    finally:
+        metrics.finish_model_log(token)
+    return response
+
+def job_priority(data):
+    """Paid events first; otherwise the requested priority, clamped to 0-9"""
+    if data.get('paid'):
+        return PAID_JOB_PRIORITY
+    try:
+        return max(0, min(9, int(data.get('priority', 0))))
+    except (TypeError, ValueError):
+        return 0
+
+def job_url(job):
+    return f"/api/jobs/{job['id']}"
+
+def enqueue_plan(data, use_cache, mode):
+    """Queue a validated plan request and answer 202 with the job to poll"""
+    callback_url = data.get('callback_url')
+    callback_error = job_requests.callback_url_error(callback_url) if callback_url is not None else None
+    if callback_error:
+        return jsonify({"status": "error", "message": f"callback_url {callback_error}"}), 400
+
+    dedupe_key = menu_cache.digest("job", {
+        "event": menu_cache.canonical_event(data),
+        "guest_count": int(data['guest_count']),
+        "use_cache": use_cache,
+        "mode": mode
+    })
+    try:
+        job, created = job_requests.submit(
+            {"data": data, "use_cache": use_cache, "mode": mode},
+            priority=job_priority(data),
+            dedupe_key=dedupe_key,
+            callback_url=callback_url
+        )
+    except job_queue.QueueFullError as e:
+        response = jsonify({"status": "error", "message": f"Server busy: {e}. Please retry later."})
+        response.headers['Retry-After'] = str(JOB_RETRY_AFTER)
+        return response, 503
+
+    response = jsonify({
+        "status": "queued",
+        "message": "Plan queued" if created else "An identical plan is already in progress",
+        "job_id": job["id"],
+        "job_url": job_url(job),
+        "position": job_requests.position(job) if job["status"] == "queued" else 0
+    })
+    response.headers['Location'] = job_url(job)
+    return response, 202
 
 @app.route('/api/plan', methods=['POST'])
 def plan_event():
     try:
         # Check if API is available
-        if not client:
+        if not llm.routes:
             return jsonify({
                 "status": "error",
                 "message": "API service unavailable. Please check backend logs."
             }), 503
             
         data = request.json
-        print("📝 Received form data:", json.dumps(data, indent=2) if data else "No data")
+        metrics.debug("📝 Received form data:", data)
         
         # Validate required fields
-        required_fields = ['event_type', 'cuisine', 'formality', 'guest_count', 'level']
-        if not data:
+        with metrics.stage("validate"):
+            validation_error = validate_plan_data(data)
+        if validation_error:
             return jsonify({
                 "status": "error",
-                "message": "No data received"
+                "message": validation_error
             }), 400
-            
-        missing = [field for field in required_fields if field not in data or not data[field]]
-        if missing:
-            return jsonify({
-                "status": "error",
-                "message": f"Missing required fields: {', '.join(missing)}"
-            }), 400
-        
-        # Generate menu
-        menu = generate_menu(data)
-        print("🍽️ STRUCTURED MENU:", json.dumps(menu, indent=2))
-        
-        # Check if menu generation failed
-        if "error" in menu:
-            return jsonify({
-                "status": "error",
-                "message": f"Menu generation failed: {menu['error']}"
-            }), 500
-            
-        # Generate grocery list if self-service
-        grocery = None
-        
-        grocery = generate_grocery_list(menu, data['guest_count'])
-        print("🛒 GROCERY LIST:", grocery if grocery else "None")
         
-        if isinstance(grocery, dict) and "error" in grocery:
+        use_cache = not menu_cache.bypass_requested(data, request.headers.get('Cache-Control'))
+        if response_cache and not use_cache:
+            response_cache.bypass()
+
+        mode = plan_mode(data, request.args.get('mode'))
+        if mode is None:
             return jsonify({
                 "status": "error",
-                "message": f"Grocery list generation failed: {grocery['error']}"
-            }), 500
-        
-        # Prepare success response
-        response = {
-            "status": "success",
-            "message": "Here is your menu",
-            "menu": menu,
-        }
-        
-        if grocery:
-            response["grocery_list"] = grocery
-            
-        return jsonify(response)
+                "message": f"mode must be one of: {', '.join(PLAN_MODES)}"
+            }), 400
+
+        if request.args.get('async') in ('1', 'true'):
+            return enqueue_plan(data, use_cache, mode)
+
+        menu = claim_speculation(data, request.headers.get('X-Plan-Session'), use_cache)
+        response, status = build_plan(data, use_cache, mode, menu)
+        with metrics.stage("serialize"):
+            return jsonify(response), status
         
     except Exception as e:
         error_msg = log_error("Server error in plan_event", e)
@@ -276,9 +671,585 @@ def plan_event():
             "message": f"Internal server error: {error_msg}"
         }), 500
 
-@app.route('/static/<path:path>')
-def serve_static(path):
-    return send_from_directory(app.static_folder, path)
+@app.route('/api/plan/<plan_id>', methods=['GET'])
+def get_plan(plan_id):
+    """A stored plan, as last edited"""
+    plan = plans.get(plan_id)
+    if not plan:
+        return jsonify({"status": "error", "message": "Plan not found"}), 404
+    return jsonify({
+        "status": "success",
+        "plan_id": plan["id"],
+        "version": plan["version"],
+        "request": plan["request"],
+        "menu": plan["menu"],
+        **grocery_fields(stored_grocery(plan))
+    })
+
+@app.route('/api/plan/<plan_id>', methods=['PATCH'])
+def edit_plan(plan_id):
+    """Change one dish or one section of a stored plan ("replace desserts[1]", "make mains vegetarian")"""
+    try:
+        plan = plans.get(plan_id)
+        if not plan:
+            return jsonify({"status": "error", "message": "Plan not found"}), 404
+
+        body = request.get_json(silent=True)
+        expected = body.get('version') if isinstance(body, dict) else None
+        if expected is not None and str(expected) != str(plan["version"]):
+            return jsonify({"status": "error", "message": "Plan has changed since that version; reload it"}), 409
+        try:
+            edit = plan_edits.parse_edit(body, plan["menu"])
+        except plan_edits.EditError as e:
+            return jsonify({"status": "error", "message": str(e)}), 400
+
+        result = apply_edit(plan, edit)
+        if isinstance(result, dict):
+            return jsonify({"status": "error", "message": f"Edit failed: {result['error']}"}), 500
+        menu, grocery, totals, changes = result
+
+        version = plans.update(plan_id, plan["version"], menu, grocery_text(grocery), totals)
+        if version is None:
+            return jsonify({"status": "error", "message": "Plan was edited concurrently; reload it and retry"}), 409
+        return jsonify({
+            "status": "success",
+            "message": "Plan updated",
+            "plan_id": plan_id,
+            "version": version,
+            "menu": menu,
+            **grocery_fields(grocery),
+            "changes": changes
+        })
+    except Exception as e:
+        error_msg = log_error("Server error in edit_plan", e)
+        return jsonify({"status": "error", "message": f"Internal server error: {error_msg}"}), 500
+
+@app.route('/api/plans/search')
+def search_plans():
+    """Past plans, newest first, filtered by cuisine, event_type and dish; streamed as NDJSON.
+
+    Each line is a plan; the last line is {"next_cursor", "count"}. Pass
+    next_cursor back as ?cursor= for the next page.
+    """
+    if not history:
+        return jsonify({"status": "error", "message": "Plan history is disabled"}), 503
+    try:
+        limit = int(request.args.get('limit', 50))
+        cursor = request.args.get('cursor')
+        cursor = int(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"status": "error", "message": "limit and cursor must be integers"}), 400
+    filters = {name: request.args.get(name) for name in ('cuisine', 'event_type', 'dish')}
+
+    def generate():
+        count, last = 0, None
+        for plan in history.search(cursor=cursor, limit=limit, **filters):
+            count, last = count + 1, plan["seq"]
+            yield json.dumps(plan) + "\n"
+        page = max(1, min(limit, plan_history.MAX_PAGE))
+        yield json.dumps({"next_cursor": last if count == page else None, "count": count}) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/api/jobs/<job_id>')
+def get_job(job_id):
+    """Poll a queued plan; once it is done the plan response is its result"""
+    job = job_requests.get(job_id)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    if job["status"] == "queued":
+        job["position"] = job_requests.position(job)
+    return jsonify({"status": "success", "job": job})
+
+@app.route('/api/jobs/<job_id>/callback', methods=['POST'])
+def add_job_callback(job_id):
+    """Register a webhook that receives the job once it finishes"""
+    if job_requests.get(job_id) is None:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    body = request.get_json(silent=True)
+    url = body.get('url') if isinstance(body, dict) else None
+    callback_error = job_requests.callback_url_error(url)
+    if callback_error:
+        return jsonify({"status": "error", "message": f"url {callback_error}"}), 400
+    job = job_requests.add_callback(job_id, url)
+    if not job:
+        return jsonify({"status": "error", "message": "Job not found"}), 404
+    return jsonify({"status": "success", "job": job})
+
+def sse(event, data):
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def parse_streamed(parser, route):
+    """MenuModel from a streamed menu call; a fast model's partial menu is a parse failure"""
+    menu = parser.model()
+    return menu_stream.require_complete(menu) if route.tier == model_tiers.FAST else menu
+
+def menu_deltas(route, prompt):
+    """Content deltas of a streamed structured menu call; closing the generator closes the stream"""
+    messages, response_format = route.structured_request([{"role": "user", "content": prompt}], MenuModel)
+    with route.track("menu") as call:
+        stream = route.client().chat.completions.create(
+            model=route.model,
+            messages=messages,
+            temperature=0.7,
+            response_format=response_format,
+            stream=True,
+            stream_options=llm_router.STREAM_OPTIONS
+        )
+        with stream:
+            for chunk in stream:
+                if chunk.usage:
+                    call.record_usage(route, chunk.usage)
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+
+def finish_streamed_menu(parser, route, score, prompt):
+    """The menu dict of a finished stream; a fast model's reply that does not parse is redone on the reasoning tier"""
+    try:
+        with metrics.stage("parse"):
+            menu = parse_streamed(parser, route).model_dump()
+    except ValueError as e:
+        if route.tier != model_tiers.FAST:
+            llm.record_parse("menu", score, route.tier, False)
+            raise
+        llm.escalate("menu", score, e)
+        menu = generate_menu_ai(prompt)
+        if isinstance(menu, dict):
+            raise RuntimeError(menu["error"])
+        return menu.model_dump()
+    llm.record_parse("menu", score, route.tier, True)
+    return menu
+
+def stream_menu_events(data, use_cache=True, menu=None):
+    """Yield SSE events for each dish as the menu streams in, then the full menu.
+
+    A menu the caller already has (a claimed speculation) is replayed like a cached one.
+    """
+    cache_key = menu_cache.menu_key(data)
+    menu = menu or cached_menu(data, cache_key, use_cache)
+
+    if menu:
+        for section in MENU_SECTIONS:
+            for dish in menu[section]:
+                yield sse("item", {"section": section, "value": dish})
+            yield sse("section", {"section": section, "value": menu[section]})
+        yield sse("section", {"section": NOTES_FIELD, "value": menu[NOTES_FIELD]})
+    else:
+        parser = MenuStreamParser()
+        # Dishes go to the browser as they arrive, so this call is routed but not hedged,
+        # and a fast model whose reply does not parse is escalated only after the stream
+        # (the final "menu" event carries the reasoning model's menu and the page redraws from it)
+        tier, score = llm.choose_tier("menu", data, explore=False)
+        route = llm.primary("menu", tier)
+        prompt = build_menu_prompt(data)
+        for delta in menu_deltas(route, prompt):
+            for kind, section, value in parser.feed(delta):
+                yield sse(kind, {"section": section, "value": value})
+        for kind, section, value in parser.close():
+            yield sse(kind, {"section": section, "value": value})
+        menu = finish_streamed_menu(parser, route, score, prompt)
+        store_menu(data, cache_key, menu)
+
+    yield sse("menu", menu)
+    return menu
+
+def upstream_busy():
+    """True while any provider has requests waiting for a rate-limit token"""
+    return any(provider["queue_depth"] for provider in llm_transport.stats().values())
+
+def speculate_menu(data, cancelled):
+    """Menu for a prefetched event, streamed so a cancelled speculation stops the provider; None once cancelled"""
+    tier, score = llm.choose_tier("menu", data, explore=False)
+    route = llm.primary("menu", tier)
+    prompt = build_menu_prompt(data)
+    parser = MenuStreamParser()
+    deltas = menu_deltas(route, prompt)
+    for delta in deltas:
+        if cancelled.is_set():
+            deltas.close()
+            return None
+        parser.feed(delta)
+    parser.close()
+    return finish_streamed_menu(parser, route, score, prompt)
+
+def claim_speculation(data, session, use_cache=True):
+    """The menu speculated for this session if it was for this event, else None (and the speculation is cancelled)"""
+    if not (speculative_menus and session and use_cache):
+        return None
+    cache_key = menu_cache.menu_key(data)
+    menu = speculative_menus.claim(session, cache_key)
+    if menu:
+        print("🔮 Serving the menu speculated while the form was being filled")
+        store_menu(data, cache_key, menu)
+    return menu
+
+@app.route('/api/plan/prefetch', methods=['POST'])
+def prefetch_plan():
+    """Start the menu for a partly filled form in the background; the same session's submit claims it"""
+    if not speculative_menus or not llm.routes:
+        return jsonify({"status": "error", "message": "Speculative generation is disabled"}), 503
+    data = request.get_json(silent=True)
+    session = request.headers.get('X-Plan-Session', '')
+    if not isinstance(data, dict) or not SESSION_ID.fullmatch(session):
+        return jsonify({"status": "error", "message": "A JSON body and an X-Plan-Session header are required"}), 400
+    missing = [field for field in PREFETCH_FIELDS if not data.get(field)]
+    if missing:
+        return jsonify({"status": "error", "message": f"Missing required fields: {', '.join(missing)}"}), 400
+
+    cache_key = menu_cache.menu_key(data)
+    if cached_menu(data, cache_key):
+        return jsonify({"status": "success", "speculation": "cached"})
+    state = speculative_menus.start(session, request.remote_addr, cache_key, data)
+    if state in ("over_budget", "at_capacity", "upstream_busy"):
+        response = jsonify({"status": "error", "speculation": state,
+                            "message": "Not speculating now; the submit will generate the menu"})
+        response.headers['Retry-After'] = str(JOB_RETRY_AFTER)
+        return response, 429
+    return jsonify({"status": "success", "speculation": state}), 202 if state == "started" else 200
+
+def stream_grocery_events(menu, guest_count, use_cache=True):
+    """Yield an SSE event per grocery line as the list streams in"""
+    cache_key = menu_cache.grocery_key(menu, guest_count)
+    grocery = local_grocery_list(menu, guest_count)
+    if not grocery and response_cache and use_cache:
+        grocery = response_cache.get(cache_key)
+
+    if grocery:
+        for line in grocery_text(grocery).splitlines():
+            if line.strip():
+                yield sse("grocery_item", {"value": line.strip().lstrip('-').strip()})
+    else:
+        route = llm.primary("grocery")
+        with route.track("grocery") as call:
+            stream = route.client().chat.completions.create(
+                model=route.model,
+                messages=[{"role": "user", "content": build_grocery_prompt(menu, guest_count)}],
+                temperature=0.7,
+                stream=True,
+                stream_options=llm_router.STREAM_OPTIONS
+            )
+            text = ""
+            pending = ""
+            thinking = False
+            for chunk in stream:
+                if chunk.usage:
+                    call.record_usage(route, chunk.usage)
+                if not chunk.choices or not chunk.choices[0].delta.content:
+                    continue
+                delta = chunk.choices[0].delta.content
+                text += delta
+                pending += delta
+                *lines, pending = pending.split("\n")
+                for line in lines:
+                    # R1-style reasoning lines are not part of the list
+                    if line.strip().lower() in ("<think>", "</think>"):
+                        thinking = line.strip().lower() == "<think>"
+                    elif line.strip() and not thinking:
+                        yield sse("grocery_item", {"value": line.strip().lstrip('-').strip()})
+        if pending.strip() and not thinking:
+            yield sse("grocery_item", {"value": pending.strip().lstrip('-').strip()})
+        grocery = menu_stream.strip_reasoning(text)
+        if response_cache and grocery:
+            response_cache.set(cache_key, grocery)
+
+    yield sse("grocery", {"value": grocery_text(grocery)})
+    return grocery
+
+@app.route('/api/plan/stream', methods=['POST'])
+def plan_event_stream():
+    """Stream the plan as Server-Sent Events: menu dishes first, then grocery lines"""
+    if not llm.routes:
+        return jsonify({
+            "status": "error",
+            "message": "API service unavailable. Please check backend logs."
+        }), 503
+
+    data = request.json
+    validation_error = validate_plan_data(data)
+    if validation_error:
+        return jsonify({
+            "status": "error",
+            "message": validation_error
+        }), 400
+
+    use_cache = not menu_cache.bypass_requested(data, request.headers.get('Cache-Control'))
+    if response_cache and not use_cache:
+        response_cache.bypass()
+
+    session = request.headers.get('X-Plan-Session')
+
+    def generate():
+        started = time.perf_counter()
+        token = metrics.start_model_log()
+        try:
+            menu = claim_speculation(data, session, use_cache)
+            menu = yield from stream_menu_events(data, use_cache, menu)
+            grocery = yield from stream_grocery_events(menu, data['guest_count'], use_cache)
+            yield sse("done", {"status": "success", "message": "Here is your menu",
+                               "plan_id": save_plan(data, menu, grocery, started)})
+        except Exception as e:
+            yield sse("error", {"status": "error", "message": log_error("Streaming plan failed", e)})
+        finally:
+            metrics.finish_model_log(token)
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+def parse_batch_body():
+    """Event specs from a JSON array or an NDJSON upload"""
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        text = request.get_data(as_text=True)
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+    specs = request.get_json(silent=True)
+    if not isinstance(specs, list):
+        raise ValueError("Expected a JSON array or NDJSON of event specs")
+    return specs
+
+def scale_batch_groceries(menus, guest_counts):
+    """Grocery lists for many menus, learning all unknown dishes in one LLM call"""
+    sections = [ingredient_index.menu_dishes(menu) for menu in menus]
+    unknown = sorted({dish for dishes in sections for dish in ingredients.unknown_dishes(dishes)})
+    if unknown:
+        reply = generate_with_deepseek(ingredient_index.build_ingredient_prompt(unknown), kind="ingredients")
+        if isinstance(reply, str):
+            with metrics.stage("parse"):
+                ingredients.learn(reply)
+    scaled = ingredients.scale_batch(sections, guest_counts)
+    return [(entries, ingredients.unknown_dishes(dishes)) for entries, dishes in zip(scaled, sections)]
+
+@app.route('/api/plan/batch', methods=['POST'])
+def plan_event_batch():
+    """Plan many events; results stream back as NDJSON in completion order.
+
+    Identical specs share one menu generation, unique specs fan out over a
+    bounded pool, and each wave of finished menus is scaled with a single
+    NumPy operation. The last line is a summary record.
+    """
+    if not llm.routes:
+        return jsonify({
+            "status": "error",
+            "message": "API service unavailable. Please check backend logs."
+        }), 503
+
+    try:
+        specs = parse_batch_body()
+    except ValueError as e:
+        return jsonify({"status": "error", "message": f"Invalid batch: {e}"}), 400
+    if len(specs) > BATCH_MAX_ITEMS:
+        return jsonify({
+            "status": "error",
+            "message": f"Batch too large: {len(specs)} items (max {BATCH_MAX_ITEMS})"
+        }), 400
+
+    use_cache = not menu_cache.bypass_requested(None, request.headers.get('Cache-Control'))
+
+    def generate():
+        started = time.perf_counter()
+        counts = {"success": 0, "error": 0}
+
+        # Group identical specs so each unique menu is generated once
+        groups = {}
+        for index, spec in enumerate(specs):
+            validation_error = validate_plan_data(spec) if isinstance(spec, dict) else "Event spec must be an object"
+            if validation_error:
+                counts["error"] += 1
+                yield json.dumps({"index": index, "status": "error", "message": validation_error}) + "\n"
+                continue
+            groups.setdefault(menu_cache.menu_key(spec), []).append(index)
+
+        pool = ThreadPoolExecutor(max_workers=BATCH_CONCURRENCY)
+        try:
+            futures = {
+                pool.submit(generate_menu, specs[indexes[0]], use_cache): indexes
+                for indexes in groups.values()
+            }
+            pending = set(futures)
+            while pending:
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                wave = []
+                for future in done:
+                    menu = future.result()
+                    for index in futures[future]:
+                        if "error" in menu:
+                            counts["error"] += 1
+                            yield json.dumps({"index": index, "status": "error", "message": menu["error"]}) + "\n"
+                        else:
+                            wave.append((index, menu))
+                if not wave:
+                    continue
+
+                groceries = scale_batch_groceries(
+                    [menu for _, menu in wave],
+                    [int(specs[index]['guest_count']) for index, _ in wave]
+                )
+                for (index, menu), (grocery, unknown) in zip(wave, groceries):
+                    counts["success"] += 1
+                    record = {"index": index, "status": "success", "menu": menu, **grocery_fields(grocery)}
+                    if unknown:
+                        record["unknown_dishes"] = unknown
+                    yield json.dumps(record) + "\n"
+        finally:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        elapsed = time.perf_counter() - started
+        yield json.dumps({
+            "type": "summary",
+            "items": len(specs),
+            "unique_specs": len(groups),
+            "succeeded": counts["success"],
+            "failed": counts["error"],
+            "elapsed_s": round(elapsed, 3),
+            "items_per_s": round(len(specs) / elapsed, 2) if elapsed else None
+        }) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.before_request
+def start_health_probes():
+    for probe in provider_health.values():
+        probe.start()
+
+@app.before_request
+def start_job_workers():
+    job_requests.start()
+
+@app.before_request
+def start_catalog_refresh():
+    if menu_catalog:
+        menu_catalog.start()
+
+@server.on_drain
+def stop_background_work(timeout):
+    """On worker shutdown, let running plan jobs and a catalog refresh finish and write the queued history"""
+    deadline = time.monotonic() + timeout
+    running = job_requests.stop(timeout)
+    if menu_catalog:
+        menu_catalog.stop(max(0.0, deadline - time.monotonic()))
+    if history:
+        history.stop(max(0.0, deadline - time.monotonic()))
+    if speculative_menus:
+        speculative_menus.stop()
+    if running:
+        print(f"⚠️ {running} plan jobs still running at shutdown; they will be requeued after their lease")
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.trace = metrics.start_trace(request.path)
+    g.model_log = metrics.start_model_log()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        endpoint = request.url_rule.rule if request.url_rule else "unmatched"
+        metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=endpoint,
+                                        method=request.method, status=response.status_code)
+    metrics.finish_trace(g.pop('trace', None), response.status_code)
+    token = g.pop('model_log', None)
+    if token is not None:
+        metrics.finish_model_log(token)
+    return response
+
+def collect_cache_metrics():
+    families = []
+    if response_cache:
+        stats = response_cache.snapshot()
+        families.append(("menu_cache_events_total", "counter", "Response cache hits, misses, evictions, bypasses and errors",
+                         [({"event": name}, stats[name]) for name in ("hits", "misses", "evictions", "bypasses", "errors")]))
+    if semantic_menus:
+        stats = semantic_menus.snapshot()
+        families.append(("semantic_cache_events_total", "counter", "Semantic cache hits, misses, inserts and evictions",
+                         [({"event": name}, stats[name]) for name in ("hits", "misses", "inserts", "evictions")]))
+        families.append(("semantic_cache_entries", "gauge", "Menus held by the semantic cache",
+                         [({}, stats["entries"])]))
+    if coalescer:
+        stats = coalescer.snapshot()
+        families.append(("llm_coalesced_calls_total", "counter", "LLM calls made upstream vs shared with a concurrent identical call",
+                         [({"outcome": name}, stats[name]) for name in ("upstream_calls", "shared_in_process", "shared_across_processes", "takeovers")]))
+    if menu_catalog:
+        stats = menu_catalog.snapshot()
+        families.append(("menu_catalog_events_total", "counter", "Catalog hits, misses, stale hits and background refreshes",
+                         [({"event": name}, stats[name]) for name in ("hits", "misses", "stale_hits", "refreshed", "refresh_failures")]))
+        families.append(("menu_catalog_entries", "gauge", "Catalog entries loaded and how many are due for regeneration",
+                         [({"state": "loaded"}, stats["entries"]), ({"state": "stale"}, stats["stale"])]))
+    if diets:
+        stats = diets.snapshot()
+        families.append(("dietary_engine_events_total", "counter", "Menus adapted to dietary restrictions, adapted without the LLM, and dishes kept, swapped or left to the LLM",
+                         [({"event": name}, stats[name]) for name in ("adaptations", "complete", "kept", "substituted", "uncovered")]))
+    if llm.policy:
+        stats = llm.tier_stats()
+        families.append(("llm_tier_events_total", "counter", "Event calls sent to the fast and reasoning model tiers, explored, escalated and failing to parse",
+                         [({"event": name}, stats[name]) for name in ("fast", "reasoning", "explored", "escalations", "fast_parse_failures", "reasoning_parse_failures")]))
+        families.append(("llm_tier_threshold", "gauge", "Complexity score from which event calls go to the reasoning tier, per call kind",
+                         [({"kind": kind}, tiers["threshold"]) for kind, tiers in stats["kinds"].items()]))
+    if speculative_menus:
+        stats = speculative_menus.snapshot()
+        families.append(("speculation_events_total", "counter", "Speculative menus started, served to a matching submit, waited on, cancelled, and refused for budget, capacity or upstream load",
+                         [({"event": name}, stats[name]) for name in ("started", "hits", "waited", "mismatched", "cancelled", "failed", "expired", "over_budget", "at_capacity", "upstream_busy")]))
+        families.append(("speculation_entries", "gauge", "Sessions holding a speculative menu, and speculations generating",
+                         [({"state": "held"}, stats["entries"]), ({"state": "running"}, stats["running"])]))
+    stats = plans.snapshot()
+    families.append(("plan_store_events_total", "counter", "Plans stored and edited, and edits lost to a concurrent edit",
+                     [({"event": name}, stats[name]) for name in ("created", "updated", "conflicts")]))
+    if history:
+        stats = history.snapshot()
+        families.append(("plan_history_events_total", "counter", "Plans recorded in the history, written, and dropped on a full queue",
+                         [({"event": name}, stats[name]) for name in ("recorded", "written", "dropped", "errors")]))
+        families.append(("plan_history_pending", "gauge", "Plans waiting for the history writer",
+                         [({}, stats["pending"])]))
+    jobs = job_requests.snapshot()
+    families.append(("plan_jobs", "gauge", "Plan jobs by state",
+                     [({"state": state}, jobs[state]) for state in ("queued", "running", "done", "failed")]))
+    families.append(("plan_job_events_total", "counter", "Plan jobs submitted, deduplicated, shed, completed and failed",
+                     [({"event": name}, jobs[name]) for name in ("submitted", "deduplicated", "shed", "completed", "failed")]))
+    return families
+
+metrics.register_collector(collect_cache_metrics)
+
+@app.route('/metrics')
+def prometheus_metrics():
+    """Prometheus text exposition of latency histograms, token usage and cache/transport state"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/healthz')
+def healthz():
+    """Liveness plus the last background probe of each LLM provider; ok while any is up"""
+    if not provider_health:
+        return jsonify({"status": "error", "providers": {}, "message": "No LLM provider configured"}), 503
+    providers = {}
+    for name, probe in provider_health.items():
+        providers[name] = probe.status()
+        if providers[name]["status"] == "unknown":
+            providers[name] = probe.probe_now()
+    status = "ok" if any(p["status"] == "up" for p in providers.values()) else "degraded"
+    return jsonify({"status": status, "providers": providers}), 200 if status == "ok" else 503
+
+@app.route('/api/llm/stats')
+def llm_stats():
+    return jsonify({
+        "status": "success",
+        "providers": llm_transport.stats(),
+        "routes": llm.stats(),
+        "tiers": llm.tier_stats(),
+        "coalescing": coalescer.snapshot() if coalescer else None
+    })
+
+@app.route('/api/cache/stats')
+def cache_stats():
+    if not response_cache and not semantic_menus and not menu_catalog and not speculative_menus:
+        return jsonify({"status": "disabled"})
+    return jsonify({
+        "status": "success",
+        "cache": response_cache.snapshot() if response_cache else None,
+        "semantic": semantic_menus.snapshot() if semantic_menus else None,
+        "catalog": menu_catalog.snapshot() if menu_catalog else None,
+        "speculation": speculative_menus.snapshot() if speculative_menus else None
+    })
 
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    server.run(app, 'app')
\ No newline at end of file
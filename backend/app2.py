@@ -1,31 +1,30 @@
 import os
 import json
 import random
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import request, jsonify
 from dotenv import load_dotenv
-from openai import OpenAI
+
+import ingredient_index
+import llm_transport
+import model_tiers
+import prompts
+import server
 
 # Load environment variables
 load_dotenv()
 
-app = Flask(__name__)
-
-# Configure paths
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-FRONTEND_DIR = os.path.join(BASE_DIR, '..', 'frontend')
-TEMPLATES_DIR = os.path.join(FRONTEND_DIR, 'templates')
-STATIC_DIR = os.path.join(FRONTEND_DIR, 'static')
+# Frontend pages and /static come from the shared factory
+app = server.create_app(__name__)
 
-app.template_folder = TEMPLATES_DIR
-app.static_folder = STATIC_DIR
+# Per-serving ingredients for known dishes
+ingredients = ingredient_index.create_index()
 
 # Initialize OpenAI client only if token is available
 try:
     GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
     if GITHUB_TOKEN:
-        client = OpenAI(
-            base_url="https://api.githubcopilot.com/chat/completions",
-            api_key=GITHUB_TOKEN
+        client = llm_transport.create_client(
+            "copilot", "https://api.githubcopilot.com/chat/completions", GITHUB_TOKEN
         )
         print("✅ GitHub Copilot API client initialized")
     else:
@@ -35,9 +34,45 @@ except:
     client = None
     print("⚠️ Failed to initialize GitHub Copilot API client, using mock data")
 
-@app.route('/')
-def index():
-    return render_template('index.html')
+# Simple events go to the fast model; complex ones, and fast replies that do not parse, to the full one
+MODELS = {
+    model_tiers.FAST: os.getenv("COPILOT_FAST_MODEL", "gpt-4o-mini"),
+    model_tiers.REASONING: os.getenv("COPILOT_MODEL", "gpt-4"),
+}
+tiers = model_tiers.create_policy()
+
+def call_function(kind, event, prompt, tools):
+    """Arguments of the forced function call, from the model tier the event needs"""
+    name = tools[0]["function"]["name"]
+    score = model_tiers.complexity(event) if tiers and event else None
+    tier = tiers.choose(kind, score) if score is not None else model_tiers.REASONING
+    while True:
+        try:
+            response = client.chat.completions.create(
+                model=MODELS[tier],
+                messages=[
+                    {"role": "system", "content": "You are an expert chef and event planner."},
+                    {"role": "user", "content": prompt}
+                ],
+                tools=tools,
+                tool_choice={"type": "function", "function": {"name": name}}
+            )
+            tool_calls = response.choices[0].message.tool_calls
+            if not tool_calls or tool_calls[0].function.name != name:
+                raise ValueError(f"API {kind} generation failed")
+            arguments = json.loads(tool_calls[0].function.arguments)
+        except Exception as e:
+            if score is not None and isinstance(e, ValueError):
+                tiers.record(kind, score, tier, False)
+            if tier != model_tiers.FAST:
+                raise
+            print(f"⤴️ {MODELS[tier]} failed the {kind} call: {e}; retrying on {MODELS[model_tiers.REASONING]}")
+            tiers.escalated()
+            tier = model_tiers.REASONING
+            continue
+        if score is not None:
+            tiers.record(kind, score, tier, True)
+        return arguments
 
 @app.route('/api/plan', methods=['POST'])
 def plan_event():
@@ -117,7 +152,7 @@ def generate_menu_with_api(event_details: dict) -> dict:
         }
     ]
     
-    prompt = f"""
+    prompt = prompts.squeeze(f"""
     Create a diverse menu for:
     - Event type: {event_details['event_type']}
     - Cuisine: {event_details['cuisine']}
@@ -127,25 +162,9 @@ def generate_menu_with_api(event_details: dict) -> dict:
     - Preparation: {'catering' if event_details['service_type'] == 'catering' else 'self-prepared'}
     
     Include 3 courses with 2-3 dishes per course. Ensure dishes are culturally authentic.
-    """
+    """)
     
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are an expert chef and event planner."},
-            {"role": "user", "content": prompt}
-        ],
-        tools=tools,
-        tool_choice={"type": "function", "function": {"name": "generate_menu"}}
-    )
-    
-    # Process the function call
-    if response.choices[0].message.tool_calls:
-        tool_call = response.choices[0].message.tool_calls[0]
-        if tool_call.function.name == "generate_menu":
-            return json.loads(tool_call.function.arguments)
-    
-    raise Exception("API menu generation failed")
+    return call_function("menu", event_details, prompt, tools)
 
 def generate_grocery_list_with_api(menu: dict, guest_count: int) -> dict:
     """Generate grocery list using GitHub Copilot function calling"""
@@ -167,31 +186,15 @@ def generate_grocery_list_with_api(menu: dict, guest_count: int) -> dict:
         }
     ]
     
-    prompt = f"""
+    prompt = prompts.squeeze(f"""
     Create a detailed grocery list for this menu for {guest_count} guests:
-    {json.dumps(menu, indent=2)}
+    {prompts.compact_menu(menu)}
     
     For each ingredient include quantity based on guest count and categorize items.
     Also provide preparation tips.
-    """
+    """)
     
-    response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[
-            {"role": "system", "content": "You are an expert chef and event planner."},
-            {"role": "user", "content": prompt}
-        ],
-        tools=tools,
-        tool_choice={"type": "function", "function": {"name": "generate_grocery_list"}}
-    )
-    
-    # Process the function call
-    if response.choices[0].message.tool_calls:
-        tool_call = response.choices[0].message.tool_calls[0]
-        if tool_call.function.name == "generate_grocery_list":
-            return json.loads(tool_call.function.arguments)
-    
-    raise Exception("API grocery generation failed")
+    return call_function("grocery", None, prompt, tools)
 
 # Mock data implementations
 def generate_mock_menu(event_details: dict) -> dict:
@@ -317,6 +320,28 @@ def generate_mock_menu(event_details: dict) -> dict:
 
 def generate_mock_grocery_list(menu: dict, guest_count: int) -> dict:
     """Generate mock grocery list without API"""
+    prep_tips = [
+        "Marinate proteins at least 2 hours before cooking",
+        "Chop vegetables in advance to save time",
+        "Prepare sauces ahead of time",
+        "Set up cooking stations for efficient preparation",
+        "Taste and adjust seasoning before serving"
+    ]
+
+    # Scale real ingredients when every dish is in the local index
+    dishes = {
+        course['name']: [dish['name'] for dish in course.get('dishes', [])]
+        for course in menu.get('courses', [])
+    }
+    if dishes and not ingredients.unknown_dishes(dishes):
+        return {
+            "ingredients": [
+                {"name": entry["name"].title(), "quantity": f"{entry['quantity']} {entry['unit']}", "category": entry["category"]}
+                for entry in ingredients.scale(dishes, int(guest_count))
+            ],
+            "prep_tips": prep_tips
+        }
+
     # Calculate quantities based on guest count
     meat_qty = guest_count * 150  # 150g per person
     veg_qty = guest_count * 200   # 200g per person
@@ -332,18 +357,8 @@ def generate_mock_grocery_list(menu: dict, guest_count: int) -> dict:
             {"name": "Dairy Products", "quantity": "As needed", "category": "dairy"},
             {"name": "Cooking Oil", "quantity": "1 bottle", "category": "pantry"}
         ],
-        "prep_tips": [
-            "Marinate proteins at least 2 hours before cooking",
-            "Chop vegetables in advance to save time",
-            "Prepare sauces ahead of time",
-            "Set up cooking stations for efficient preparation",
-            "Taste and adjust seasoning before serving"
-        ]
+        "prep_tips": prep_tips
     }
 
-@app.route('/static/<path:path>')
-def serve_static(path):
-    return send_from_directory(app.static_folder, path)
-
 if __name__ == '__main__':
-    app.run(debug=True, port=5000)
\ No newline at end of file
+    server.run(app, 'app2')
\ No newline at end of file
@@ -0,0 +1,181 @@
+"""ASGI entry point.
+
+POST /api/plan runs on the async pipeline (menu and grocery calls overlap and
+no worker thread waits on the network); every other route is served by the
+Flask app.
+
+Flask routes run on a pool of SERVER_THREADS threads.
+
+Run with: uvicorn asgi:application --port 5000 (or python server.py asgi)
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import menu_cache
+import metrics
+from app import (app as flask_app, validate_plan_data, plan_mode, PLAN_MODES, response_cache, llm,
+                 grocery_fields, save_plan, claim_speculation, log_error, start_health_probes,
+                 start_catalog_refresh)
+from async_pipeline import plan_combined_async, plan_event_async
+
+# WsgiToAsgi runs every Flask request on one shared thread, which would serve
+# /api/plan/stream and the other Flask routes one request at a time
+wsgi_executor = ThreadPoolExecutor(max_workers=int(os.getenv('SERVER_THREADS', 32)),
+                                   thread_name_prefix="wsgi")
+
+
+class PooledWsgiInstance(WsgiToAsgiInstance):
+    @sync_to_async(thread_sensitive=False, executor=wsgi_executor)
+    def run_wsgi_app(self, body):
+        return WsgiToAsgiInstance.__dict__['run_wsgi_app'].func(self, body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    """WsgiToAsgi with each request on its own pool thread"""
+
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiInstance(self.wsgi_application)(scope, receive, send)
+
+
+flask_asgi = PooledWsgiToAsgi(flask_app)
+
+
+async def send_json(send, payload, status=200):
+    with metrics.stage("serialize"):
+        body = json.dumps(payload).encode()
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+async def read_body(receive):
+    body = b""
+    more_body = True
+    while more_body:
+        message = await receive()
+        body += message.get("body", b"")
+        more_body = message.get("more_body", False)
+    return body
+
+
+async def plan_event(scope, receive, send):
+    try:
+        started = time.perf_counter()
+        start_health_probes()
+        start_catalog_refresh()
+        if not llm.routes:
+            return await send_json(send, {
+                "status": "error",
+                "message": "API service unavailable. Please check backend logs."
+            }, 503)
+
+        try:
+            data = json.loads(await read_body(receive) or b"null")
+        except ValueError:
+            data = None
+
+        with metrics.stage("validate"):
+            validation_error = validate_plan_data(data)
+        if validation_error:
+            return await send_json(send, {"status": "error", "message": validation_error}, 400)
+
+        query = parse_qs(scope.get("query_string", b"").decode())
+        mode = plan_mode(data, query.get("mode", [None])[0])
+        if mode is None:
+            return await send_json(send, {
+                "status": "error",
+                "message": f"mode must be one of: {', '.join(PLAN_MODES)}"
+            }, 400)
+
+        headers = dict(scope.get("headers", []))
+        use_cache = not menu_cache.bypass_requested(data, headers.get(b"cache-control", b"").decode())
+        if response_cache and not use_cache:
+            response_cache.bypass()
+
+        # A menu speculated while the form was filled in skips menu generation (and the combined call)
+        menu = await asyncio.to_thread(claim_speculation, data, headers.get(b"x-plan-session", b"").decode(),
+                                       use_cache)
+        if menu:
+            result = await plan_event_async(data, use_cache, menu)
+        elif mode == "combined":
+            result = await plan_combined_async(data, use_cache)
+        else:
+            result = await plan_event_async(data, use_cache)
+        if isinstance(result, dict) and "error" in result:
+            return await send_json(send, {
+                "status": "error",
+                "message": f"Plan generation failed: {result['error']}"
+            }, 500)
+
+        menu, grocery = result
+        response = {
+            "status": "success",
+            "message": "Here is your menu",
+            "plan_id": await asyncio.to_thread(save_plan, data, menu, grocery, started),
+            "menu": menu,
+        }
+        if grocery:
+            response.update(grocery_fields(grocery))
+        await send_json(send, response)
+    except Exception as e:
+        error_msg = log_error("Server error in plan_event", e)
+        await send_json(send, {
+            "status": "error",
+            "message": f"Internal server error: {error_msg}"
+        }, 500)
+
+
+def wants_job(scope):
+    """POST /api/plan?async=1 queues a job, which the Flask app handles"""
+    query = parse_qs(scope.get("query_string", b"").decode())
+    return query.get("async", [""])[0] in ("1", "true")
+
+
+async def lifespan(scope, receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            start_health_probes()
+            start_catalog_refresh()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(scope, receive, send)
+    if scope["type"] == "http" and scope["path"] == "/api/plan" and scope["method"] == "POST" \
+            and not wants_job(scope):
+        started = time.perf_counter()
+        trace = metrics.start_trace(scope["path"])
+        status = {}
+
+        async def send_with_status(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        models = metrics.start_model_log()
+        try:
+            return await plan_event(scope, receive, send_with_status)
+        finally:
+            metrics.finish_model_log(models)
+            metrics.REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint="/api/plan",
+                                            method="POST", status=status.get("code", 500))
+            metrics.finish_trace(trace, status.get("code", 500))
+    return await flask_asgi(scope, receive, send)
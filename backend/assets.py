@@ -0,0 +1,217 @@
+"""Build and serve the frontend's static assets.
+
+`python assets.py` (also run on startup when the sources changed) minifies
+every .js and .css file in frontend/static, names each after a hash of its
+content (js/script.js -> js/script.<hash>.js) and writes it, plus .gz and
+.br variants, to the build directory with a manifest.json mapping source
+paths to built ones. Templates link assets through asset_url(), so
+index.html always points at the current build.
+
+send_asset() serves a fingerprinted file in the best encoding the client
+accepts, with an ETag and Cache-Control: immutable for a year: a changed file
+gets a new name, so browsers never need to revalidate. Unfingerprinted paths
+still work but are sent with no-cache, so clients revalidate them.
+
+The minifier only drops comments and whitespace outside strings and template
+literals; it does not parse JavaScript, so the sources must not use regex
+literals. Brotli output needs the brotli package and is skipped without it.
+
+Configured with STATIC_BUILD_DIR and ASSET_BUILD (auto, to rebuild on startup
+when a source is newer than the manifest, or off).
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import re
+import time
+
+from flask import Response, request, send_from_directory
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+STATIC_DIR = os.path.join(BASE_DIR, '..', 'frontend', 'static')
+BUILD_DIR = os.getenv('STATIC_BUILD_DIR', os.path.join(BASE_DIR, '..', 'frontend', 'build'))
+MANIFEST = 'manifest.json'
+
+HASH_LENGTH = 10
+IMMUTABLE = 'public, max-age=31536000, immutable'
+CONTENT_TYPES = {'.js': 'text/javascript; charset=utf-8', '.css': 'text/css; charset=utf-8'}
+# Content-Encoding -> file suffix, in order of preference
+ENCODINGS = [('br', '.br'), ('gzip', '.gz')]
+
+# Punctuation that never needs the whitespace around it
+_JS_TIGHT = re.compile(r'[ \t]*([{}();,:=])[ \t]*')
+_CSS_TIGHT = re.compile(r'\s*([{};,>])\s*')
+_BREAK_AFTER = re.compile(r'([{;,])\n')
+_BREAK_BEFORE = re.compile(r'\n(})')
+
+_manifest = None
+
+
+def _segments(text, quotes, line_comments):
+    """Split source into ("code", text) and ("string", text), dropping comments"""
+    segments, code, i, n = [], [], 0, len(text)
+    while i < n:
+        ch = text[i]
+        if ch in quotes:
+            j = i + 1
+            while j < n and text[j] != ch:
+                j += 2 if text[j] == '\\' else 1
+            segments.append(("code", ''.join(code)))
+            segments.append(("string", text[i:j + 1]))
+            code, i = [], j + 1
+        elif text.startswith('/*', i):
+            end = text.find('*/', i + 2)
+            code.append(' ')
+            i = n if end < 0 else end + 2
+        elif line_comments and text.startswith('//', i):
+            end = text.find('\n', i)
+            i = n if end < 0 else end
+        else:
+            code.append(ch)
+            i += 1
+    segments.append(("code", ''.join(code)))
+    return segments
+
+
+def minify_js(text):
+    """JavaScript without comments, indentation or blank lines (line breaks are kept for ASI)"""
+    out = []
+    for kind, chunk in _segments(text, '\'"`', line_comments=True):
+        if kind == "code":
+            chunk = re.sub(r'[ \t]+', ' ', re.sub(r'\s*\n\s*', '\n', chunk))
+            chunk = _JS_TIGHT.sub(r'\1', chunk)
+        out.append(chunk)
+    text = ''.join(out)
+    text = _BREAK_BEFORE.sub(r'\1', _BREAK_AFTER.sub(r'\1', text))
+    return text.strip() + '\n'
+
+
+def minify_css(text):
+    out = []
+    for kind, chunk in _segments(text, '\'"', line_comments=False):
+        if kind == "code":
+            chunk = _CSS_TIGHT.sub(r'\1', re.sub(r'\s+', ' ', chunk))
+            chunk = re.sub(r':\s+', ':', chunk).replace(';}', '}')
+        out.append(chunk)
+    return ''.join(out).strip() + '\n'
+
+
+MINIFIERS = {'.js': minify_js, '.css': minify_css}
+
+
+def _sources(source_dir):
+    for root, _, files in os.walk(source_dir):
+        for name in sorted(files):
+            if os.path.splitext(name)[1] in MINIFIERS:
+                yield os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, '/')
+
+
+def _write(path, data):
+    """Write via a temporary file, so a worker never serves a half-written asset"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def build(source_dir=STATIC_DIR, build_dir=BUILD_DIR):
+    """Minify, fingerprint and precompress every asset; returns the manifest"""
+    manifest = {}
+    for path in _sources(source_dir):
+        stem, ext = os.path.splitext(path)
+        with open(os.path.join(source_dir, path), encoding='utf-8') as f:
+            data = MINIFIERS[ext](f.read()).encode()
+        digest = hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+        built = f"{stem}.{digest}{ext}"
+        target = os.path.join(build_dir, built)
+        _write(target, data)
+        _write(target + '.gz', gzip.compress(data, 9, mtime=0))
+        if brotli:
+            _write(target + '.br', brotli.compress(data, quality=11))
+        manifest[path] = built
+    _write(os.path.join(build_dir, MANIFEST), json.dumps(manifest, indent=2, sort_keys=True).encode())
+    return manifest
+
+
+def ensure_built(source_dir=STATIC_DIR, build_dir=BUILD_DIR):
+    """Rebuild when ASSET_BUILD=auto and a source is newer than the manifest"""
+    global _manifest
+    manifest_path = os.path.join(build_dir, MANIFEST)
+    if os.getenv('ASSET_BUILD', 'auto') == 'auto':
+        built_at = os.path.getmtime(manifest_path) if os.path.exists(manifest_path) else 0
+        newest = max((os.path.getmtime(os.path.join(source_dir, path)) for path in _sources(source_dir)),
+                     default=0)
+        if newest > built_at:
+            started = time.perf_counter()
+            _manifest = build(source_dir, build_dir)
+            print(f"📦 Built {len(_manifest)} static assets in {(time.perf_counter() - started) * 1000:.0f}ms")
+            return _manifest
+    try:
+        with open(manifest_path) as f:
+            _manifest = json.load(f)
+    except (OSError, ValueError):
+        print("⚠️ No static asset build; serving frontend/static unminified")
+        _manifest = {}
+    return _manifest
+
+
+def asset_url(path):
+    """URL of a static file: its fingerprinted build when there is one"""
+    return f"/static/{(_manifest or {}).get(path, path)}"
+
+
+def _accepted(header):
+    accepted = set()
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') not in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+def send_asset(path, source_dir=STATIC_DIR, build_dir=BUILD_DIR):
+    """Response for /static/<path>"""
+    if path not in (_manifest or {}).values():
+        response = send_from_directory(source_dir, path)
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+
+    accepted = _accepted(request.headers.get('Accept-Encoding'))
+    encoding, suffix = next(((name, suffix) for name, suffix in ENCODINGS
+                             if name in accepted and os.path.exists(os.path.join(build_dir, path + suffix))),
+                            (None, ''))
+    digest = path.rsplit('.', 2)[-2]
+    etag = f'"{digest}-{encoding}"' if encoding else f'"{digest}"'
+    headers = {'Cache-Control': IMMUTABLE, 'ETag': etag, 'Vary': 'Accept-Encoding'}
+    if etag in request.headers.get('If-None-Match', ''):
+        return Response(status=304, headers=headers)
+
+    with open(os.path.join(build_dir, path + suffix), 'rb') as f:
+        body = f.read()
+    if encoding:
+        headers['Content-Encoding'] = encoding
+    return Response(body, headers=headers,
+                    content_type=CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Minify, fingerprint and precompress the static assets")
+    parser.add_argument("--source", default=STATIC_DIR)
+    parser.add_argument("--out", default=BUILD_DIR)
+    args = parser.parse_args()
+    manifest = build(args.source, args.out)
+    if not brotli:
+        print("⚠️ brotli is not installed; only gzip variants were written")
+    for path, built in manifest.items():
+        sizes = [os.path.getsize(os.path.join(args.source, path))]
+        sizes += [os.path.getsize(os.path.join(args.out, built + suffix)) if os.path.exists(
+            os.path.join(args.out, built + suffix)) else 0 for suffix in ('', '.gz', '.br')]
+        print(f"{path} -> {built}: {sizes[0]} B source, {sizes[1]} minified, {sizes[2]} gzip, {sizes[3]} brotli")
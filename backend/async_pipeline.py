@@ -0,0 +1,198 @@
+import asyncio
+import contextvars
+
+import ingredient_index
+import llm_router
+import menu_cache
+import metrics
+import model_tiers
+import prompts
+from app import (
+    MenuModel, PlanModel, llm, response_cache, ingredients, coalescer,
+    build_menu_prompt, build_grocery_prompt, cached_menu, store_menu, split_plan, parse_streamed, is_shareable,
+    log_error
+)
+from menu_stream import MenuStreamParser, MENU_SECTIONS
+
+
+async def cache_get(key, use_cache):
+    if not (response_cache and use_cache):
+        return None
+    return await asyncio.to_thread(response_cache.get, key)
+
+
+async def cache_set(key, value):
+    if response_cache:
+        await asyncio.to_thread(response_cache.set, key, value)
+
+
+async def coalesced_async(key, call, use_cache=True):
+    """coalesced() for coroutines: one call shared with identical sync and async requests.
+
+    A shared result can be a sync caller's {"error": ...} dict, which is raised here.
+    """
+    # Requests that bypass the cache still want a fresh result of their own
+    if not (coalescer and use_cache):
+        return await call()
+    result = await coalescer.ado(key, call, is_shareable)
+    if not is_shareable(result):
+        raise RuntimeError(result["error"])
+    return result
+
+
+async def complete_async(prompt, kind="text"):
+    return await llm.acomplete([{"role": "user", "content": prompt}], kind=kind, temperature=0.7)
+
+
+async def learn_dishes_async(dishes):
+    """Ask the LLM for per-serving ingredients of dishes the index does not know"""
+    reply = await complete_async(ingredient_index.build_ingredient_prompt(dishes), kind="ingredients")
+    with metrics.stage("parse"):
+        return await asyncio.to_thread(ingredients.learn, reply)
+
+
+async def generate_grocery_text_async(menu, guest_count, use_cache=True):
+    """Free-text grocery list from the LLM, for menus the index cannot cover"""
+    cache_key = menu_cache.grocery_key(menu, guest_count)
+    cached = await cache_get(cache_key, use_cache)
+    if cached:
+        return cached
+
+    with metrics.stage("prompt_build"):
+        prompt = build_grocery_prompt(menu, guest_count)
+    grocery = await coalesced_async(menu_cache.digest("grocery", prompt),
+                                    lambda: complete_async(prompt, kind="grocery"), use_cache)
+    await cache_set(cache_key, grocery)
+    return grocery
+
+
+async def plan_combined_async(data, use_cache=True):
+    """Menu and grocery list from one structured call, else the streaming pipeline.
+
+    Same contract as plan_event_async, which handles cached menus and any
+    combined call that fails or comes back incomplete.
+    """
+    if not llm.routes:
+        return {"error": "API client not initialized"}
+
+    menu_key = menu_cache.menu_key(data)
+    menu = await asyncio.to_thread(cached_menu, data, menu_key, use_cache)
+    if not menu:
+        async def call():
+            with metrics.stage("prompt_build"):
+                prompt = prompts.plan_prompt(data)
+            plan = await llm.acomplete([{"role": "user", "content": prompt}], response_format=PlanModel,
+                                       kind="plan", event=data, temperature=0.7)
+            with metrics.stage("parse"):
+                split = split_plan(plan)
+            if split is None:
+                return {"error": "Combined plan came back incomplete"}
+            menu, grocery = split
+            await asyncio.to_thread(store_menu, data, menu_key, menu)
+            await cache_set(menu_cache.grocery_key(menu, int(data['guest_count'])), grocery)
+            return {"menu": menu, "grocery_list": grocery}
+
+        try:
+            # Same key and result as the sync combined call, so the two share a flight
+            plan_key = menu_cache.digest("plan", [menu_key, int(data['guest_count'])])
+            result = await coalesced_async(plan_key, call, use_cache)
+            return result["menu"], result["grocery_list"]
+        except Exception as e:
+            log_error("Combined plan call failed", e)
+        print("⚠️ Combined plan failed, falling back to separate menu and grocery calls")
+    return await plan_event_async(data, use_cache, menu)
+
+
+async def plan_event_async(data, use_cache=True, menu=None):
+    """Stream the menu and look up unknown dishes as soon as their section closes.
+
+    Known dishes are scaled from the local ingredient index, so only dishes
+    the index has never seen cost an LLM call, and those calls overlap the
+    rest of the menu stream. A menu the caller already looked up can be
+    passed in. Returns (menu, grocery) on success or an {"error": ...} dict.
+    """
+    if not llm.routes:
+        return {"error": "API client not initialized"}
+
+    learn_tasks = []
+    try:
+        guest_count = int(data['guest_count'])
+        menu_key = menu_cache.menu_key(data)
+        menu = menu or await asyncio.to_thread(cached_menu, data, menu_key, use_cache)
+
+        async def generate():
+            parser = MenuStreamParser()
+            # Sections are consumed as they stream in, so the menu call is routed but not hedged
+            tier, score = llm.choose_tier("menu", data, explore=False)
+            route = llm.primary("menu", tier)
+            prompt = build_menu_prompt(data)
+            # Lookups start mid-stream but must not count as part of the menu's LLM stage
+            outer_context = contextvars.copy_context()
+
+            def look_up(events):
+                for kind, section, value in events:
+                    if kind == "section" and section in MENU_SECTIONS:
+                        unknown = ingredients.unknown_dishes({section: value})
+                        if unknown:
+                            learn_tasks.append(asyncio.create_task(
+                                learn_dishes_async(unknown), context=outer_context.copy()))
+
+            messages, response_format = route.structured_request([{"role": "user", "content": prompt}], MenuModel)
+            with route.track("menu") as call:
+                stream = await route.async_client().chat.completions.create(
+                    model=route.model,
+                    messages=messages,
+                    temperature=0.7,
+                    response_format=response_format,
+                    stream=True,
+                    stream_options=llm_router.STREAM_OPTIONS
+                )
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            call.record_usage(route, chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            look_up(parser.feed(chunk.choices[0].delta.content))
+            look_up(parser.close())
+
+            try:
+                with metrics.stage("parse"):
+                    menu = parse_streamed(parser, route).model_dump()
+            except ValueError as e:
+                if route.tier != model_tiers.FAST:
+                    llm.record_parse("menu", score, route.tier, False)
+                    raise
+                llm.escalate("menu", score, e)
+                menu = (await llm.acomplete([{"role": "user", "content": prompt}], response_format=MenuModel,
+                                            kind="menu", temperature=0.7)).model_dump()
+            else:
+                llm.record_parse("menu", score, route.tier, True)
+            await asyncio.to_thread(store_menu, data, menu_key, menu)
+            # Dishes are learned before the flight lands, so requests sharing it find them in the index
+            await asyncio.gather(*learn_tasks, return_exceptions=True)
+            return menu
+
+        if not menu:
+            # Same key as the sync menu call, so identical sync and async requests share one stream
+            menu = await coalesced_async(menu_key, generate, use_cache)
+
+        dishes = ingredient_index.menu_dishes(menu)
+        # Dishes the incremental parser missed (or a cached menu's new dishes)
+        unknown = ingredients.unknown_dishes(dishes)
+        if unknown:
+            try:
+                await learn_dishes_async(unknown)
+            except Exception as e:
+                log_error("Ingredient lookup failed", e)
+
+        with metrics.stage("grocery"):
+            if ingredients.unknown_dishes(dishes):
+                grocery = await generate_grocery_text_async(menu, guest_count, use_cache)
+            else:
+                grocery = ingredients.scale(dishes, guest_count)
+        return menu, grocery
+
+    except Exception as e:
+        for task in learn_tasks:
+            task.cancel()
+        return {"error": log_error("Async plan pipeline failed", e)}
@@ -0,0 +1,68 @@
+"""POST /api/plan latency for form combinations served from the precomputed catalog.
+
+Warms a catalog against the local stub LLM (stub_llm.py), then sends random
+form combinations with random guest counts through Flask's test client and
+reports latency percentiles and how many upstream LLM calls they needed.
+
+Run with: python bench_catalog.py --requests 500
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+
+import catalog
+from bench_plan import percentile
+from stub_llm import make_server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--port", type=int, default=8960)
+    args = parser.parse_args()
+
+    stub = make_server(args.port, ttft=0.05, tps=2000)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    workdir = tempfile.mkdtemp(prefix="bench_catalog_")
+    os.environ.update(
+        DEEPSEEK_API_KEY="stub",
+        OPENROUTER_BASE_URL=f"http://127.0.0.1:{args.port}",
+        LLM_PROVIDER_RATE="1000",
+        LLM_FREE_MODEL_RATE="1000",
+        CATALOG_PATH=os.path.join(workdir, "catalog.sqlite3"),
+        INGREDIENT_DB_PATH=os.path.join(workdir, "ingredients.sqlite3"),
+        JOB_DB_PATH=os.path.join(workdir, "jobs.sqlite3"),
+        SEMANTIC_CACHE="off",
+        SINGLE_FLIGHT="off",
+    )
+    import app
+
+    started = time.perf_counter()
+    built, failed = app.menu_catalog.warm(concurrency=8)
+    print(f"📚 Warmed {built} entries ({failed} failed) in {time.perf_counter() - started:.1f}s")
+
+    client = app.app.test_client()
+    calls_before = sum(route.stats()["calls"] for route in app.llm.routes.values())
+    latencies = []
+    for _ in range(args.requests):
+        event = random.choice(catalog.combinations())
+        event = {**event, "guest_count": random.randint(2, 200)}
+        start = time.perf_counter()
+        response = client.post("/api/plan", json=event)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200 and response.get_json()["grocery_list"], response.get_json()
+    calls = sum(route.stats()["calls"] for route in app.llm.routes.values()) - calls_before
+
+    print(f"⏱️  {args.requests} catalog requests: p50 {percentile(latencies, 50) * 1000:.2f} ms, "
+          f"p99 {percentile(latencies, 99) * 1000:.2f} ms, "
+          f"under 5 ms: {sum(latency < 0.005 for latency in latencies) / len(latencies):.0%}, "
+          f"upstream LLM calls: {calls}")
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Latency and tokens per plan: separate menu + grocery calls vs one combined call.
+
+Runs POST /api/plan in-process through Flask's test client against the local
+stub LLM (stub_llm.py), with ?mode=separate and ?mode=combined, for two
+cases: dishes the ingredient index already knows (the separate path scales
+the grocery list locally after one menu call) and unknown dishes (the separate
+path needs a second, ingredient lookup call). Every request uses a new event
+so no cache answers it. Reports mean latency, LLM calls and tokens per plan.
+
+Run with: python bench_combined.py --requests 10 --tps 200
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from stub_llm import make_server
+
+
+def token_totals(metrics):
+    totals = {"prompt": 0, "completion": 0}
+    with metrics.LLM_TOKENS._lock:
+        for (_, _, kind), value in metrics.LLM_TOKENS._values.items():
+            totals[kind] += value
+    return totals
+
+
+def llm_calls(app):
+    return sum(route.stats()["calls"] for route in app.llm.routes.values())
+
+
+def run(app, ingredient_index, mode, known, total, workdir):
+    client = app.app.test_client()
+    latencies = []
+    calls_before = llm_calls(app)
+    tokens_before = token_totals(app.metrics)
+    for n in range(total):
+        if not known:
+            # A fresh, unseeded index: none of the stub menu's dishes are known
+            app.ingredients = ingredient_index.IngredientIndex(
+                os.path.join(workdir, f"{mode}-{n}.sqlite3"), seed_path=os.path.join(workdir, "no-seed.json"))
+        event = {"event_type": f"{mode} {'known' if known else 'unknown'} party {n}", "cuisine": "italian",
+                 "formality": "casual", "guest_count": 20, "level": "easy"}
+        start = time.perf_counter()
+        response = client.post(f"/api/plan?mode={mode}", json=event)
+        latencies.append(time.perf_counter() - start)
+        assert response.status_code == 200, response.get_json()
+    tokens = token_totals(app.metrics)
+    return {
+        "latency": statistics.mean(latencies),
+        "calls": (llm_calls(app) - calls_before) / total,
+        "prompt": (tokens["prompt"] - tokens_before["prompt"]) / total,
+        "completion": (tokens["completion"] - tokens_before["completion"]) / total,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=10)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tps", type=float, default=200.0)
+    parser.add_argument("--port", type=int, default=8950)
+    args = parser.parse_args()
+
+    stub = make_server(args.port, args.ttft, args.tps)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    workdir = tempfile.mkdtemp(prefix="bench_combined_")
+    os.environ.update(
+        DEEPSEEK_API_KEY="stub",
+        OPENROUTER_BASE_URL=f"http://127.0.0.1:{args.port}",
+        LLM_PROVIDER_RATE="1000",
+        LLM_FREE_MODEL_RATE="1000",
+        SEMANTIC_CACHE="off",
+        SINGLE_FLIGHT="off",
+        INGREDIENT_DB_PATH=os.path.join(workdir, "seeded.sqlite3"),
+        JOB_DB_PATH=os.path.join(workdir, "jobs.sqlite3"),
+    )
+    import app
+    import ingredient_index
+
+    print(f"⏱️  {args.requests} plans per row, stub ttft={args.ttft}s tps={args.tps}")
+    print(f"{'dishes':<8} {'mode':<9} {'mean (s)':>9} {'LLM calls':>10} {'prompt tok':>11} {'output tok':>11}")
+    seeded = app.ingredients
+    for known in (True, False):
+        for mode in ("separate", "combined"):
+            app.ingredients = seeded
+            stats = run(app, ingredient_index, mode, known, args.requests, workdir)
+            print(f"{'known' if known else 'unknown':<8} {mode:<9} {stats['latency']:>9.2f} {stats['calls']:>10.1f} "
+                  f"{stats['prompt']:>11.0f} {stats['completion']:>11.0f}")
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,118 @@
+"""Dietary adaptation speed and coverage against a catalog built from the seed dishes.
+
+Builds a catalog stand-in of --menus menus per cuisine, each drawing its
+sections from the seed dishes in data/ingredients.json (see DISHES), and a
+fresh ingredient index seeded from the same file. Then, for every
+restriction in --restrictions, adapts every catalog menu the way a request
+with that restriction would be served and reports:
+
+- adapt() latency percentiles (warm index; the first call, which builds the
+  tags and substitution pools, is reported separately)
+- how many menus were met without any LLM call, and how many dish slots were
+  kept, swapped for a catalog dish, or left for a targeted LLM call
+
+Run with: python bench_dietary.py --menus 20 --repeat 200
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+from types import SimpleNamespace
+
+import dietary
+import ingredient_index
+from bench_plan import percentile
+
+# cuisine -> section -> seed dishes
+DISHES = {
+    "italian": {
+        "appetizers": ["Bruschetta", "Caprese Salad", "Caprese Skewers", "Arancini", "Prosciutto e Melone"],
+        "main_courses": ["Spaghetti Carbonara", "Mushroom Risotto", "Lasagna", "Eggplant Parmesan",
+                         "Chicken Parmesan", "Grilled Sea Bass"],
+        "desserts": ["Tiramisu", "Panna Cotta", "Panna Cotta with Berries", "Cannoli"],
+        "beverages": ["Chianti", "Limoncello", "Espresso", "Sparkling Lemonade"],
+    },
+    "mexican": {
+        "appetizers": ["Guacamole", "Guacamole & Chips", "Beef Quesadillas"],
+        "main_courses": ["Chicken Enchiladas", "Vegetable Fajitas", "Fish Tacos"],
+        "desserts": ["Churros", "Flan"],
+        "beverages": ["Margaritas", "Horchata", "Mint Lemonade"],
+    },
+    "asian": {
+        "appetizers": ["Edamame", "Gyoza", "Spring Rolls", "Samosa"],
+        "main_courses": ["Teriyaki Chicken", "Vegetable Tempura", "Sushi Platter", "Pad Thai", "Butter Chicken",
+                         "Palak Paneer", "Vegetable Biryani"],
+        "desserts": ["Mochi Ice Cream", "Matcha Tiramisu", "Gulab Jamun", "Kheer"],
+        "beverages": ["Green Tea", "Mango Lassi", "Iced Tea"],
+    },
+    "mediterranean": {
+        "appetizers": ["Hummus with Pita", "Falafel", "Greek Salad"],
+        "main_courses": ["Chicken Souvlaki", "Lamb Kofta", "Grilled Sea Bass"],
+        "desserts": ["Baklava", "Panna Cotta"],
+        "beverages": ["Mint Lemonade", "Sparkling Lemonade", "Iced Tea"],
+    },
+    "american": {
+        "appetizers": ["Deviled Eggs", "Buffalo Wings", "Caprese Skewers"],
+        "main_courses": ["Cheeseburgers", "BBQ Pulled Pork", "Mac and Cheese"],
+        "desserts": ["Apple Pie", "Brownies"],
+        "beverages": ["Iced Tea", "Sparkling Lemonade"],
+    },
+}
+RESTRICTIONS = "vegetarian|vegan|pescatarian|gluten-free|nut-free|dairy-free|no alcohol|vegetarian, gluten-free"
+
+
+def synthetic_catalog(menus, seed):
+    rng = random.Random(seed)
+    entries = {}
+    for cuisine, sections in DISHES.items():
+        for number in range(menus):
+            entries[f"dinner|{cuisine}|formal|{number}"] = {
+                section: rng.sample(dishes, min(2, len(dishes))) for section, dishes in sections.items()
+            }
+    return SimpleNamespace(menus=entries, version=1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--menus", type=int, default=20, help="catalog menus per cuisine")
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--restrictions", default=RESTRICTIONS, help="|-separated; each is one case")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    ingredients = ingredient_index.IngredientIndex(os.path.join(tempfile.mkdtemp(), "ingredients.sqlite3"))
+    catalog = synthetic_catalog(args.menus, args.seed)
+    engine = dietary.DietIndex(ingredients, catalog)
+    start = time.perf_counter()
+    engine.dish_tags("warm up")
+    print(f"🥗 {len(ingredients.dishes)} known dishes, {len(catalog.menus)} catalog menus; "
+          f"index built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    menus = [(key.split('|')[1], menu) for key, menu in catalog.menus.items()]
+    print(f"{'restriction':<30} {'p50 µs':>7} {'p95 µs':>7} {'local':>7} {'kept':>6} {'swapped':>8} {'to LLM':>7}")
+    for case in [case.strip() for case in args.restrictions.split("|") if case.strip()]:
+        forbidden, unknown = dietary.parse(case)
+        if unknown:
+            print(f"{case:<30} not understood: {', '.join(unknown)}")
+            continue
+        samples, complete, kept, swapped, uncovered = [], 0, 0, 0, 0
+        for repeat in range(args.repeat):
+            cuisine, menu = menus[repeat % len(menus)]
+            start = time.perf_counter()
+            adapted = engine.adapt(menu, forbidden, cuisine)
+            samples.append((time.perf_counter() - start) * 1e6)
+        for cuisine, menu in menus:
+            adapted = engine.adapt(menu, forbidden, cuisine)
+            slots = sum(len(indexes) for indexes in adapted["uncovered"].values())
+            complete += not slots
+            swapped += len(adapted["substituted"])
+            uncovered += slots
+            kept += sum(len(menu[section]) for section in menu) - len(adapted["substituted"]) - slots
+        samples.sort()
+        print(f"{case:<30} {percentile(samples, 50):>7.1f} {percentile(samples, 95):>7.1f} "
+              f"{complete / len(menus):>7.0%} {kept:>6} {swapped:>8} {uncovered:>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,129 @@
+"""Grocery aggregation speed on synthetic catering menus.
+
+Builds menus of --dishes dishes with --per-dish ingredients each, written the
+way different dish recipes and LLM replies write them: plurals, synonyms,
+preparation words, mixed case and a mix of units for one ingredient (g, kg,
+lbs, cups, tbsp, pieces, cloves). Every dish is scaled to its share of
+--guests servings, then the whole list is merged with grocery.aggregate(),
+wrapped in a GroceryList, and parsed back from text with grocery.structure().
+
+Reports per-call latency percentiles with warm name/unit caches (the steady
+state in a server) and the first call with cold caches, plus how many raw
+items collapsed into how many lines and whether the merged list still weighs
+what the items did.
+
+Run with: python bench_grocery.py --dishes 30 --guests 500 --repeat 2000
+"""
+import argparse
+import random
+import time
+
+import grocery
+import ingredient_index
+from bench_plan import percentile
+
+# canonical name, category, base amount per serving, spellings, (unit, factor from grams or ml or pcs)
+INGREDIENTS = [
+    ("onion", "produce", 40, ["Onions", "yellow onion", "onion, diced", "Large Onions", "white onions"],
+     [("g", 1), ("kg", 0.001), ("pcs", 1 / 150)]),
+    ("garlic", "produce", 2, ["garlic cloves", "Garlic", "minced garlic", "cloves garlic"], [("cloves", 1)]),
+    ("tomato", "produce", 60, ["Tomatoes", "ripe tomato", "tomatoes (chopped)"],
+     [("g", 1), ("lbs", 1 / 453.6), ("pcs", 1 / 120)]),
+    ("bell pepper", "produce", 30, ["capsicum", "Bell Peppers", "red bell pepper"], [("g", 1), ("pieces", 1 / 150)]),
+    ("coriander", "produce", 2, ["cilantro", "fresh coriander", "Cilantro leaves"], [("g", 1), ("oz", 1 / 28.35)]),
+    ("green onion", "produce", 5, ["scallions", "spring onions", "Green Onions"], [("g", 1)]),
+    ("zucchini", "produce", 50, ["courgettes", "Zucchini", "sliced zucchini"], [("g", 1), ("kg", 0.001)]),
+    ("lemon", "produce", 0.2, ["Lemons", "lemon", "fresh lemons"], [("pcs", 1), ("each", 1)]),
+    ("flour", "baking", 25, ["all-purpose flour", "plain flour", "Flour"], [("g", 1), ("cups", 1 / (240 * 0.53))]),
+    ("sugar", "baking", 15, ["granulated sugar", "white sugar", "Sugar"], [("g", 1), ("tbsp", 1 / (14.79 * 0.85))]),
+    ("butter", "dairy", 10, ["unsalted butter", "Butter"], [("g", 1), ("tbsp", 1 / (14.79 * 0.96))]),
+    ("cream", "dairy", 20, ["heavy cream", "double cream", "whipping cream"], [("ml", 1), ("cups", 1 / 240)]),
+    ("egg", "dairy", 0.5, ["Eggs", "large eggs", "egg"], [("pcs", 1), ("dozen", 1 / 12)]),
+    ("parmesan", "dairy", 8, ["parmesan cheese", "Parmigiano-Reggiano", "grated parmesan"], [("g", 1)]),
+    ("olive oil", "pantry", 10, ["extra virgin olive oil", "Olive Oil", "EVOO"],
+     [("ml", 1), ("tbsp", 1 / 14.79), ("l", 0.001)]),
+    ("salt", "pantry", 1, ["sea salt", "kosher salt", "salt"], [("g", 1), ("tsp", 1 / (4.93 * 1.2))]),
+    ("chickpea", "pantry", 30, ["chickpeas", "garbanzo beans"], [("g", 1)]),
+    ("rice", "pantry", 60, ["Rice", "rice"], [("g", 1), ("cups", 1 / (240 * 0.85))]),
+    ("shrimp", "seafood", 50, ["prawns", "Shrimp", "large shrimp"], [("g", 1), ("lb", 1 / 453.6)]),
+    ("chicken breast", "meat", 120, ["boneless chicken breasts", "chicken breast fillets", "Chicken Breast"],
+     [("g", 1), ("kg", 0.001)]),
+    ("ground beef", "meat", 100, ["minced beef", "beef mince", "Ground Beef"], [("g", 1), ("lbs", 1 / 453.6)]),
+    ("eggplant", "produce", 60, ["aubergines", "Eggplant"], [("g", 1), ("pcs", 1 / 450)]),
+    ("basil", "produce", 1, ["fresh basil", "basil leaves", "Basil"], [("g", 1)]),
+    ("milk", "dairy", 30, ["Milk", "whole milk"], [("ml", 1), ("cups", 1 / 240)]),
+]
+
+
+def synthetic_menu(dishes, per_dish, guests, seed):
+    """Raw grocery items for every dish, each scaled to its share of the servings"""
+    rng = random.Random(seed)
+    servings = ingredient_index.section_servings(guests, dishes)
+    items = []
+    for _ in range(dishes):
+        for name, category, amount, spellings, units in rng.sample(INGREDIENTS, per_dish):
+            unit, factor = rng.choice(units)
+            items.append({"name": rng.choice(spellings), "quantity": round(amount * factor * servings, 3),
+                          "unit": unit, "category": category})
+    return items
+
+
+def grams(entries):
+    """Total weight of a list, with every entry converted to grams where the tables allow"""
+    total = 0.0
+    for entry in entries:
+        dimension, quantity = grocery.to_base(entry["quantity"], entry["unit"]) or (None, 0.0)
+        factor = grocery.grams_per_unit(grocery.canonical_name(entry["name"]), dimension)
+        total += quantity * (factor or 0.0)
+    return total
+
+
+def timed(function, repeat):
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1e6)
+    samples.sort()
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--dishes", type=int, default=30)
+    parser.add_argument("--per-dish", type=int, default=10, help="ingredients per dish")
+    parser.add_argument("--guests", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    items = synthetic_menu(args.dishes, min(args.per_dish, len(INGREDIENTS)), args.guests, args.seed)
+    text = "\n".join(f"- {item['name']} ({item['quantity']} {item['unit']})" for item in items)
+
+    grocery.canonical_name.cache_clear()
+    grocery.unit_info.cache_clear()
+    grocery._resolve.cache_clear()
+    start = time.perf_counter()
+    entries = grocery.aggregate(items)
+    cold = (time.perf_counter() - start) * 1e6
+
+    cases = {
+        "aggregate": lambda: grocery.aggregate(items),
+        "aggregate+model": lambda: grocery.grocery_list(grocery.aggregate(items)),
+        "structure(text)": lambda: grocery.structure(text),
+    }
+    print(f"🛒 {args.dishes} dishes x {args.per_dish} ingredients for {args.guests} guests: "
+          f"{len(items)} raw items -> {len(entries)} lines, {len(text) / 1024:.1f} KiB as text")
+    print(f"{'case':<16} {'p50 µs':>8} {'p95 µs':>8} {'p99 µs':>8}")
+    for name, function in cases.items():
+        samples = timed(function, args.repeat)
+        print(f"{name:<16} {percentile(samples, 50):>8.1f} {percentile(samples, 95):>8.1f} "
+              f"{percentile(samples, 99):>8.1f}")
+    print(f"❄️  first aggregate with cold name/unit caches: {cold:.1f} µs")
+
+    before, after = grams(items), grams(entries)
+    print(f"⚖️  {before / 1000:.1f} kg in, {after / 1000:.1f} kg out ({(after - before) / before:+.2%}, rounding)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,115 @@
+"""Plan history write and search speed at large table sizes.
+
+Fills a fresh history database with --rows synthetic plans (random event
+types, cuisines and dishes drawn from small vocabularies, the way real
+traffic repeats itself) through record() and flush(), the same path the
+writer thread takes. Then times:
+
+- record(): what a request pays to hand a plan to the writer
+- flush(): rows per second inserted, FTS index included
+- search() for each filter combination, on the first page and on a page
+  --deep-pages deep (following next cursors), to show keyset paging costs
+  the same at any depth
+
+Run with: python bench_history.py --rows 1000000 --repeat 50
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+import plan_history
+from bench_plan import percentile
+
+EVENTS = ["wedding", "birthday", "corporate", "graduation", "baby shower", "anniversary", "holiday party", "gala"]
+CUISINES = ["italian", "mexican", "indian", "japanese", "french", "thai", "greek", "lebanese", "korean", "american"]
+WORDS = ["grilled", "roasted", "spiced", "smoked", "braised", "lemon", "garlic", "herb", "chicken", "salmon",
+         "lamb", "tofu", "shrimp", "mushroom", "risotto", "tacos", "curry", "salad", "tart", "soup", "skewers",
+         "dumplings", "flatbread", "gnocchi", "ceviche", "pavlova", "tiramisu", "churros", "kebab", "biryani"]
+SECTIONS = ["appetizers", "main_courses", "desserts"]
+
+
+def synthetic_plan(rng):
+    data = {"event_type": rng.choice(EVENTS), "cuisine": rng.choice(CUISINES), "guest_count": rng.randint(10, 500)}
+    menu = {section: [" ".join(rng.sample(WORDS, 3)).title() for _ in range(rng.randint(2, 4))]
+            for section in SECTIONS}
+    return data, menu
+
+
+def fill(history, rows, seed):
+    rng = random.Random(seed)
+    record_samples, written, flush_seconds = [], 0, 0.0
+    while written < rows:
+        for _ in range(min(history.batch_size, rows - written)):
+            data, menu = synthetic_plan(rng)
+            start = time.perf_counter()
+            history.record(None, data, menu, "- Onion (2 kg)", "stub/model", 900.0)
+            record_samples.append((time.perf_counter() - start) * 1e6)
+        start = time.perf_counter()
+        written += history.flush()
+        flush_seconds += time.perf_counter() - start
+    record_samples.sort()
+    return record_samples, flush_seconds
+
+
+def page(history, filters, cursor, limit):
+    rows = list(history.search(cursor=cursor, limit=limit, **filters))
+    return rows[-1]["seq"] if len(rows) == limit else None
+
+
+def timed_search(history, filters, limit, deep_pages, repeat):
+    """Latencies (ms) of the first page and of the page after deep_pages cursors"""
+    cursor = None
+    for _ in range(deep_pages):
+        cursor = page(history, filters, cursor, limit)
+        if cursor is None:
+            break
+    first, deep = [], []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        page(history, filters, None, limit)
+        first.append((time.perf_counter() - start) * 1000)
+        start = time.perf_counter()
+        page(history, filters, cursor, limit)
+        deep.append((time.perf_counter() - start) * 1000)
+    return sorted(first), sorted(deep)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=200000)
+    parser.add_argument("--limit", type=int, default=50, help="rows per page")
+    parser.add_argument("--deep-pages", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--path", help="database file (default: a temporary one)")
+    args = parser.parse_args()
+
+    path = args.path or os.path.join(tempfile.mkdtemp(), "plan_history.sqlite3")
+    history = plan_history.PlanHistory(path, batch_size=2000, max_pending=args.rows + 1)
+    record_samples, flush_seconds = fill(history, args.rows, args.seed)
+    print(f"🗄️  {args.rows} plans, {os.path.getsize(path) / 2 ** 20:.0f} MiB at {path}")
+    print(f"record(): p50 {percentile(record_samples, 50):.1f} µs, p99 {percentile(record_samples, 99):.1f} µs; "
+          f"flush: {args.rows / flush_seconds:,.0f} rows/s")
+
+    cases = {
+        "no filter": {},
+        "cuisine": {"cuisine": "Italian"},
+        "event_type": {"event_type": "wedding"},
+        "event+cuisine": {"event_type": "wedding", "cuisine": "thai"},
+        "dish": {"dish": "risotto"},
+        "dish prefix": {"dish": "grilled sal*"},
+        "long prefix": {"dish": "risott*"},
+        "dish+cuisine": {"dish": "tacos", "cuisine": "mexican"},
+    }
+    print(f"{'search':<14} {'first p50':>10} {'first p95':>10} {'deep p50':>10} {'deep p95':>10}  (ms, "
+          f"{args.limit} rows/page, deep = page {args.deep_pages + 1})")
+    for name, filters in cases.items():
+        first, deep = timed_search(history, filters, args.limit, args.deep_pages, args.repeat)
+        print(f"{name:<14} {percentile(first, 50):>10.2f} {percentile(first, 95):>10.2f} "
+              f"{percentile(deep, 50):>10.2f} {percentile(deep, 95):>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
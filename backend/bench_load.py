@@ -0,0 +1,314 @@
+"""Open-loop load test of the plan endpoints against the stub LLM, with baselines.
+
+Starts stub_llm.py and the app server as subprocesses, then sends requests at
+a fixed rate for --duration seconds to each scenario:
+
+- plan: POST /api/plan
+- stream: POST /api/plan/stream (also time to the first dish event)
+- batch: POST /api/plan/batch with --batch-size events, at --batch-rps
+
+Latency is measured from each request's scheduled send time, so a server that
+falls behind shows up as latency instead of silently lowering the rate. Every
+request is a new event sent with Cache-Control: no-cache unless --cache is
+given, so each one reaches the stub. Reports p50/p95/p99, achieved throughput,
+errors and the server's peak RSS (its worker processes included).
+
+--save writes the results as a baseline. --compare checks them against one and
+exits 1 when p95, p99, time to first dish or memory grew, or throughput fell,
+by more than --tolerance, or when errors appeared.
+
+Run with: python bench_load.py --rps 10 --duration 20 --compare data/load_baseline.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bench_plan import BASE_DIR, EVENT, percentile, wait_until_up
+from stub_llm import TTFT_DISTRIBUTIONS
+
+SCENARIOS = ("plan", "stream", "batch")
+SERVERS = {
+    "flask": [sys.executable, "-m", "flask", "--app", "app", "run", "--port", "{port}"],
+    "asgi": [sys.executable, "-m", "uvicorn", "asgi:application", "--port", "{port}", "--log-level", "warning"],
+    "gunicorn": [sys.executable, "server.py", "app", "--bind", "127.0.0.1:{port}"],
+    "gunicorn-asgi": [sys.executable, "server.py", "asgi", "--bind", "127.0.0.1:{port}"],
+}
+# metric -> True when higher is worse
+COMPARED = {"p95_ms": True, "p99_ms": True, "ttfb_p95_ms": True, "rps": False, "peak_rss_mb": True}
+
+_sessions = threading.local()
+
+
+def session():
+    if not hasattr(_sessions, "session"):
+        _sessions.session = requests.Session()
+    return _sessions.session
+
+
+class RssSampler:
+    """Peak resident memory of a process and its children, sampled from /proc"""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    @staticmethod
+    def _rss_kb(pid):
+        try:
+            with open(f"/proc/{pid}/status") as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return 0
+
+    def _children(self):
+        children = []
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # The ppid follows the parenthesised command name
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            if ppid == self.pid:
+                children.append(int(entry))
+        return children
+
+    def sample(self):
+        return sum(self._rss_kb(pid) for pid in [self.pid] + self._children()) / 1024
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, self.sample())
+            self._stop.wait(self.interval)
+
+    def __enter__(self):
+        if os.path.isdir("/proc"):
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+
+
+def new_event(args):
+    if args.cache:
+        return dict(EVENT)
+    return {**EVENT, "event_type": f"dinner {uuid.uuid4().hex[:8]}"}
+
+
+def headers(args):
+    return {} if args.cache else {"Cache-Control": "no-cache"}
+
+
+def send_plan(base_url, args):
+    response = session().post(f"{base_url}/api/plan", json=new_event(args), headers=headers(args), timeout=120)
+    return response.status_code == 200, None
+
+
+def send_stream(base_url, args):
+    first_dish = None
+    ok = False
+    started = time.perf_counter()
+    with session().post(f"{base_url}/api/plan/stream", json=new_event(args), headers=headers(args),
+                        stream=True, timeout=120) as response:
+        if response.status_code != 200:
+            return False, None
+        event = None
+        for line in response.iter_lines(decode_unicode=True):
+            if line.startswith("event: "):
+                event = line[7:]
+                if event == "item" and first_dish is None:
+                    first_dish = time.perf_counter() - started
+            elif line.startswith("data: ") and event == "done":
+                ok = json.loads(line[6:]).get("status") == "success"
+    return ok, first_dish
+
+
+def send_batch(base_url, args):
+    events = [new_event(args) for _ in range(args.batch_size)]
+    response = session().post(f"{base_url}/api/plan/batch", json=events, headers=headers(args), timeout=300)
+    if response.status_code != 200:
+        return False, None
+    lines = [json.loads(line) for line in response.text.splitlines() if line.strip()]
+    return len(lines) > args.batch_size and all(line.get("status") != "error" for line in lines), None
+
+
+SENDERS = {"plan": send_plan, "stream": send_stream, "batch": send_batch}
+
+
+def run_scenario(name, base_url, args, sampler):
+    """Send requests at a fixed rate for `duration` seconds; returns the scenario's stats"""
+    send = SENDERS[name]
+    rps = args.batch_rps if name == "batch" else args.rps
+    total = max(1, int(rps * args.duration))
+    results = []
+
+    def timed(scheduled):
+        try:
+            ok, first = send(base_url, args)
+        except requests.RequestException:
+            ok, first = False, None
+        finished = time.perf_counter()
+        results.append((ok, finished - scheduled, first, finished))
+
+    sampler.peak = sampler.sample()
+    with ThreadPoolExecutor(max_workers=args.max_in_flight) as pool:
+        started = time.perf_counter()
+        for i in range(total):
+            scheduled = started + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(timed, scheduled)
+    elapsed = max(result[3] for result in results) - started
+
+    latencies = [result[1] for result in results if result[0]]
+    firsts = [result[2] for result in results if result[0] and result[2] is not None]
+    stats = {
+        "requests": total,
+        "errors": total - len(latencies),
+        "rps": round(len(latencies) / elapsed, 2),
+        "peak_rss_mb": round(sampler.peak, 1),
+    }
+    for pct in (50, 95, 99):
+        stats[f"p{pct}_ms"] = round(percentile(latencies, pct) * 1000, 1) if latencies else None
+    if firsts:
+        stats["ttfb_p50_ms"] = round(percentile(firsts, 50) * 1000, 1)
+        stats["ttfb_p95_ms"] = round(percentile(firsts, 95) * 1000, 1)
+    return stats
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Regression messages for results against a saved baseline"""
+    regressions = []
+    for name, stats in results.items():
+        base = baseline.get("results", {}).get(name)
+        if not base:
+            continue
+        if stats["errors"] > base["errors"]:
+            regressions.append(f"{name} errors {base['errors']} -> {stats['errors']}")
+        for metric, higher_is_worse in COMPARED.items():
+            old, new = base.get(metric), stats.get(metric)
+            if old is None or new is None:
+                continue
+            if higher_is_worse:
+                slack = max(old * tolerance, min_delta_ms if metric.endswith("_ms") else 0)
+                worse = new > old + slack
+            else:
+                worse = new < old * (1 - tolerance)
+            if worse:
+                regressions.append(f"{name} {metric} {old} -> {new}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--server", choices=sorted(SERVERS), default="flask", help="app server to start")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS))
+    parser.add_argument("--rps", type=float, default=10.0, help="requests sent per second")
+    parser.add_argument("--duration", type=float, default=20.0, help="seconds per scenario")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--batch-rps", type=float, default=1.0, help="batch requests sent per second")
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--warmup", type=int, default=3, help="unmeasured plan requests first")
+    parser.add_argument("--cache", action="store_true", help="repeat one event and let caches answer")
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--ttft-dist", choices=TTFT_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--ttft-spread", type=float, default=0.5)
+    parser.add_argument("--tps", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--stub-port", type=int, default=8970)
+    parser.add_argument("--port", type=int, default=5070)
+    parser.add_argument("--save", help="write the results to this baseline file")
+    parser.add_argument("--compare", help="fail on regressions against this baseline file")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative regression")
+    parser.add_argument("--min-delta-ms", type=float, default=20.0,
+                        help="latency increases smaller than this never count as regressions")
+    args = parser.parse_args()
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip() in SCENARIOS]
+
+    workdir = tempfile.mkdtemp(prefix="bench_load_")
+    stub = subprocess.Popen(
+        [sys.executable, "stub_llm.py", "--port", str(args.stub_port), "--ttft", str(args.ttft),
+         "--ttft-dist", args.ttft_dist, "--ttft-spread", str(args.ttft_spread), "--tps", str(args.tps),
+         "--error-rate", str(args.error_rate)],
+        cwd=BASE_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    env = dict(os.environ,
+               DEEPSEEK_API_KEY="stub",
+               OPENROUTER_BASE_URL=f"http://127.0.0.1:{args.stub_port}",
+               LLM_ROUTER_PROVIDERS="openrouter",
+               LLM_PROVIDER_RATE="10000",
+               LLM_FREE_MODEL_RATE="10000",
+               MENU_CACHE_BACKEND="memory",
+               SEMANTIC_CACHE="off",
+               SINGLE_FLIGHT="off",
+               INGREDIENT_DB_PATH=os.path.join(workdir, "ingredients.sqlite3"),
+               CATALOG_PATH=os.path.join(workdir, "catalog.sqlite3"),
+               PLAN_DB_PATH=os.path.join(workdir, "plans.sqlite3"),
+               JOB_DB_PATH=os.path.join(workdir, "jobs.sqlite3"))
+    command = [part.format(port=args.port) for part in SERVERS[args.server]]
+    server = subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    results = {}
+    try:
+        wait_until_up(f"{base_url}/healthz")
+        for _ in range(args.warmup):
+            send_plan(base_url, args)
+        print(f"⏱️  {args.server}: {args.rps:g} req/s ({args.batch_rps:g} batches of {args.batch_size}) "
+              f"for {args.duration:g}s per scenario, stub ttft "
+              f"{args.ttft}s ({args.ttft_dist}) tps={args.tps:g} errors={args.error_rate:g}")
+        print(f"{'scenario':<8} {'reqs':>5} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+              f"{'ttfb p95':>9} {'req/s':>7} {'peak MB':>8}")
+        with RssSampler(server.pid) as sampler:
+            for name in scenarios:
+                stats = results[name] = run_scenario(name, base_url, args, sampler)
+                ttfb = f"{stats['ttfb_p95_ms']:.0f}" if "ttfb_p95_ms" in stats else "-"
+                print(f"{name:<8} {stats['requests']:>5} {stats['errors']:>6} {stats['p50_ms'] or 0:>8.0f} "
+                      f"{stats['p95_ms'] or 0:>8.0f} {stats['p99_ms'] or 0:>8.0f} {ttfb:>9} "
+                      f"{stats['rps']:>7.2f} {stats['peak_rss_mb']:>8.1f}")
+    finally:
+        server.terminate()
+        server.wait()
+        stub.terminate()
+        stub.wait()
+
+    config = {key: getattr(args, key) for key in
+              ("server", "rps", "duration", "batch_size", "batch_rps", "cache",
+               "ttft", "ttft_dist", "ttft_spread", "tps", "error_rate")}
+    if args.save:
+        with open(args.save, "w") as f:
+            json.dump({"config": config, "results": results}, f, indent=2)
+        print(f"💾 Baseline saved to {args.save}")
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != config:
+            print(f"⚠️ Baseline was recorded with different settings: {baseline.get('config')}")
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print("🔴 Regressions against baseline: " + "; ".join(regressions))
+            sys.exit(1)
+        print(f"✅ Within {args.tolerance:.0%} of baseline")
+
+
+if __name__ == '__main__':
+    main()
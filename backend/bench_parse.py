@@ -0,0 +1,167 @@
+"""Menu reply parsing: success rate and throughput over a corpus of model replies.
+
+data/menu_replies.jsonl holds replies in the shapes the providers produce
+(plain and pretty-printed JSON, R1 <think> blocks, ```json fences, chatter
+before and after the object, dishes as objects, renamed keys, "Appetizers:"
+text) with the menu each one should parse to, or null for replies that hold
+no menu. Every reply is parsed by:
+
+- regex: the old parse_menu_response (five re.search calls over the text)
+- find/rfind: slice from the first "{" to the last "}", then MenuModel
+- strict: MenuModel.model_validate_json on the whole reply, what the SDK's
+  structured output parser does
+- stream: MenuStreamParser fed in small chunks, as deltas arrive
+
+A parse succeeds when it returns exactly the expected menu, or fails cleanly
+on a reply without one. --fuzz then feeds every reply to the stream parser
+with random delta boundaries (which must not change the result) and cut off
+at random points (which must parse or raise ReplyParseError, nothing else).
+
+Run with: python bench_parse.py --repeat 200 --chunk 4 --fuzz 200
+"""
+import argparse
+import json
+import os
+import random
+import re
+import time
+
+from menu_stream import MenuModel, MenuStreamParser, ReplyParseError
+
+CORPUS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'menu_replies.jsonl')
+
+
+def regex_parse(text):
+    """parse_menu_response as it was"""
+    menu = {"appetizers": [], "main_courses": [], "desserts": [], "beverages": [], "preparation_notes": ""}
+    sections = {
+        "appetizers": r'appetizers?[:\s]*([\s\S]+?)(?=\n\s*main course|dessert|beverage|$)',
+        "main_courses": r'main courses?[:\s]*([\s\S]+?)(?=\n\s*dessert|beverage|$)',
+        "desserts": r'desserts?[:\s]*([\s\S]+?)(?=\n\s*beverage|$)',
+        "beverages": r'beverages?[:\s]*([\s\S]+?)(?=\n|$)',
+        "notes": r'notes?[:\s]*([\s\S]+)'
+    }
+    for key, pattern in sections.items():
+        match = re.search(pattern, text, re.IGNORECASE)
+        if match:
+            content = match.group(1).strip()
+            if key == "notes":
+                menu["preparation_notes"] = content
+            else:
+                menu[key] = [item.strip() for item in re.split(r'\n\s*[-*•]', content) if item.strip()]
+    if not any(menu[key] for key in ("appetizers", "main_courses", "desserts", "beverages")):
+        raise ValueError("no menu")
+    return MenuModel.model_validate(menu)
+
+
+def slice_parse(text):
+    start = text.find('{')
+    end = text.rfind('}') + 1
+    return MenuModel.model_validate(json.loads(text[start:end]))
+
+
+def strict_parse(text):
+    return MenuModel.model_validate_json(text)
+
+
+def stream_parse(text, chunk):
+    parser = MenuStreamParser()
+    for start in range(0, len(text), chunk):
+        parser.feed(text[start:start + chunk])
+    parser.close()
+    return parser.model()
+
+
+def random_chunks(text):
+    chunks, start = [], 0
+    while start < len(text):
+        size = random.randint(1, 12)
+        chunks.append(text[start:start + size])
+        start += size
+    return chunks
+
+
+def fuzz(samples, rounds):
+    """(replies whose result changed with the chunking, truncations that raised something else)"""
+    changed, crashed = 0, 0
+    for sample in samples:
+        try:
+            expected = stream_parse(sample["reply"], len(sample["reply"]) or 1).model_dump()
+        except ReplyParseError:
+            expected = None
+        for _ in range(rounds):
+            parser = MenuStreamParser()
+            for chunk in random_chunks(sample["reply"]):
+                parser.feed(chunk)
+            parser.close()
+            try:
+                result = parser.model().model_dump()
+            except ReplyParseError:
+                result = None
+            changed += result != expected
+
+            cut = sample["reply"][:random.randint(0, len(sample["reply"]))]
+            try:
+                stream_parse(cut, random.randint(1, 12))
+            except ReplyParseError:
+                pass
+            except Exception:
+                crashed += 1
+    return changed, crashed
+
+
+def succeeded(parse, sample):
+    try:
+        menu = parse(sample["reply"]).model_dump()
+    except ValueError:
+        return sample["menu"] is None
+    return menu == sample["menu"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=200, help="passes over the corpus for throughput")
+    parser.add_argument("--chunk", type=int, default=4, help="characters per streamed delta")
+    parser.add_argument("--fuzz", type=int, default=200, help="random chunkings and truncations per reply")
+    parser.add_argument("--corpus", default=CORPUS)
+    parser.add_argument("--verbose", action="store_true", help="list the replies each parser gets wrong")
+    args = parser.parse_args()
+
+    with open(args.corpus) as f:
+        samples = [json.loads(line) for line in f if line.strip()]
+    size = sum(len(sample["reply"].encode()) for sample in samples)
+    parsers = {
+        "regex": regex_parse,
+        "find/rfind": slice_parse,
+        "strict": strict_parse,
+        "stream": lambda text: stream_parse(text, args.chunk),
+    }
+
+    print(f"📄 {len(samples)} replies, {size / 1024:.1f} KiB, {args.repeat} passes, "
+          f"{args.chunk}-character deltas for stream")
+    print(f"{'parser':<11} {'success':>8} {'replies/s':>10} {'MB/s':>7}")
+    for name, parse in parsers.items():
+        failures = [sample["source"] for sample in samples if not succeeded(parse, sample)]
+        start = time.perf_counter()
+        for _ in range(args.repeat):
+            for sample in samples:
+                try:
+                    parse(sample["reply"])
+                except ValueError:
+                    pass
+        elapsed = time.perf_counter() - start
+        print(f"{name:<11} {1 - len(failures) / len(samples):>8.0%} "
+              f"{len(samples) * args.repeat / elapsed:>10.0f} {size * args.repeat / elapsed / 1e6:>7.2f}")
+        if args.verbose:
+            for source in failures:
+                print(f"    ✗ {source}")
+
+    if args.fuzz:
+        changed, crashed = fuzz(samples, args.fuzz)
+        runs = len(samples) * args.fuzz
+        print(f"🎲 stream fuzz: {changed}/{runs} chunkings changed the result, "
+              f"{crashed}/{runs} truncated replies raised something other than ReplyParseError")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,112 @@
+"""Benchmark /api/plan: sequential Flask path vs the async ASGI pipeline.
+
+Both servers talk to the local stub LLM (stub_llm.py), so the numbers only
+reflect how the two request paths schedule the LLM round-trips.
+
+Run with: python bench_plan.py --requests 40 --concurrency 8
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from stub_llm import make_server
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EVENT = {
+    "event_type": "dinner",
+    "cuisine": "italian",
+    "formality": "formal",
+    "guest_count": 50,
+    "level": 2
+}
+
+SERVERS = {
+    "sync (flask)": [sys.executable, "-m", "flask", "--app", "app", "run", "--port", "{port}"],
+    "async (asgi)": [sys.executable, "-m", "uvicorn", "asgi:application", "--port", "{port}",
+                     "--log-level", "warning"],
+}
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def wait_until_up(url, timeout=30):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            requests.get(url, timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {url} did not start")
+
+
+def run_load(url, total, concurrency):
+    def one(_):
+        start = time.perf_counter()
+        response = requests.post(url, json=EVENT, timeout=120)
+        response.raise_for_status()
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(total)))
+    elapsed = time.perf_counter() - start
+    return {
+        "p50": percentile(latencies, 50),
+        "p99": percentile(latencies, 99),
+        "mean": statistics.mean(latencies),
+        "rps": total / elapsed,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--ttft", type=float, default=0.3)
+    parser.add_argument("--tps", type=float, default=50.0)
+    parser.add_argument("--stub-port", type=int, default=8900)
+    parser.add_argument("--port", type=int, default=5055)
+    args = parser.parse_args()
+
+    stub = make_server(args.stub_port, args.ttft, args.tps)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    env = dict(os.environ,
+               DEEPSEEK_API_KEY="stub",
+               OPENROUTER_BASE_URL=f"http://127.0.0.1:{args.stub_port}",
+               LLM_PROVIDER_RATE="1000",
+               LLM_FREE_MODEL_RATE="1000")
+
+    print(f"⏱️  {args.requests} requests, concurrency {args.concurrency}, "
+          f"stub ttft={args.ttft}s tps={args.tps}")
+    print(f"{'server':<14} {'p50 (s)':>8} {'p99 (s)':>8} {'mean (s)':>9} {'req/s':>7}")
+    for name, command in SERVERS.items():
+        command = [part.format(port=args.port) for part in command]
+        server = subprocess.Popen(command, cwd=BASE_DIR, env=env,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_until_up(f"http://127.0.0.1:{args.port}/")
+            stats = run_load(f"http://127.0.0.1:{args.port}/api/plan", args.requests, args.concurrency)
+        finally:
+            server.terminate()
+            server.wait()
+        print(f"{name:<14} {stats['p50']:>8.2f} {stats['p99']:>8.2f} {stats['mean']:>9.2f} {stats['rps']:>7.2f}")
+
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,80 @@
+"""Prompt size and generation latency per prompt template version.
+
+Renders the menu, grocery and ingredient prompts with every version in
+prompts.TEMPLATES and sends each one to stub_llm.py, which charges time for
+prompt tokens (--prefill-tps) as well as output tokens. Reports characters,
+the local token estimate, the prompt tokens the stub bills, and mean latency.
+The "v1 indented" row is v1 the way the old f-strings sent it, with the source
+indentation and blank lines left in.
+
+Run with: python bench_prompts.py --requests 20 --prefill-tps 1000
+"""
+import argparse
+import statistics
+import textwrap
+import threading
+import time
+
+import llm_transport
+import prompts
+from menu_stream import MENU_SECTIONS
+from stub_llm import STUB_MENU, make_server
+
+EVENT = {
+    "event_type": "Birthday party", "cuisine": "Italian", "formality": "casual",
+    "guest_count": 50, "level": "intermediate", "dietary_restrictions": "none",
+}
+DISHES = [dish for section in MENU_SECTIONS for dish in STUB_MENU[section]]
+MENU_FORMAT = {"type": "json_schema", "json_schema": {"name": "MenuModel", "schema": {"type": "object"}}}
+
+
+def build(name, version):
+    if name == "menu":
+        return prompts.menu_prompt(EVENT, version)
+    if name == "grocery":
+        return prompts.grocery_prompt(STUB_MENU, EVENT["guest_count"], version)
+    return prompts.ingredient_prompt(DISHES, version)
+
+
+def indented(text):
+    """Roughly what the old indented f-strings put on the wire"""
+    return "\n" + textwrap.indent(text.replace("\n", "\n\n", 1), "    ") + "\n    "
+
+
+def measure(client, name, prompt, total):
+    extra = {"response_format": MENU_FORMAT} if name == "menu" else {}
+    latencies, billed = [], 0
+    for _ in range(total):
+        start = time.perf_counter()
+        response = client.chat.completions.create(
+            model="stub", messages=[{"role": "user", "content": prompt}], **extra)
+        latencies.append(time.perf_counter() - start)
+        billed = response.usage.prompt_tokens
+    return billed, statistics.mean(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=20)
+    parser.add_argument("--prefill-tps", type=float, default=1000.0)
+    parser.add_argument("--port", type=int, default=8940)
+    args = parser.parse_args()
+
+    stub = make_server(args.port, ttft=0.05, tps=500, prefill_tps=args.prefill_tps)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    client = llm_transport.create_client("stub", f"http://127.0.0.1:{args.port}", "stub")
+
+    variants = [("v1 indented", "v1", indented)] + [(version, version, str) for version in prompts.TEMPLATES]
+    print(f"⏱️  {args.requests} requests per prompt, prefill {args.prefill_tps:.0f} tokens/s")
+    print(f"{'template':<12} {'version':<12} {'chars':>6} {'est tok':>8} {'billed':>7} {'latency (ms)':>13}")
+    for name in ("menu", "grocery", "ingredients"):
+        for label, version, wrap in variants:
+            prompt = wrap(build(name, version))
+            billed, latency = measure(client, name, prompt, args.requests)
+            print(f"{name:<12} {label:<12} {len(prompt):>6} {prompts.estimate_tokens(prompt):>8} "
+                  f"{billed:>7} {latency * 1000:>13.1f}")
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""Tail latency of LLM calls with and without hedged requests.
+
+Two stub providers (stub_llm.py) each answer a share of requests only after a
+long time-to-first-token. The same burst of grocery completions runs through
+llm_router once with hedging disabled and once enabled, and the latency
+percentiles plus the router's hedge counters are reported.
+
+Run with: python bench_router.py --requests 200 --concurrency 10 --slow-rate 0.03
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import llm_router
+from bench_plan import percentile
+from stub_llm import make_server
+
+PROMPT = "Create a grocery shopping list for 8 people based on this menu:\n- Tiramisu\n- Bruschetta"
+
+
+def run_burst(router, total, concurrency):
+    def one(_):
+        start = time.perf_counter()
+        router.complete([{"role": "user", "content": PROMPT}], kind="grocery")
+        return time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        latencies = list(pool.map(one, range(total)))
+    return {pct: percentile(latencies, pct) for pct in (50, 95, 99)}
+
+
+def make_routes(ports):
+    return [llm_router.Route(name, f"http://127.0.0.1:{port}", "stub", "stub")
+            for name, port in zip(("stub-a", "stub-b"), ports)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--slow-rate", type=float, default=0.03)
+    parser.add_argument("--slow-ttft", type=float, default=4.0)
+    parser.add_argument("--ports", type=int, nargs=2, default=[8930, 8931])
+    args = parser.parse_args()
+
+    stubs = [make_server(port, ttft=0.2, tps=200, slow_rate=args.slow_rate, slow_ttft=args.slow_ttft)
+             for port in args.ports]
+    for stub in stubs:
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    print(f"⏱️  {args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.slow_rate:.0%} of replies delayed {args.slow_ttft}s")
+    print(f"{'router':<10} {'p50 (s)':>8} {'p95 (s)':>8} {'p99 (s)':>8}")
+    for name, hedge in (("no hedge", False), ("hedged", True)):
+        router = llm_router.Router(make_routes(args.ports), hedge=hedge)
+        # Warm up so the hedge delay comes from the observed p95, not the default
+        run_burst(router, 50, args.concurrency)
+        stats = run_burst(router, args.requests, args.concurrency)
+        print(f"{name:<10} {stats[50]:>8.2f} {stats[95]:>8.2f} {stats[99]:>8.2f}")
+    for route, route_stats in router.stats().items():
+        print(f"📊 {route}: hedges={route_stats['hedges']} hedge_wins={route_stats['hedge_wins']} "
+              f"cancelled={route_stats['cancelled']} errors={route_stats['errors']}")
+    for stub in stubs:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
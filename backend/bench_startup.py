@@ -0,0 +1,82 @@
+"""Startup-time benchmark: `import app` wall time and first-request latency.
+
+Each run starts a fresh interpreter, imports the app, then issues the first
+GET /healthz and POST /api/plan through Flask's test client against the
+local stub LLM. Exits non-zero when a median exceeds its budget, so it can
+guard against startup regressions (e.g. network calls creeping back into
+import time).
+
+Run with: python bench_startup.py --runs 5 --max-import-ms 1500 --max-first-request-ms 5000
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+
+from stub_llm import make_server
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PROBE = """
+import json, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+client.get('/healthz')
+health = time.perf_counter()
+client.post('/api/plan', json={"event_type": "dinner", "cuisine": "italian",
+                               "formality": "formal", "guest_count": 8, "level": 1})
+done = time.perf_counter()
+print("RESULT" + json.dumps({
+    "import_ms": (imported - started) * 1000,
+    "healthz_ms": (health - imported) * 1000,
+    "first_plan_ms": (done - health) * 1000,
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--max-import-ms", type=float, default=1500)
+    parser.add_argument("--max-first-request-ms", type=float, default=5000)
+    parser.add_argument("--stub-port", type=int, default=8920)
+    args = parser.parse_args()
+
+    stub = make_server(args.stub_port, ttft=0.05, tps=500)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    env = dict(os.environ,
+               DEEPSEEK_API_KEY="stub",
+               OPENROUTER_BASE_URL=f"http://127.0.0.1:{args.stub_port}",
+               LLM_FREE_MODEL_RATE="1000",
+               MENU_CACHE_BACKEND="memory")
+
+    runs = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, "-c", PROBE], cwd=BASE_DIR, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        runs.append(json.loads(output.split("RESULT", 1)[1]))
+    stub.shutdown()
+
+    medians = {key: statistics.median(run[key] for run in runs) for key in runs[0]}
+    print(f"⏱️  median of {args.runs} cold starts")
+    for key, value in medians.items():
+        print(f"{key:<14} {value:>9.1f}")
+
+    failures = []
+    if medians["import_ms"] > args.max_import_ms:
+        failures.append(f"import {medians['import_ms']:.0f}ms > {args.max_import_ms:.0f}ms")
+    if medians["first_plan_ms"] > args.max_first_request_ms:
+        failures.append(f"first request {medians['first_plan_ms']:.0f}ms > {args.max_first_request_ms:.0f}ms")
+    if failures:
+        print("🔴 Startup regression: " + "; ".join(failures))
+        sys.exit(1)
+    print("✅ Startup within budget")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Menu latency and cost with adaptive model tiers versus the reasoning model alone.
+
+Two stub providers (stub_llm.py) stand in for the two tiers: a reasoning
+model that thinks before it answers (--reasoning-ttft, <think> block) and a
+fast model that answers quickly but cuts off --malformed-rate of its
+structured replies for events with 200 or more guests. The same stream of
+random events (form values, 8 to 400 guests, a few dietary restrictions)
+runs through llm_router once with the reasoning route only and once with
+both routes and a TierPolicy, and reports per run:
+
+- menu call latency percentiles, overall and for simple/complex events
+  (complexity below/at or above --threshold)
+- tokens per call priced at LLM_TIER_PRICES-style --prices
+- the share of calls the fast tier answered, escalations, and the threshold
+  and per-score parse-failure rates the policy learned
+
+Run with: python bench_tiers.py --requests 600 --concurrency 16
+"""
+import argparse
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import catalog
+import llm_router
+import model_tiers
+import prompts
+from bench_plan import percentile
+from menu_stream import MenuModel
+from stub_llm import make_server
+
+RESTRICTIONS = ["none", "none", "none", "vegetarian", "gluten-free", "vegan, nut-free", "halal", "no shellfish"]
+LARGE_EVENT = r"\b([2-9]\d\d|\d{4,}) guests"
+
+
+def random_event(rng):
+    return {
+        "event_type": rng.choice(catalog.EVENT_TYPES),
+        "cuisine": rng.choice(catalog.CUISINES + ["ethiopian"]),
+        "formality": rng.choice(catalog.FORMALITIES),
+        "level": rng.choice(catalog.LEVELS),
+        "guest_count": rng.choice([8, 12, 20, 40, 80, 150, 250, 400]),
+        "dietary_restrictions": rng.choice(RESTRICTIONS),
+    }
+
+
+def run(router, events, concurrency):
+    """[(complexity, seconds)] for one menu call per event"""
+    def one(event):
+        start = time.perf_counter()
+        router.complete([{"role": "user", "content": prompts.menu_prompt(event)}], response_format=MenuModel,
+                        kind="menu", event=event, temperature=0.7)
+        return model_tiers.complexity(event), time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        return list(pool.map(one, events))
+
+
+def tokens_and_cost(router, prices):
+    tokens = cost = 0.0
+    for route in router.routes.values():
+        stats = route.stats()
+        calls = stats["calls"] - stats["errors"]
+        per_call = route.tokens_per_call("menu") or 0
+        tokens += calls * per_call
+        cost += calls * per_call * prices[route.tier] / 1e6
+    return tokens, cost
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--threshold", type=int, default=2)
+    parser.add_argument("--explore", type=float, default=0.25)
+    parser.add_argument("--reasoning-ttft", type=float, default=1.5)
+    parser.add_argument("--malformed-rate", type=float, default=0.5)
+    parser.add_argument("--prices", default=model_tiers.DEFAULT_PRICES)
+    parser.add_argument("--ports", type=int, nargs=2, default=[8940, 8941])
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    reasoning_port, fast_port = args.ports
+    stubs = [make_server(reasoning_port, ttft=args.reasoning_ttft, tps=60, reasoning_rate=1.0),
+             make_server(fast_port, ttft=0.2, tps=200, malformed_rate=args.malformed_rate,
+                         malformed_match=LARGE_EVENT)]
+    for stub in stubs:
+        threading.Thread(target=stub.serve_forever, daemon=True).start()
+    prices = model_tiers.parse_prices(args.prices)
+    rng = random.Random(args.seed)
+    events = [random_event(rng) for _ in range(args.requests)]
+
+    print(f"🎚️  {args.requests} menu calls, concurrency {args.concurrency}; fast model cuts off "
+          f"{args.malformed_rate:.0%} of replies for events of 200+ guests")
+    print(f"{'router':<16} {'p50 s':>6} {'p95 s':>6} {'simple p50':>11} {'complex p50':>12} "
+          f"{'tok/call':>9} {'$/1k calls':>11} {'fast':>6} {'escal.':>7}")
+    for name, tiered in (("reasoning only", False), ("adaptive tiers", True)):
+        routes = [llm_router.Route("stub", f"http://127.0.0.1:{reasoning_port}", "stub", "stub-r1")]
+        policy = None
+        if tiered:
+            routes.append(llm_router.Route("stub-fast", f"http://127.0.0.1:{fast_port}", "stub", "stub-fast",
+                                           tier=model_tiers.FAST, provider="stub"))
+            policy = model_tiers.TierPolicy(threshold=args.threshold, explore=args.explore, prices=prices)
+        router = llm_router.Router(routes, policy=policy)
+        samples = run(router, events, args.concurrency)
+        latencies = [seconds for _, seconds in samples]
+        simple = [seconds for score, seconds in samples if score < args.threshold]
+        complex_ = [seconds for score, seconds in samples if score >= args.threshold]
+        tokens, cost = tokens_and_cost(router, prices)
+        stats = router.tier_stats() or {"fast": 0, "escalations": 0}
+        print(f"{name:<16} {percentile(latencies, 50):>6.2f} {percentile(latencies, 95):>6.2f} "
+              f"{percentile(simple, 50):>11.2f} {percentile(complex_, 50):>12.2f} "
+              f"{tokens / len(samples):>9.0f} {cost / len(samples) * 1000:>11.4f} "
+              f"{stats['fast'] / len(samples):>6.0%} {stats['escalations']:>7}")
+    for kind, learned in stats["kinds"].items():
+        print(f"📈 {kind}: threshold {args.threshold} -> {learned['threshold']}")
+        for score, row in learned["scores"].items():
+            print(f"   complexity {score}: {row['samples']} fast samples, "
+                  f"{row['parse_failure_rate']:.0%} parse failures -> {row['tier'] or 'not enough samples'}")
+    for stub in stubs:
+        stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
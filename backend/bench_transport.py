@@ -0,0 +1,73 @@
+"""Exercise the shared LLM transport against a throttling stub server.
+
+Fires a burst of concurrent completions at stub_llm.py configured to answer a
+share of them with 429 (Retry-After) or 503, once with a bare OpenAI client
+and once with llm_transport's client, and reports success rate, latency and
+the transport's counters.
+
+Run with: python bench_transport.py --requests 40 --concurrency 10 --throttle-rate 0.3
+"""
+import argparse
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from openai import OpenAI
+
+import llm_transport
+from bench_plan import percentile
+from stub_llm import make_server
+
+
+def run_burst(client, total, concurrency):
+    def one(_):
+        start = time.perf_counter()
+        try:
+            client.chat.completions.create(
+                model="stub",
+                messages=[{"role": "user", "content": "Create a grocery shopping list for 4 people\n- Tiramisu"}],
+            )
+            return True, time.perf_counter() - start
+        except Exception:
+            return False, time.perf_counter() - start
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(total)))
+    latencies = [latency for ok, latency in results if ok]
+    return {
+        "ok": len(latencies),
+        "p50": percentile(latencies, 50) if latencies else float('nan'),
+        "p99": percentile(latencies, 99) if latencies else float('nan'),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--throttle-rate", type=float, default=0.3)
+    parser.add_argument("--error-rate", type=float, default=0.1)
+    parser.add_argument("--port", type=int, default=8910)
+    args = parser.parse_args()
+
+    stub = make_server(args.port, ttft=0.05, tps=500,
+                       throttle_rate=args.throttle_rate, error_rate=args.error_rate, retry_after=1)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{args.port}"
+
+    clients = {
+        "bare client": OpenAI(base_url=base_url, api_key="stub", max_retries=0),
+        "llm_transport": llm_transport.create_client("stub", base_url, "stub"),
+    }
+    print(f"⏱️  {args.requests} requests, concurrency {args.concurrency}, "
+          f"{args.throttle_rate:.0%} throttled, {args.error_rate:.0%} errors")
+    print(f"{'client':<14} {'ok':>6} {'p50 (s)':>8} {'p99 (s)':>8}")
+    for name, client in clients.items():
+        stats = run_burst(client, args.requests, args.concurrency)
+        print(f"{name:<14} {stats['ok']:>3}/{args.requests:<2} {stats['p50']:>8.2f} {stats['p99']:>8.2f}")
+    print("📊 transport stats:", llm_transport.stats()["stub"])
+    stub.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+"""Precomputed menus for the event combinations the planner form offers.
+
+`python catalog.py` warms the catalog offline: it generates a menu for every
+event type x cuisine x formality x level combination in index.html, makes
+sure the ingredient index knows every dish, and stores the menus in SQLite.
+Each process loads the whole catalog into a dict at startup, so a request for
+a catalog combination gets its menu from a dict lookup and its grocery list
+from local scaling, with no upstream call.
+
+Menus do not depend on the exact guest count (grocery lists are scaled for
+it), so entries are keyed on the four form fields only. Requests with dietary
+restrictions skip the catalog.
+
+Freshness: entries older than CATALOG_MAX_AGE are still served, and a
+background thread regenerates the oldest of them, a few per interval. A
+SQLite lease makes sure only one worker regenerates a given entry, and every
+worker picks up the others' new rows on its next pass.
+
+Configured with CATALOG (on/off), CATALOG_PATH, CATALOG_MAX_AGE,
+CATALOG_REFRESH_INTERVAL and CATALOG_REFRESH_BATCH.
+"""
+import argparse
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# The <select> and radio values of frontend/templates/index.html
+EVENT_TYPES = ['dinner', 'lunch', 'brunch', 'party', 'bbq']
+CUISINES = ['italian', 'mexican', 'asian', 'mediterranean', 'american']
+FORMALITIES = ['casual', 'semi-formal', 'formal']
+LEVELS = ['1', '2', '3']
+KEY_FIELDS = ['event_type', 'cuisine', 'formality', 'level']
+
+# Guest count used in the prompt when generating catalog menus
+GUEST_COUNT = 12
+REFRESH_LEASE = 600
+
+
+def combinations():
+    """Every catalog event, as a dict of the form fields"""
+    return [dict(zip(KEY_FIELDS, values))
+            for values in itertools.product(EVENT_TYPES, CUISINES, FORMALITIES, LEVELS)]
+
+
+def catalog_key(data):
+    """"dinner|italian|formal|2" for a request, or None if it wants dietary changes"""
+    dietary = str(data.get('dietary_restrictions') or '').strip().lower()
+    if dietary and dietary not in ('none', 'no'):
+        return None
+    return "|".join(str(data.get(field, '')).strip().lower() for field in KEY_FIELDS)
+
+
+class Catalog:
+    def __init__(self, path, generate, max_age=7 * 86400, refresh_interval=60, refresh_batch=2):
+        self.path = path
+        self.generate = generate
+        self.max_age = max_age
+        self.refresh_interval = refresh_interval
+        self.refresh_batch = refresh_batch
+        self.menus = {}
+        self.generated_at = {}
+        # Bumped whenever menus changes, so derived indexes know to rebuild
+        self.version = 0
+        self.stats = {"hits": 0, "misses": 0, "stale_hits": 0, "refreshed": 0, "refresh_failures": 0}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS catalog (
+                key TEXT PRIMARY KEY,
+                event TEXT NOT NULL,
+                menu TEXT NOT NULL,
+                generated_at REAL NOT NULL,
+                refreshing_at REAL
+            )
+        """)
+        self.reload()
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def reload(self):
+        """Pull rows written since the last load (by this or another process) into memory"""
+        rows = self._connect().execute(
+            "SELECT key, menu, generated_at FROM catalog WHERE generated_at > ?", (self._loaded_at,)
+        ).fetchall()
+        with self._lock:
+            for key, menu, generated_at in rows:
+                self.menus[key] = json.loads(menu)
+                self.generated_at[key] = generated_at
+                self._loaded_at = max(self._loaded_at, generated_at)
+            if rows:
+                self.version += 1
+        return len(rows)
+
+    def lookup(self, data):
+        """The catalog menu for a request, or None"""
+        key = catalog_key(data)
+        menu = self.menus.get(key) if key else None
+        with self._lock:
+            if menu is None:
+                self.stats["misses"] += 1
+                return None
+            self.stats["hits"] += 1
+            if self.generated_at[key] < time.time() - self.max_age:
+                self.stats["stale_hits"] += 1
+        return menu
+
+    def store(self, event, menu):
+        key = catalog_key(event)
+        now = time.time()
+        self._connect().execute(
+            "INSERT OR REPLACE INTO catalog (key, event, menu, generated_at) VALUES (?, ?, ?, ?)",
+            (key, json.dumps(event), json.dumps(menu), now)
+        )
+        with self._lock:
+            self.menus[key] = menu
+            self.generated_at[key] = now
+            self.version += 1
+
+    def build(self, event):
+        """Generate and store one entry; True on success"""
+        menu = self.generate(event)
+        if not isinstance(menu, dict) or "error" in menu:
+            print(f"⚠️ Catalog entry {catalog_key(event)} failed: {menu.get('error') if isinstance(menu, dict) else menu}")
+            return False
+        self.store(event, menu)
+        return True
+
+    def warm(self, concurrency=4, force=False):
+        """Generate every missing (or, with force, every) combination; returns (built, failed)"""
+        events = [event for event in combinations() if force or catalog_key(event) not in self.menus]
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            results = list(pool.map(self.build, events))
+        return results.count(True), results.count(False)
+
+    def _claim_stale(self):
+        """Lease up to refresh_batch of the oldest stale entries to this process"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rows = conn.execute(
+                "UPDATE catalog SET refreshing_at = ? WHERE key IN ("
+                "SELECT key FROM catalog WHERE generated_at < ? AND "
+                "(refreshing_at IS NULL OR refreshing_at < ?) ORDER BY generated_at LIMIT ?"
+                ") RETURNING event",
+                (now, now - self.max_age, now - REFRESH_LEASE, self.refresh_batch)
+            ).fetchall()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return [json.loads(event) for (event,) in rows]
+
+    def refresh_once(self):
+        self.reload()
+        for event in self._claim_stale():
+            if self.build(event):
+                self._count("refreshed")
+            else:
+                self._count("refresh_failures")
+                # Give the entry back so another pass can retry it
+                self._connect().execute("UPDATE catalog SET refreshing_at = NULL WHERE key = ?",
+                                        (catalog_key(event),))
+
+    def _refresh_loop(self):
+        while not self._stopping.wait(self.refresh_interval):
+            try:
+                self.refresh_once()
+            except Exception:
+                traceback.print_exc()
+
+    def start(self):
+        """Start the background refresher once per process (safe to call on every request)"""
+        if self._thread:
+            return
+        with self._lock:
+            if self._thread:
+                return
+            self._thread = threading.Thread(target=self._refresh_loop, name="catalog-refresh", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout=30):
+        """Stop refreshing, waiting for a refresh in progress to be stored"""
+        self._stopping.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.menus)
+            stats["stale"] = sum(1 for at in self.generated_at.values() if at < now - self.max_age)
+        stats["combinations"] = len(EVENT_TYPES) * len(CUISINES) * len(FORMALITIES) * len(LEVELS)
+        return stats
+
+
+def create_catalog(generate):
+    """Build the catalog from environment settings (None when disabled)"""
+    if os.getenv('CATALOG', 'on').lower() in ('off', 'none', '0', 'false'):
+        return None
+    return Catalog(
+        os.getenv('CATALOG_PATH', os.path.join(BASE_DIR, 'cache', 'catalog.sqlite3')),
+        generate,
+        max_age=float(os.getenv('CATALOG_MAX_AGE', 7 * 86400)),
+        refresh_interval=float(os.getenv('CATALOG_REFRESH_INTERVAL', 60)),
+        refresh_batch=int(os.getenv('CATALOG_REFRESH_BATCH', 2)),
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Warm the precomputed menu catalog")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--force", action="store_true", help="regenerate entries that already exist")
+    args = parser.parse_args()
+
+    from app import menu_catalog
+    if menu_catalog is None:
+        raise SystemExit("Catalog is disabled (CATALOG=off)")
+    started = time.perf_counter()
+    built, failed = menu_catalog.warm(args.concurrency, args.force)
+    print(f"📚 Catalog: {built} built, {failed} failed, {len(menu_catalog.menus)} entries "
+          f"in {time.perf_counter() - started:.1f}s")
@@ -0,0 +1,32 @@
+import importlib
+import threading
+
+import pytest
+
+from stub_llm import make_server
+
+
+@pytest.fixture(scope="session")
+def planner(tmp_path_factory):
+    """The app module on a stub provider, with every store in a temporary directory.
+
+    app reads its configuration at import time, so every test that needs it
+    shares this one import.
+    """
+    stub = make_server(0, ttft=0.3, tps=1000)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+    path = tmp_path_factory.mktemp("planner")
+    env = pytest.MonkeyPatch()
+    for name, value in {
+        "DEEPSEEK_API_KEY": "stub", "LLM_ROUTER_PROVIDERS": "openrouter",
+        "OPENROUTER_BASE_URL": f"http://127.0.0.1:{stub.server_address[1]}",
+        "LLM_PROVIDER_RATE": "1000", "LLM_FREE_MODEL_RATE": "1000", "LLM_MODEL_TIERS": "off",
+        "CATALOG": "off", "SEMANTIC_CACHE": "off", "MENU_CACHE_BACKEND": "off", "HEALTH_PROBE_INTERVAL": "3600",
+        "CATALOG_PATH": str(path / "catalog.sqlite3"), "INGREDIENT_DB_PATH": str(path / "ingredients.sqlite3"),
+        "JOB_DB_PATH": str(path / "jobs.sqlite3"), "PLAN_DB_PATH": str(path / "plans.sqlite3"),
+        "PLAN_HISTORY_PATH": str(path / "history.sqlite3"), "SINGLE_FLIGHT_PATH": "",
+    }.items():
+        env.setenv(name, value)
+    yield importlib.import_module("app")
+    env.undo()
+    stub.shutdown()
@@ -0,0 +1,329 @@
+"""Dietary restrictions applied locally: allergen/diet tags for known dishes and catalog substitutions.
+
+Every ingredient in the ingredient index is tagged from its name (TAG_WORDS
+and TAG_PHRASES: meat, dairy, gluten, tree nuts, ...), and every known dish
+carries the union of its ingredients' tags and the tags of its own name. A
+restriction is a set of tags it forbids (RESTRICTIONS), so checking a dish is
+one bit test.
+
+DietIndex.adapt() takes a menu and the forbidden tags, keeps the dishes that
+comply and swaps each one that does not for a compatible dish from the same
+section of catalog menus of the same cuisine (the most common one first).
+Slots it cannot fill, because no catalog dish fits or the dish is not in the
+ingredient index and cannot be checked, are returned as "uncovered" for a
+targeted LLM call. The index is rebuilt when the ingredient index or the
+catalog changes.
+
+parse() reads the free-text dietary_restrictions field ("vegan, nut-free",
+"no shellfish", "lactose intolerant"). Anything it cannot map to tags, and
+restrictions that depend on sourcing rather than ingredients (halal, kosher),
+is reported as unknown so the caller leaves the menu to the LLM.
+
+Tags come from names, not from labels on products: "chocolate chips" count
+as dairy and "oats" as gluten, and an ingredient no table mentions counts as
+free of everything.
+
+Configured with DIETARY_ENGINE (on/off).
+"""
+import os
+import re
+import threading
+from functools import lru_cache
+
+from ingredient_index import dish_key
+from menu_stream import MENU_SECTIONS
+
+TAGS = ['meat', 'pork', 'fish', 'shellfish', 'dairy', 'egg', 'gluten', 'tree_nut', 'peanut', 'soy', 'sesame',
+        'honey', 'alcohol', 'gelatin']
+BIT = {tag: 1 << position for position, tag in enumerate(TAGS)}
+
+
+def mask(*tags):
+    value = 0
+    for tag in tags:
+        value |= BIT[tag]
+    return value
+
+
+MEAT, PORK = mask('meat'), mask('meat', 'pork')
+FISH, SHELLFISH = mask('fish'), mask('shellfish')
+DAIRY, EGG, GLUTEN = mask('dairy'), mask('egg'), mask('gluten')
+NUT, PEANUT, SOY, SESAME = mask('tree_nut'), mask('peanut'), mask('soy'), mask('sesame')
+HONEY, ALCOHOL, GELATIN = mask('honey'), mask('alcohol'), mask('gelatin')
+
+# restriction -> tags a dish must not have
+RESTRICTIONS = {
+    'vegan': MEAT | PORK | FISH | SHELLFISH | DAIRY | EGG | HONEY | GELATIN,
+    'vegetarian': MEAT | PORK | FISH | SHELLFISH | GELATIN,
+    'pescatarian': MEAT | PORK | GELATIN,
+    'gluten-free': GLUTEN,
+    'nut-free': NUT | PEANUT,
+    'tree-nut-free': NUT,
+    'peanut-free': PEANUT,
+    'dairy-free': DAIRY,
+    'egg-free': EGG,
+    'fish-free': FISH,
+    'shellfish-free': SHELLFISH,
+    'seafood-free': FISH | SHELLFISH,
+    'meat-free': MEAT | PORK,
+    'pork-free': PORK,
+    'soy-free': SOY,
+    'sesame-free': SESAME,
+    'alcohol-free': ALCOHOL,
+}
+
+# Other ways to write a restriction, after lowercasing and turning hyphens into spaces
+DIET_ALIASES = {
+    'vegan': 'vegan', 'plant based': 'vegan', 'vegetarian': 'vegetarian', 'veggie': 'vegetarian',
+    'lacto ovo vegetarian': 'vegetarian', 'pescatarian': 'pescatarian', 'pescetarian': 'pescatarian',
+    'celiac': 'gluten-free', 'coeliac': 'gluten-free', 'lactose intolerant': 'dairy-free',
+    'teetotal': 'alcohol-free', 'sober': 'alcohol-free',
+}
+
+# What a "no X" / "X-free" / "X allergy" phrase names -> restriction
+ALLERGEN_WORDS = {
+    'nut': 'nut-free', 'nuts': 'nut-free', 'tree nut': 'tree-nut-free', 'tree nuts': 'tree-nut-free',
+    'peanut': 'peanut-free', 'peanuts': 'peanut-free', 'dairy': 'dairy-free', 'milk': 'dairy-free',
+    'lactose': 'dairy-free', 'egg': 'egg-free', 'eggs': 'egg-free', 'gluten': 'gluten-free',
+    'wheat': 'gluten-free', 'fish': 'fish-free', 'shellfish': 'shellfish-free', 'seafood': 'seafood-free',
+    'meat': 'meat-free', 'pork': 'pork-free', 'soy': 'soy-free', 'soya': 'soy-free', 'sesame': 'sesame-free',
+    'alcohol': 'alcohol-free', 'booze': 'alcohol-free',
+}
+_ALLERGEN_PHRASE = re.compile(
+    r'^(?:no|without|avoid|free of|allergic to|intolerant to|(?:an? )?allergy to) (?P<before>.+)$'
+    r'|^(?P<after>.+?) (?:free|allergy|allergies|allergic|intolerance|intolerant)$'
+)
+NO_RESTRICTIONS = {'', 'none', 'no', 'n/a', 'na', 'nothing', 'no restrictions'}
+_SPLIT = re.compile(r'[,;/&+\n]|\band\b')
+_FILLER = re.compile(r'\b(?:only|strict|strictly|diet|dietary|friendly|options?|please|menu|guests?|must be|all)\b')
+
+# ingredient or dish-name word -> tags; a word is also tried without its plural s
+TAG_WORDS = {
+    # meat and poultry
+    'chicken': MEAT, 'beef': MEAT, 'steak': MEAT, 'veal': MEAT, 'lamb': MEAT, 'mutton': MEAT, 'goat': MEAT,
+    'turkey': MEAT, 'duck': MEAT, 'venison': MEAT, 'rabbit': MEAT, 'meat': MEAT, 'meatball': MEAT,
+    'brisket': MEAT, 'kofta': MEAT, 'souvlaki': MEAT, 'suet': MEAT, 'broth': MEAT, 'burger': MEAT,
+    'cheeseburger': MEAT | DAIRY | GLUTEN, 'hamburger': MEAT | GLUTEN, 'wing': MEAT,
+    'pork': PORK, 'bacon': PORK, 'ham': PORK, 'pancetta': PORK, 'prosciutto': PORK, 'sausage': PORK,
+    'salami': PORK, 'chorizo': PORK, 'pepperoni': PORK, 'lard': PORK, 'guanciale': PORK, 'carnitas': PORK,
+    # fish and shellfish
+    'fish': FISH, 'salmon': FISH, 'tuna': FISH, 'cod': FISH, 'bass': FISH, 'halibut': FISH, 'trout': FISH,
+    'anchovy': FISH, 'anchovie': FISH, 'sardine': FISH, 'mackerel': FISH, 'tilapia': FISH, 'snapper': FISH,
+    'swordfish': FISH, 'bonito': FISH, 'dashi': FISH, 'worcestershire': FISH, 'caviar': FISH, 'sushi': FISH,
+    'shrimp': SHELLFISH, 'prawn': SHELLFISH, 'crab': SHELLFISH, 'lobster': SHELLFISH, 'scallop': SHELLFISH,
+    'mussel': SHELLFISH, 'clam': SHELLFISH, 'oyster': SHELLFISH, 'squid': SHELLFISH, 'calamari': SHELLFISH,
+    'octopus': SHELLFISH, 'crawfish': SHELLFISH, 'seafood': FISH | SHELLFISH, 'paella': SHELLFISH,
+    # dairy and eggs
+    'milk': DAIRY, 'cream': DAIRY, 'butter': DAIRY, 'cheese': DAIRY, 'yogurt': DAIRY, 'yoghurt': DAIRY,
+    'ghee': DAIRY, 'paneer': DAIRY, 'ricotta': DAIRY, 'mascarpone': DAIRY, 'mozzarella': DAIRY,
+    'parmesan': DAIRY, 'pecorino': DAIRY, 'feta': DAIRY, 'cheddar': DAIRY, 'gouda': DAIRY, 'brie': DAIRY,
+    'burrata': DAIRY, 'halloumi': DAIRY, 'gruyere': DAIRY, 'buttermilk': DAIRY, 'custard': DAIRY | EGG,
+    'lassi': DAIRY, 'kheer': DAIRY, 'gelato': DAIRY, 'whey': DAIRY, 'casein': DAIRY, 'alfredo': DAIRY,
+    'chocolate': DAIRY, 'cheesecake': DAIRY | EGG | GLUTEN, 'flan': DAIRY | EGG, 'tiramisu': DAIRY | EGG | GLUTEN,
+    'egg': EGG, 'mayonnaise': EGG, 'mayo': EGG, 'aioli': EGG, 'meringue': EGG, 'carbonara': EGG | DAIRY | PORK,
+    'ladyfinger': GLUTEN | EGG, 'brioche': GLUTEN | EGG | DAIRY, 'frittata': EGG, 'quiche': EGG | DAIRY | GLUTEN,
+    # gluten
+    'flour': GLUTEN, 'wheat': GLUTEN, 'barley': GLUTEN, 'rye': GLUTEN, 'oat': GLUTEN, 'couscous': GLUTEN,
+    'bulgur': GLUTEN, 'semolina': GLUTEN, 'farro': GLUTEN, 'spelt': GLUTEN, 'seitan': GLUTEN, 'panko': GLUTEN,
+    'breadcrumb': GLUTEN, 'bread': GLUTEN, 'baguette': GLUTEN, 'bun': GLUTEN, 'pita': GLUTEN, 'naan': GLUTEN,
+    'ciabatta': GLUTEN, 'focaccia': GLUTEN, 'croissant': GLUTEN | DAIRY, 'crouton': GLUTEN, 'cracker': GLUTEN,
+    'pasta': GLUTEN, 'spaghetti': GLUTEN, 'macaroni': GLUTEN, 'penne': GLUTEN, 'fettuccine': GLUTEN,
+    'linguine': GLUTEN, 'lasagna': GLUTEN, 'ravioli': GLUTEN, 'tortellini': GLUTEN, 'gnocchi': GLUTEN,
+    'noodle': GLUTEN, 'udon': GLUTEN, 'ramen': GLUTEN, 'dough': GLUTEN, 'pastry': GLUTEN, 'phyllo': GLUTEN,
+    'filo': GLUTEN, 'crust': GLUTEN, 'wrapper': GLUTEN, 'tortilla': GLUTEN, 'cake': GLUTEN, 'cookie': GLUTEN,
+    'biscuit': GLUTEN, 'brownie': GLUTEN, 'muffin': GLUTEN, 'pancake': GLUTEN, 'waffle': GLUTEN,
+    'shell': GLUTEN, 'pie': GLUTEN, 'tart': GLUTEN, 'beer': GLUTEN | ALCOHOL, 'ale': GLUTEN | ALCOHOL,
+    'cannoli': GLUTEN | DAIRY, 'baklava': GLUTEN | NUT | HONEY, 'churro': GLUTEN, 'samosa': GLUTEN,
+    'gyoza': GLUTEN | PORK, 'tempura': GLUTEN, 'pizza': GLUTEN | DAIRY, 'quesadilla': GLUTEN | DAIRY,
+    'teriyaki': SOY | GLUTEN,
+    # nuts, seeds and soy
+    'almond': NUT, 'walnut': NUT, 'pecan': NUT, 'cashew': NUT, 'pistachio': NUT, 'hazelnut': NUT,
+    'macadamia': NUT, 'nut': NUT, 'praline': NUT, 'marzipan': NUT, 'nutella': NUT | DAIRY, 'pesto': NUT | DAIRY,
+    'peanut': PEANUT, 'satay': PEANUT, 'sesame': SESAME, 'tahini': SESAME, 'hummus': SESAME,
+    'soy': SOY, 'soya': SOY, 'tofu': SOY, 'tempeh': SOY, 'miso': SOY, 'edamame': SOY, 'soybean': SOY,
+    # other
+    'honey': HONEY, 'gelatin': GELATIN, 'gelatine': GELATIN, 'marshmallow': GELATIN,
+    'wine': ALCOHOL, 'chianti': ALCOHOL, 'prosecco': ALCOHOL, 'champagne': ALCOHOL, 'sangria': ALCOHOL,
+    'rum': ALCOHOL, 'vodka': ALCOHOL, 'gin': ALCOHOL, 'tequila': ALCOHOL, 'mezcal': ALCOHOL,
+    'whiskey': ALCOHOL, 'whisky': ALCOHOL, 'bourbon': ALCOHOL, 'brandy': ALCOHOL, 'cognac': ALCOHOL,
+    'sake': ALCOHOL, 'liqueur': ALCOHOL, 'limoncello': ALCOHOL, 'vermouth': ALCOHOL,
+    'margarita': ALCOHOL, 'mojito': ALCOHOL, 'cocktail': ALCOHOL, 'spritz': ALCOHOL,
+    'mimosa': ALCOHOL, 'bellini': ALCOHOL, 'amaretto': ALCOHOL, 'kahlua': ALCOHOL | DAIRY,
+}
+
+# Phrases whose words would mislead TAG_WORDS; checked before the words they contain
+TAG_PHRASES = {
+    'coconut milk': 0, 'coconut cream': 0, 'oat milk': GLUTEN, 'almond milk': NUT, 'soy milk': SOY,
+    'rice milk': 0, 'peanut butter': PEANUT, 'almond butter': NUT, 'cocoa butter': 0, 'apple butter': 0,
+    'cream of tartar': 0, 'corn tortilla': 0, 'tortilla chip': 0, 'rice noodle': 0, 'glass noodle': 0,
+    'rice paper': 0, 'rice flour': 0, 'corn flour': 0, 'almond flour': NUT, 'chickpea flour': 0,
+    'coconut flour': 0, 'gluten free': 0, 'dark chocolate': 0, 'cocoa powder': 0, 'soy sauce': SOY | GLUTEN,
+    'fish sauce': FISH, 'oyster sauce': SHELLFISH, 'vegan cheese': 0, 'vegan butter': 0, 'egg free': 0,
+    'nut free': 0, 'dairy free': 0, 'vegetable broth': 0, 'vegetable stock': 0, 'mushroom broth': 0,
+    'chicken stock': MEAT, 'beef stock': MEAT, 'bone broth': MEAT, 'ice cream': DAIRY,
+    'caesar dressing': FISH | EGG | DAIRY, 'caesar salad': FISH | EGG | DAIRY | GLUTEN,
+    'egg roll': GLUTEN | EGG | PORK, 'spring roll': GLUTEN, 'tree nut': NUT, 'pie crust': GLUTEN | DAIRY,
+    'sparkling wine': ALCOHOL, 'ginger beer': 0, 'root beer': 0, 'butternut squash': 0, 'nutmeg': 0,
+    'water chestnut': 0, 'ginger ale': 0, 'triple sec': ALCOHOL, 'pine nut': NUT,
+}
+_WORD = re.compile(r'[a-z]+')
+
+
+@lru_cache(maxsize=8192)
+def name_tags(name):
+    """Tags of an ingredient or dish name, from TAG_PHRASES and TAG_WORDS"""
+    words = _WORD.findall(str(name).lower())
+    tags, i = 0, 0
+    while i < len(words):
+        for length in (3, 2):
+            phrase = ' '.join(words[i:i + length])
+            if len(words) - i >= length and phrase in TAG_PHRASES:
+                tags |= TAG_PHRASES[phrase]
+                i += length
+                break
+        else:
+            word = words[i]
+            for candidate in (word, word[:-1] if word.endswith('s') else None, word[:-2] if word.endswith('es') else None):
+                if candidate in TAG_WORDS:
+                    tags |= TAG_WORDS[candidate]
+                    break
+            i += 1
+    return tags
+
+
+def describe(tags):
+    """Tag names set in a tag mask"""
+    return [tag for tag in TAGS if tags & BIT[tag]]
+
+
+@lru_cache(maxsize=1024)
+def phrases(text):
+    """The separate restrictions of a dietary_restrictions field, normalized; () for none"""
+    text = ' '.join(str(text or '').lower().replace('-', ' ').replace('_', ' ').split())
+    if text in NO_RESTRICTIONS:
+        return ()
+    found = (' '.join(_FILLER.sub(' ', phrase).split()) for phrase in _SPLIT.split(text))
+    return tuple(phrase for phrase in found if phrase)
+
+
+@lru_cache(maxsize=1024)
+def parse(text):
+    """(forbidden tag mask, (phrases not understood, ...)) for a dietary_restrictions field"""
+    forbidden, unknown = 0, []
+    for phrase in phrases(text):
+        name = DIET_ALIASES.get(phrase) or ALLERGEN_WORDS.get(phrase.removesuffix(' free'))
+        if name is None:
+            match = _ALLERGEN_PHRASE.match(phrase)
+            name = ALLERGEN_WORDS.get(match['before'] or match['after']) if match else None
+        if name is None and phrase.replace(' ', '-') in RESTRICTIONS:
+            name = phrase.replace(' ', '-')
+        if name is None:
+            unknown.append(phrase)
+        else:
+            forbidden |= RESTRICTIONS[name]
+    return forbidden, tuple(unknown)
+
+
+class DietIndex:
+    def __init__(self, ingredients, catalog=None):
+        self.ingredients = ingredients
+        self.catalog = catalog
+        self.stats = {"adaptations": 0, "complete": 0, "kept": 0, "substituted": 0, "uncovered": 0}
+        self._lock = threading.Lock()
+        self._built_from = None
+        self._source = None
+        self._tags = {}
+        self._pools = {}
+
+    def _build(self):
+        """Dish tags from the ingredient index and (section, cuisine) substitution pools from the catalog"""
+        dishes = self.ingredients.dishes
+        ingredient_tags = {ingredient_id: name_tags(name)
+                           for ingredient_id, (name, _, _) in self.ingredients.ingredients.items()}
+        tags = {}
+        for key, rows in dishes.items():
+            value = name_tags(key)
+            for ingredient_id, _ in rows:
+                value |= ingredient_tags.get(ingredient_id, 0)
+            tags[key] = value
+
+        counts, names = {}, {}
+        for catalog_key, menu in (dict(self.catalog.menus) if self.catalog else {}).items():
+            cuisine = catalog_key.split('|')[1]
+            for section in MENU_SECTIONS:
+                for dish in menu.get(section) or ():
+                    key = dish_key(dish)
+                    if key in tags:
+                        pool = counts.setdefault((section, cuisine), {})
+                        pool[key] = pool.get(key, 0) + 1
+                        names.setdefault(key, dish)
+        pools = {
+            slot: [(names[key], key, tags[key]) for key in sorted(pool, key=lambda key: (-pool[key], key))]
+            for slot, pool in counts.items()
+        }
+        return tags, pools
+
+    def _current(self):
+        """(tags, pools), rebuilt when the ingredient index reloaded or the catalog changed"""
+        dishes, version = self.ingredients.dishes, self.catalog.version if self.catalog else 0
+        if self._built_from != (id(dishes), version):
+            with self._lock:
+                if self._built_from != (id(dishes), version):
+                    self._tags, self._pools = self._build()
+                    # The index holds on to dishes, so its id cannot be reused while we compare against it
+                    self._source = dishes
+                    self._built_from = (id(dishes), version)
+        return self._tags, self._pools
+
+    def dish_tags(self, dish):
+        """Tag mask of a dish the ingredient index knows; None for a dish it cannot check"""
+        return self._current()[0].get(dish_key(dish))
+
+    def adapt(self, menu, forbidden, cuisine, sections=None):
+        """The menu with every dish that has a forbidden tag swapped for a compatible catalog dish.
+
+        Returns {"menu", "substituted": [{"section", "index", "removed",
+        "added"}], "uncovered": {section: [index, ...]}}. Uncovered slots still
+        hold their original dish.
+        """
+        tags, pools = self._current()
+        cuisine = ' '.join(str(cuisine or '').lower().split())
+        adapted, substituted, uncovered, kept = dict(menu), [], {}, 0
+        for section in sections or MENU_SECTIONS:
+            items = list(menu.get(section) or ())
+            used = {dish_key(dish) for dish in items}
+            candidates = iter(pools.get((section, cuisine), ()))
+            for index, dish in enumerate(items):
+                dish_tags = tags.get(dish_key(dish))
+                if dish_tags is not None and not dish_tags & forbidden:
+                    kept += 1
+                    continue
+                replacement = next((name for name, key, value in candidates
+                                    if not value & forbidden and key not in used), None)
+                if replacement is None:
+                    uncovered.setdefault(section, []).append(index)
+                    continue
+                used.add(dish_key(replacement))
+                substituted.append({"section": section, "index": index, "removed": dish, "added": replacement})
+                items[index] = replacement
+            if section in menu:
+                adapted[section] = items
+        with self._lock:
+            self.stats["adaptations"] += 1
+            self.stats["complete"] += not uncovered
+            self.stats["kept"] += kept
+            self.stats["substituted"] += len(substituted)
+            self.stats["uncovered"] += sum(len(indexes) for indexes in uncovered.values())
+        return {"menu": adapted, "substituted": substituted, "uncovered": uncovered}
+
+    def snapshot(self):
+        tags, pools = self._current()
+        with self._lock:
+            return dict(self.stats, dishes=len(tags), pools=len(pools))
+
+
+def create_engine(ingredients, catalog=None):
+    """Build the dietary index from environment settings (None when disabled)"""
+    if os.getenv('DIETARY_ENGINE', 'on').lower() in ('off', 'none', '0', 'false'):
+        return None
+    return DietIndex(ingredients, catalog)
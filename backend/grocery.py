@@ -0,0 +1,336 @@
+"""Grocery list aggregation: canonical ingredient names and unit normalization.
+
+The same ingredient reaches a list under many names ("Onions, diced",
+"yellow onion", "2 large onions") and in many units (g, kg, cups, pieces,
+cloves). canonical_name() folds names onto one entry through SYNONYMS, a list
+of preparation words to drop and plural rules. Quantities are converted to a
+base unit per dimension through UNITS (g for mass, ml for volume, pcs for
+counts), and an ingredient listed in more than one dimension ("3 onions" in
+one dish, "500 g onions" in another) is merged through PIECE_GRAMS and
+DENSITY when both sides convert to grams.
+
+aggregate() merges raw items into sorted entries, parse_text() reads the
+"- Item (quantity)" lists the LLM writes, and grocery_list() wraps entries in
+a GroceryList model. Names and units are resolved through caches, so
+re-aggregating a catering list of a few hundred items takes well under a
+millisecond (see bench_grocery.py).
+"""
+import math
+import re
+from functools import lru_cache
+
+from menu_stream import GroceryList
+
+# unit -> (dimension, factor to the dimension's base unit)
+UNITS = {
+    'g': ('mass', 1), 'gram': ('mass', 1), 'grams': ('mass', 1), 'mg': ('mass', 0.001),
+    'kg': ('mass', 1000), 'kgs': ('mass', 1000), 'kilogram': ('mass', 1000), 'kilograms': ('mass', 1000),
+    'oz': ('mass', 28.35), 'ounce': ('mass', 28.35), 'ounces': ('mass', 28.35),
+    'lb': ('mass', 453.6), 'lbs': ('mass', 453.6), 'pound': ('mass', 453.6), 'pounds': ('mass', 453.6),
+    'ml': ('volume', 1), 'milliliter': ('volume', 1), 'milliliters': ('volume', 1),
+    'millilitre': ('volume', 1), 'millilitres': ('volume', 1), 'cl': ('volume', 10), 'dl': ('volume', 100),
+    'l': ('volume', 1000), 'liter': ('volume', 1000), 'liters': ('volume', 1000),
+    'litre': ('volume', 1000), 'litres': ('volume', 1000),
+    'tsp': ('volume', 4.93), 'teaspoon': ('volume', 4.93), 'teaspoons': ('volume', 4.93),
+    'tbsp': ('volume', 14.79), 'tablespoon': ('volume', 14.79), 'tablespoons': ('volume', 14.79),
+    'cup': ('volume', 240), 'cups': ('volume', 240), 'fl oz': ('volume', 29.57),
+    'pint': ('volume', 473), 'pints': ('volume', 473), 'quart': ('volume', 946), 'quarts': ('volume', 946),
+    'gallon': ('volume', 3785), 'gallons': ('volume', 3785),
+    'pcs': ('count', 1), 'pc': ('count', 1), 'piece': ('count', 1), 'pieces': ('count', 1),
+    'each': ('count', 1), 'whole': ('count', 1), 'dozen': ('count', 12),
+    'clove': ('clove', 1), 'cloves': ('clove', 1),
+}
+BASE_UNITS = {'mass': 'g', 'volume': 'ml', 'count': 'pcs', 'clove': 'cloves'}
+
+# Grams per piece, so counted and weighed amounts of one ingredient merge
+PIECE_GRAMS = {
+    'onion': 150, 'red onion': 150, 'shallot': 40, 'garlic': 50, 'tomato': 120, 'cherry tomato': 15,
+    'potato': 170, 'sweet potato': 200, 'carrot': 60, 'bell pepper': 150, 'cucumber': 300,
+    'zucchini': 200, 'eggplant': 450, 'avocado': 170, 'lemon': 100, 'lime': 65, 'orange': 180,
+    'apple': 180, 'banana': 120, 'egg': 50, 'baguette': 250, 'chicken breast': 200,
+}
+CLOVE_GRAMS = 5
+# Grams per ml, so measured and weighed amounts of one ingredient merge
+DENSITY = {
+    'flour': 0.53, 'sugar': 0.85, 'brown sugar': 0.93, 'rice': 0.85, 'butter': 0.96, 'honey': 1.42,
+    'water': 1.0, 'milk': 1.03, 'cream': 1.0, 'yogurt': 1.03, 'olive oil': 0.91, 'vegetable oil': 0.92,
+    'salt': 1.2, 'cocoa powder': 0.42, 'oat': 0.41, 'parmesan': 0.42,
+}
+
+# Other names for an ingredient -> its canonical name (applied before and after cleanup)
+SYNONYMS = {
+    'scallion': 'green onion', 'spring onion': 'green onion', 'yellow onion': 'onion',
+    'white onion': 'onion', 'brown onion': 'onion', 'cilantro': 'coriander', 'garbanzo bean': 'chickpea',
+    'aubergine': 'eggplant', 'courgette': 'zucchini', 'capsicum': 'bell pepper', 'rocket': 'arugula',
+    'prawn': 'shrimp', 'minced beef': 'ground beef', 'beef mince': 'ground beef',
+    'all purpose flour': 'flour', 'plain flour': 'flour', 'granulated sugar': 'sugar',
+    'white sugar': 'sugar', 'extra virgin olive oil': 'olive oil', 'evoo': 'olive oil',
+    'heavy cream': 'cream', 'double cream': 'cream', 'whipping cream': 'cream',
+    'unsalted butter': 'butter', 'salted butter': 'butter', 'garlic clove': 'garlic',
+    'clove garlic': 'garlic', 'cloves garlic': 'garlic', 'parmigiano reggiano': 'parmesan', 'parmesan cheese': 'parmesan',
+    'mozzarella cheese': 'mozzarella', 'sea salt': 'salt', 'kosher salt': 'salt', 'table salt': 'salt',
+    'greek yoghurt': 'greek yogurt', 'yoghurt': 'yogurt', 'chicken breast fillet': 'chicken breast',
+    'basil leaf': 'basil', 'mint leaf': 'mint', 'chilli': 'chili', 'chile': 'chili',
+}
+# Preparation and size words that do not change what is bought
+DESCRIPTORS = {
+    'fresh', 'chopped', 'diced', 'sliced', 'minced', 'grated', 'shredded', 'peeled',
+    'finely', 'roughly', 'thinly', 'large', 'medium', 'small', 'ripe', 'organic', 'boneless',
+    'skinless', 'of', 'a', 'the',
+}
+# Plurals that the suffix rules below would get wrong, and words that are not plurals
+IRREGULAR = {
+    'tomatoes': 'tomato', 'potatoes': 'potato', 'mangoes': 'mango', 'leaves': 'leaf', 'loaves': 'loaf',
+    'cookies': 'cookie', 'brownies': 'brownie', 'pies': 'pie', 'chilies': 'chili', 'chillies': 'chili',
+    'anchovies': 'anchovy', 'dice': 'dice',
+}
+UNCOUNTABLE = {'molasses', 'hummus', 'couscous', 'asparagus', 'greens', 'grits', 'swiss', 'brussels', 'series'}
+
+_SEPARATORS = re.compile(r'\(.*?\)|,.*$|;.*$')
+_NON_WORD = re.compile(r'[^a-z0-9 ]+')
+_BULLET = re.compile(r'^\s*(?:[-*•+]|\d+[.)])\s+')
+_QUANTITY = re.compile(r'^\s*(\d+\s+\d+/\d+|\d+/\d+|\d*\.?\d+)(?:\s*[-–]\s*(\d*\.?\d+))?\s*(.*)$')
+_FRACTIONS = {'½': '1/2', '¼': '1/4', '¾': '3/4', '⅓': '1/3', '⅔': '2/3'}
+# The "- Item (2.5 kg)" lines render_grocery_text() writes, and most LLM lines
+_SIMPLE_LINE = re.compile(r'^(?:[-*•+]\s+)?([^():*]+?)\s*\((\d+(?:\.\d+)?)\s*([a-zA-Z]+)?\)$')
+
+
+def _singular(word):
+    if word in IRREGULAR:
+        return IRREGULAR[word]
+    if word in UNCOUNTABLE or len(word) < 4 or word.endswith(('ss', 'us', 'is')):
+        return word
+    if word.endswith('ies'):
+        return word[:-3] + 'y'
+    if word.endswith(('ches', 'shes', 'sses', 'xes')):
+        return word[:-2]
+    if word.endswith('s'):
+        return word[:-1]
+    return word
+
+
+@lru_cache(maxsize=8192)
+def canonical_name(name):
+    """The canonical ingredient name ("Large Onions, diced" -> "onion", "cilantro" -> "coriander")"""
+    name = _NON_WORD.sub(' ', _SEPARATORS.sub('', str(name).lower()).replace('-', ' '))
+    name = ' '.join(name.split())
+    name = SYNONYMS.get(name, name)
+    words = [word for word in name.split() if word not in DESCRIPTORS] or name.split()
+    if words:
+        words[-1] = _singular(words[-1])
+    name = ' '.join(words)
+    return SYNONYMS.get(name, name)
+
+
+@lru_cache(maxsize=1024)
+def unit_info(unit):
+    """(dimension, factor to its base unit) for a unit; unknown units are their own dimension"""
+    unit = ' '.join(str(unit or 'pcs').strip().lower().rstrip('.').split()) or 'pcs'
+    return UNITS.get(unit) or (_singular(unit), 1)
+
+
+@lru_cache(maxsize=8192)
+def _resolve(name, unit):
+    """((canonical name, dimension), factor to the base unit) for an item's name and unit"""
+    dimension, factor = unit_info(unit)
+    return (canonical_name(name), dimension), factor
+
+
+def to_base(quantity, unit):
+    """Convert a quantity to (dimension, base quantity); None for unknown units"""
+    unit = str(unit).strip().lower().rstrip('.')
+    if unit not in UNITS:
+        return None
+    dimension, factor = UNITS[unit]
+    return dimension, float(quantity) * factor
+
+
+def format_quantity(quantity, dimension):
+    """Pick a readable unit for an aggregated base quantity"""
+    if dimension == 'mass' and quantity >= 1000:
+        return round(quantity / 1000, 1), 'kg'
+    if dimension == 'volume' and quantity >= 1000:
+        return round(quantity / 1000, 1), 'l'
+    if dimension in ('mass', 'volume'):
+        return max(1, int(round(quantity))), BASE_UNITS[dimension]
+    return math.ceil(quantity - 1e-9), BASE_UNITS.get(dimension, dimension)
+
+
+def grams_per_unit(name, dimension):
+    """Grams in one base unit of `dimension` of an ingredient; None when unknown"""
+    if dimension == 'mass':
+        return 1.0
+    if dimension == 'count':
+        return PIECE_GRAMS.get(name)
+    if dimension == 'clove':
+        return CLOVE_GRAMS
+    if dimension == 'volume':
+        return DENSITY.get(name)
+    return None
+
+
+def common_dimension(name, amounts):
+    """Dimension to merge an ingredient's {dimension: base quantity} into, or None if they do not convert.
+
+    The dimension holding the most of the ingredient by weight wins, so one
+    stray "2 pcs" does not turn a list of grams into pieces.
+    """
+    grams = {}
+    for dimension, amount in amounts.items():
+        factor = grams_per_unit(name, dimension)
+        if factor is None:
+            return None
+        grams[dimension] = amount * factor
+    return max(grams, key=grams.get)
+
+
+def merge_dimensions(totals):
+    """Fold {(name, dimension): [base quantity, category]} entries of one ingredient into one dimension"""
+    dimensions = {}
+    for name, dimension in totals:
+        dimensions.setdefault(name, []).append(dimension)
+    for name, present in dimensions.items():
+        if len(present) < 2:
+            continue
+        amounts = {dimension: totals[(name, dimension)][0] for dimension in present}
+        target = common_dimension(name, amounts)
+        if target is None:
+            continue
+        into = totals[(name, target)]
+        scale = grams_per_unit(name, target)
+        for dimension in present:
+            if dimension != target:
+                into[0] += totals.pop((name, dimension))[0] * grams_per_unit(name, dimension) / scale
+    return totals
+
+
+def entries(totals):
+    """Readable entries, sorted by category and name, for {(name, dimension): [base quantity, category]}"""
+    result = []
+    for (name, dimension), (total, category) in merge_dimensions(totals).items():
+        quantity, unit = format_quantity(total, dimension)
+        result.append({"name": name, "quantity": quantity, "unit": unit, "category": category})
+    result.sort(key=lambda entry: (entry["category"], entry["name"]))
+    return result
+
+
+def aggregate(items, scale=1.0):
+    """Merge raw items ([{"name", "quantity", "unit", "category"}], e.g. from several dishes) into entries.
+
+    Names are canonicalized, quantities multiplied by `scale` and converted to
+    base units; items without a positive quantity are dropped.
+    """
+    totals = {}
+    for item in items:
+        try:
+            key, factor = _resolve(item['name'], item.get('unit'))
+            amount = float(item['quantity']) * scale * factor
+        except (KeyError, TypeError, ValueError):
+            continue
+        if not key[0] or not amount > 0:
+            continue
+        total = totals.get(key)
+        if total is None:
+            totals[key] = [amount, str(item.get('category') or 'other').strip().lower()]
+        else:
+            total[0] += amount
+    return entries(totals)
+
+
+def parse_quantity(text):
+    """(quantity, rest of the text) for "2 1/2 cups", "1.5kg", "2-3 pcs"; None without a leading number"""
+    if not text.isascii():
+        for fraction, ascii_fraction in _FRACTIONS.items():
+            text = text.replace(fraction, f" {ascii_fraction}")
+    match = _QUANTITY.match(text)
+    if match is None:
+        return None
+    number = match.group(2) or match.group(1)
+    whole, _, fraction = number.rpartition(' ') if '/' in number else ('', '', number)
+    if '/' in fraction:
+        numerator, denominator = fraction.split('/')
+        value = (float(whole) if whole else 0.0) + float(numerator) / float(denominator or 1)
+    else:
+        value = float(fraction)
+    return value, match.group(3).strip()
+
+
+def _split_unit(text):
+    """(unit, rest) where unit is a known unit at the start of text, else (None, text)"""
+    words = text.split()
+    for size in (2, 1):
+        unit = ' '.join(words[:size]).lower().rstrip('.')
+        if len(words) >= size and unit in UNITS:
+            return unit, ' '.join(words[size:])
+    return None, text
+
+
+def parse_line(line, category='other'):
+    """{"name", "quantity", "unit", "category"} for one grocery line, or None if it has no quantity.
+
+    Reads "- Onions (2 kg)", "Onions: 2 kg", "2 kg onions" and "3 lemons".
+    """
+    match = _SIMPLE_LINE.match(line)
+    if match:
+        name, quantity, unit = match.groups()
+        return {"name": name, "quantity": float(quantity), "unit": unit or 'pcs', "category": category}
+    line = _BULLET.sub('', line).replace('**', '').strip()
+    if line.endswith(')') and '(' in line:
+        name, _, amount = line[:-1].rpartition('(')
+    elif ':' in line:
+        name, _, amount = line.partition(':')
+    else:
+        parsed = parse_quantity(line)
+        if parsed is None:
+            return None
+        quantity, rest = parsed
+        unit, name = _split_unit(rest)
+        if name.lower().startswith('of '):
+            name = name[3:]
+        return {"name": name.strip(), "quantity": quantity, "unit": unit or 'pcs', "category": category} \
+            if name.strip() else None
+    parsed = parse_quantity(amount)
+    if parsed is None or not name.strip():
+        return None
+    quantity, rest = parsed
+    unit, _ = _split_unit(rest)
+    return {"name": name.strip(), "quantity": quantity, "unit": unit or (rest.split()[0] if rest else 'pcs'),
+            "category": category}
+
+
+def parse_text(text):
+    """(items, lines without a quantity) from a grocery list in text form; headings set the category"""
+    items, unquantified, category = [], [], 'other'
+    for line in (text or '').splitlines():
+        line = line.strip()
+        if not line or line.startswith('```'):
+            continue
+        if line[-1] in ':*_' and line.rstrip('*_ ').endswith(':') and not any(ch.isdigit() for ch in line):
+            category = line.strip('#*_ ').rstrip(':').strip().lower() or category
+            continue
+        item = parse_line(line, category)
+        if item is None:
+            unquantified.append(_BULLET.sub('', line).strip())
+        else:
+            items.append(item)
+    return items, unquantified
+
+
+def grocery_list(entries, unquantified=()):
+    """GroceryList for aggregated entries"""
+    # Validating the plain dicts in pydantic-core is faster than model_construct() per item
+    return GroceryList.model_validate({"items": entries, "unquantified": list(unquantified)})
+
+
+def structure(text, categories=None):
+    """GroceryList for a grocery list in text form, with duplicates merged.
+
+    Lines under no heading take their category from `categories`
+    ({canonical name: category}) when given.
+    """
+    items, unquantified = parse_text(text)
+    if categories:
+        for item in items:
+            if item["category"] == 'other':
+                item["category"] = categories.get(canonical_name(item["name"]), 'other')
+    return grocery_list(aggregate(items), unquantified)
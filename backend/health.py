@@ -0,0 +1,65 @@
+"""Background health probe for LLM providers.
+
+Replaces the old import-time connection test: a daemon thread calls the
+provider's cheap check (e.g. models.list()) every few seconds and records the
+result, so worker boot never waits on the network and a provider that comes
+back is noticed without restarting the process.
+"""
+import threading
+import time
+import traceback
+
+
+class HealthProbe:
+    def __init__(self, name, check, interval=60.0, down_interval=10.0):
+        self.name = name
+        self.check = check
+        self.interval = interval
+        self.down_interval = down_interval
+        self._status = {"status": "unknown", "last_checked": None, "latency_ms": None, "error": None}
+        self._lock = threading.Lock()
+        self._thread = None
+        self._wake = threading.Event()
+
+    def start(self):
+        """Start the probe thread once per process (safe to call on every request)"""
+        if self._thread and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name=f"health-{self.name}", daemon=True)
+            self._thread.start()
+
+    def probe_now(self):
+        """Run one check in the caller's thread and return the new status"""
+        started = time.perf_counter()
+        try:
+            self.check()
+            status = {"status": "up", "error": None}
+        except Exception as e:
+            status = {"status": "down", "error": f"{type(e).__name__}: {e}"}
+        status["latency_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        status["last_checked"] = time.time()
+        with self._lock:
+            changed = self._status["status"] != status["status"]
+            self._status = status
+        if changed:
+            icon = "🔌" if status["status"] == "up" else "🔴"
+            print(f"{icon} {self.name} provider is {status['status']}"
+                  + (f": {status['error']}" if status["error"] else ""))
+        return status
+
+    def _run(self):
+        while True:
+            try:
+                status = self.probe_now()
+            except Exception:
+                traceback.print_exc()
+                status = {"status": "down"}
+            self._wake.wait(self.interval if status["status"] == "up" else self.down_interval)
+            self._wake.clear()
+
+    def status(self):
+        with self._lock:
+            return dict(self._status)
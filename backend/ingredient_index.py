@@ -0,0 +1,337 @@
+"""Local ingredient knowledge base and grocery scaling engine.
+
+Each known dish maps to its per-serving ingredients, stored in SQLite in base
+units (g, ml or a count) and loaded into memory at startup. Scaling a whole
+menu to a guest count is then a handful of dict additions instead of an LLM
+round-trip. Dishes the index does not know are looked up once through the LLM
+and written back (see build_ingredient_prompt / IngredientIndex.learn).
+
+Ingredient names go through grocery.canonical_name(), and one ingredient
+stored in two convertible units ("onion" in pcs and in g) is folded into one
+at load time, so the same ingredient merges across dishes.
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+from functools import lru_cache
+
+import numpy as np
+
+import grocery
+import menu_stream
+import prompts
+from grocery import BASE_UNITS, format_quantity, to_base
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_DB_PATH = os.path.join(BASE_DIR, 'data', 'ingredients.sqlite3')
+SEED_PATH = os.path.join(BASE_DIR, 'data', 'ingredients.json')
+
+# Guests sample every dish in a section, so n dishes share PORTION_OVERHEAD servings per guest
+PORTION_OVERHEAD = 1.25
+
+
+@lru_cache(maxsize=4096)
+def dish_key(name):
+    """Normalize a dish name for lookup ("Tiramisu: classic..." -> "tiramisu")"""
+    name = re.split(r':| - | – |\(', str(name), maxsplit=1)[0]
+    name = name.lower().replace('&', ' and ')
+    name = re.sub(r'[^a-z0-9 ]+', ' ', name)
+    return ' '.join(name.split())
+
+
+def section_servings(guest_count, dish_count):
+    """Servings of each dish in a section of dish_count dishes"""
+    return guest_count * min(1.0, PORTION_OVERHEAD / dish_count)
+
+
+def grocery_entries(items):
+    """Normalize an LLM-made grocery list ([{"name", "quantity", "unit", "category"}]) like scale() output.
+
+    Names are canonicalized and quantities converted to base units, so
+    duplicates merge before readable units are picked again; items without a
+    positive quantity are dropped.
+    """
+    return grocery.aggregate(items)
+
+
+def menu_dishes(menu):
+    """{section: [dish, ...]} for the list sections of a MenuModel-shaped dict"""
+    return {section: items for section, items in menu.items() if isinstance(items, list) and items}
+
+
+class IngredientIndex:
+    def __init__(self, path=DEFAULT_DB_PATH, seed_path=SEED_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS ingredients (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                dimension TEXT NOT NULL,
+                category TEXT NOT NULL,
+                UNIQUE (name, dimension)
+            );
+            CREATE TABLE IF NOT EXISTS dishes (
+                id INTEGER PRIMARY KEY,
+                key TEXT NOT NULL UNIQUE,
+                source TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS dish_ingredients (
+                dish_id INTEGER NOT NULL REFERENCES dishes (id),
+                ingredient_id INTEGER NOT NULL REFERENCES ingredients (id),
+                quantity REAL NOT NULL,
+                PRIMARY KEY (dish_id, ingredient_id)
+            );
+        """)
+        if not self._conn.execute("SELECT 1 FROM dishes LIMIT 1").fetchone() and os.path.exists(seed_path):
+            with open(seed_path) as f:
+                for dish, rows in json.load(f).items():
+                    self._insert_dish(dish, rows, 'seed')
+            self._conn.commit()
+        self._load()
+
+    def _load(self):
+        """Pull the whole index into memory: ingredient table plus dish -> ((ingredient_id, qty), ...).
+
+        Ingredients whose names now share a canonical name, or that are one
+        ingredient in two convertible dimensions, fold onto a single id
+        (self._alias maps every stored id to (id, factor)). Everything is built
+        locally and swapped in at the end, so readers never see a half-built index.
+        """
+        ingredients = {}
+        alias, first = {}, {}
+        for ingredient_id, name, dimension, category in self._conn.execute(
+                "SELECT id, name, dimension, category FROM ingredients ORDER BY id"):
+            key = (grocery.canonical_name(name), dimension)
+            target = first.setdefault(key, ingredient_id)
+            alias[ingredient_id] = (target, 1.0)
+            if target == ingredient_id:
+                ingredients[ingredient_id] = (key[0], dimension, category)
+        rows = [(key, ingredient_id, quantity) for key, ingredient_id, quantity in self._conn.execute("""
+            SELECT d.key, di.ingredient_id, di.quantity
+            FROM dish_ingredients di JOIN dishes d ON d.id = di.dish_id
+        """)]
+
+        usage, by_name = {}, {}
+        for _, ingredient_id, quantity in rows:
+            target = alias[ingredient_id][0]
+            usage[target] = usage.get(target, 0.0) + quantity
+        for ingredient_id, (name, dimension, _) in ingredients.items():
+            by_name.setdefault(name, {})[dimension] = ingredient_id
+        for name, ids in by_name.items():
+            if len(ids) < 2:
+                continue
+            target = grocery.common_dimension(name, {dimension: usage.get(i, 0.0) for dimension, i in ids.items()})
+            if target is None:
+                continue
+            into, scale = ids[target], grocery.grams_per_unit(name, target)
+            for dimension, ingredient_id in ids.items():
+                if ingredient_id == into:
+                    continue
+                factor = grocery.grams_per_unit(name, dimension) / scale
+                del ingredients[ingredient_id]
+                for stored, (current, current_factor) in alias.items():
+                    if current == ingredient_id:
+                        alias[stored] = (into, current_factor * factor)
+        categories = {name: category for name, _, category in ingredients.values()}
+
+        dishes = {}
+        for key, ingredient_id, quantity in rows:
+            target, factor = alias[ingredient_id]
+            dish = dishes.setdefault(key, {})
+            dish[target] = dish.get(target, 0.0) + quantity * factor
+        dishes = {key: tuple(dish.items()) for key, dish in dishes.items()}
+        self.ingredients, self.categories, self._alias, self.dishes, self._dense = (
+            ingredients, categories, alias, dishes, None)
+
+    def _dense_matrix(self):
+        """Dense (dishes x ingredients) per-serving matrix for batch scaling, built on first use.
+
+        Columns are ordered by (category, name) so non-zero entries come out
+        already sorted the way scale() sorts them.
+        """
+        dense = self._dense
+        if dense is None:
+            ingredients, dishes = self.ingredients, self.dishes
+            ingredient_ids = sorted(ingredients, key=lambda i: (ingredients[i][2], ingredients[i][0]))
+            columns = {ingredient_id: col for col, ingredient_id in enumerate(ingredient_ids)}
+            rows = {key: row for row, key in enumerate(dishes)}
+            matrix = np.zeros((len(rows), len(columns)))
+            for key, row in rows.items():
+                for ingredient_id, quantity in dishes[key]:
+                    matrix[row, columns[ingredient_id]] = quantity
+            dimensions = [ingredients[i][1] for i in ingredient_ids]
+            metric = np.array([d in ('mass', 'volume') for d in dimensions])
+            small_units = [BASE_UNITS.get(d, d) for d in dimensions]
+            large_units = ['kg' if d == 'mass' else 'l' if d == 'volume' else BASE_UNITS.get(d, d) for d in dimensions]
+            dense = self._dense = (matrix, rows, ingredient_ids, metric, small_units, large_units)
+        return dense
+
+    def _insert_dish(self, dish, rows, source):
+        """rows: [(name, quantity, unit, category), ...] per serving"""
+        key = dish_key(dish)
+        cursor = self._conn.execute(
+            "INSERT OR IGNORE INTO dishes (key, source) VALUES (?, ?)", (key, source)
+        )
+        if not cursor.rowcount:
+            return False
+        dish_id = cursor.lastrowid
+        for name, quantity, unit, category in rows:
+            base = to_base(quantity, unit)
+            if base is None:
+                continue
+            dimension, base_quantity = base
+            name = grocery.canonical_name(name)
+            self._conn.execute(
+                "INSERT OR IGNORE INTO ingredients (name, dimension, category) VALUES (?, ?, ?)",
+                (name, dimension, str(category or 'other').strip().lower())
+            )
+            ingredient_id = self._conn.execute(
+                "SELECT id FROM ingredients WHERE name = ? AND dimension = ?", (name, dimension)
+            ).fetchone()[0]
+            # Two rows of one dish can name the same ingredient ("onion", "yellow onion")
+            self._conn.execute(
+                "INSERT INTO dish_ingredients (dish_id, ingredient_id, quantity) VALUES (?, ?, ?) "
+                "ON CONFLICT (dish_id, ingredient_id) DO UPDATE SET quantity = quantity + excluded.quantity",
+                (dish_id, ingredient_id, base_quantity)
+            )
+        return True
+
+    def knows(self, dish):
+        return dish_key(dish) in self.dishes
+
+    def unknown_dishes(self, sections):
+        """Dishes (across all sections) with no entry in the index"""
+        return [dish for items in sections.values() for dish in items if not self.knows(dish)]
+
+    def add_dishes(self, dishes, source='llm'):
+        """Write new dishes ({dish: [(name, quantity, unit, category), ...]}) through to SQLite"""
+        with self._lock:
+            added = [dish for dish, rows in dishes.items() if self._insert_dish(dish, rows, source)]
+            self._conn.commit()
+            self._load()
+        return added
+
+    def learn(self, reply):
+        """Parse an LLM reply to build_ingredient_prompt and add the dishes it describes"""
+        try:
+            payload = menu_stream.extract_json(reply)
+        except ValueError:
+            return []
+        if not isinstance(payload, dict):
+            return []
+
+        dishes = {}
+        for dish, items in payload.items():
+            rows = []
+            for item in items if isinstance(items, list) else []:
+                try:
+                    rows.append((item['name'], float(item['quantity']), item['unit'], item.get('category')))
+                except (KeyError, TypeError, ValueError):
+                    continue
+            if rows:
+                dishes[dish] = rows
+        return self.add_dishes(dishes)
+
+    def scale(self, sections, guest_count):
+        """Aggregate every dish's ingredients for a guest count.
+
+        Returns [{"name", "quantity", "unit", "category"}] sorted by category
+        and name; dishes the index does not know are skipped.
+        """
+        return self.entries(self.totals(sections, guest_count))
+
+    def totals(self, sections, guest_count):
+        """{ingredient_id: base quantity} for a guest count; dishes the index does not know are skipped"""
+        totals = {}
+        for items in sections.values():
+            if items:
+                self.dish_totals(items, section_servings(guest_count, len(items)), totals)
+        return totals
+
+    def dish_totals(self, dishes, servings, totals=None):
+        """Add `servings` servings of each dish to totals ({ingredient_id: base quantity})"""
+        totals = {} if totals is None else totals
+        for dish in dishes:
+            for ingredient_id, quantity in self.dishes.get(dish_key(dish), ()):
+                totals[ingredient_id] = totals.get(ingredient_id, 0.0) + quantity * servings
+        return totals
+
+    def scale_batch(self, menus, guest_counts):
+        """Scale many menus at once.
+
+        Builds an (events x dishes) servings matrix and multiplies it by the
+        (dishes x ingredients) per-serving matrix in one NumPy operation.
+        Returns one entry list per menu, in the same shape as scale().
+        """
+        matrix, rows, ingredient_ids, metric, small_units, large_units = self._dense_matrix()
+        servings = np.zeros((len(menus), len(rows)))
+        for event, (sections, guest_count) in enumerate(zip(menus, guest_counts)):
+            for items in sections.values():
+                if not items:
+                    continue
+                share = section_servings(guest_count, len(items))
+                for dish in items:
+                    row = rows.get(dish_key(dish))
+                    if row is not None:
+                        servings[event, row] += share
+
+        quantities = servings @ matrix
+
+        # Same unit choice as format_quantity(), for every cell at once
+        large = metric & (quantities >= 1000)
+        display = np.where(metric, np.maximum(1, np.rint(quantities)), np.ceil(quantities - 1e-9))
+
+        results = [[] for _ in menus]
+        events, cols = np.nonzero(quantities)
+        for event, col, quantity, value, is_large in zip(
+            events.tolist(), cols.tolist(), quantities[events, cols].tolist(), display[events, cols].tolist(),
+            large[events, cols].tolist()
+        ):
+            name, _, category = self.ingredients[ingredient_ids[col]]
+            results[event].append({
+                "name": name,
+                # np.round() rounds half to even on the scaled value (1850 g -> 1.8 kg); match round()
+                "quantity": round(quantity / 1000, 1) if is_large else int(value),
+                "unit": large_units[col] if is_large else small_units[col],
+                "category": category,
+            })
+        return results
+
+    def fold(self, totals):
+        """Totals stored under ids that have since been folded into another, moved onto the current ids"""
+        folded = {}
+        for ingredient_id, total in totals.items():
+            target, factor = self._alias.get(ingredient_id, (ingredient_id, 1.0))
+            folded[target] = folded.get(target, 0.0) + total * factor
+        return folded
+
+    def entries(self, totals):
+        """Readable entries, sorted by category and name, for {ingredient_id: base quantity} totals"""
+        entries = []
+        for ingredient_id, total in self.fold(totals).items():
+            name, dimension, category = self.ingredients[ingredient_id]
+            quantity, unit = format_quantity(total, dimension)
+            entries.append({"name": name, "quantity": quantity, "unit": unit, "category": category})
+        entries.sort(key=lambda entry: (entry["category"], entry["name"]))
+        return entries
+
+
+def build_ingredient_prompt(dishes):
+    """Ask the LLM for per-serving ingredients of dishes the index does not know"""
+    return prompts.ingredient_prompt(dishes)
+
+
+def render_grocery_text(entries):
+    """Render scaled entries in the "- Item (quantity)" format the frontend expects"""
+    return "\n".join(
+        f"- {entry['name'].title()} ({entry['quantity']} {entry['unit']})" for entry in entries
+    )
+
+
+def create_index():
+    return IngredientIndex(os.getenv('INGREDIENT_DB_PATH', DEFAULT_DB_PATH))
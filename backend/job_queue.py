@@ -0,0 +1,357 @@
+"""Durable background job queue for plan requests.
+
+Jobs live in a SQLite table, so they survive restarts and every worker process
+on the host drains the same queue (claims use BEGIN IMMEDIATE, so a job runs
+once). Features:
+
+- priorities: higher first, then oldest first (paid events jump the line)
+- deduplication: submitting a spec identical to a queued or running job
+  returns that job instead of queueing another
+- bounded backlog: submit() raises QueueFullError once too many jobs wait,
+  so callers can shed load with 503 + Retry-After
+- completion webhooks: every registered callback URL gets the finished job
+  POSTed to it, with a few retries, from a pool of callback threads so a
+  slow or failing endpoint never holds up a job worker. A callback host must
+  resolve to public addresses only (no loopback, private or link-local
+  targets, checked again before every delivery, redirects not followed),
+  unless the operator lists the hosts allowed in JOB_CALLBACK_ALLOWED_HOSTS
+- leases: a job left "running" by a crashed worker is requeued after
+  JOB_LEASE_SECONDS
+
+Configured with JOB_DB_PATH, JOB_WORKERS, JOB_MAX_BACKLOG, JOB_LEASE_SECONDS,
+JOB_RETENTION_SECONDS, JOB_CALLBACK_RETRIES, JOB_CALLBACK_WORKERS and
+JOB_CALLBACK_ALLOWED_HOSTS (comma-separated host names).
+"""
+import ipaddress
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+POLL_INTERVAL = 1.0
+CALLBACK_TIMEOUT = 10
+
+
+class QueueFullError(Exception):
+    """Raised by submit() when the backlog is at its limit"""
+
+
+def callback_url_error(url, allowed_hosts=()):
+    """Why the server must not POST to this callback URL; None if it may.
+
+    With allowed_hosts, only those host names are accepted (and trusted
+    wherever they point); otherwise every address the host resolves to must
+    be a public one.
+    """
+    if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+        return "must be an http(s) URL"
+    try:
+        parts = urlsplit(url)
+        host, port = parts.hostname, parts.port or (443 if parts.scheme == 'https' else 80)
+    except ValueError:
+        return "is not a valid URL"
+    if not host:
+        return "has no host"
+    if allowed_hosts:
+        return None if host.lower() in allowed_hosts else "host is not an allowed callback host"
+    try:
+        addresses = {info[4][0] for info in socket.getaddrinfo(host, port, proto=socket.IPPROTO_TCP)}
+    except (OSError, UnicodeError):
+        return "host does not resolve"
+    for address in addresses:
+        if not ipaddress.ip_address(address.split('%')[0]).is_global:
+            return "host resolves to a private, loopback or link-local address"
+    return None
+
+
+class JobQueue:
+    def __init__(self, path, handler, workers=4, max_backlog=100, lease_seconds=300,
+                 retention_seconds=86400, callback_retries=3, callback_workers=2, callback_hosts=()):
+        self.path = path
+        self.handler = handler
+        self.worker_count = workers
+        self.max_backlog = max_backlog
+        self.lease_seconds = lease_seconds
+        self.retention_seconds = retention_seconds
+        self.callback_retries = callback_retries
+        self.callback_hosts = {host.lower() for host in callback_hosts}
+        self.stats = {"submitted": 0, "deduplicated": 0, "shed": 0, "completed": 0, "failed": 0,
+                      "callbacks_sent": 0, "callbacks_failed": 0}
+        self._stats_lock = threading.Lock()
+        self._wake = threading.Condition()
+        self._threads = []
+        self._start_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._local = threading.local()
+        self._callbacks = ThreadPoolExecutor(max_workers=callback_workers, thread_name_prefix="job-callback")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    dedupe_key TEXT,
+                    payload TEXT NOT NULL,
+                    priority INTEGER NOT NULL DEFAULT 0,
+                    status TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    created_at REAL NOT NULL,
+                    started_at REAL,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority DESC, created_at);
+                CREATE INDEX IF NOT EXISTS jobs_dedupe ON jobs (dedupe_key, status);
+                CREATE TABLE IF NOT EXISTS job_callbacks (
+                    job_id TEXT NOT NULL,
+                    url TEXT NOT NULL,
+                    PRIMARY KEY (job_id, url)
+                );
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._stats_lock:
+            self.stats[name] += 1
+
+    def start(self):
+        """Start the worker threads once per process (safe to call on every request)"""
+        if self._threads:
+            return
+        with self._start_lock:
+            if self._threads:
+                return
+            for index in range(self.worker_count):
+                thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, payload, priority=0, dedupe_key=None, callback_url=None):
+        """Queue a job; returns (job, created). Raises QueueFullError when the backlog is full"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            job = None
+            if dedupe_key:
+                job = conn.execute(
+                    "SELECT * FROM jobs WHERE dedupe_key = ? AND status IN ('queued', 'running') LIMIT 1",
+                    (dedupe_key,)
+                ).fetchone()
+            if job is None:
+                backlog = conn.execute("SELECT COUNT(*) FROM jobs WHERE status = 'queued'").fetchone()[0]
+                if backlog >= self.max_backlog:
+                    conn.execute("ROLLBACK")
+                    self._count("shed")
+                    raise QueueFullError(f"Job backlog is full ({backlog} queued)")
+                job_id = uuid.uuid4().hex
+                conn.execute(
+                    "INSERT INTO jobs (id, dedupe_key, payload, priority, status, created_at) "
+                    "VALUES (?, ?, ?, ?, 'queued', ?)",
+                    (job_id, dedupe_key, json.dumps(payload), int(priority), time.time())
+                )
+                created = True
+            else:
+                job_id = job["id"]
+                created = False
+            if callback_url:
+                conn.execute("INSERT OR IGNORE INTO job_callbacks (job_id, url) VALUES (?, ?)",
+                             (job_id, callback_url))
+            conn.execute("COMMIT")
+        except QueueFullError:
+            raise
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._count("submitted" if created else "deduplicated")
+        if created:
+            with self._wake:
+                self._wake.notify()
+        return self.get(job_id), created
+
+    def callback_url_error(self, url):
+        return callback_url_error(url, self.callback_hosts)
+
+    def add_callback(self, job_id, url):
+        """Register a webhook; delivered right away if the job already finished. None for an unknown job"""
+        if self.get(job_id) is None:
+            return None
+        conn = self._connect()
+        conn.execute("INSERT OR IGNORE INTO job_callbacks (job_id, url) VALUES (?, ?)", (job_id, url))
+        job = self.get(job_id)
+        if job and job["status"] in ('done', 'failed'):
+            self._callbacks.submit(self._deliver, job, url)
+        return job
+
+    def get(self, job_id):
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def position(self, job):
+        """Jobs that will run before this queued job"""
+        return self._connect().execute(
+            "SELECT COUNT(*) FROM jobs WHERE status = 'queued' AND "
+            "(priority > ? OR (priority = ? AND created_at < ?))",
+            (job["priority"], job["priority"], job["created_at"])
+        ).fetchone()[0]
+
+    @staticmethod
+    def _to_dict(row):
+        job = {
+            "id": row["id"],
+            "status": row["status"],
+            "priority": row["priority"],
+            "created_at": row["created_at"],
+            "started_at": row["started_at"],
+            "finished_at": row["finished_at"],
+        }
+        if row["result"] is not None:
+            job["result"] = json.loads(row["result"])
+        if row["error"] is not None:
+            job["error"] = row["error"]
+        return job
+
+    def _claim(self):
+        """Atomically move the best queued job to running; None if the queue is empty"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            now = time.time()
+            # Requeue jobs whose worker died mid-run
+            conn.execute("UPDATE jobs SET status = 'queued', started_at = NULL "
+                         "WHERE status = 'running' AND started_at < ?", (now - self.lease_seconds,))
+            row = conn.execute(
+                "UPDATE jobs SET status = 'running', started_at = ? WHERE id = ("
+                "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+                ") RETURNING *", (now,)
+            ).fetchone()
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        return row
+
+    def _finish(self, job_id, status, result=None, error=None):
+        conn = self._connect()
+        conn.execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ?",
+            (status, json.dumps(result) if result is not None else None, error, time.time(), job_id)
+        )
+        self._count("completed" if status == 'done' else "failed")
+        job = self.get(job_id)
+        for row in conn.execute("SELECT url FROM job_callbacks WHERE job_id = ?", (job_id,)).fetchall():
+            self._callbacks.submit(self._deliver, job, row["url"])
+
+    def _deliver(self, job, url):
+        """POST the finished job to one webhook, with backoff between retries (runs on a callback thread)"""
+        for attempt in range(self.callback_retries):
+            # Checked again here: the host may resolve elsewhere than when it was registered
+            error = self.callback_url_error(url)
+            if error:
+                print(f"⚠️ Job callback to {url} refused: {error}")
+                break
+            try:
+                response = requests.post(url, json={"job": job}, timeout=CALLBACK_TIMEOUT, allow_redirects=False)
+                if response.status_code < 500:
+                    self._count("callbacks_sent")
+                    return
+            except requests.RequestException as e:
+                print(f"⚠️ Job callback to {url} failed: {e}")
+            if attempt + 1 == self.callback_retries or self._stopping.wait(2 ** attempt):
+                break
+        self._count("callbacks_failed")
+
+    def _purge(self):
+        self._connect().execute(
+            "DELETE FROM jobs WHERE status IN ('done', 'failed') AND finished_at < ?",
+            (time.time() - self.retention_seconds,)
+        )
+        self._connect().execute("DELETE FROM job_callbacks WHERE job_id NOT IN (SELECT id FROM jobs)")
+
+    def stop(self, timeout=30):
+        """Stop claiming jobs and wait for the running ones; returns how many are still running.
+
+        A job still running when the process exits keeps its lease and is
+        requeued by another worker once the lease expires.
+        """
+        self._stopping.set()
+        with self._wake:
+            self._wake.notify_all()
+        deadline = time.monotonic() + timeout
+        for thread in self._threads:
+            thread.join(max(0.0, deadline - time.monotonic()))
+        # Webhooks already handed off are still attempted once each; backoff waits end now
+        self._callbacks.shutdown(wait=False)
+        return sum(thread.is_alive() for thread in self._threads)
+
+    def _work(self):
+        last_purge = 0.0
+        while not self._stopping.is_set():
+            try:
+                row = self._claim()
+            except Exception:
+                traceback.print_exc()
+                row = None
+            if row is None:
+                if self._threads and threading.current_thread() is self._threads[0] \
+                        and time.time() - last_purge > 60:
+                    self._purge()
+                    last_purge = time.time()
+                # Other processes may enqueue too, so wake up periodically as well
+                with self._wake:
+                    if not self._stopping.is_set():
+                        self._wake.wait(POLL_INTERVAL)
+                continue
+            try:
+                result, error = self.handler(json.loads(row["payload"])), None
+                if isinstance(result, dict) and result.get("status") == "error":
+                    result, error = None, result.get("message", "Job failed")
+            except Exception as e:
+                traceback.print_exc()
+                result, error = None, f"{type(e).__name__}: {e}"
+            try:
+                self._finish(row["id"], 'done' if error is None else 'failed', result, error)
+            except Exception:
+                traceback.print_exc()
+
+    def snapshot(self):
+        counts = dict(self._connect().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall())
+        with self._stats_lock:
+            stats = dict(self.stats)
+        stats.update({status: counts.get(status, 0) for status in ('queued', 'running', 'done', 'failed')})
+        stats["workers"] = len(self._threads)
+        stats["max_backlog"] = self.max_backlog
+        return stats
+
+
+def create_queue(handler):
+    """Build the job queue from environment settings"""
+    return JobQueue(
+        os.getenv('JOB_DB_PATH', os.path.join(BASE_DIR, 'cache', 'jobs.sqlite3')),
+        handler,
+        workers=int(os.getenv('JOB_WORKERS', 4)),
+        max_backlog=int(os.getenv('JOB_MAX_BACKLOG', 100)),
+        lease_seconds=float(os.getenv('JOB_LEASE_SECONDS', 300)),
+        retention_seconds=float(os.getenv('JOB_RETENTION_SECONDS', 86400)),
+        callback_retries=int(os.getenv('JOB_CALLBACK_RETRIES', 3)),
+        callback_workers=int(os.getenv('JOB_CALLBACK_WORKERS', 2)),
+        callback_hosts=[host.strip() for host in os.getenv('JOB_CALLBACK_ALLOWED_HOSTS', '').split(',')
+                        if host.strip()],
+    )
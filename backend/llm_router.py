@@ -0,0 +1,587 @@
+"""Route LLM calls across providers by observed latency, with hedged requests.
+
+Every configured provider (OpenRouter, direct DeepSeek, GitHub Copilot) is a
+Route on top of llm_transport's shared limiter and circuit breaker. The router
+keeps a rolling window of latencies per route and call kind ("menu",
+"grocery", ...) plus a rolling error rate, and sends each call to the fastest
+healthy route. If that call has not finished after the route's p95 for the
+kind, a hedged duplicate goes to the next route; the first answer wins and the
+loser's stream is closed so the provider stops generating.
+
+Calls are made with stream=True so a cancelled attempt can be abandoned
+mid-generation instead of running to completion in the background.
+Replies go through menu_stream rather than the SDK's strict parser, so
+reasoning preambles and code fences neither fail structured calls nor reach
+users in text ones.
+
+Each provider also gets a "<provider>-fast" route on its fast non-reasoning
+model (DEEPSEEK_FAST_MODEL, ...; empty disables it). Calls made for an event
+go to the tier model_tiers picks from the event's complexity; a fast call that
+fails, or whose structured reply does not parse or leaves a field empty, is
+escalated to the reasoning routes. Calls without an event stay on the reasoning routes.
+
+Structured calls send the Pydantic model's JSON schema as a json_schema
+response_format to providers listed in LLM_STRUCTURED_OUTPUT_PROVIDERS. Other
+providers (the direct DeepSeek API only has JSON mode) get
+{"type": "json_object"}, with the schema in a system message instead.
+"""
+import asyncio
+import contextvars
+import json
+import math
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import llm_transport
+import menu_stream
+import metrics
+import model_tiers
+from model_tiers import FAST, REASONING
+
+# name -> (base URL env var, default base URL, API key env var, model env var, default model,
+#          fast model env var, default fast model)
+PROVIDERS = {
+    "openrouter": ('OPENROUTER_BASE_URL', "https://openrouter.ai/api/v1",
+                   'DEEPSEEK_API_KEY', 'DEEPSEEK_MODEL', "deepseek/deepseek-r1-0528:free",
+                   'DEEPSEEK_FAST_MODEL', "deepseek/deepseek-chat-v3-0324:free"),
+    "deepseek": ('DEEPSEEK_DIRECT_BASE_URL', "https://api.deepseek.com",
+                 'DEEPSEEK_DIRECT_API_KEY', 'DEEPSEEK_DIRECT_MODEL', "deepseek-reasoner",
+                 'DEEPSEEK_DIRECT_FAST_MODEL', "deepseek-chat"),
+    "copilot": ('COPILOT_BASE_URL', "https://api.githubcopilot.com",
+                'GITHUB_TOKEN', 'COPILOT_MODEL', "gpt-4",
+                'COPILOT_FAST_MODEL', "gpt-4o-mini"),
+}
+
+ROUTER_PROVIDERS = "openrouter,deepseek,copilot"
+LATENCY_WINDOW = int(os.getenv('LLM_ROUTER_WINDOW', 100))
+ERROR_WINDOW = int(os.getenv('LLM_ROUTER_ERROR_WINDOW', 20))
+MAX_ERROR_RATE = float(os.getenv('LLM_ROUTER_MAX_ERROR_RATE', 0.5))
+HEDGE_PERCENTILE = float(os.getenv('LLM_HEDGE_PERCENTILE', 95))
+HEDGE_MIN_SAMPLES = int(os.getenv('LLM_HEDGE_MIN_SAMPLES', 5))
+HEDGE_DEFAULT_DELAY = float(os.getenv('LLM_HEDGE_DEFAULT_DELAY', 10))  # seconds, before enough samples
+HEDGE_MIN_DELAY = float(os.getenv('LLM_HEDGE_MIN_DELAY', 0.5))
+HEDGE_ENABLED = os.getenv('LLM_HEDGE', '1') not in ('0', 'false', 'no')
+# Providers that accept a json_schema response_format; the rest get JSON mode
+STRUCTURED_OUTPUT_PROVIDERS = os.getenv('LLM_STRUCTURED_OUTPUT_PROVIDERS', "openrouter,copilot")
+SCHEMA_INSTRUCTION = "Reply with only a JSON object that matches this JSON schema:"
+# Ask streaming providers for a final usage chunk so token counters work
+STREAM_OPTIONS = {"include_usage": True}
+
+LLM_CALL_SECONDS = metrics.histogram("llm_call_duration_seconds", "LLM call latency per route",
+                                     ("provider", "tier", "kind", "outcome"))
+
+
+def json_schema_format(model):
+    """The json_schema response_format request field for a Pydantic model"""
+    return {"type": "json_schema", "json_schema": {"name": model.__name__, "schema": model.model_json_schema()}}
+
+
+def structured_request(messages, model, structured=True):
+    """(messages, response_format) asking for a reply that parses as `model`.
+
+    Without structured outputs the provider gets JSON mode, and the schema
+    goes in a leading system message so the model still sees the fields.
+    """
+    if structured:
+        return messages, json_schema_format(model)
+    instruction = f"{SCHEMA_INSTRUCTION}\n{json.dumps(model.model_json_schema(), separators=(',', ':'))}"
+    return [{"role": "system", "content": instruction}, *messages], {"type": "json_object"}
+
+
+class NoProviderError(RuntimeError):
+    """Raised when no LLM provider is configured"""
+
+
+class AttemptCancelled(Exception):
+    """The other attempt of a hedged call won"""
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(math.ceil(pct / 100 * len(ordered))) - 1)
+    return ordered[max(index, 0)]
+
+
+def usage_tokens(usage):
+    return getattr(usage, "total_tokens", None) or 0
+
+
+class Route:
+    """One provider/model pair with lazily built clients and rolling stats.
+
+    Routes of one provider (its reasoning and fast models) share the
+    provider's transport: limiter, circuit breaker and counters.
+    """
+
+    def __init__(self, name, base_url, api_key, model, tier=REASONING, provider=None, structured=True):
+        self.name = name
+        self.provider = provider or name
+        self.structured = structured
+        self.base_url = base_url
+        self.api_key = api_key
+        self.model = model
+        self.tier = tier
+        self.latencies = {}
+        self.tokens = {}
+        self.outcomes = deque(maxlen=ERROR_WINDOW)
+        self.counters = {"calls": 0, "errors": 0, "cancelled": 0, "hedges": 0, "hedge_wins": 0}
+        self._client = None
+        self._async_client = None
+        self._lock = threading.Lock()
+
+    def client(self):
+        with self._lock:
+            if self._client is None:
+                self._client = llm_transport.create_client(self.provider, self.base_url, self.api_key)
+            return self._client
+
+    def async_client(self):
+        with self._lock:
+            if self._async_client is None:
+                self._async_client = llm_transport.create_async_client(self.provider, self.base_url, self.api_key)
+            return self._async_client
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    def structured_request(self, messages, model):
+        """(messages, response_format) for a `model` reply, in the form this route's provider supports"""
+        return structured_request(messages, model, self.structured)
+
+    def record_success(self, kind, seconds, tokens=None):
+        LLM_CALL_SECONDS.observe(seconds, provider=self.provider, tier=self.tier, kind=kind, outcome="ok")
+        metrics.record_model(self.provider, self.model)
+        with self._lock:
+            self.latencies.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+            if tokens:
+                self.tokens.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(tokens)
+            self.outcomes.append(True)
+            self.counters["calls"] += 1
+
+    def record_cancelled(self, kind, seconds):
+        """A hedge loser is at least this slow; keep it as a latency sample so it ranks fairly"""
+        LLM_CALL_SECONDS.observe(seconds, provider=self.provider, tier=self.tier, kind=kind, outcome="cancelled")
+        with self._lock:
+            self.latencies.setdefault(kind, deque(maxlen=LATENCY_WINDOW)).append(seconds)
+            self.counters["cancelled"] += 1
+
+    def record_error(self, kind, seconds):
+        LLM_CALL_SECONDS.observe(seconds, provider=self.provider, tier=self.tier, kind=kind, outcome="error")
+        with self._lock:
+            self.outcomes.append(False)
+            self.counters["calls"] += 1
+            self.counters["errors"] += 1
+
+    @contextmanager
+    def track(self, kind):
+        """Record latency and outcome of a call made directly on this route's client.
+
+        Yields a TrackedCall; a streaming caller sets its tokens from the usage chunk.
+        """
+        started = time.perf_counter()
+        call = TrackedCall()
+        try:
+            with metrics.stage("llm_network"):
+                yield call
+        except Exception:
+            self.record_error(kind, time.perf_counter() - started)
+            raise
+        self.record_success(kind, time.perf_counter() - started, call.tokens)
+
+    def latency(self, kind, pct):
+        """Latency percentile for a call kind; None until there are samples"""
+        with self._lock:
+            samples = list(self.latencies.get(kind, ()))
+        return percentile(samples, pct) if samples else None
+
+    def tokens_per_call(self, kind):
+        """Mean tokens (prompt + completion) of a call kind; None until there are samples"""
+        with self._lock:
+            samples = list(self.tokens.get(kind, ()))
+        return sum(samples) / len(samples) if samples else None
+
+    def error_rate(self):
+        with self._lock:
+            outcomes = list(self.outcomes)
+        return outcomes.count(False) / len(outcomes) if outcomes else 0.0
+
+    def healthy(self):
+        circuit = llm_transport.get_provider(self.provider).breaker.state
+        return circuit != "open" and self.error_rate() < MAX_ERROR_RATE
+
+    def hedge_delay(self, kind):
+        """Seconds to wait for this route before hedging to the next one"""
+        with self._lock:
+            samples = list(self.latencies.get(kind, ()))
+        if len(samples) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        return max(HEDGE_MIN_DELAY, percentile(samples, HEDGE_PERCENTILE))
+
+    def stats(self):
+        with self._lock:
+            kinds = {kind: list(samples) for kind, samples in self.latencies.items()}
+            counters = dict(self.counters)
+        return {
+            "model": self.model,
+            "tier": self.tier,
+            "healthy": self.healthy(),
+            "error_rate": round(self.error_rate(), 3),
+            "latency": {
+                kind: {"samples": len(samples),
+                       "p50_s": round(percentile(samples, 50), 3),
+                       "p95_s": round(percentile(samples, 95), 3)}
+                for kind, samples in kinds.items() if samples
+            },
+            **counters,
+        }
+
+
+class TrackedCall:
+    """Tokens of a call made under Route.track(); None when the provider sent no usage"""
+
+    def __init__(self):
+        self.tokens = None
+
+    def record_usage(self, route, usage):
+        metrics.record_usage(route.provider, route.model, usage)
+        self.tokens = usage_tokens(usage)
+
+
+class Attempt:
+    """One in-flight call of a (possibly hedged) request; cancel() closes its stream"""
+
+    def __init__(self, route, hedge=False):
+        self.route = route
+        self.hedge = hedge
+        self.cancelled = threading.Event()
+        self.stream = None
+
+    def attach(self, stream):
+        self.stream = stream
+        if self.cancelled.is_set():
+            stream.close()
+            raise AttemptCancelled()
+
+    def check(self):
+        if self.cancelled.is_set():
+            raise AttemptCancelled()
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.stream is not None:
+            try:
+                self.stream.close()
+            except Exception:
+                pass
+
+
+class Router:
+    def __init__(self, routes, hedge=HEDGE_ENABLED, policy=None):
+        self.routes = {route.name: route for route in routes}
+        self.hedge = hedge
+        self.policy = policy
+        if policy is not None:
+            policy.measure = self.tier_costs
+        # Each sync call uses at most two workers at a time (primary + hedge/failover)
+        self._pool = ThreadPoolExecutor(max_workers=llm_transport.POOL_SIZE * 2,
+                                        thread_name_prefix="llm-router")
+
+    def tier_routes(self, tier):
+        """Routes of a tier; the reasoning routes when no provider has a model for it"""
+        routes = [route for route in self.routes.values() if route.tier == tier]
+        if routes or tier == REASONING:
+            return routes
+        return self.tier_routes(REASONING)
+
+    def ranked(self, kind, tier=REASONING):
+        """Healthy routes of a tier first, fastest median first; unmeasured routes get explored early"""
+        order = self.tier_routes(tier)
+
+        def score(route):
+            median = route.latency(kind, 50)
+            return (not route.healthy(), median if median is not None else 0.0, order.index(route))
+
+        return sorted(order, key=score)
+
+    def primary(self, kind, tier=REASONING):
+        """Best route for calls the router cannot hedge (e.g. streamed to the browser)"""
+        ranked = self.ranked(kind, tier)
+        if not ranked:
+            raise NoProviderError("No LLM provider configured")
+        return ranked[0]
+
+    @staticmethod
+    def _request(route, messages, response_format, kwargs):
+        if response_format is not None:
+            messages, response_format = route.structured_request(messages, response_format)
+            kwargs = {**kwargs, "response_format": response_format}
+        return dict(model=route.model, messages=messages, stream_options=STREAM_OPTIONS, **kwargs)
+
+    def _call(self, attempt, kind, messages, response_format, kwargs):
+        route = attempt.route
+        started = time.perf_counter()
+        try:
+            request = self._request(route, messages, response_format, kwargs)
+            with metrics.stage("llm_network"):
+                stream = route.client().chat.completions.create(stream=True, **request)
+                attempt.attach(stream)
+                parts = []
+                tokens = 0
+                with stream:
+                    for chunk in stream:
+                        attempt.check()
+                        if chunk.usage:
+                            metrics.record_usage(route.provider, route.model, chunk.usage)
+                            tokens = usage_tokens(chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+            result = "".join(parts)
+            with metrics.stage("parse"):
+                if response_format is not None:
+                    result = menu_stream.parse_reply(result, response_format)
+                    if route.tier == FAST:
+                        # A partial reply is accepted from the reasoning tier, escalated from the fast one
+                        menu_stream.require_complete(result)
+                else:
+                    result = menu_stream.strip_reasoning(result)
+        except Exception:
+            if attempt.cancelled.is_set():
+                route.record_cancelled(kind, time.perf_counter() - started)
+                raise AttemptCancelled()
+            route.record_error(kind, time.perf_counter() - started)
+            raise
+        route.record_success(kind, time.perf_counter() - started, tokens)
+        return result
+
+    def choose_tier(self, kind, event, explore=True):
+        """(tier, complexity score) for a call made for an event; (REASONING, None) when tiers are off"""
+        if self.policy is None or event is None or not any(route.tier == FAST for route in self.routes.values()):
+            return REASONING, None
+        score = model_tiers.complexity(event)
+        return self.policy.choose(kind, score, explore), score
+
+    def record_parse(self, kind, score, tier, parsed):
+        """Feed a structured reply's outcome back to the tier policy"""
+        if self.policy is not None and score is not None:
+            self.policy.record(kind, score, tier, parsed)
+
+    def escalate(self, kind, score, error):
+        """Log and count a fast-tier failure that is retried on the reasoning tier"""
+        if isinstance(error, ValueError):
+            self.record_parse(kind, score, FAST, False)
+        self.policy.escalated()
+        print(f"⤴️ Fast model failed a {kind} call (complexity {score}): {error}; retrying on the reasoning model")
+
+    def complete(self, messages, response_format=None, kind="text", event=None, **kwargs):
+        """Run a chat completion on the fastest healthy route, hedging after its p95.
+
+        With an event, the call goes to the tier its complexity calls for, and a
+        failed fast call is retried on the reasoning tier. Returns the reply
+        text, or the parsed model when response_format is a Pydantic class.
+        Raises the last provider error if every route failed.
+        """
+        tier, score = self.choose_tier(kind, event)
+        if tier == FAST:
+            try:
+                result = self._complete(messages, response_format, kind, FAST, kwargs)
+            except NoProviderError:
+                raise
+            except Exception as e:
+                self.escalate(kind, score, e)
+            else:
+                self.record_parse(kind, score, FAST, True)
+                return result
+        try:
+            result = self._complete(messages, response_format, kind, REASONING, kwargs)
+        except ValueError:
+            self.record_parse(kind, score, REASONING, False)
+            raise
+        self.record_parse(kind, score, REASONING, True)
+        return result
+
+    def _complete(self, messages, response_format, kind, tier, kwargs):
+        candidates = self.ranked(kind, tier)
+        if not candidates:
+            raise NoProviderError("No LLM provider configured")
+
+        attempts = {}
+
+        def launch(hedge=False):
+            attempt = Attempt(candidates.pop(0), hedge)
+            # Run in a copy of the caller's context so stage timings nest under its request
+            future = self._pool.submit(contextvars.copy_context().run,
+                                       self._call, attempt, kind, messages, response_format, kwargs)
+            attempts[future] = attempt
+
+        launch()
+        hedge_at = time.monotonic() + attempts[next(iter(attempts))].route.hedge_delay(kind)
+        last_error = None
+        try:
+            while attempts:
+                can_hedge = self.hedge and candidates and hedge_at is not None
+                timeout = max(0.0, hedge_at - time.monotonic()) if can_hedge else None
+                done, _ = wait(attempts, timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    candidates[0].count("hedges")
+                    launch(hedge=True)
+                    hedge_at = None
+                    continue
+                for future in done:
+                    attempt = attempts.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        last_error = e
+                        if candidates and not attempts:
+                            launch()
+                        continue
+                    if attempt.hedge:
+                        attempt.route.count("hedge_wins")
+                    return result
+            raise last_error
+        finally:
+            for attempt in attempts.values():
+                attempt.cancel()
+
+    async def _acall(self, route, kind, messages, response_format, kwargs):
+        started = time.perf_counter()
+        try:
+            request = self._request(route, messages, response_format, kwargs)
+            with metrics.stage("llm_network"):
+                parts = []
+                tokens = 0
+                stream = await route.async_client().chat.completions.create(stream=True, **request)
+                async with stream:
+                    async for chunk in stream:
+                        if chunk.usage:
+                            metrics.record_usage(route.provider, route.model, chunk.usage)
+                            tokens = usage_tokens(chunk.usage)
+                        if chunk.choices and chunk.choices[0].delta.content:
+                            parts.append(chunk.choices[0].delta.content)
+            result = "".join(parts)
+            with metrics.stage("parse"):
+                if response_format is not None:
+                    result = menu_stream.parse_reply(result, response_format)
+                    if route.tier == FAST:
+                        # A partial reply is accepted from the reasoning tier, escalated from the fast one
+                        menu_stream.require_complete(result)
+                else:
+                    result = menu_stream.strip_reasoning(result)
+        except asyncio.CancelledError:
+            route.record_cancelled(kind, time.perf_counter() - started)
+            raise
+        except Exception:
+            route.record_error(kind, time.perf_counter() - started)
+            raise
+        route.record_success(kind, time.perf_counter() - started, tokens)
+        return result
+
+    async def acomplete(self, messages, response_format=None, kind="text", event=None, **kwargs):
+        """Async complete(); the losing attempt's task is cancelled"""
+        tier, score = self.choose_tier(kind, event)
+        if tier == FAST:
+            try:
+                result = await self._acomplete(messages, response_format, kind, FAST, kwargs)
+            except NoProviderError:
+                raise
+            except Exception as e:
+                self.escalate(kind, score, e)
+            else:
+                self.record_parse(kind, score, FAST, True)
+                return result
+        try:
+            result = await self._acomplete(messages, response_format, kind, REASONING, kwargs)
+        except ValueError:
+            self.record_parse(kind, score, REASONING, False)
+            raise
+        self.record_parse(kind, score, REASONING, True)
+        return result
+
+    async def _acomplete(self, messages, response_format, kind, tier, kwargs):
+        candidates = self.ranked(kind, tier)
+        if not candidates:
+            raise NoProviderError("No LLM provider configured")
+
+        attempts = {}
+
+        def launch(hedge=False):
+            route = candidates.pop(0)
+            task = asyncio.create_task(self._acall(route, kind, messages, response_format, kwargs))
+            attempts[task] = (route, hedge)
+
+        launch()
+        hedge_at = time.monotonic() + attempts[next(iter(attempts))][0].hedge_delay(kind)
+        last_error = None
+        try:
+            while attempts:
+                can_hedge = self.hedge and candidates and hedge_at is not None
+                timeout = max(0.0, hedge_at - time.monotonic()) if can_hedge else None
+                done, _ = await asyncio.wait(attempts, timeout=timeout, return_when=asyncio.FIRST_COMPLETED)
+                if not done:
+                    candidates[0].count("hedges")
+                    launch(hedge=True)
+                    hedge_at = None
+                    continue
+                for task in done:
+                    route, hedge = attempts.pop(task)
+                    try:
+                        result = task.result()
+                    except Exception as e:
+                        last_error = e
+                        if candidates and not attempts:
+                            launch()
+                        continue
+                    if hedge:
+                        route.count("hedge_wins")
+                    return result
+            raise last_error
+        finally:
+            for task in attempts:
+                task.cancel()
+
+    def tier_costs(self, kind):
+        """{tier: (p50 seconds, tokens per call)} of each tier's fastest measured route for a call kind"""
+        costs = {}
+        for tier in model_tiers.TIERS:
+            measured = [(route.latency(kind, 50), route.tokens_per_call(kind))
+                        for route in self.routes.values() if route.tier == tier and route.healthy()]
+            measured = [sample for sample in measured if sample[0] is not None]
+            if measured:
+                # tokens are None for a route whose calls reported no usage yet
+                costs[tier] = min(measured, key=lambda sample: sample[0])
+        return costs
+
+    def stats(self):
+        return {name: route.stats() for name, route in self.routes.items()}
+
+    def tier_stats(self):
+        return self.policy.snapshot() if self.policy is not None else None
+
+
+def create_router(providers=None):
+    """Router over every provider in `providers` that has an API key configured"""
+    providers = providers or os.getenv('LLM_ROUTER_PROVIDERS', ROUTER_PROVIDERS)
+    structured = {name.strip() for name in STRUCTURED_OUTPUT_PROVIDERS.split(",") if name.strip()}
+    routes = []
+    for name in [name.strip() for name in providers.split(",") if name.strip()]:
+        if name not in PROVIDERS:
+            print(f"⚠️ Unknown LLM provider '{name}' in LLM_ROUTER_PROVIDERS, skipping")
+            continue
+        base_env, default_base_url, key_env, model_env, default_model, fast_env, default_fast = PROVIDERS[name]
+        api_key = os.getenv(key_env)
+        if api_key:
+            base_url = os.getenv(base_env, default_base_url)
+            routes.append(Route(name, base_url, api_key, os.getenv(model_env, default_model),
+                                structured=name in structured))
+            fast_model = os.getenv(fast_env, default_fast)
+            if fast_model:
+                routes.append(Route(f"{name}-fast", base_url, api_key, fast_model, tier=FAST, provider=name,
+                                    structured=name in structured))
+    if routes:
+        print("🔀 LLM providers:", ", ".join(f"{route.name} ({route.model})" for route in routes))
+    return Router(routes, policy=model_tiers.create_policy())
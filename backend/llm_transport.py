@@ -0,0 +1,385 @@
+"""Shared, rate-limit-aware HTTP transport for every LLM client in the process.
+
+All OpenAI-compatible clients (sync and async) are built here on top of one
+transport per provider, which adds:
+
+- a sized HTTP connection pool with keep-alive
+- token buckets per provider and per model (OpenRouter ":free" models are
+  limited to a few requests a minute)
+- retries with jittered exponential backoff that honor Retry-After
+- a circuit breaker that fails fast while a provider keeps erroring
+- queue depth / in-flight gauges and request counters (see stats())
+
+The SDK's own retries are disabled so that a request is retried in one place.
+"""
+import asyncio
+import email.utils
+import json
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+import httpx
+from openai import OpenAI, AsyncOpenAI
+
+import metrics
+
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+POOL_SIZE = int(os.getenv('LLM_POOL_SIZE', 20))
+KEEPALIVE_CONNECTIONS = int(os.getenv('LLM_KEEPALIVE_CONNECTIONS', 10))
+KEEPALIVE_EXPIRY = float(os.getenv('LLM_KEEPALIVE_EXPIRY', 30))
+MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', 0.5))
+BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', 30))
+PROVIDER_RATE = float(os.getenv('LLM_PROVIDER_RATE', 10))          # requests / second
+FREE_MODEL_RATE = float(os.getenv('LLM_FREE_MODEL_RATE', 20 / 60))  # requests / second
+BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', 5))
+BREAKER_RESET = float(os.getenv('LLM_BREAKER_RESET', 30))
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised without touching the network while a provider's breaker is open"""
+
+
+class TokenBucket:
+    """Reservation-style token bucket: reserve() returns how long the caller must wait"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            wait = -self._tokens / self.rate if self._tokens < 0 else 0.0
+            return max(wait, self._paused_until - now)
+
+    def pause(self, seconds):
+        """Hold every caller back, e.g. for a provider's Retry-After"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class CircuitBreaker:
+    """Opens after `threshold` consecutive failures; after `reset_timeout` one probe decides"""
+
+    def __init__(self, threshold=BREAKER_THRESHOLD, reset_timeout=BREAKER_RESET):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        """"closed" or "probe" when a request may go out, None otherwise; a probe must be released"""
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return "closed"
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return "probe"
+            return None
+
+    def release(self, admitted):
+        """End of an attempt admitted by allow(); a probe that recorded nothing (e.g. a 429) frees the slot"""
+        if admitted == "probe":
+            with self._lock:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.threshold or self.opened_at is not None:
+                self.opened_at = time.monotonic()
+            self._probing = False
+
+
+def retry_after_seconds(response):
+    """Parse Retry-After (delta seconds or HTTP date); None if absent"""
+    value = response.headers.get('retry-after') if response is not None else None
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def backoff_delay(attempt, response=None):
+    """Honor Retry-After when given, else full-jitter exponential backoff"""
+    retry_after = retry_after_seconds(response)
+    if retry_after is not None:
+        return min(retry_after, BACKOFF_MAX)
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+
+
+def model_of(request):
+    try:
+        return json.loads(request.content or b"{}").get("model")
+    except (ValueError, AttributeError):
+        return None
+
+
+class Provider:
+    """Limiter, breaker and metrics shared by every client talking to one provider"""
+
+    def __init__(self, name, rate=PROVIDER_RATE):
+        self.name = name
+        self.bucket = TokenBucket(rate, max(1, rate))
+        self.model_buckets = {}
+        self.breaker = CircuitBreaker()
+        self.queue_depth = 0
+        self.in_flight = 0
+        self.counters = {"requests": 0, "retries": 0, "throttled": 0, "failures": 0, "rejected": 0}
+        self._lock = threading.Lock()
+
+    def model_bucket(self, model):
+        if not model or not model.endswith(':free'):
+            return None
+        with self._lock:
+            if model not in self.model_buckets:
+                self.model_buckets[model] = TokenBucket(FREE_MODEL_RATE, 1)
+            return self.model_buckets[model]
+
+    def count(self, name):
+        with self._lock:
+            self.counters[name] += 1
+
+    @contextmanager
+    def gauge(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+        try:
+            yield
+        finally:
+            with self._lock:
+                setattr(self, name, getattr(self, name) - 1)
+
+    def admission_delay(self, model):
+        """Reserve a token from the provider and model buckets; returns the wait"""
+        delay = self.bucket.reserve()
+        bucket = self.model_bucket(model)
+        if bucket:
+            delay = max(delay, bucket.reserve())
+        return delay
+
+    def on_throttled(self, model, response):
+        self.count("throttled")
+        retry_after = retry_after_seconds(response)
+        if retry_after:
+            bucket = self.model_bucket(model) or self.bucket
+            bucket.pause(min(retry_after, BACKOFF_MAX))
+
+    def check_breaker(self):
+        """What allow() admitted the attempt as; raises CircuitOpenError instead of sending"""
+        admitted = self.breaker.allow()
+        if not admitted:
+            self.count("rejected")
+            raise CircuitOpenError(f"{self.name} circuit open after repeated failures")
+        return admitted
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": self.queue_depth,
+                "in_flight": self.in_flight,
+                "circuit": self.breaker.state,
+                **self.counters,
+            }
+
+
+class ResilientTransport(httpx.BaseTransport):
+    def __init__(self, provider, max_retries=MAX_RETRIES):
+        self.provider = provider
+        self.max_retries = max_retries
+        self._transport = httpx.HTTPTransport(limits=pool_limits())
+
+    def handle_request(self, request):
+        provider = self.provider
+        model = model_of(request)
+
+        for attempt in range(self.max_retries + 1):
+            # Checked before every retry too: a breaker that opened meanwhile stops them
+            admitted = provider.check_breaker()
+            if attempt == 0:
+                provider.count("requests")
+            try:
+                with provider.gauge("queue_depth"), metrics.stage("llm_queue"):
+                    time.sleep(provider.admission_delay(model))
+                try:
+                    with provider.gauge("in_flight"):
+                        response = self._transport.handle_request(request)
+                except httpx.TransportError:
+                    provider.breaker.record_failure()
+                    if attempt == self.max_retries:
+                        provider.count("failures")
+                        raise
+                    delay = backoff_delay(attempt)
+                else:
+                    if response.status_code not in RETRYABLE_STATUS:
+                        provider.breaker.record_success()
+                        return response
+                    if response.status_code == 429:
+                        # Throttling says nothing about the provider's health
+                        provider.on_throttled(model, response)
+                    else:
+                        provider.breaker.record_failure()
+                    if attempt == self.max_retries:
+                        provider.count("failures")
+                        return response
+                    response.read()
+                    response.close()
+                    delay = backoff_delay(attempt, response)
+            finally:
+                provider.breaker.release(admitted)
+            provider.count("retries")
+            with metrics.stage("llm_queue"):
+                time.sleep(delay)
+
+    def close(self):
+        self._transport.close()
+
+
+class AsyncResilientTransport(httpx.AsyncBaseTransport):
+    def __init__(self, provider, max_retries=MAX_RETRIES):
+        self.provider = provider
+        self.max_retries = max_retries
+        self._transport = httpx.AsyncHTTPTransport(limits=pool_limits())
+
+    async def handle_async_request(self, request):
+        provider = self.provider
+        model = model_of(request)
+
+        for attempt in range(self.max_retries + 1):
+            # Checked before every retry too: a breaker that opened meanwhile stops them
+            admitted = provider.check_breaker()
+            if attempt == 0:
+                provider.count("requests")
+            try:
+                with provider.gauge("queue_depth"), metrics.stage("llm_queue"):
+                    await asyncio.sleep(provider.admission_delay(model))
+                try:
+                    with provider.gauge("in_flight"):
+                        response = await self._transport.handle_async_request(request)
+                except httpx.TransportError:
+                    provider.breaker.record_failure()
+                    if attempt == self.max_retries:
+                        provider.count("failures")
+                        raise
+                    delay = backoff_delay(attempt)
+                else:
+                    if response.status_code not in RETRYABLE_STATUS:
+                        provider.breaker.record_success()
+                        return response
+                    if response.status_code == 429:
+                        # Throttling says nothing about the provider's health
+                        provider.on_throttled(model, response)
+                    else:
+                        provider.breaker.record_failure()
+                    if attempt == self.max_retries:
+                        provider.count("failures")
+                        return response
+                    await response.aread()
+                    await response.aclose()
+                    delay = backoff_delay(attempt, response)
+            finally:
+                provider.breaker.release(admitted)
+            provider.count("retries")
+            with metrics.stage("llm_queue"):
+                await asyncio.sleep(delay)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+def pool_limits():
+    return httpx.Limits(
+        max_connections=POOL_SIZE,
+        max_keepalive_connections=KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=KEEPALIVE_EXPIRY,
+    )
+
+
+_providers = {}
+_providers_lock = threading.Lock()
+
+
+def get_provider(name):
+    with _providers_lock:
+        if name not in _providers:
+            _providers[name] = Provider(name)
+        return _providers[name]
+
+
+def create_client(provider, base_url, api_key):
+    """Sync OpenAI client on the shared transport for a provider"""
+    return OpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        max_retries=0,
+        http_client=httpx.Client(transport=ResilientTransport(get_provider(provider)))
+    )
+
+
+def create_async_client(provider, base_url, api_key):
+    """Async OpenAI client on the shared limiter/breaker for a provider"""
+    return AsyncOpenAI(
+        base_url=base_url,
+        api_key=api_key,
+        max_retries=0,
+        http_client=httpx.AsyncClient(transport=AsyncResilientTransport(get_provider(provider)))
+    )
+
+
+def stats():
+    """Per-provider queue depth, in-flight count, breaker state and counters"""
+    with _providers_lock:
+        providers = dict(_providers)
+    return {name: provider.stats() for name, provider in providers.items()}
+
+
+def collect_metrics():
+    """Transport gauges and counters for the /metrics endpoint"""
+    providers = stats()
+    families = [
+        ("llm_queue_depth", "gauge", "Requests waiting for a rate-limit token",
+         [({"provider": name}, p["queue_depth"]) for name, p in providers.items()]),
+        ("llm_in_flight", "gauge", "Requests currently on the network",
+         [({"provider": name}, p["in_flight"]) for name, p in providers.items()]),
+        ("llm_circuit_open", "gauge", "1 while the provider's circuit breaker is open",
+         [({"provider": name}, int(p["circuit"] == "open")) for name, p in providers.items()]),
+    ]
+    for counter in ("requests", "retries", "throttled", "failures", "rejected"):
+        families.append((f"llm_transport_{counter}_total", "counter", f"Transport {counter} per provider",
+                         [({"provider": name}, p[counter]) for name, p in providers.items()]))
+    return families
+
+
+metrics.register_collector(collect_metrics)
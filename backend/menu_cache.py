@@ -0,0 +1,310 @@
+"""Content-addressed response cache for menu and grocery generation.
+
+Keys are SHA-256 digests of canonicalized request fields, so "Italian " and
+"italian" (or 48 and 50 guests for a menu) land on the same entry. Backends:
+
+- memory: in-process LRU with TTL (default)
+- sqlite: on-disk store shared by every worker on the host
+- redis:  any server speaking the Redis protocol (RESP)
+
+Configured with MENU_CACHE_BACKEND, MENU_CACHE_TTL, MENU_CACHE_MAX_ENTRIES,
+MENU_CACHE_PATH and MENU_CACHE_URL. stub_redis.py is a local stand-in for a
+Redis server.
+"""
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlparse
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+EVENT_FIELDS = ['event_type', 'cuisine', 'formality', 'level']
+GUEST_BUCKETS = [2, 6, 12, 25, 50, 100, 250, 500]
+
+
+def bucket_guest_count(guest_count):
+    """Map a guest count to the upper bound of its bucket (e.g. 48 -> 50)"""
+    try:
+        guest_count = int(guest_count)
+    except (TypeError, ValueError):
+        return 0
+    for bound in GUEST_BUCKETS:
+        if guest_count <= bound:
+            return bound
+    return GUEST_BUCKETS[-1] * ((guest_count + GUEST_BUCKETS[-1] - 1) // GUEST_BUCKETS[-1])
+
+
+def canonical_event(data):
+    """Lowercased, trimmed event fields with the guest count bucketed.
+
+    Dietary restrictions are added only when there are some, so events
+    without any keep the keys they always had.
+    """
+    event = {field: str(data.get(field, '')).strip().lower() for field in EVENT_FIELDS}
+    event['guest_count'] = bucket_guest_count(data.get('guest_count'))
+    dietary = ' '.join(str(data.get('dietary_restrictions') or '').lower().split())
+    if dietary not in ('', 'none', 'no'):
+        event['dietary_restrictions'] = dietary
+    return event
+
+
+def digest(namespace, payload):
+    encoded = json.dumps(payload, sort_keys=True, separators=(',', ':'))
+    return f"{namespace}:{hashlib.sha256(encoded.encode()).hexdigest()}"
+
+
+def menu_key(data):
+    return digest("menu", canonical_event(data))
+
+
+def grocery_key(menu, guest_count):
+    """Grocery lists depend on the exact menu and the exact guest count"""
+    sections = {section: items for section, items in menu.items() if isinstance(items, list)}
+    return digest("grocery", {"menu": sections, "guest_count": int(guest_count)})
+
+
+def bypass_requested(data, cache_control=None):
+    """Per-request opt-out: {"cache": false} in the body or Cache-Control: no-cache"""
+    if isinstance(data, dict) and data.get('cache') is False:
+        return True
+    return bool(cache_control) and 'no-cache' in cache_control.lower()
+
+
+class MemoryBackend:
+    """In-process LRU with per-entry expiry"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """Return (value, expired) for a key"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None, False
+            value, expires_at = entry
+            if expires_at < time.time():
+                del self._entries[key]
+                return None, True
+            self._entries.move_to_end(key)
+            return value, False
+
+    def set(self, key, value, ttl):
+        """Store a value; returns the number of entries evicted to make room"""
+        with self._lock:
+            self._entries[key] = (value, time.time() + ttl)
+            self._entries.move_to_end(key)
+            evicted = 0
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                evicted += 1
+            return evicted
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class SQLiteBackend:
+    """On-disk store; the oldest-accessed rows go once max_entries is exceeded"""
+
+    def __init__(self, path, max_entries=100000):
+        self.path = path
+        self.max_entries = max_entries
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS cache (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed ON cache (accessed_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        conn = self._connect()
+        row = conn.execute("SELECT value, expires_at FROM cache WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None, False
+        value, expires_at = row
+        now = time.time()
+        if expires_at < now:
+            conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            return None, True
+        conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        return value, False
+
+    def set(self, key, value, ttl):
+        conn = self._connect()
+        now = time.time()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, value, now + ttl, now)
+        )
+        overflow = conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0] - self.max_entries
+        if overflow > 0:
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at LIMIT ?)",
+                (overflow,)
+            )
+            return overflow
+        return 0
+
+    def delete(self, key):
+        self._connect().execute("DELETE FROM cache WHERE key = ?", (key,))
+
+
+class RedisBackend:
+    """Minimal RESP client (GET / SET EX / DEL); expiry and eviction happen server-side"""
+
+    def __init__(self, url="redis://localhost:6379/0", timeout=1.0):
+        parsed = urlparse(url)
+        self.host = parsed.hostname or 'localhost'
+        self.port = parsed.port or 6379
+        self.db = int(parsed.path.lstrip('/') or 0)
+        self.password = parsed.password
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            conn = (sock, sock.makefile('rb'))
+            self._local.conn = conn
+            if self.password:
+                self._command('AUTH', self.password)
+            if self.db:
+                self._command('SELECT', str(self.db))
+        return conn
+
+    def _command(self, *args):
+        sock, reader = self._connection()
+        payload = f"*{len(args)}\r\n".encode()
+        for arg in args:
+            data = arg if isinstance(arg, bytes) else str(arg).encode()
+            payload += b"$%d\r\n%s\r\n" % (len(data), data)
+        try:
+            sock.sendall(payload)
+            return self._read_reply(reader)
+        except OSError:
+            self._local.conn = None
+            sock.close()
+            raise
+
+    def _read_reply(self, reader):
+        line = reader.readline()
+        if not line:
+            raise ConnectionError("Redis connection closed")
+        kind, rest = line[:1], line[1:-2]
+        if kind == b'+':
+            return rest.decode()
+        if kind == b'-':
+            raise RuntimeError(f"Redis error: {rest.decode()}")
+        if kind == b':':
+            return int(rest)
+        if kind == b'$':
+            length = int(rest)
+            if length < 0:
+                return None
+            data = reader.read(length + 2)
+            return data[:-2].decode()
+        if kind == b'*':
+            return [self._read_reply(reader) for _ in range(int(rest))]
+        raise RuntimeError(f"Unexpected Redis reply: {line!r}")
+
+    def get(self, key):
+        return self._command('GET', key), False
+
+    def set(self, key, value, ttl):
+        self._command('SET', key, value, 'EX', str(max(1, int(ttl))))
+        return 0
+
+    def delete(self, key):
+        self._command('DEL', key)
+
+
+class ResponseCache:
+    """JSON-serializing front for a backend, with hit/miss/eviction counters"""
+
+    def __init__(self, backend, ttl=86400):
+        self.backend = backend
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "bypasses": 0, "errors": 0}
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self.stats[name] += amount
+
+    def get(self, key):
+        try:
+            value, expired = self.backend.get(key)
+        except Exception as e:
+            print(f"⚠️ Cache read failed: {e}")
+            self._count("errors")
+            return None
+        if expired:
+            self._count("evictions")
+        if value is None:
+            self._count("misses")
+            return None
+        self._count("hits")
+        return json.loads(value)
+
+    def set(self, key, value):
+        try:
+            evicted = self.backend.set(key, json.dumps(value), self.ttl)
+        except Exception as e:
+            print(f"⚠️ Cache write failed: {e}")
+            self._count("errors")
+            return
+        if evicted:
+            self._count("evictions", evicted)
+
+    def bypass(self):
+        self._count("bypasses")
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["backend"] = type(self.backend).__name__
+        return stats
+
+
+def create_cache():
+    """Build the response cache from environment settings (None when disabled)"""
+    kind = os.getenv('MENU_CACHE_BACKEND', 'memory').lower()
+    ttl = float(os.getenv('MENU_CACHE_TTL', 86400))
+    max_entries = int(os.getenv('MENU_CACHE_MAX_ENTRIES', 1024))
+
+    if kind in ('off', 'none', ''):
+        return None
+    if kind == 'sqlite':
+        path = os.getenv('MENU_CACHE_PATH', os.path.join(BASE_DIR, 'cache', 'responses.sqlite3'))
+        backend = SQLiteBackend(path, max_entries)
+    elif kind == 'redis':
+        backend = RedisBackend(os.getenv('MENU_CACHE_URL', 'redis://localhost:6379/0'))
+    else:
+        backend = MemoryBackend(max_entries)
+    return ResponseCache(backend, ttl)
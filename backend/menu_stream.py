@@ -0,0 +1,341 @@
+"""Parse menu replies from the LLM in one pass, as they stream in.
+
+Models do not always answer with bare JSON. R1-style reasoning models open
+with a <think>...</think> block (which may itself contain braces), others wrap
+the object in a ```json fence or add a sentence before or after it, and some
+ignore the schema and write "Appetizers:" headers with "- dish" lines.
+MenuStreamParser reads all of those from the streamed deltas without
+re-scanning earlier text, and parse_reply() does the same for a complete reply
+of any structured model.
+"""
+import json
+import re
+
+from pydantic import BaseModel, ValidationError
+
+MENU_SECTIONS = ['appetizers', 'main_courses', 'desserts', 'beverages']
+NOTES_FIELD = 'preparation_notes'
+
+# What models (and people) call the menu sections
+SECTION_ALIASES = {
+    'appetizers': 'appetizers', 'appetizer': 'appetizers', 'starters': 'appetizers', 'starter': 'appetizers',
+    'main_courses': 'main_courses', 'main courses': 'main_courses', 'main course': 'main_courses',
+    'mains': 'main_courses', 'main': 'main_courses', 'entrees': 'main_courses', 'entree': 'main_courses',
+    'desserts': 'desserts', 'dessert': 'desserts', 'sweets': 'desserts',
+    'beverages': 'beverages', 'beverage': 'beverages', 'drinks': 'beverages', 'drink': 'beverages',
+}
+NOTES_ALIASES = {'preparation notes', 'prep notes', 'notes', 'note', 'chef notes', "chef's notes", 'tips'}
+# Keys that name a dish when a model writes dishes as objects instead of strings
+DISH_KEYS = {'name', 'dish', 'title'}
+# A text-format line longer than this (or ending in a full stop) is prose, not a dish
+MAX_DISH_CHARS = 120
+
+_SCAN = re.compile(r'\{|\n|<(/?)(think|thinking|reasoning)>', re.IGNORECASE)
+_TEXT = re.compile(r'\n|<(/)(think|thinking|reasoning)>', re.IGNORECASE)
+_JSON_TOKEN = re.compile(r'["{}\[\],:]')
+_STRING_TOKEN = re.compile(r'["\\]')
+_BULLET = re.compile(r'^(?:[-*•+]|\d+[.)])\s+')
+_REASONING = re.compile(r'<(think|thinking|reasoning)>.*?(?:</\1>|$)', re.IGNORECASE | re.DOTALL)
+
+
+class MenuModel(BaseModel):
+    appetizers: list[str]
+    main_courses: list[str]
+    desserts: list[str]
+    beverages: list[str]
+    preparation_notes: str
+
+
+class GroceryItem(BaseModel):
+    name: str
+    quantity: float
+    unit: str
+    category: str
+
+
+class GroceryList(BaseModel):
+    """A merged grocery list; lines the LLM gave without a quantity ("Salt, to taste") stay as text"""
+    items: list[GroceryItem]
+    unquantified: list[str] = []
+
+
+class ReplyParseError(ValueError):
+    """The reply holds no usable structured answer"""
+
+
+def field_name(text):
+    """MENU_SECTIONS entry or NOTES_FIELD for a key or heading, else None"""
+    name = ' '.join(text.strip().strip('*_#').replace('_', ' ').lower().split())
+    if name in NOTES_ALIASES:
+        return NOTES_FIELD
+    return SECTION_ALIASES.get(name)
+
+
+class MenuStreamParser:
+    """Incrementally parse a streamed menu reply.
+
+    Feed it content deltas as they arrive; each call returns the events that
+    the new text completed:
+
+    - ("item", section, dish) when a dish closes
+    - ("section", section, items) when a section list (or the notes) closes
+
+    Call close() once the stream ends to flush the last text section, then
+    model() for the validated MenuModel.
+    """
+
+    def __init__(self):
+        self.menu = {section: [] for section in MENU_SECTIONS}
+        self.menu[NOTES_FIELD] = ""
+        self.format = None  # "json" or "text" once the reply shows which
+        self.done = False
+        self._mode = "scan"
+        self._pending = ""
+        self._close_tag = None
+        self._section = None
+        self._notes = []
+        # JSON state: one [bracket, key, expecting_key] per open object or array
+        self._stack = []
+        self._in_string = False
+        self._escape = False
+        self._buf = []
+
+    def feed(self, chunk):
+        events = []
+        if self.done or not chunk:
+            return events
+        if self._mode == "json":
+            rest = self._feed_json(chunk, events)
+            return events + self.feed(rest) if rest else events
+
+        text = self._pending + chunk
+        pos = 0
+        while pos < len(text):
+            if self._mode == "think":
+                end = text.lower().find(self._close_tag, pos)
+                if end < 0:
+                    # Keep enough to match a closing tag split across chunks
+                    pos = max(pos, len(text) - len(self._close_tag) + 1)
+                    break
+                pos = end + len(self._close_tag)
+                self._mode = "scan"
+                continue
+            match = (_SCAN if self._mode == "scan" else _TEXT).search(text, pos)
+            if match is None:
+                break
+            if match.group() == '\n':
+                self._on_line(text[pos:match.start()], events)
+                pos = match.end()
+            elif match.group(1):
+                # A closing tag without its opening one: everything so far was reasoning
+                self._reset()
+                pos = match.end()
+            elif match.group(2):
+                self._mode = "think"
+                self._close_tag = f"</{match.group(2).lower()}>"
+                pos = match.end()
+            else:
+                self._mode = "json"
+                self.format = "json"
+                self._pending = ""
+                rest = self._feed_json(text[match.start():], events)
+                return events + self.feed(rest) if rest else events
+        # An unfinished line, or a tag that may be split across chunks
+        self._pending = text[pos:]
+        return events
+
+    def _reset(self):
+        self.menu = {section: [] for section in MENU_SECTIONS}
+        self.menu[NOTES_FIELD] = ""
+        self.format = None
+        self._mode = "scan"
+        self._section = None
+        self._notes = []
+
+    def close(self):
+        """Flush whatever the stream left unfinished; returns the final events"""
+        events = []
+        if self._mode in ("scan", "text") and self._pending:
+            self._on_line(self._pending, events)
+        self._pending = ""
+        if self._mode == "text":
+            self._end_section(events)
+        self.done = True
+        return events
+
+    def model(self):
+        """The parsed menu as a validated MenuModel; raises ReplyParseError"""
+        if not any(self.menu[section] for section in MENU_SECTIONS):
+            raise ReplyParseError("Reply contains no menu")
+        return MenuModel.model_validate(self.menu)
+
+    # Text replies ("Appetizers:" headings and "- dish" lines)
+
+    def _on_line(self, line, events):
+        line = line.strip()
+        if not line or line.startswith('```'):
+            return
+        heading = line.lstrip('#>').strip().replace('**', '')
+        name, colon, rest = heading.partition(':')
+        field = field_name(name) if colon else field_name(heading)
+        if field:
+            self._end_section(events)
+            self._mode = "text"
+            self.format = "text"
+            self._section = field
+            rest = rest.strip() if colon else ""
+            if rest and field == NOTES_FIELD:
+                self._notes.append(rest)
+            elif rest:
+                for dish in rest.split(';'):
+                    self._add_dish(dish, events)
+            return
+        if self._section == NOTES_FIELD:
+            self._notes.append(line)
+        elif self._section:
+            bullet = _BULLET.match(line)
+            dish = line[bullet.end():] if bullet else line
+            if bullet or (len(dish) <= MAX_DISH_CHARS and not dish.endswith('.')):
+                self._add_dish(dish, events)
+
+    def _add_dish(self, dish, events):
+        dish = dish.replace('**', '').strip()
+        if len(dish) > 1 and dish[0] == dish[-1] == '"':
+            dish = dish[1:-1].strip()
+        if dish:
+            self.menu[self._section].append(dish)
+            events.append(("item", self._section, dish))
+
+    def _end_section(self, events):
+        if self._section == NOTES_FIELD:
+            self.menu[NOTES_FIELD] = "\n".join(self._notes)
+            events.append(("section", NOTES_FIELD, self.menu[NOTES_FIELD]))
+        elif self._section:
+            events.append(("section", self._section, list(self.menu[self._section])))
+        self._section = None
+
+    # JSON replies
+
+    def _feed_json(self, text, events):
+        """Consume JSON text; returns the text after an object that held no menu"""
+        pos, end = 0, len(text)
+        while pos < end and not self.done:
+            if self._in_string:
+                if self._escape:
+                    self._buf.append(text[pos])
+                    self._escape = False
+                    pos += 1
+                    continue
+                match = _STRING_TOKEN.search(text, pos)
+                if match is None:
+                    self._buf.append(text[pos:])
+                    return None
+                self._buf.append(text[pos:match.start()])
+                pos = match.end()
+                if match.group() == '\\':
+                    self._buf.append('\\')
+                    self._escape = True
+                    continue
+                self._in_string = False
+                value = ''.join(self._buf)
+                if '\\' in value:
+                    try:
+                        value = json.loads('"' + value + '"')
+                    except ValueError:
+                        pass
+                self._on_string(value, events)
+                continue
+
+            match = _JSON_TOKEN.search(text, pos)
+            if match is None:
+                return None
+            pos = match.end()
+            ch = match.group()
+            if ch == '"':
+                self._in_string = True
+                self._buf = []
+            elif ch in '{[':
+                self._stack.append([ch, None, ch == '{'])
+            elif ch in '}]':
+                self._stack.pop()
+                if not self._stack:
+                    if any(self.menu[section] for section in MENU_SECTIONS) or self.menu[NOTES_FIELD]:
+                        self.done = True
+                        return None
+                    # Braces in a preamble ("{guest_count} guests"), keep looking for the menu
+                    self._mode = "scan"
+                    self.format = None
+                    return text[pos:]
+                elif ch == ']' and len(self._stack) == 1:
+                    field = self._stack[0][1]
+                    if field in MENU_SECTIONS:
+                        events.append(("section", field, list(self.menu[field])))
+                    elif field == NOTES_FIELD:
+                        self.menu[NOTES_FIELD] = "\n".join(self._notes)
+                        events.append(("section", NOTES_FIELD, self.menu[NOTES_FIELD]))
+            elif self._stack[-1][0] == '{':
+                self._stack[-1][2] = ch == ','
+        return None
+
+    def _on_string(self, value, events):
+        top = self._stack[-1]
+        if top[0] == '{' and top[2]:
+            top[1] = field_name(value) if len(self._stack) == 1 else value.lower()
+            return
+        field = self._stack[0][1]
+        depth = len(self._stack)
+        if field == NOTES_FIELD:
+            if depth == 1:
+                self.menu[NOTES_FIELD] = value
+                events.append(("section", NOTES_FIELD, value))
+            elif depth == 2:
+                self._notes.append(value)
+        elif field in MENU_SECTIONS and (
+                depth == 2 and top[0] == '[' or
+                depth == 3 and self._stack[1][0] == '[' and top[1] in DISH_KEYS):
+            self.menu[field].append(value)
+            events.append(("item", field, value))
+
+
+def parse_menu(text):
+    """MenuModel from a complete reply; raises ReplyParseError"""
+    parser = MenuStreamParser()
+    parser.feed(text)
+    parser.close()
+    return parser.model()
+
+
+def require_complete(result):
+    """Raise ReplyParseError if a parsed reply left any list field empty (a cut-off or schema-ignoring reply)"""
+    missing = [name for name, value in result if isinstance(value, list) and not value]
+    if missing:
+        raise ReplyParseError(f"Reply is missing {', '.join(missing)}")
+    return result
+
+
+def strip_reasoning(text):
+    """A reply without its <think> blocks (an unclosed one runs to the end)"""
+    return _REASONING.sub('', text or '').strip()
+
+
+def extract_json(text):
+    """The first JSON object in a reply, skipping reasoning blocks, fences and chatter"""
+    text = strip_reasoning(text)
+    decoder = json.JSONDecoder()
+    start = text.find('{')
+    while start >= 0:
+        try:
+            return decoder.raw_decode(text, start)[0]
+        except ValueError:
+            start = text.find('{', start + 1)
+    raise ReplyParseError("Reply contains no JSON object")
+
+
+def parse_reply(text, model):
+    """Validate a complete reply as the Pydantic `model`; raises ReplyParseError"""
+    if model is MenuModel:
+        return parse_menu(text)
+    try:
+        return model.model_validate(extract_json(text))
+    except ValidationError as e:
+        raise ReplyParseError(f"Reply does not match {model.__name__}: {e.error_count()} errors") from e
@@ -0,0 +1,241 @@
+"""In-process metrics with Prometheus text exposition, plus sampled request traces.
+
+Stages are timed with `with metrics.stage("parse"):`. Each stage records its
+exclusive time (nested stages are subtracted), so an "llm_queue" wait inside
+an "llm_network" call is not counted twice. Observing a histogram is a
+perf_counter read, a bisect and a locked add; nothing is printed.
+
+A request is traced with probability TRACE_SAMPLE_RATE (default 0). A traced
+request prints one JSON line with its stage timings when it finishes, and
+metrics.debug() output is only printed for traced requests, so large objects
+are never formatted on the untraced hot path. A request can also collect the
+models that answered its LLM calls (start_model_log / models_used), for the
+plan history.
+"""
+import bisect
+import contextvars
+import json
+import math
+import os
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0))
+
+
+def _label_text(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_label_text(self.labels, key)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {key: (list(counts), total, count) for key, (counts, total, count) in self._series.items()}
+        for key, (counts, total, count) in sorted(series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = "+Inf" if bound == math.inf else repr(float(bound))
+                lines.append(f"{self.name}_bucket{_label_text(self.labels, key, ('le', le))} {cumulative}")
+            lines.append(f"{self.name}_sum{_label_text(self.labels, key)} {total:.6f}")
+            lines.append(f"{self.name}_count{_label_text(self.labels, key)} {count}")
+        return lines
+
+
+_metrics = []
+_collectors = []
+
+
+def counter(name, help, labels=()):
+    metric = Counter(name, help, labels)
+    _metrics.append(metric)
+    return metric
+
+
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    metric = Histogram(name, help, labels, buckets)
+    _metrics.append(metric)
+    return metric
+
+
+def register_collector(collect):
+    """collect() returns (name, type, help, [(labels dict, value), ...]) tuples at scrape time"""
+    _collectors.append(collect)
+
+
+def render():
+    """Every metric in the Prometheus text exposition format"""
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for collect in _collectors:
+        try:
+            families = collect()
+        except Exception as e:
+            print(f"⚠️ Metrics collector failed: {e}")
+            continue
+        for name, kind, help, samples in families:
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in samples:
+                lines.append(f"{name}{_label_text(tuple(labels), tuple(labels.values()))} {value}")
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = histogram("http_request_duration_seconds", "HTTP request latency",
+                            ("endpoint", "method", "status"))
+STAGE_SECONDS = histogram("plan_stage_duration_seconds",
+                          "Exclusive time per planning stage (nested stages excluded)", ("stage",))
+LLM_TOKENS = counter("llm_tokens_total", "Tokens reported in LLM response usage",
+                     ("provider", "model", "type"))
+
+
+class _Frame:
+    __slots__ = ("name", "parent", "nested")
+
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.nested = 0.0
+
+
+_frame = contextvars.ContextVar("metrics_frame", default=None)
+_trace = contextvars.ContextVar("metrics_trace", default=None)
+_models = contextvars.ContextVar("metrics_models", default=None)
+
+
+@contextmanager
+def stage(name):
+    """Time a stage into plan_stage_duration_seconds (and the trace, if sampled)"""
+    parent = _frame.get()
+    frame = _Frame(name, parent)
+    token = _frame.set(frame)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        _frame.reset(token)
+        if parent is not None:
+            parent.nested += elapsed
+        exclusive = max(0.0, elapsed - frame.nested)
+        STAGE_SECONDS.observe(exclusive, stage=name)
+        trace = _trace.get()
+        if trace is not None:
+            trace["stages"].append((name, round(exclusive * 1000, 2)))
+
+
+def start_trace(endpoint):
+    """Start a sampled trace for the current request; returns a token for finish_trace"""
+    if TRACE_SAMPLE_RATE <= 0 or random.random() >= TRACE_SAMPLE_RATE:
+        return None
+    return _trace.set({"endpoint": endpoint, "started": time.perf_counter(), "stages": []})
+
+
+def finish_trace(token, status):
+    if token is None:
+        return
+    trace = _trace.get()
+    _trace.reset(token)
+    if trace is None:
+        return
+    stages = {}
+    for name, ms in trace["stages"]:
+        stages[name] = round(stages.get(name, 0) + ms, 2)
+    print("🔎 TRACE " + json.dumps({
+        "endpoint": trace["endpoint"],
+        "status": status,
+        "total_ms": round((time.perf_counter() - trace["started"]) * 1000, 2),
+        "stages_ms": stages,
+    }))
+
+
+def tracing():
+    return _trace.get() is not None
+
+
+def debug(label, value):
+    """Print a (possibly large) object only while the current request is traced"""
+    if _trace.get() is not None:
+        print(label, value if isinstance(value, str) else json.dumps(value, indent=2, default=str))
+
+
+def start_model_log():
+    """Start collecting the models that answer LLM calls for the current request; returns a token"""
+    return _models.set([])
+
+
+def finish_model_log(token):
+    _models.reset(token)
+
+
+def record_model(provider, model):
+    models = _models.get()
+    if models is not None and f"{provider}/{model}" not in models:
+        models.append(f"{provider}/{model}")
+
+
+def models_used():
+    """"provider/model" of every successful LLM call so far in this request, comma-separated; None if none"""
+    return ",".join(_models.get() or ()) or None
+
+
+def record_usage(provider, model, usage):
+    """Count prompt/completion tokens from an OpenAI-style usage object"""
+    if usage is None:
+        return
+    for kind in ("prompt_tokens", "completion_tokens"):
+        amount = getattr(usage, kind, None)
+        if amount is None and isinstance(usage, dict):
+            amount = usage.get(kind)
+        if amount:
+            LLM_TOKENS.inc(amount, provider=provider, model=model, type=kind.split('_')[0])
@@ -0,0 +1,190 @@
+"""Adaptive model tiers: a fast non-reasoning model for simple events, the reasoning model when needed.
+
+complexity() scores an event from its fields: guest count, formality,
+cooking level, how many dietary restrictions it carries (restrictions the
+dietary engine cannot read count double) and whether the cuisine and event
+type are ones the form offers. TierPolicy.choose() sends a call to the fast
+tier when its score is below the threshold and to the reasoning tier (R1)
+otherwise; the router escalates a fast call to the reasoning tier when it
+fails, e.g. because its structured reply did not parse.
+
+Every fast call's parse outcome is kept per (call kind, score). Once a score
+has LLM_TIER_MIN_SAMPLES outcomes, its own numbers decide: it stays on the
+fast tier while its parse-failure rate is at most LLM_TIER_MAX_PARSE_FAILURES
+and a fast call, counting the reasoning call that follows each failure, is
+still expected to be no slower and no more expensive than going to the
+reasoning tier directly (latency and tokens per call come from the router's
+routes, prices from LLM_TIER_PRICES). Learned scores move the threshold for
+scores without data of their own, and a small fraction of calls
+(LLM_TIER_EXPLORE) goes to the fast tier regardless, so a score sent to the
+reasoning tier is re-measured rather than left there for good.
+
+Configured with LLM_MODEL_TIERS (on/off), LLM_TIER_THRESHOLD,
+LLM_TIER_MAX_PARSE_FAILURES, LLM_TIER_WINDOW, LLM_TIER_MIN_SAMPLES,
+LLM_TIER_EXPLORE and LLM_TIER_PRICES ("fast=1.10,reasoning=2.19", USD per
+million tokens).
+"""
+import os
+import random
+import threading
+from collections import deque
+
+import catalog
+import dietary
+
+FAST, REASONING = "fast", "reasoning"
+TIERS = (FAST, REASONING)
+DEFAULT_PRICES = "fast=1.10,reasoning=2.19"
+
+
+def _field(event, name):
+    return ' '.join(str(event.get(name) or '').lower().split())
+
+
+def complexity(event):
+    """Complexity score of an event; 0 is a small casual event with no restrictions"""
+    score = 0
+    try:
+        guests = int(event.get('guest_count') or 0)
+    except (TypeError, ValueError):
+        guests = 0
+    score += (guests > 50) + (guests > 200)
+    score += _field(event, 'formality') == 'formal'
+    score += _field(event, 'level') == '3'
+    restrictions = dietary.phrases(event.get('dietary_restrictions'))
+    unknown = dietary.parse(event.get('dietary_restrictions'))[1]
+    score += len(restrictions) + len(unknown)
+    score += _field(event, 'cuisine') not in catalog.CUISINES
+    score += _field(event, 'event_type') not in catalog.EVENT_TYPES
+    return score
+
+
+def parse_prices(text):
+    """{"fast": usd, "reasoning": usd} per million tokens from "fast=1.10,reasoning=2.19\""""
+    prices = {}
+    for part in text.split(','):
+        tier, _, price = part.partition('=')
+        if tier.strip() in TIERS and price.strip():
+            prices[tier.strip()] = float(price)
+    return prices
+
+
+class TierPolicy:
+    def __init__(self, threshold=2, max_parse_failures=0.15, window=50, min_samples=10, explore=0.05,
+                 prices=None, measure=None):
+        self.threshold = threshold
+        self.max_parse_failures = max_parse_failures
+        self.window = window
+        self.min_samples = min_samples
+        self.explore = explore
+        self.prices = prices or parse_prices(DEFAULT_PRICES)
+        # kind -> {tier: (p50 seconds, tokens per call or None)}; set by the router
+        self.measure = measure
+        self.stats = {"fast": 0, "reasoning": 0, "explored": 0, "escalations": 0,
+                      "fast_parse_failures": 0, "reasoning_parse_failures": 0}
+        self._outcomes = {}
+        self._lock = threading.Lock()
+
+    def _failure_rate(self, kind, score):
+        """Parse-failure rate of fast calls at this score; None until there are min_samples"""
+        outcomes = self._outcomes.get((kind, score))
+        if not outcomes or len(outcomes) < self.min_samples:
+            return None
+        return outcomes.count(False) / len(outcomes)
+
+    def _worth_it(self, failures, costs):
+        """Fast tier at this failure rate, counting the escalations, is no slower and no dearer"""
+        if failures > self.max_parse_failures:
+            return False
+        if not costs or FAST not in costs or REASONING not in costs:
+            return True
+        (fast_seconds, fast_tokens), (slow_seconds, slow_tokens) = costs[FAST], costs[REASONING]
+        if fast_seconds + failures * slow_seconds > slow_seconds:
+            return False
+        if fast_tokens is None or slow_tokens is None:
+            return True  # no token counts to price yet; latency alone decides
+        fast_price = fast_tokens * self.prices.get(FAST, 0.0)
+        slow_price = slow_tokens * self.prices.get(REASONING, 0.0)
+        return fast_price + failures * slow_price <= slow_price
+
+    def _decisions(self, kind, costs):
+        """{score: fast?} for every score of this kind with enough outcomes"""
+        decisions = {}
+        for (outcome_kind, score) in list(self._outcomes):
+            if outcome_kind == kind:
+                failures = self._failure_rate(kind, score)
+                if failures is not None:
+                    decisions[score] = self._worth_it(failures, costs)
+        return decisions
+
+    @staticmethod
+    def _effective_threshold(threshold, decisions):
+        """Learned scores move the threshold: up past scores that stay fast, down to the first that does not"""
+        for score, fast in sorted(decisions.items()):
+            if not fast:
+                return min(threshold, score)
+            threshold = max(threshold, score + 1)
+        return threshold
+
+    def choose(self, kind, score, explore=True):
+        """FAST or REASONING for a call of this kind at this complexity score"""
+        costs = self.measure(kind) if self.measure else None
+        with self._lock:
+            decisions = self._decisions(kind, costs)
+            if score in decisions:
+                fast = decisions[score]
+            else:
+                fast = score < self._effective_threshold(self.threshold, decisions)
+            explored = not fast and explore and random.random() < self.explore
+            tier = FAST if fast or explored else REASONING
+            self.stats[tier] += 1
+            self.stats["explored"] += explored
+        return tier
+
+    def record(self, kind, score, tier, parsed):
+        """Outcome of a call's structured reply; only fast-tier outcomes steer the threshold"""
+        with self._lock:
+            if tier == FAST:
+                self._outcomes.setdefault((kind, score), deque(maxlen=self.window)).append(parsed)
+            if not parsed:
+                self.stats[f"{tier}_parse_failures"] += 1
+
+    def escalated(self):
+        with self._lock:
+            self.stats["escalations"] += 1
+
+    def snapshot(self):
+        costs = {}
+        with self._lock:
+            kinds = sorted({kind for kind, _ in self._outcomes})
+        for kind in kinds:
+            costs[kind] = self.measure(kind) if self.measure else None
+        with self._lock:
+            scores = {}
+            for kind in kinds:
+                decisions = self._decisions(kind, costs[kind])
+                scores[kind] = {
+                    "threshold": self._effective_threshold(self.threshold, decisions),
+                    "scores": {
+                        score: {"samples": len(outcomes),
+                                "parse_failure_rate": round(outcomes.count(False) / len(outcomes), 3),
+                                "tier": (FAST if decisions[score] else REASONING) if score in decisions else None}
+                        for (outcome_kind, score), outcomes in sorted(self._outcomes.items())
+                        if outcome_kind == kind and outcomes
+                    },
+                }
+            return dict(self.stats, threshold=self.threshold, kinds=scores)
+
+
+def create_policy():
+    """Build the tier policy from environment settings (None when disabled)"""
+    if os.getenv('LLM_MODEL_TIERS', 'on').lower() in ('off', 'none', '0', 'false'):
+        return None
+    return TierPolicy(
+        threshold=int(os.getenv('LLM_TIER_THRESHOLD', 2)),
+        max_parse_failures=float(os.getenv('LLM_TIER_MAX_PARSE_FAILURES', 0.15)),
+        window=int(os.getenv('LLM_TIER_WINDOW', 50)),
+        min_samples=int(os.getenv('LLM_TIER_MIN_SAMPLES', 10)),
+        explore=float(os.getenv('LLM_TIER_EXPLORE', 0.05)),
+        prices=parse_prices(os.getenv('LLM_TIER_PRICES', DEFAULT_PRICES)),
+    )
@@ -0,0 +1,90 @@
+"""Parse menu edits for PATCH /api/plan/<id>.
+
+An edit is either a short instruction:
+
+- "replace desserts[1]": a new dish instead of the second dessert
+- "replace desserts[1] with panna cotta": that exact dish, no LLM call
+- "make mains vegetarian": every main course again, under a constraint
+
+or the same thing as fields: {"section": "desserts", "index": 1, "dish": ...}
+or {"section": "mains", "constraint": "vegetarian"}. Indexes are 0-based.
+"""
+import re
+
+from menu_stream import MENU_SECTIONS, SECTION_ALIASES
+
+MAX_CONSTRAINT_CHARS = 100
+
+_REPLACE = re.compile(r'^(?:replace|swap|change)\s+(?:the\s+)?(?P<section>[a-z_ ]+?)\s*\[\s*(?P<index>-?\d+)\s*\]'
+                      r'(?:\s+with\s+(?P<dish>.+))?$', re.IGNORECASE)
+_MAKE = re.compile(r'^make\s+(?:the\s+|all\s+)?(?P<rest>.+)$', re.IGNORECASE)
+
+
+class EditError(ValueError):
+    """The edit cannot be applied to this plan (answered with 400)"""
+
+
+def section_name(text):
+    section = SECTION_ALIASES.get(' '.join(str(text or '').lower().split()))
+    if section is None:
+        raise EditError(f"Unknown section '{text}'; use one of: {', '.join(MENU_SECTIONS)}")
+    return section
+
+
+def dish_index(value):
+    """0-based dish index from a PATCH body field (an integer or a string of digits); None if absent"""
+    if value is None:
+        return None
+    if isinstance(value, str) and re.fullmatch(r'\s*[0-9]+\s*', value):
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool) and value >= 0:
+        return value
+    raise EditError(f"Index must be a non-negative whole number, not {value!r}")
+
+
+def parse_instruction(instruction):
+    """{"section", "index", "dish", "constraint"} for an instruction string"""
+    instruction = ' '.join(str(instruction).split()).rstrip('.')
+    match = _REPLACE.match(instruction)
+    if match:
+        return {"section": section_name(match['section']), "index": int(match['index']),
+                "dish": match['dish'], "constraint": None}
+    match = _MAKE.match(instruction)
+    if match:
+        rest = match['rest']
+        # Longest alias first, so "main courses vegetarian" is not read as "main" + "courses vegetarian"
+        for alias in sorted(SECTION_ALIASES, key=len, reverse=True):
+            if rest.lower().startswith(alias + ' '):
+                return {"section": SECTION_ALIASES[alias], "index": None, "dish": None,
+                        "constraint": rest[len(alias):].strip()}
+    raise EditError('Unrecognized edit; try "replace desserts[1]" or "make mains vegetarian"')
+
+
+def parse_edit(body, menu):
+    """Validate a PATCH body against the plan's menu; raises EditError"""
+    if not isinstance(body, dict):
+        raise EditError("Edit body must be a JSON object")
+    if body.get('instruction'):
+        edit = parse_instruction(body['instruction'])
+    else:
+        edit = {
+            "section": section_name(body.get('section')),
+            "index": dish_index(body.get('index')),
+            "dish": body.get('dish'),
+            "constraint": body.get('constraint'),
+        }
+        if edit["index"] is None and not edit["constraint"]:
+            raise EditError("Give an index to replace one dish, or a constraint to redo the section")
+
+    items = menu.get(edit["section"]) or []
+    if edit["index"] is not None and not 0 <= edit["index"] < len(items):
+        raise EditError(f"{edit['section']} has {len(items)} dishes; index {edit['index']} is out of range")
+    if edit["index"] is None and edit["dish"]:
+        raise EditError("A replacement dish needs the index of the dish it replaces")
+    if edit["dish"] is not None:
+        edit["dish"] = ' '.join(str(edit["dish"]).split())
+        if not edit["dish"]:
+            raise EditError("Replacement dish is empty")
+    if edit["constraint"]:
+        edit["constraint"] = ' '.join(str(edit["constraint"]).split())[:MAX_CONSTRAINT_CHARS]
+    return edit
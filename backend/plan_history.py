@@ -0,0 +1,255 @@
+"""Append-only history of every generated plan, searchable by cuisine, event type and dish.
+
+Unlike the plan store (the editable state behind PATCH, kept for
+PLAN_RETENTION_SECONDS), the history keeps what was generated: the request,
+menu, grocery list, the models that answered and the latency, so past menus
+can be found and reused instead of paid for again.
+
+- record() only appends to an in-memory queue. A writer thread inserts the
+  queue in batches, one transaction per PLAN_HISTORY_BATCH rows or every
+  PLAN_HISTORY_FLUSH_SECONDS, so request threads never wait on SQLite. A
+  full queue drops records (counted in stats) rather than block; records
+  still queued when a process dies are lost.
+- cuisine and event_type are indexed, and dish names go into an FTS5 index
+  (whole words; a trailing * searches the last word as a prefix).
+- search() pages with a keyset cursor (the last row's seq) and reads rows
+  lazily, so a page costs the same at any depth and any table size.
+
+Configured with PLAN_HISTORY (on/off), PLAN_HISTORY_PATH,
+PLAN_HISTORY_FLUSH_SECONDS, PLAN_HISTORY_BATCH, PLAN_HISTORY_MAX_PENDING and
+PLAN_HISTORY_RETENTION_SECONDS (0 keeps everything).
+"""
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import traceback
+from collections import deque
+
+from menu_stream import MENU_SECTIONS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MAX_PAGE = 500
+PURGE_EVERY = 100
+_TOKEN = re.compile(r'\w+', re.UNICODE)
+
+
+def normalize(value):
+    return ' '.join(str(value).lower().split()) if value is not None else None
+
+
+def dish_query(text):
+    """FTS5 query matching dish names that contain every word of text.
+
+    A trailing * makes the last word a prefix ("grilled sal*"). Whole words
+    are the default because FTS5 reads a long prefix's entire match list
+    before it can page it; prefixes of up to 3 characters use the prefix index.
+    """
+    text = str(text).strip().lower()
+    tokens = _TOKEN.findall(text)
+    if not tokens:
+        return None
+    query = ' '.join(f'"{token}"' for token in tokens)
+    return query + '*' if text.endswith('*') else query
+
+
+class PlanHistory:
+    def __init__(self, path, flush_seconds=0.5, batch_size=500, max_pending=10000, retention_seconds=0):
+        self.path = path
+        self.flush_seconds = flush_seconds
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        self.retention_seconds = retention_seconds
+        self.stats = {"recorded": 0, "written": 0, "dropped": 0, "batches": 0, "errors": 0}
+        self._lock = threading.Lock()
+        self._wake = threading.Condition(self._lock)
+        self._pending = deque()
+        self._writer = None
+        self._stopping = threading.Event()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().executescript("""
+            CREATE TABLE IF NOT EXISTS plan_history (
+                seq INTEGER PRIMARY KEY,
+                plan_id TEXT,
+                created_at REAL NOT NULL,
+                event_type TEXT,
+                cuisine TEXT,
+                guest_count INTEGER,
+                model TEXT,
+                latency_ms REAL,
+                request TEXT NOT NULL,
+                menu TEXT NOT NULL,
+                grocery TEXT,
+                dishes TEXT NOT NULL
+            );
+            -- Each index ends in the rowid (seq), so a filtered page is a range scan in seq order
+            CREATE INDEX IF NOT EXISTS plan_history_cuisine ON plan_history (cuisine);
+            CREATE INDEX IF NOT EXISTS plan_history_event ON plan_history (event_type);
+            CREATE INDEX IF NOT EXISTS plan_history_event_cuisine ON plan_history (event_type, cuisine);
+            CREATE INDEX IF NOT EXISTS plan_history_plan ON plan_history (plan_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS plan_history_dishes USING fts5(
+                dishes, content='plan_history', content_rowid='seq', prefix='2 3'
+            );
+            CREATE TRIGGER IF NOT EXISTS plan_history_insert AFTER INSERT ON plan_history BEGIN
+                INSERT INTO plan_history_dishes (rowid, dishes) VALUES (new.seq, new.dishes);
+            END;
+            CREATE TRIGGER IF NOT EXISTS plan_history_delete AFTER DELETE ON plan_history BEGIN
+                INSERT INTO plan_history_dishes (plan_history_dishes, rowid, dishes)
+                VALUES ('delete', old.seq, old.dishes);
+            END;
+        """)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _start(self):
+        """Start the writer thread once per process"""
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_loop, name="plan-history-writer", daemon=True)
+            self._writer.start()
+
+    def record(self, plan_id, data, menu, grocery, model=None, latency_ms=None):
+        """Queue a generated plan for the writer; never blocks on the database"""
+        row = (
+            plan_id, time.time(), normalize(data.get('event_type')), normalize(data.get('cuisine')),
+            data.get('guest_count'), model, latency_ms, data, menu, grocery,
+        )
+        with self._wake:
+            if len(self._pending) >= self.max_pending:
+                self.stats["dropped"] += 1
+                return False
+            self._pending.append(row)
+            self.stats["recorded"] += 1
+            self._start()
+            if len(self._pending) >= self.batch_size:
+                self._wake.notify()
+        return True
+
+    def flush(self):
+        """Write everything queued so far in one transaction; returns the number of rows written"""
+        with self._lock:
+            rows, self._pending = self._pending, deque()
+        if not rows:
+            return 0
+        values = [
+            (plan_id, created_at, event_type, cuisine, guest_count, model, latency_ms, json.dumps(data),
+             json.dumps(menu), grocery,
+             "\n".join(dish for section in MENU_SECTIONS for dish in menu.get(section) or ()))
+            for plan_id, created_at, event_type, cuisine, guest_count, model, latency_ms, data, menu, grocery in rows
+        ]
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany(
+                "INSERT INTO plan_history (plan_id, created_at, event_type, cuisine, guest_count, model, "
+                "latency_ms, request, menu, grocery, dishes) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            with self._lock:
+                self.stats["errors"] += 1
+            raise
+        with self._lock:
+            self.stats["written"] += len(values)
+            self.stats["batches"] += 1
+            batches = self.stats["batches"]
+        if self.retention_seconds and batches % PURGE_EVERY == 0:
+            conn.execute("DELETE FROM plan_history WHERE created_at < ?", (time.time() - self.retention_seconds,))
+        return len(values)
+
+    def _write_loop(self):
+        while not self._stopping.is_set():
+            with self._wake:
+                if len(self._pending) < self.batch_size and not self._stopping.is_set():
+                    self._wake.wait(self.flush_seconds)
+            try:
+                self.flush()
+            except Exception:
+                traceback.print_exc()
+
+    def stop(self, timeout=30):
+        """Stop the writer and write what is still queued"""
+        self._stopping.set()
+        with self._wake:
+            self._wake.notify()
+        if self._writer is not None:
+            self._writer.join(timeout)
+        self.flush()
+
+    def search(self, cuisine=None, event_type=None, dish=None, cursor=None, limit=50):
+        """Plans matching every given filter, newest first; yields row dicts lazily.
+
+        cursor is the seq of the last row of the previous page. Only rows
+        already written are searched.
+        """
+        limit = max(1, min(int(limit), MAX_PAGE))
+        clauses, params = [], []
+        if dish:
+            query = dish_query(dish)
+            if query is None:
+                return
+            source = "plan_history_dishes JOIN plan_history h ON h.seq = plan_history_dishes.rowid"
+            clauses.append("plan_history_dishes MATCH ?")
+            params.append(query)
+            order = "plan_history_dishes.rowid"
+        else:
+            source = "plan_history h"
+            order = "h.seq"
+        for column, value in (("cuisine", cuisine), ("event_type", event_type)):
+            if value:
+                clauses.append(f"h.{column} = ?")
+                params.append(normalize(value))
+        if cursor is not None:
+            clauses.append(f"{order} < ?")
+            params.append(int(cursor))
+        where = f"WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._connect().execute(
+            f"SELECT h.seq, h.plan_id, h.created_at, h.event_type, h.cuisine, h.guest_count, h.model, "
+            f"h.latency_ms, h.request, h.menu, h.grocery FROM {source} {where} ORDER BY {order} DESC LIMIT ?",
+            params + [limit]
+        )
+        for row in rows:
+            yield {
+                "seq": row["seq"],
+                "plan_id": row["plan_id"],
+                "created_at": row["created_at"],
+                "event_type": row["event_type"],
+                "cuisine": row["cuisine"],
+                "guest_count": row["guest_count"],
+                "model": row["model"],
+                "latency_ms": row["latency_ms"],
+                "request": json.loads(row["request"]),
+                "menu": json.loads(row["menu"]),
+                "grocery_list": row["grocery"],
+            }
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, pending=len(self._pending))
+
+
+def create_history():
+    """Build the plan history from environment settings (None when disabled)"""
+    if os.getenv('PLAN_HISTORY', 'on').lower() in ('off', 'none', '0', 'false'):
+        return None
+    return PlanHistory(
+        os.getenv('PLAN_HISTORY_PATH', os.path.join(BASE_DIR, 'cache', 'plan_history.sqlite3')),
+        flush_seconds=float(os.getenv('PLAN_HISTORY_FLUSH_SECONDS', 0.5)),
+        batch_size=int(os.getenv('PLAN_HISTORY_BATCH', 500)),
+        max_pending=int(os.getenv('PLAN_HISTORY_MAX_PENDING', 10000)),
+        retention_seconds=float(os.getenv('PLAN_HISTORY_RETENTION_SECONDS', 0)),
+    )
@@ -0,0 +1,120 @@
+"""Server-side plan state, so a plan can be edited without resending it.
+
+Every successful /api/plan response gets a plan_id. The store keeps the
+request fields, the menu, the grocery list text and, when the list was scaled
+from the ingredient index, the per-ingredient base quantities it was rendered
+from; PATCH /api/plan/<id> adjusts those quantities for the changed dishes
+instead of rebuilding the list.
+
+Each plan carries a version. update() only succeeds against the version the
+caller read, so two concurrent edits of one plan cannot silently overwrite
+each other (the loser gets a conflict and retries).
+
+Configured with PLAN_DB_PATH and PLAN_RETENTION_SECONDS.
+"""
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+PURGE_EVERY = 1000
+
+
+class PlanStore:
+    def __init__(self, path, retention_seconds=30 * 86400):
+        self.path = path
+        self.retention_seconds = retention_seconds
+        self.stats = {"created": 0, "updated": 0, "conflicts": 0}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._connect().execute("""
+            CREATE TABLE IF NOT EXISTS plans (
+                id TEXT PRIMARY KEY,
+                request TEXT NOT NULL,
+                menu TEXT NOT NULL,
+                grocery TEXT,
+                totals TEXT,
+                version INTEGER NOT NULL DEFAULT 1,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+        """)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+            return self.stats[name]
+
+    @staticmethod
+    def _encode_totals(totals):
+        return json.dumps({str(ingredient_id): quantity for ingredient_id, quantity in totals.items()}) \
+            if totals is not None else None
+
+    def create(self, data, menu, grocery, totals=None):
+        """Store a new plan; returns its id"""
+        plan_id = uuid.uuid4().hex
+        now = time.time()
+        self._connect().execute(
+            "INSERT INTO plans (id, request, menu, grocery, totals, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (plan_id, json.dumps(data), json.dumps(menu), grocery, self._encode_totals(totals), now, now)
+        )
+        if self._count("created") % PURGE_EVERY == 0:
+            self._connect().execute("DELETE FROM plans WHERE updated_at < ?", (now - self.retention_seconds,))
+        return plan_id
+
+    def get(self, plan_id):
+        row = self._connect().execute("SELECT * FROM plans WHERE id = ?", (plan_id,)).fetchone()
+        if row is None:
+            return None
+        totals = json.loads(row["totals"]) if row["totals"] is not None else None
+        return {
+            "id": row["id"],
+            "request": json.loads(row["request"]),
+            "menu": json.loads(row["menu"]),
+            "grocery": row["grocery"],
+            "totals": {int(key): value for key, value in totals.items()} if totals is not None else None,
+            "version": row["version"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def update(self, plan_id, version, menu, grocery, totals=None):
+        """Save an edit made against `version`; returns the new version, or None on a conflict"""
+        cursor = self._connect().execute(
+            "UPDATE plans SET menu = ?, grocery = ?, totals = ?, version = version + 1, updated_at = ? "
+            "WHERE id = ? AND version = ?",
+            (json.dumps(menu), grocery, self._encode_totals(totals), time.time(), plan_id, version)
+        )
+        if not cursor.rowcount:
+            self._count("conflicts")
+            return None
+        self._count("updated")
+        return version + 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats)
+
+
+def create_store():
+    """Build the plan store from environment settings"""
+    return PlanStore(
+        os.getenv('PLAN_DB_PATH', os.path.join(BASE_DIR, 'cache', 'plans.sqlite3')),
+        retention_seconds=float(os.getenv('PLAN_RETENTION_SECONDS', 30 * 86400)),
+    )
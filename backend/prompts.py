@@ -0,0 +1,232 @@
+"""Prompt templates for the LLM calls, rendered compactly and kept under a token budget.
+
+Every prompt is built from a named template of a template version. Rendering
+dedents the text, trims each line and drops blank lines, so source indentation
+is never sent. Menus are encoded one section per line ("Appetizers: A; B")
+instead of a bulleted block or indented JSON, and user-supplied fields are
+whitespace-collapsed and clipped so one oversized field cannot blow up a prompt.
+
+Token counts are estimated locally (no tokenizer download); a rendered prompt
+above the budget raises PromptTooLongError before anything is sent.
+
+Version "v1" holds the original verbose prompts and is kept for comparison
+(see bench_prompts.py); "v2" is the compact default. Menu prompts are sent with
+a JSON schema response_format, so v2 drops the format example the schema
+already enforces.
+
+Configured with PROMPT_VERSION, PROMPT_TOKEN_BUDGET and PROMPT_FIELD_MAX_CHARS.
+"""
+import math
+import os
+import re
+import textwrap
+
+DEFAULT_VERSION = os.getenv('PROMPT_VERSION', 'v2')
+TOKEN_BUDGET = int(os.getenv('PROMPT_TOKEN_BUDGET', 1500))
+FIELD_MAX_CHARS = int(os.getenv('PROMPT_FIELD_MAX_CHARS', 100))
+
+EVENT_FIELDS = ['event_type', 'cuisine', 'formality', 'level', 'dietary_restrictions']
+
+TEMPLATES = {
+    "v1": {
+        "menu": """
+            Create a menu for a {formality} {event_type} event with {guest_count} guests.
+            Cuisine style: {cuisine}
+            Cooking Level: {level}
+
+            Provide the menu in this format:
+
+            Appetizers:
+            - Appetizer 1
+            - Appetizer 2
+
+            Main Courses:
+            - Main Course 1
+            - Main Course 2
+
+            Desserts:
+            - Dessert 1
+            - Dessert 2
+
+            Beverages:
+            - Beverage 1
+            - Beverage 2
+
+            Notes: Preparation instructions or special notes
+        """,
+        "grocery": """
+            Create a grocery shopping list for {guest_count} people based on this menu:
+            {menu_bullets}
+
+            Provide the list in this format:
+            - Item 1 (quantity)
+            - Item 2 (quantity)
+            - Item 3 (quantity)
+        """,
+        "plan": """
+            Create a menu for a {formality} {event_type} event with {guest_count} guests.
+            Cuisine style: {cuisine}
+            Cooking Level: {level}
+
+            Provide 2 appetizers, 2 main courses, 2 desserts, 2 beverages and preparation notes.
+
+            Also provide the grocery shopping list for {guest_count} people for that menu,
+            with the name, total quantity, unit and store category of every item.
+        """,
+        "section": """
+            Suggest {count} new {section} for a {formality} {cuisine} {event_type} event
+            with {guest_count} guests. Cooking Level: {level}
+            {constraint_line}
+            The menu already has these {section}: {keep}
+            Do not suggest any of these dishes again: {avoid}
+        """,
+        "ingredients": """
+            List the ingredients for ONE serving of each of these dishes:
+            {dish_bullets}
+
+            Respond only with JSON mapping each dish name to its ingredients, e.g.
+            {{"Dish name": [{{"name": "tomatoes", "quantity": 80, "unit": "g", "category": "produce"}}]}}
+            Use only these units: g, kg, ml, l, tsp, tbsp, cup, pcs, clove.
+        """,
+    },
+    "v2": {
+        "menu": """
+            Menu for a {formality} {event_type}, {guest_count} guests.
+            Cuisine: {cuisine}. Cooking level: {level}.
+            Give 2 appetizers, 2 main courses, 2 desserts, 2 beverages and short preparation notes.
+        """,
+        "grocery": """
+            Grocery list for {guest_count} people for this menu:
+            {menu_compact}
+            One line per item: - Item (quantity)
+        """,
+        "plan": """
+            Menu for a {formality} {event_type}, {guest_count} guests.
+            Cuisine: {cuisine}. Cooking level: {level}.
+            Give 2 appetizers, 2 main courses, 2 desserts, 2 beverages and short preparation notes,
+            plus the grocery list for {guest_count} people: name, total quantity, unit
+            (g, kg, ml, l, tsp, tbsp, cup, pcs, clove) and store category per item.
+        """,
+        "section": """
+            {count} new {section} for a {formality} {cuisine} {event_type}, {guest_count} guests, level {level}.
+            {constraint_line}
+            Already on the menu: {keep}
+            Avoid: {avoid}
+        """,
+        "ingredients": """
+            Ingredients for ONE serving of each dish: {dish_list}
+            JSON only, dish name -> ingredients, e.g.
+            {{"Dish": [{{"name": "tomatoes", "quantity": 80, "unit": "g", "category": "produce"}}]}}
+            Units: g, kg, ml, l, tsp, tbsp, cup, pcs, clove.
+        """,
+    },
+}
+
+_TOKEN_PIECES = re.compile(r"[A-Za-z]+|\d+|\s{2,}|[^\sA-Za-z\d]")
+
+
+class PromptTooLongError(Exception):
+    """Raised when a rendered prompt is estimated above the token budget"""
+
+
+def estimate_tokens(text):
+    """Approximate BPE token count: short words are one token, long words and numbers split"""
+    count = 0
+    for piece in _TOKEN_PIECES.findall(text):
+        if piece[0].isalpha():
+            count += math.ceil(len(piece) / 6)
+        elif piece[0].isdigit():
+            count += math.ceil(len(piece) / 3)
+        else:
+            # punctuation, or a run of whitespace such as indentation
+            count += 1
+    return count
+
+
+def squeeze(text):
+    """Dedent, trim every line and drop blank lines"""
+    lines = (line.strip() for line in textwrap.dedent(text).splitlines())
+    return "\n".join(line for line in lines if line)
+
+
+def clip(value, limit=None):
+    """Collapse whitespace in a user-supplied field and cut it to the field limit"""
+    limit = limit or FIELD_MAX_CHARS
+    text = " ".join(str(value if value is not None else '').split())
+    return text if len(text) <= limit else text[:limit].rstrip() + "…"
+
+
+def menu_sections(menu):
+    """(label, dish names) for each non-empty section of a menu.
+
+    Accepts MenuModel dicts ({"appetizers": [...]}) and the app2 course shape
+    ({"courses": [{"name": ..., "dishes": [{"name": ...}]}]}); dish descriptions
+    are left out since a dish name is enough to shop for it.
+    """
+    if isinstance(menu.get('courses'), list):
+        return [(clip(course.get('name')), [clip(dish.get('name') if isinstance(dish, dict) else dish)
+                                            for dish in course.get('dishes') or []])
+                for course in menu['courses'] if isinstance(course, dict) and course.get('dishes')]
+    return [(key.replace('_', ' ').capitalize(), [clip(item) for item in items])
+            for key, items in menu.items() if items and isinstance(items, list)]
+
+
+def compact_menu(menu):
+    """One line per section: "Appetizers: Bruschetta; Caprese Skewers\""""
+    return "\n".join(f"{label}: {'; '.join(items)}" for label, items in menu_sections(menu))
+
+
+def bulleted_menu(menu):
+    """The original "section:\\n- item" encoding, used by the v1 templates"""
+    return "\n".join(f"{section}:\n" + "\n".join(f"- {clip(item)}" for item in items)
+                     for section, items in menu.items() if items and isinstance(items, list))
+
+
+def render(name, version=None, budget=None, **fields):
+    """Render a template; raises PromptTooLongError if the estimate exceeds the budget"""
+    version = version or DEFAULT_VERSION
+    try:
+        template = TEMPLATES[version][name]
+    except KeyError:
+        raise ValueError(f"Unknown prompt template {version}/{name}")
+    text = squeeze(template.format(**fields))
+    budget = budget or TOKEN_BUDGET
+    tokens = estimate_tokens(text)
+    if tokens > budget:
+        raise PromptTooLongError(f"Prompt {version}/{name} is ~{tokens} tokens, over the {budget} token budget")
+    return text
+
+
+def menu_prompt(data, version=None, **options):
+    fields = {field: clip(data.get(field)) for field in EVENT_FIELDS}
+    fields['guest_count'] = clip(data.get('guest_count'), 10)
+    return render("menu", version, **fields, **options)
+
+
+def plan_prompt(data, version=None, **options):
+    """Menu plus grocery list in one structured call (PLAN_MODE=combined)"""
+    fields = {field: clip(data.get(field)) for field in EVENT_FIELDS}
+    fields['guest_count'] = clip(data.get('guest_count'), 10)
+    return render("plan", version, **fields, **options)
+
+
+def section_prompt(data, section, count, keep, avoid, constraint=None, version=None, **options):
+    """New dishes for one menu section (PATCH /api/plan/<id>), without resending the rest of the plan"""
+    fields = {field: clip(data.get(field)) for field in EVENT_FIELDS}
+    fields['guest_count'] = clip(data.get('guest_count'), 10)
+    return render("section", version, count=count, section=section.replace('_', ' '),
+                  keep="; ".join(clip(dish) for dish in keep) or "-",
+                  avoid="; ".join(clip(dish) for dish in avoid) or "-",
+                  constraint_line=f"Every dish must be: {clip(constraint)}" if constraint else "",
+                  **fields, **options)
+
+
+def grocery_prompt(menu, guest_count, version=None, **options):
+    return render("grocery", version, guest_count=clip(guest_count, 10),
+                  menu_compact=compact_menu(menu), menu_bullets=bulleted_menu(menu), **options)
+
+
+def ingredient_prompt(dishes, version=None, **options):
+    dishes = [clip(dish) for dish in dishes]
+    return render("ingredients", version, dish_list="; ".join(dishes),
+                  dish_bullets="\n".join(f"- {dish}" for dish in dishes), **options)
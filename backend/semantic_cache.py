@@ -0,0 +1,235 @@
+"""Near-duplicate menu cache on hashed feature vectors and a NumPy index.
+
+The exact-match cache in menu_cache only helps when the canonical fields are
+identical. This cache embeds each free-text field (event type, cuisine,
+formality) separately with the hashing trick: normalized words plus character
+trigrams, signed-hashed into a fixed number of dimensions. A stored menu is
+served when every field's cosine similarity clears the threshold, the cooking
+level and dietary restrictions match exactly, and the guest counts are within
+a ratio of each other, so "Italian cuisine, birthday party, 48 guests" reuses
+the menu made for "italian, birthday, 50 guests".
+
+Menus carry no quantities; grocery lists are scaled from the ingredient index
+for the caller's exact guest count, so a reused menu still gets a correctly
+sized list.
+
+Configured with SEMANTIC_CACHE (on/off), SEMANTIC_CACHE_THRESHOLD,
+SEMANTIC_CACHE_GUEST_RATIO, SEMANTIC_CACHE_MAX_ENTRIES and SEMANTIC_CACHE_PATH.
+"""
+import atexit
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+TEXT_FIELDS = ['event_type', 'cuisine', 'formality']
+DIMENSIONS = 256
+STOPWORDS = {
+    'a', 'an', 'the', 'and', 'of', 'for', 'with', 'style', 'styled', 'cuisine', 'food',
+    'foods', 'dishes', 'menu', 'party', 'event', 'celebration', 'themed', 'theme',
+}
+TRIGRAM_WEIGHT = 0.5
+
+
+def normalize(text):
+    """Lowercase words without filler ("Italian cuisine" -> ["italian"])"""
+    words = re.findall(r"[a-z0-9]+", str(text or '').lower())
+    words = [word[:-1] if len(word) > 3 and word.endswith('s') else word for word in words]
+    return [word for word in words if word not in STOPWORDS]
+
+
+def _bucket(feature):
+    digest = hashlib.blake2b(feature.encode(), digest_size=8).digest()
+    value = int.from_bytes(digest, 'little')
+    return value % DIMENSIONS, 1.0 if value >> 63 else -1.0
+
+
+def embed_text(text):
+    """Unit-length hashing-trick vector of a field's words and character trigrams"""
+    vector = np.zeros(DIMENSIONS, dtype=np.float32)
+    words = normalize(text)
+    for word in words:
+        index, sign = _bucket(f"w:{word}")
+        vector[index] += sign
+        padded = f"#{word}#"
+        for start in range(len(padded) - 2):
+            index, sign = _bucket(f"c:{padded[start:start + 3]}")
+            vector[index] += sign * TRIGRAM_WEIGHT
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def embed_event(data):
+    """(fields x dimensions) matrix, one embedding per free-text field"""
+    return np.stack([embed_text(data.get(field)) for field in TEXT_FIELDS])
+
+
+def partition(data):
+    """Fields that must match exactly for a menu to be reused"""
+    level = str(data.get('level', '')).strip().lower()
+    dietary = sorted(set(normalize(data.get('dietary_restrictions'))) - {'none', 'no'})
+    return f"{level}|{','.join(dietary)}"
+
+
+class SemanticCache:
+    """Fixed-capacity vector index; the least recently used entry is evicted when full"""
+
+    def __init__(self, max_entries=5000, threshold=0.85, guest_ratio=1.5, path=None, save_every=20):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.max_guest_log_ratio = math.log(guest_ratio)
+        self.path = path
+        self.save_every = save_every
+        self.vectors = np.zeros((max_entries, len(TEXT_FIELDS), DIMENSIONS), dtype=np.float32)
+        self.log_guests = np.zeros(max_entries, dtype=np.float32)
+        self.last_used = np.zeros(max_entries, dtype=np.float64)
+        self.partitions = [None] * max_entries
+        self.partition_ids = np.full(max_entries, -1, dtype=np.int32)
+        self._partition_index = {}
+        self.menus = [None] * max_entries
+        self.size = 0
+        self._unsaved = 0
+        self._lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "inserts": 0, "evictions": 0}
+        if path:
+            self.load()
+
+    @staticmethod
+    def _log_guests(data):
+        try:
+            return math.log(max(1, int(data.get('guest_count'))))
+        except (TypeError, ValueError):
+            return 0.0
+
+    def _partition_id(self, part):
+        return self._partition_index.setdefault(part, len(self._partition_index))
+
+    def _search(self, vectors, part, log_guests):
+        """Best (slot, score) among entries in the same partition and guest range"""
+        if part not in self._partition_index or not self.size:
+            return None, 0.0
+        size = self.size
+        eligible = (self.partition_ids[:size] == self._partition_index[part]) & \
+                   (np.abs(self.log_guests[:size] - log_guests) <= self.max_guest_log_ratio)
+        if not eligible.any():
+            return None, 0.0
+        # Per-field cosine similarity; an entry only scores as high as its worst field
+        scores = np.einsum('nfd,fd->nf', self.vectors[:size], vectors).min(axis=1)
+        scores[~eligible] = -1.0
+        best = int(np.argmax(scores))
+        return best, float(scores[best])
+
+    def lookup(self, data):
+        """Return (menu, similarity) for the closest stored event above the threshold, else (None, score)"""
+        vectors = embed_event(data)
+        with self._lock:
+            slot, score = self._search(vectors, partition(data), self._log_guests(data))
+            if slot is None or score < self.threshold:
+                self.stats["misses"] += 1
+                return None, score
+            self.last_used[slot] = time.time()
+            self.stats["hits"] += 1
+            return self.menus[slot], score
+
+    def add(self, data, menu):
+        vectors = embed_event(data)
+        part = partition(data)
+        log_guests = self._log_guests(data)
+        with self._lock:
+            slot, score = self._search(vectors, part, log_guests)
+            if slot is None or score < 0.999:
+                if self.size < self.max_entries:
+                    slot = self.size
+                    self.size += 1
+                else:
+                    slot = int(np.argmin(self.last_used[:self.size]))
+                    self.stats["evictions"] += 1
+            self.vectors[slot] = vectors
+            self.log_guests[slot] = log_guests
+            self.partitions[slot] = part
+            self.partition_ids[slot] = self._partition_id(part)
+            self.menus[slot] = menu
+            self.last_used[slot] = time.time()
+            self.stats["inserts"] += 1
+            self._unsaved += 1
+            should_save = self.path and self._unsaved >= self.save_every
+        if should_save:
+            self.save()
+
+    def save(self):
+        """Write the index atomically (vectors in .npz, menus and partitions as JSON inside it)"""
+        if not self.path:
+            return
+        with self._lock:
+            size = self.size
+            payload = {
+                "vectors": self.vectors[:size].copy(),
+                "log_guests": self.log_guests[:size].copy(),
+                "last_used": self.last_used[:size].copy(),
+                "records": np.array(json.dumps({"partitions": self.partitions[:size], "menus": self.menus[:size]})),
+            }
+            self._unsaved = 0
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            np.savez_compressed(f, **payload)
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with np.load(self.path) as saved:
+                vectors = saved["vectors"]
+                log_guests = saved["log_guests"]
+                last_used = saved["last_used"]
+                records = json.loads(str(saved["records"]))
+        except Exception as e:
+            print(f"⚠️ Could not load semantic cache from {self.path}: {e}")
+            return
+        if vectors.shape[1:] != self.vectors.shape[1:]:
+            print("⚠️ Semantic cache on disk uses different dimensions, starting empty")
+            return
+        # Keep the most recently used entries if the file holds more than fit
+        keep = np.argsort(last_used)[::-1][:self.max_entries]
+        size = len(keep)
+        self.vectors[:size] = vectors[keep]
+        self.log_guests[:size] = log_guests[keep]
+        self.last_used[:size] = last_used[keep]
+        self.partitions[:size] = [records["partitions"][i] for i in keep]
+        self.menus[:size] = [records["menus"][i] for i in keep]
+        self.partition_ids[:size] = [self._partition_id(part) for part in self.partitions[:size]]
+        self.size = size
+        print(f"🧠 Loaded {size} menus into the semantic cache")
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["entries"] = self.size
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+        stats["memory_bytes"] = int(self.vectors.nbytes + self.log_guests.nbytes + self.last_used.nbytes)
+        return stats
+
+
+def create_semantic_cache():
+    """Build the semantic cache from environment settings (None when disabled)"""
+    if os.getenv('SEMANTIC_CACHE', 'on').lower() in ('off', 'none', '0', 'false'):
+        return None
+    path = os.getenv('SEMANTIC_CACHE_PATH', os.path.join(BASE_DIR, 'cache', 'semantic_menus.npz'))
+    cache = SemanticCache(
+        max_entries=int(os.getenv('SEMANTIC_CACHE_MAX_ENTRIES', 5000)),
+        threshold=float(os.getenv('SEMANTIC_CACHE_THRESHOLD', 0.85)),
+        guest_ratio=float(os.getenv('SEMANTIC_CACHE_GUEST_RATIO', 1.5)),
+        path=path or None,
+    )
+    if cache.path:
+        atexit.register(cache.save)
+    return cache
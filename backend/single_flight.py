@@ -0,0 +1,274 @@
+"""Coalesce identical concurrent LLM calls into one upstream request.
+
+Within a process, the first caller for a key runs the call and later callers
+wait on its result. Across processes on the host, the leader claims the key in
+a small SQLite table and publishes its result there; a leader in another
+process that finds the key claimed polls for the result instead of calling the
+provider. Published results are kept for SINGLE_FLIGHT_RESULT_TTL seconds so
+requests that arrive just after the call finished still share it. If the
+owning process dies, its claim expires after SINGLE_FLIGHT_TIMEOUT and the next
+caller takes over.
+
+ado() is the same for coroutines (the async /api/plan pipeline). Sync and
+async callers share one table of flights, and an async caller waits for the
+leader without holding a thread.
+
+Configured with SINGLE_FLIGHT (on/off), SINGLE_FLIGHT_PATH ("" for in-process
+only), SINGLE_FLIGHT_TIMEOUT and SINGLE_FLIGHT_RESULT_TTL.
+"""
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+class _Flight:
+    __slots__ = ("done", "result", "error", "abandoned", "waiters")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        # An async leader that was cancelled leaves its followers to call fn() themselves
+        self.abandoned = False
+        # Wake-ups for async followers, called once the flight is done
+        self.waiters = []
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class SingleFlight:
+    def __init__(self, path=None, timeout=120.0, result_ttl=30.0, poll_interval=0.05):
+        self.path = path
+        self.timeout = timeout
+        self.result_ttl = result_ttl
+        self.poll_interval = poll_interval
+        self.owner = uuid.uuid4().hex
+        self.stats = {"upstream_calls": 0, "shared_in_process": 0, "shared_across_processes": 0,
+                      "takeovers": 0}
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        if path:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self._connect().execute("""
+                CREATE TABLE IF NOT EXISTS flights (
+                    key TEXT PRIMARY KEY,
+                    owner TEXT NOT NULL,
+                    started_at REAL NOT NULL,
+                    result TEXT,
+                    finished_at REAL
+                )
+            """)
+
+    def _connect(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def do(self, key, fn, shareable=lambda result: True):
+        """Return fn() for key, sharing one call among concurrent callers.
+
+        Only results for which shareable(result) is true are published to other
+        processes (errors are not); callers in this process always share the
+        leader's outcome.
+        """
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+
+        if not leader:
+            if flight.done.wait(self.timeout) and not flight.abandoned:
+                self._count("shared_in_process")
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+            self._count("takeovers")
+            return fn()
+
+        try:
+            flight.result = self._lead(key, fn, shareable)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    async def ado(self, key, fn, shareable=lambda result: True):
+        """Return await fn() for key; do() for coroutines, sharing flights with sync callers"""
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                waiter = loop.create_future()
+                flight.waiters.append(lambda: loop.call_soon_threadsafe(_wake, waiter))
+
+        if not leader:
+            try:
+                await asyncio.wait_for(waiter, self.timeout)
+            except asyncio.TimeoutError:
+                pass
+            if flight.done.is_set() and not flight.abandoned:
+                self._count("shared_in_process")
+                if flight.error is not None:
+                    raise flight.error
+                return flight.result
+            self._count("takeovers")
+            return await fn()
+
+        try:
+            flight.result = await self._alead(key, fn, shareable)
+            return flight.result
+        except asyncio.CancelledError:
+            flight.abandoned = True
+            raise
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def _land(self, key, flight):
+        """Finish a flight: later callers lead their own, waiting ones get its outcome"""
+        with self._lock:
+            del self._flights[key]
+            waiters = flight.waiters
+        flight.done.set()
+        for wake in waiters:
+            wake()
+
+    def _lead(self, key, fn, shareable):
+        if not self.path:
+            self._count("upstream_calls")
+            return fn()
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            state, value = self._claim(key)
+            if state == "result":
+                self._count("shared_across_processes")
+                return value
+            if state == "claimed":
+                break
+            if time.monotonic() > deadline:
+                self._count("takeovers")
+                break
+            time.sleep(self.poll_interval)
+
+        self._count("upstream_calls")
+        try:
+            result = fn()
+        except Exception:
+            self._release(key)
+            raise
+        if shareable(result):
+            self._publish(key, result)
+        else:
+            self._release(key)
+        return result
+
+    async def _alead(self, key, fn, shareable):
+        """_lead() for coroutines; the SQLite claim and publish run on worker threads"""
+        if not self.path:
+            self._count("upstream_calls")
+            return await fn()
+
+        deadline = time.monotonic() + self.timeout
+        while True:
+            state, value = await asyncio.to_thread(self._claim, key)
+            if state == "result":
+                self._count("shared_across_processes")
+                return value
+            if state == "claimed":
+                break
+            if time.monotonic() > deadline:
+                self._count("takeovers")
+                break
+            await asyncio.sleep(self.poll_interval)
+
+        self._count("upstream_calls")
+        try:
+            result = await fn()
+        except BaseException:
+            await asyncio.shield(asyncio.to_thread(self._release, key))
+            raise
+        if shareable(result):
+            await asyncio.to_thread(self._publish, key, result)
+        else:
+            await asyncio.to_thread(self._release, key)
+        return result
+
+    def _claim(self, key):
+        """("result", value) if published, ("waiting", None) if another owner runs it, else claim it"""
+        conn = self._connect()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT owner, started_at, result, finished_at FROM flights WHERE key = ?",
+                               (key,)).fetchone()
+            if row:
+                owner, started_at, result, finished_at = row
+                if finished_at is not None and finished_at > now - self.result_ttl:
+                    conn.execute("COMMIT")
+                    return "result", json.loads(result)
+                if finished_at is None and owner != self.owner and started_at > now - self.timeout:
+                    conn.execute("COMMIT")
+                    return "waiting", None
+            conn.execute("INSERT OR REPLACE INTO flights (key, owner, started_at) VALUES (?, ?, ?)",
+                         (key, self.owner, now))
+            conn.execute("COMMIT")
+            return "claimed", None
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def _publish(self, key, result):
+        conn = self._connect()
+        now = time.time()
+        conn.execute("UPDATE flights SET result = ?, finished_at = ? WHERE key = ? AND owner = ?",
+                     (json.dumps(result), now, key, self.owner))
+        conn.execute("DELETE FROM flights WHERE finished_at < ?", (now - self.result_ttl,))
+
+    def _release(self, key):
+        self._connect().execute("DELETE FROM flights WHERE key = ? AND owner = ? AND finished_at IS NULL",
+                                (key, self.owner))
+
+    def snapshot(self):
+        with self._lock:
+            stats = dict(self.stats)
+            stats["in_flight"] = len(self._flights)
+        stats["saved_calls"] = stats["shared_in_process"] + stats["shared_across_processes"]
+        return stats
+
+
+def create_single_flight():
+    """Build the coalescer from environment settings (None when disabled)"""
+    if os.getenv('SINGLE_FLIGHT', 'on').lower() in ('off', 'none', '0', 'false'):
+        return None
+    path = os.getenv('SINGLE_FLIGHT_PATH', os.path.join(BASE_DIR, 'cache', 'singleflight.sqlite3'))
+    return SingleFlight(
+        path=path or None,
+        timeout=float(os.getenv('SINGLE_FLIGHT_TIMEOUT', 120)),
+        result_ttl=float(os.getenv('SINGLE_FLIGHT_RESULT_TTL', 30)),
+    )
@@ -0,0 +1,189 @@
+"""Speculative menus started from a partly filled form and claimed by the submit.
+
+The page posts the form to /api/plan/prefetch (debounced) as soon as event
+type, cuisine and formality are chosen. start() generates that event's menu
+in the background and keeps it under the browser's session id; claim() at
+submit returns it if the submitted event has the same menu key, waiting for
+a speculation that is still running, and cancels it otherwise. A newer
+prefetch from the same session replaces (and cancels) the older one, and a
+cancelled speculation closes its stream so the provider stops generating.
+
+Speculation must never cost the real requests their rate limit, so it is
+bounded three ways: a token bucket per client (SPECULATION_CLIENT_RATE per
+minute, bursts of SPECULATION_CLIENT_BURST), at most SPECULATION_MAX_RUNNING
+generations at once across all clients, and none while busy() reports the
+upstream is already queueing. Memory is bounded by SPECULATION_MAX_ENTRIES
+sessions (least recently used evicted first) and SPECULATION_TTL_SECONDS
+since a session's last prefetch; entries are one menu each.
+
+Configured with SPECULATION (on/off), SPECULATION_TTL_SECONDS,
+SPECULATION_MAX_ENTRIES, SPECULATION_CLIENT_RATE, SPECULATION_CLIENT_BURST,
+SPECULATION_MAX_RUNNING and SPECULATION_WAIT_SECONDS (how long a submit
+waits for a running speculation).
+"""
+import os
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+
+class Speculation:
+    """One background menu generation for one session"""
+
+    def __init__(self, key, client):
+        self.key = key
+        self.client = client
+        self.touched = time.monotonic()
+        self.cancelled = threading.Event()
+        self.done = threading.Event()
+        self.menu = None
+
+
+class SpeculationCache:
+    def __init__(self, generate, ttl_seconds=120, max_entries=256, client_rate=6, client_burst=3,
+                 max_running=2, wait_seconds=60, busy=None):
+        # generate(data, cancelled) -> menu dict, or None once cancelled is set
+        self.generate = generate
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.client_rate = client_rate / 60
+        self.client_burst = client_burst
+        self.max_running = max_running
+        self.wait_seconds = wait_seconds
+        self.busy = busy
+        self.stats = {"started": 0, "hits": 0, "waited": 0, "mismatched": 0, "cancelled": 0,
+                      "failed": 0, "expired": 0, "over_budget": 0, "at_capacity": 0,
+                      "upstream_busy": 0}
+        self._entries = OrderedDict()
+        self._budgets = {}
+        self._running = 0
+        self._lock = threading.Lock()
+        self._pool = ThreadPoolExecutor(max_workers=max_running, thread_name_prefix="speculation")
+
+    def _cancel(self, speculation, reason="cancelled"):
+        if not speculation.done.is_set() and not speculation.cancelled.is_set():
+            speculation.cancelled.set()
+            self.stats[reason] += 1
+
+    def _expire(self, now):
+        while self._entries:
+            session, speculation = next(iter(self._entries.items()))
+            if now - speculation.touched < self.ttl_seconds and len(self._entries) <= self.max_entries:
+                break
+            del self._entries[session]
+            self._cancel(speculation, "expired")
+        for client, (_, updated) in list(self._budgets.items()):
+            if (now - updated) * self.client_rate >= self.client_burst:
+                del self._budgets[client]  # back to a full bucket; no need to remember it
+
+    def _take(self, client, now):
+        """One token from the client's bucket, or False"""
+        tokens, updated = self._budgets.get(client, (self.client_burst, now))
+        tokens = min(self.client_burst, tokens + (now - updated) * self.client_rate)
+        if tokens < 1:
+            return False
+        self._budgets[client] = (tokens - 1, now)
+        return True
+
+    def start(self, session, client, key, data):
+        """Speculate on data for a session.
+
+        Returns "started", "running", "ready", or why it did not start:
+        "at_capacity" (max_running speculations already generating),
+        "upstream_busy" (busy() reports queueing) or "over_budget".
+        """
+        now = time.monotonic()
+        with self._lock:
+            self._expire(now)
+            current = self._entries.get(session)
+            if current and current.key == key and not current.cancelled.is_set():
+                if not current.done.is_set() or current.menu:
+                    current.touched = now
+                    self._entries.move_to_end(session)
+                    return "ready" if current.menu else "running"
+            if current:
+                # The form changed; whatever happens next, the old guess is wasted work
+                del self._entries[session]
+                self._cancel(current)
+            if self._running >= self.max_running:
+                self.stats["at_capacity"] += 1
+                return "at_capacity"
+            if self.busy and self.busy():
+                self.stats["upstream_busy"] += 1
+                return "upstream_busy"
+            if not self._take(client, now):
+                self.stats["over_budget"] += 1
+                return "over_budget"
+            speculation = Speculation(key, client)
+            self._entries[session] = speculation
+            self._expire(now)
+            self._running += 1
+            self.stats["started"] += 1
+        self._pool.submit(self._run, speculation, data)
+        return "started"
+
+    def _run(self, speculation, data):
+        try:
+            if not speculation.cancelled.is_set():
+                speculation.menu = self.generate(data, speculation.cancelled)
+        except Exception:
+            traceback.print_exc()
+            with self._lock:
+                self.stats["failed"] += 1
+        finally:
+            with self._lock:
+                self._running -= 1
+            speculation.done.set()
+
+    def claim(self, session, key):
+        """The session's speculative menu if it was for this key (waiting for it if still running), else None"""
+        with self._lock:
+            speculation = self._entries.pop(session, None)
+            if speculation is None:
+                return None
+            if speculation.key != key:
+                self.stats["mismatched"] += 1
+                self._cancel(speculation)
+                return None
+            running = not speculation.done.is_set()
+        if running:
+            with self._lock:
+                self.stats["waited"] += 1
+            if not speculation.done.wait(self.wait_seconds):
+                with self._lock:
+                    self._cancel(speculation)
+                return None
+        if speculation.menu:
+            with self._lock:
+                self.stats["hits"] += 1
+        return speculation.menu
+
+    def stop(self):
+        """Cancel every running speculation (worker shutdown)"""
+        with self._lock:
+            for speculation in self._entries.values():
+                self._cancel(speculation)
+            self._entries.clear()
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), running=self._running)
+
+
+def create_speculation(generate, busy=None):
+    """Build the speculation cache from environment settings (None when disabled)"""
+    if os.getenv('SPECULATION', 'on').lower() in ('off', 'none', '0', 'false'):
+        return None
+    return SpeculationCache(
+        generate,
+        ttl_seconds=float(os.getenv('SPECULATION_TTL_SECONDS', 120)),
+        max_entries=int(os.getenv('SPECULATION_MAX_ENTRIES', 256)),
+        client_rate=float(os.getenv('SPECULATION_CLIENT_RATE', 6)),
+        client_burst=float(os.getenv('SPECULATION_CLIENT_BURST', 3)),
+        max_running=int(os.getenv('SPECULATION_MAX_RUNNING', 2)),
+        wait_seconds=float(os.getenv('SPECULATION_WAIT_SECONDS', 60)),
+        busy=busy,
+    )
@@ -0,0 +1,301 @@
+"""Local stand-in for the OpenRouter chat completions API, used by the benchmarks.
+
+Latency is modelled as time-to-first-token plus output tokens / tokens-per-second,
+so shorter completions come back faster just like on the real provider.
+
+Throttling can be injected to exercise client retry logic: --throttle-rate
+answers that fraction of completions with 429 + Retry-After, --error-rate with 503.
+A latency tail can be injected too: --slow-rate replies wait --slow-ttft first.
+--ttft-dist draws the time to first token from a distribution around --ttft
+instead of a constant: uniform (+-ttft-spread x ttft), lognormal (sigma
+--ttft-spread) or exponential (mean --ttft).
+Prompt processing can be charged with --prefill-tps (input tokens per second,
+0 = free), so longer prompts answer later. --reasoning-rate answers that
+fraction the way R1-style models do: a <think> block, then the reply in a
+```json fence. --malformed-rate cuts that fraction of structured replies off
+mid-JSON, the way a weaker model fails a schema; with --malformed-match only
+prompts matching that regex are affected. Structured requests are recognised
+by a json_schema response_format, or in JSON mode by the schema in their
+system message.
+
+Run with: python stub_llm.py --port 8900 --ttft 0.3 --tps 50
+"""
+import argparse
+import json
+import random
+import re
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+STUB_MENU = {
+    "appetizers": ["Bruschetta with Tomato and Basil", "Caprese Skewers"],
+    "main_courses": ["Chicken Parmesan", "Mushroom Risotto"],
+    "desserts": ["Tiramisu", "Panna Cotta with Berries"],
+    "beverages": ["Sparkling Lemonade", "Chianti"],
+    "preparation_notes": "Prepare the tiramisu and panna cotta a day ahead; start the risotto 30 minutes before serving."
+}
+
+CHARS_PER_TOKEN = 4
+TTFT_DISTRIBUTIONS = ("fixed", "uniform", "lognormal", "exponential")
+# Compact prompts list dishes as "Desserts: Tiramisu; Panna Cotta" (see prompts.py)
+COMPACT_DISHES = re.compile(r'(?:^(?:appetizers|main courses|desserts|beverages)|each dish): (.+)$',
+                            re.IGNORECASE | re.MULTILINE)
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // CHARS_PER_TOKEN)
+
+
+def prompt_dishes(prompt):
+    """Dishes listed in a prompt, as "- dish" lines or compact "Section: a; b" lines"""
+    dishes = re.findall(r'^\s*- (.+)$', prompt, re.MULTILINE)
+    for line in COMPACT_DISHES.findall(prompt):
+        dishes.extend(dish.strip() for dish in line.split(';'))
+    return [d for d in dishes if d and not d.startswith('Item ')]
+
+
+def grocery_reply(prompt):
+    """Three ingredient lines per dish mentioned in the prompt"""
+    dishes = prompt_dishes(prompt)
+    lines = []
+    for dish in dishes:
+        for n in range(1, 4):
+            lines.append(f"- {dish} ingredient {n} ({n * 250} g)")
+    return "\n".join(lines)
+
+
+def ingredient_reply(prompt):
+    """Two per-serving ingredients for each dish in an ingredient lookup prompt"""
+    dishes = prompt_dishes(prompt)
+    return json.dumps({
+        dish: [
+            {"name": f"{dish} base", "quantity": 120, "unit": "g", "category": "pantry"},
+            {"name": "olive oil", "quantity": 1, "unit": "tbsp", "category": "pantry"},
+        ]
+        for dish in dishes
+    })
+
+
+def plan_reply(prompt):
+    """STUB_MENU plus a grocery list sized for the guest count in the prompt"""
+    match = re.search(r'(\d+) (?:guests|people)', prompt)
+    guests = int(match.group(1)) if match else 10
+    grocery = []
+    for section in ("appetizers", "main_courses", "desserts"):
+        for dish in STUB_MENU[section]:
+            grocery.append({"name": f"{dish} base", "quantity": 120 * guests, "unit": "g", "category": "pantry"})
+    grocery.append({"name": "olive oil", "quantity": 15 * guests, "unit": "ml", "category": "pantry"})
+    return json.dumps({**STUB_MENU, "grocery_list": grocery})
+
+
+def dishes_reply(prompt):
+    """As many new dish names as a section prompt asks for"""
+    match = re.search(r'(\d+) new', prompt)
+    count = int(match.group(1)) if match else 1
+    return json.dumps({"dishes": [f"House Special {uuid.uuid4().hex[:6]}" for _ in range(count)]})
+
+
+def request_schema(payload):
+    """JSON schema a structured request asks for: in the json_schema format, or in JSON mode's system message"""
+    response_format = payload.get("response_format") or {}
+    if response_format.get("type") == "json_schema":
+        return response_format.get("json_schema", {}).get("schema", {})
+    if response_format.get("type") == "json_object":
+        system = next((m["content"] for m in payload["messages"] if m["role"] == "system"), "")
+        return json.loads(system.partition("\n")[2] or "{}")
+    return None
+
+
+def build_reply(payload):
+    prompt = payload["messages"][-1]["content"]
+    schema = request_schema(payload)
+    if schema is not None:
+        if "grocery_list" in schema.get("properties", {}):
+            return plan_reply(prompt)
+        if "dishes" in schema.get("properties", {}):
+            return dishes_reply(prompt)
+        return json.dumps(STUB_MENU)
+    if "ONE serving" in prompt:
+        return ingredient_reply(prompt)
+    return grocery_reply(prompt)
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ttft = 0.3
+    tps = 50.0
+    throttle_rate = 0.0
+    error_rate = 0.0
+    retry_after = 1
+    slow_rate = 0.0
+    slow_ttft = 5.0
+    ttft_dist = "fixed"
+    ttft_spread = 0.5
+    prefill_tps = 0.0
+    reasoning_rate = 0.0
+    malformed_rate = 0.0
+    malformed_match = ""
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, payload, status=200):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def send_error_reply(self, status, message):
+        body = json.dumps({"error": {"message": message, "code": status}}).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if status == 429:
+            self.send_header("Retry-After", str(self.retry_after))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def sample_ttft(self):
+        if self.ttft_dist == "uniform":
+            return self.ttft * random.uniform(1 - self.ttft_spread, 1 + self.ttft_spread)
+        if self.ttft_dist == "lognormal":
+            # Median ttft, so the tail grows with the spread
+            return self.ttft * random.lognormvariate(0, self.ttft_spread)
+        if self.ttft_dist == "exponential":
+            return random.expovariate(1 / self.ttft) if self.ttft else 0.0
+        return self.ttft
+
+    def do_GET(self):
+        if self.path.rstrip('/').endswith('/models'):
+            return self.send_json({"object": "list", "data": [{"id": "stub", "object": "model"}]})
+        self.send_json({"error": "not found"}, 404)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or b"{}")
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            return self.send_json({"error": "not found"}, 404)
+
+        roll = random.random()
+        if roll < self.throttle_rate:
+            return self.send_error_reply(429, "Rate limit exceeded: free-models-per-min")
+        if roll < self.throttle_rate + self.error_rate:
+            return self.send_error_reply(503, "Provider temporarily unavailable")
+
+        content = build_reply(payload)
+        structured = request_schema(payload) is not None
+        if (structured and random.random() < self.malformed_rate
+                and re.search(self.malformed_match, payload["messages"][-1]["content"])):
+            content = content[:len(content) // 2]
+        if random.random() < self.reasoning_rate:
+            content = (f"<think>\nThe user wants {{\"guests\": ...}}; list dishes first.\n</think>\n\n"
+                       f"```json\n{content}\n```")
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        prompt_tokens = estimate_tokens(payload["messages"][-1]["content"])
+        completion_tokens = estimate_tokens(content)
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        }
+
+        time.sleep(self.slow_ttft if random.random() < self.slow_rate else self.sample_ttft())
+        if self.prefill_tps:
+            time.sleep(prompt_tokens / self.prefill_tps)
+        if payload.get("stream"):
+            include_usage = (payload.get("stream_options") or {}).get("include_usage")
+            return self.stream_reply(completion_id, payload["model"], content, usage if include_usage else None)
+
+        time.sleep(completion_tokens / self.tps)
+        self.send_json({
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": payload["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        })
+
+    def stream_reply(self, completion_id, model, content, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+
+        def chunk(delta, finish_reason=None, usage=None):
+            event = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}] if delta is not None else [],
+            }
+            if usage:
+                event["usage"] = usage
+            self.wfile.write(f"data: {json.dumps(event)}\n\n".encode())
+            self.wfile.flush()
+
+        self.close_connection = True
+        try:
+            chunk({"role": "assistant", "content": ""})
+            for start in range(0, len(content), CHARS_PER_TOKEN):
+                time.sleep(1 / self.tps)
+                chunk({"content": content[start:start + CHARS_PER_TOKEN]})
+            chunk({}, "stop")
+            if usage:
+                chunk(None, usage=usage)
+            self.wfile.write(b"data: [DONE]\n\n")
+            self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass  # client cancelled the stream
+
+
+def make_server(port=8900, ttft=0.3, tps=50.0, throttle_rate=0.0, error_rate=0.0, retry_after=1,
+                slow_rate=0.0, slow_ttft=5.0, prefill_tps=0.0, reasoning_rate=0.0,
+                ttft_dist="fixed", ttft_spread=0.5, malformed_rate=0.0, malformed_match=""):
+    handler = type("ConfiguredStubHandler", (StubHandler,), {
+        "ttft": ttft, "tps": tps,
+        "throttle_rate": throttle_rate, "error_rate": error_rate, "retry_after": retry_after,
+        "slow_rate": slow_rate, "slow_ttft": slow_ttft, "prefill_tps": prefill_tps,
+        "reasoning_rate": reasoning_rate,
+        "ttft_dist": ttft_dist, "ttft_spread": ttft_spread,
+        "malformed_rate": malformed_rate, "malformed_match": malformed_match,
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--ttft", type=float, default=0.3, help="seconds to first token")
+    parser.add_argument("--tps", type=float, default=50.0, help="output tokens per second")
+    parser.add_argument("--throttle-rate", type=float, default=0.0, help="fraction answered with 429")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered with 503")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds on 429")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="fraction answered after --slow-ttft")
+    parser.add_argument("--slow-ttft", type=float, default=5.0, help="seconds to first token for slow replies")
+    parser.add_argument("--ttft-dist", choices=TTFT_DISTRIBUTIONS, default="fixed",
+                        help="distribution of time to first token around --ttft")
+    parser.add_argument("--ttft-spread", type=float, default=0.5,
+                        help="uniform half-width (fraction of --ttft) or lognormal sigma")
+    parser.add_argument("--prefill-tps", type=float, default=0.0, help="input tokens per second (0 = free)")
+    parser.add_argument("--reasoning-rate", type=float, default=0.0,
+                        help="fraction answered with a <think> block and a fenced reply")
+    parser.add_argument("--malformed-rate", type=float, default=0.0,
+                        help="fraction of structured replies cut off mid-JSON")
+    parser.add_argument("--malformed-match", default="", help="only prompts matching this regex are cut off")
+    args = parser.parse_args()
+    print(f"🧪 Stub LLM listening on http://127.0.0.1:{args.port}")
+    make_server(args.port, args.ttft, args.tps,
+                args.throttle_rate, args.error_rate, args.retry_after,
+                args.slow_rate, args.slow_ttft, args.prefill_tps, args.reasoning_rate,
+                args.ttft_dist, args.ttft_spread, args.malformed_rate, args.malformed_match).serve_forever()
@@ -0,0 +1,114 @@
+"""Local stand-in for a Redis server, for the redis response cache backend.
+
+Speaks enough of RESP for menu_cache.RedisBackend: PING, AUTH, SELECT,
+GET, SET (with EX), DEL and FLUSHDB. Every database is an in-memory dict,
+and keys with an EX expire lazily when they are read. With --password,
+commands other than AUTH and PING are refused until the client
+authenticates, like a server with requirepass.
+
+Run with: python stub_redis.py --port 6379, then MENU_CACHE_BACKEND=redis
+MENU_CACHE_URL=redis://localhost:6379/0
+"""
+import argparse
+import socketserver
+import threading
+import time
+
+
+class StubRedisHandler(socketserver.StreamRequestHandler):
+    password = None
+
+    def setup(self):
+        super().setup()
+        self.db = 0
+        self.authenticated = self.password is None
+
+    def read_command(self):
+        """[arg, ...] of one RESP array of bulk strings; None once the client hangs up"""
+        line = self.rfile.readline()
+        if not line:
+            return None
+        if not line.startswith(b'*'):
+            return line.split()  # inline command, e.g. from telnet
+        args = []
+        for _ in range(int(line[1:-2])):
+            length = int(self.rfile.readline()[1:-2])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def reply(self, value):
+        if value is None:
+            data = b"$-1\r\n"
+        elif isinstance(value, int):
+            data = b":%d\r\n" % value
+        elif isinstance(value, Exception):
+            data = b"-ERR %s\r\n" % str(value).encode()
+        elif value == "OK" or value == "PONG":
+            data = b"+%s\r\n" % value.encode()
+        else:
+            data = b"$%d\r\n%s\r\n" % (len(value), value)
+        self.wfile.write(data)
+
+    def handle(self):
+        while True:
+            args = self.read_command()
+            if args is None:
+                return
+            if not args:
+                continue
+            try:
+                self.reply(self.run(args[0].decode().upper(), args[1:]))
+            except (ValueError, IndexError) as e:
+                self.reply(ValueError(f"bad arguments: {e}"))
+
+    def run(self, command, args):
+        server = self.server
+        if command == 'PING':
+            return "PONG"
+        if command == 'AUTH':
+            if args[-1].decode() != self.password:
+                return ValueError("invalid password")
+            self.authenticated = True
+            return "OK"
+        if not self.authenticated:
+            return ValueError("NOAUTH Authentication required")
+        if command == 'SELECT':
+            self.db = int(args[0])
+            return "OK"
+        with server.lock:
+            data = server.databases.setdefault(self.db, {})
+            if command == 'GET':
+                value, expires_at = data.get(args[0], (None, None))
+                if expires_at is not None and expires_at <= time.time():
+                    del data[args[0]]
+                    return None
+                return value
+            if command == 'SET':
+                options = [arg.decode().upper() for arg in args[2:]]
+                ttl = float(options[options.index('EX') + 1]) if 'EX' in options else None
+                data[args[0]] = (args[1], time.time() + ttl if ttl is not None else None)
+                return "OK"
+            if command == 'DEL':
+                return sum(data.pop(key, None) is not None for key in args)
+            if command == 'FLUSHDB':
+                data.clear()
+                return "OK"
+        return ValueError(f"unknown command '{command}'")
+
+
+def make_server(port=6379, password=None):
+    handler = type("ConfiguredStubRedisHandler", (StubRedisHandler,), {"password": password})
+    server = socketserver.ThreadingTCPServer(("127.0.0.1", port), handler)
+    server.daemon_threads = True
+    server.databases = {}
+    server.lock = threading.Lock()
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=6379)
+    parser.add_argument("--password", help="require AUTH with this password")
+    args = parser.parse_args()
+    print(f"🧪 Stub Redis listening on redis://127.0.0.1:{args.port}")
+    make_server(args.port, args.password).serve_forever()
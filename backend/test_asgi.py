@@ -0,0 +1,108 @@
+import asyncio
+import importlib
+
+import httpx
+import pytest
+
+EVENT = {"event_type": "dinner", "cuisine": "italian", "formality": "casual", "level": "1",
+         "dietary_restrictions": "none", "guest_count": 10}
+
+
+@pytest.fixture(scope="module")
+def asgi(planner):
+    return importlib.import_module("asgi")
+
+
+def upstream_calls(asgi):
+    return sum(route["calls"] for route in asgi.llm.stats().values())
+
+
+async def post(client, path, headers=None, event=EVENT):
+    return await client.post(path, json=event, headers=headers or {}, timeout=30)
+
+
+def client(asgi):
+    return httpx.AsyncClient(transport=httpx.ASGITransport(app=asgi.application), base_url="http://test")
+
+
+def test_plan_claims_the_speculated_menu(asgi):
+    import app
+    headers = {"X-Plan-Session": "tab-test-speculation"}
+
+    async def main():
+        async with client(asgi) as c:
+            prefetch = await post(c, "/api/plan/prefetch", headers)
+            assert prefetch.json()["speculation"] == "started"
+            before = upstream_calls(asgi)
+            response = await post(c, "/api/plan?mode=combined", headers)
+            return response, upstream_calls(asgi) - before
+
+    response, calls = asyncio.run(main())
+    assert response.status_code == 200
+    assert app.speculative_menus.snapshot()["hits"] == 1
+    assert calls <= 1  # at most the speculation finishing; no menu or combined call of its own
+
+
+def test_identical_plans_share_one_menu_stream(asgi):
+    import app
+
+    async def main():
+        async with client(asgi) as c:
+            before, calls = app.coalescer.snapshot(), upstream_calls(asgi)
+            # With no response cache, only single-flight can keep this to one menu stream
+            event = {**EVENT, "cuisine": "mexican"}
+            responses = await asyncio.gather(*(post(c, "/api/plan", event=event) for _ in range(3)))
+            return responses, before, app.coalescer.snapshot(), upstream_calls(asgi) - calls
+
+    responses, before, after, calls = asyncio.run(main())
+    assert app.response_cache is None
+    assert [response.status_code for response in responses] == [200] * 3
+    assert len({str(response.json()["menu"]) for response in responses}) == 1
+    assert after["shared_in_process"] - before["shared_in_process"] >= 2
+    assert calls == 1
+
+
+@pytest.mark.parametrize("body", [{**EVENT, "guest_count": "ten"}, {**EVENT, "guest_count": 0},
+                                  {**EVENT, "guest_count": -4}, {**EVENT, "guest_count": True},
+                                  {**EVENT, "guest_count": 2.5}, [1, 2], "dinner"])
+def test_malformed_plans_get_a_json_400(asgi, body):
+    async def main():
+        async with client(asgi) as c:
+            return await c.post("/api/plan", json=body, timeout=30)
+
+    response = asyncio.run(main())
+    assert response.status_code == 400
+    assert response.json()["status"] == "error"
+
+
+def test_pipeline_errors_get_the_json_error_envelope(asgi, monkeypatch):
+    async def broken(data, use_cache=True, menu=None):
+        raise RuntimeError("pipeline exploded")
+
+    monkeypatch.setattr(asgi, "plan_event_async", broken)
+
+    async def main():
+        async with client(asgi) as c:
+            return await post(c, "/api/plan", event={**EVENT, "cuisine": "thai"})
+
+    response = asyncio.run(main())
+    assert response.status_code == 500
+    assert response.json()["message"].startswith("Internal server error")
+
+
+def test_grocery_json_and_text_come_from_the_same_entries(asgi):
+    import app
+    entries = [{"name": "half-and-half (light)", "quantity": 1.5, "unit": "l", "category": "dairy"},
+               {"name": "salt", "quantity": 20, "unit": "g", "category": "pantry"}]
+    fields = app.grocery_fields(entries)
+    assert fields["grocery"]["items"] == entries  # re-parsing the text would fold the name to "half and half"
+    assert fields["grocery_list"].splitlines() == ["- Half-And-Half (Light) (1.5 l)", "- Salt (20 g)"]
+
+    async def main():
+        async with client(asgi) as c:
+            return await post(c, "/api/plan", event={**EVENT, "cuisine": "greek"})
+
+    body = asyncio.run(main()).json()
+    items = body["grocery"]["items"]
+    assert items and body["grocery_list"].splitlines() == [
+        f"- {item['name'].title()} ({item['quantity']:g} {item['unit']})" for item in items]
@@ -0,0 +1,82 @@
+import gzip
+import os
+
+import pytest
+from flask import Flask
+
+import assets
+
+SCRIPT = """// Planner form
+const label = "a  // not a comment";
+function show(x) {
+    /* two
+       lines */
+    return `${x}   kept`;
+}
+"""
+STYLE = "body {\n    color: red;  /* brand */\n}\n"
+
+
+@pytest.fixture
+def built(tmp_path, monkeypatch):
+    """(source dir, build dir, manifest) for a small static tree, built like on startup"""
+    source, build = tmp_path / "static", tmp_path / "build"
+    (source / "js").mkdir(parents=True)
+    (source / "js" / "script.js").write_text(SCRIPT)
+    (source / "style.css").write_text(STYLE)
+    (source / "logo.txt").write_text("not an asset")
+    monkeypatch.setenv("ASSET_BUILD", "auto")
+    monkeypatch.setattr(assets, "_manifest", None)
+    return str(source), str(build), assets.ensure_built(str(source), str(build))
+
+
+@pytest.fixture
+def client(built):
+    source, build, _ = built
+    app = Flask(__name__, static_folder=None)
+    app.add_url_rule('/static/<path:path>', view_func=lambda path: assets.send_asset(path, source, build))
+    return app.test_client()
+
+
+def test_minifiers_keep_strings_and_drop_comments():
+    assert assets.minify_js(SCRIPT) == 'const label="a  // not a comment";function show(x){return `${x}   kept`;}\n'
+    assert assets.minify_css(STYLE) == "body{color:red}\n"
+
+
+def test_build_fingerprints_by_content(built, tmp_path):
+    source, build, manifest = built
+    assert sorted(manifest) == ["js/script.js", "style.css"]
+    script = manifest["js/script.js"]
+    assert script.startswith("js/script.") and script.endswith(".js")
+    assert assets.asset_url("js/script.js") == f"/static/{script}"
+    with open(os.path.join(build, script + ".gz"), "rb") as f:
+        assert gzip.decompress(f.read()) == assets.minify_js(SCRIPT).encode()
+
+    # Same content, same name; changed content, new name
+    assert assets.build(source, str(tmp_path / "again"))["js/script.js"] == script
+    with open(os.path.join(source, "js", "script.js"), "a") as f:
+        f.write("show(1);\n")
+    assert assets.build(source, build)["js/script.js"] != script
+
+
+def test_fingerprinted_assets_are_immutable_and_precompressed(built, client):
+    script = built[2]["js/script.js"]
+    response = client.get(f"/static/{script}", headers={"Accept-Encoding": "gzip, deflate"})
+    assert response.headers["Cache-Control"] == assets.IMMUTABLE
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.headers["Vary"] == "Accept-Encoding"
+    assert gzip.decompress(response.data) == assets.minify_js(SCRIPT).encode()
+
+    again = client.get(f"/static/{script}", headers={"Accept-Encoding": "gzip",
+                                                       "If-None-Match": response.headers["ETag"]})
+    assert again.status_code == 304
+
+    plain = client.get(f"/static/{script}", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in plain.headers and plain.data == assets.minify_js(SCRIPT).encode()
+
+
+def test_unfingerprinted_paths_must_revalidate(client):
+    response = client.get("/static/js/script.js")
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    assert response.data.decode() == SCRIPT
@@ -0,0 +1,37 @@
+import json
+
+EVENT = {"event_type": "wedding", "cuisine": "italian", "formality": "formal", "level": "2",
+         "dietary_restrictions": "none", "guest_count": 80}
+
+
+def records(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_batch_streams_a_record_per_spec_and_a_summary(planner):
+    specs = [EVENT, {**EVENT, "guest_count": 40}, {"cuisine": "italian"}, EVENT]
+    response = planner.app.test_client().post("/api/plan/batch", json=specs)
+    assert response.status_code == 200
+    *results, summary = records(response)
+
+    assert sorted(record["index"] for record in results) == [0, 1, 2, 3]
+    by_index = {record["index"]: record for record in results}
+    assert by_index[2]["status"] == "error" and "Missing required fields" in by_index[2]["message"]
+    assert by_index[0]["grocery"] == by_index[3]["grocery"]
+    assert by_index[1]["grocery"] != by_index[0]["grocery"]
+    assert summary["type"] == "summary"
+    assert (summary["items"], summary["unique_specs"], summary["succeeded"], summary["failed"]) == (4, 2, 3, 1)
+
+
+def test_batch_accepts_ndjson(planner):
+    body = "\n".join(json.dumps({**EVENT, "guest_count": guests}) for guests in (12, 24)) + "\n"
+    response = planner.app.test_client().post("/api/plan/batch", data=body, content_type="application/x-ndjson")
+    assert records(response)[-1]["succeeded"] == 2
+
+
+def test_bad_batches_are_rejected(planner, monkeypatch):
+    client = planner.app.test_client()
+    assert client.post("/api/plan/batch", json={"not": "a list"}).status_code == 400
+    assert client.post("/api/plan/batch", data="{broken\n", content_type="application/x-ndjson").status_code == 400
+    monkeypatch.setattr(planner, "BATCH_MAX_ITEMS", 1)
+    assert client.post("/api/plan/batch", json=[EVENT, EVENT]).status_code == 400
@@ -0,0 +1,60 @@
+import json
+import os
+import statistics
+from types import SimpleNamespace
+
+import pytest
+
+import bench_load
+import stub_llm
+from bench_plan import percentile
+
+BASELINE = {"results": {"plan": {"errors": 0, "rps": 10.0, "p95_ms": 1000.0, "p99_ms": 1200.0,
+                                 "peak_rss_mb": 90.0}}}
+
+
+def result(**changes):
+    return {"plan": {**BASELINE["results"]["plan"], **changes}}
+
+
+def test_results_within_tolerance_pass():
+    assert bench_load.compare(result(p95_ms=1150.0, rps=8.5, peak_rss_mb=100.0), BASELINE, 0.2, 20) == []
+    # Scenarios without a baseline are not compared
+    assert bench_load.compare({"batch": {"errors": 3}}, BASELINE, 0.2, 20) == []
+
+
+@pytest.mark.parametrize("changes, regression", [({"p99_ms": 1500.0}, "plan p99_ms 1200.0 -> 1500.0"),
+                                                 ({"rps": 7.0}, "plan rps 10.0 -> 7.0"),
+                                                 ({"peak_rss_mb": 120.0}, "plan peak_rss_mb 90.0 -> 120.0"),
+                                                 ({"errors": 2}, "plan errors 0 -> 2")])
+def test_regressions_are_reported(changes, regression):
+    assert bench_load.compare(result(**changes), BASELINE, 0.2, 20) == [regression]
+
+
+def test_small_latencies_get_the_minimum_slack():
+    baseline = {"results": {"plan": {"errors": 0, "p95_ms": 10.0}}}
+    assert bench_load.compare({"plan": {"errors": 0, "p95_ms": 25.0}}, baseline, 0.2, 20) == []
+    assert bench_load.compare({"plan": {"errors": 0, "p95_ms": 35.0}}, baseline, 0.2, 20) != []
+
+
+def test_saved_baseline_matches_the_scenarios():
+    with open(os.path.join(os.path.dirname(__file__), "data", "load_baseline.json")) as f:
+        baseline = json.load(f)
+    assert set(baseline["results"]) == set(bench_load.SCENARIOS)
+    assert baseline["config"]["ttft_dist"] in stub_llm.TTFT_DISTRIBUTIONS
+    for stats in baseline["results"].values():
+        assert stats["errors"] == 0 and stats["p50_ms"] <= stats["p95_ms"] <= stats["p99_ms"]
+    assert "ttfb_p95_ms" in baseline["results"]["stream"]
+
+
+def test_percentile():
+    values = list(range(1, 101))
+    assert (percentile(values, 50), percentile(values, 95), percentile(values, 100)) == (51, 95, 100)
+
+
+@pytest.mark.parametrize("dist", stub_llm.TTFT_DISTRIBUTIONS)
+def test_stub_ttft_distributions_centre_on_ttft(dist):
+    settings = SimpleNamespace(ttft=0.3, ttft_dist=dist, ttft_spread=0.5)
+    samples = [stub_llm.StubHandler.sample_ttft(settings) for _ in range(4000)]
+    centre = statistics.mean(samples) if dist == "exponential" else statistics.median(samples)
+    assert min(samples) >= 0 and centre == pytest.approx(0.3, rel=0.1)
@@ -0,0 +1,74 @@
+import sqlite3
+import time
+
+import pytest
+
+import catalog
+
+EVENT = {"event_type": "dinner", "cuisine": "italian", "formality": "formal", "level": "2"}
+
+
+def menu_for(event):
+    return {"appetizers": [f"{event['cuisine']} starter"], "main_courses": ["Main"], "desserts": ["Dessert"],
+            "beverages": ["Water"], "preparation_notes": ""}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "catalog.sqlite3")
+
+
+@pytest.mark.parametrize("data, key", [
+    ({**EVENT, "guest_count": 40, "dietary_restrictions": "None"}, "dinner|italian|formal|2"),
+    ({**EVENT, "cuisine": " Italian "}, "dinner|italian|formal|2"),
+    ({**EVENT, "dietary_restrictions": "vegan"}, None),
+])
+def test_catalog_key(data, key):
+    assert catalog.catalog_key(data) == key
+
+
+def test_warm_builds_every_combination_once(path):
+    events = []
+    menus = catalog.Catalog(path, lambda event: events.append(event) or menu_for(event))
+    assert menus.warm(concurrency=2) == (len(catalog.combinations()), 0)
+    assert menus.warm() == (0, 0)
+    assert len(events) == len(catalog.combinations()) == menus.snapshot()["combinations"]
+    assert menus.lookup({**EVENT, "guest_count": 75}) == menu_for(EVENT)
+    assert menus.lookup({**EVENT, "dietary_restrictions": "vegan"}) is None
+
+
+def test_failed_entries_are_not_stored(path):
+    menus = catalog.Catalog(path, lambda event: {"error": "upstream down"})
+    assert not menus.build(EVENT)
+    assert menus.lookup(EVENT) is None and menus.snapshot()["misses"] == 1
+
+
+def test_other_processes_pick_up_new_entries(path):
+    writer = catalog.Catalog(path, menu_for)
+    reader = catalog.Catalog(path, menu_for)
+    writer.build(EVENT)
+    assert reader.lookup(EVENT) is None
+    assert reader.reload() == 1
+    assert reader.lookup(EVENT) == menu_for(EVENT)
+
+
+def test_stale_entries_are_served_and_refreshed_by_one_worker(path):
+    built = []
+    first = catalog.Catalog(path, lambda event: built.append(event) or menu_for(event), max_age=60, refresh_batch=5)
+    second = catalog.Catalog(path, lambda event: built.append(event) or menu_for(event), max_age=60, refresh_batch=5)
+    first.store(EVENT, {"appetizers": ["Old"]})
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE catalog SET generated_at = ?", (time.time() - 3600,))
+    first.generated_at[catalog.catalog_key(EVENT)] = time.time() - 3600
+
+    assert first.lookup(EVENT) == {"appetizers": ["Old"]}
+    assert first.snapshot()["stale_hits"] == 1
+    claimed = first._claim_stale()
+    assert claimed == [EVENT] and second._claim_stale() == []  # leased to the first worker
+
+    with sqlite3.connect(path) as conn:
+        conn.execute("UPDATE catalog SET refreshing_at = NULL")
+    second.refresh_once()
+    assert built == [EVENT] and second.snapshot()["refreshed"] == 1
+    first.reload()
+    assert first.lookup(EVENT) == menu_for(EVENT)
@@ -0,0 +1,57 @@
+import pytest
+
+EVENT = {"event_type": "graduation", "cuisine": "spanish", "formality": "casual", "level": "1",
+         "dietary_restrictions": "none", "guest_count": 30}
+
+
+@pytest.fixture
+def kinds(planner, monkeypatch):
+    """Kinds of the structured LLM calls made during a test"""
+    calls, complete = [], planner.llm.complete
+
+    def recording_complete(messages, response_format=None, kind="text", **kwargs):
+        calls.append(kind)
+        return complete(messages, response_format, kind, **kwargs)
+
+    monkeypatch.setattr(planner.llm, "complete", recording_complete)
+    return calls
+
+
+def test_combined_mode_makes_one_structured_call(planner, kinds):
+    response = planner.app.test_client().post("/api/plan?mode=combined", json=EVENT)
+    assert response.status_code == 200
+    body = response.get_json()
+    assert kinds == ["plan"]
+    assert all(body["menu"][section] for section in planner.MENU_SECTIONS)
+    assert body["grocery"]["items"] and body["grocery_list"]
+
+
+def test_failed_combined_call_falls_back_to_separate_calls(planner, kinds, monkeypatch):
+    complete = planner.llm.complete
+
+    def failing_plan(messages, response_format=None, kind="text", **kwargs):
+        if kind == "plan":
+            raise RuntimeError("plan call failed")
+        return complete(messages, response_format, kind, **kwargs)
+
+    monkeypatch.setattr(planner.llm, "complete", failing_plan)
+    response = planner.app.test_client().post("/api/plan", json={**EVENT, "cuisine": "greek", "mode": "combined"})
+    assert response.status_code == 200
+    assert kinds == ["menu"]  # after the failed plan call, which never reaches the recorder
+
+
+def test_split_plan_needs_every_section_and_a_grocery_list(planner):
+    plan = planner.PlanModel(appetizers=["Tapas"], main_courses=["Paella"], desserts=["Churros"],
+                             beverages=["Sangria"], preparation_notes="",
+                             grocery_list=[{"name": "Rice", "quantity": 2, "unit": "kg", "category": "pantry"},
+                                           {"name": "rice", "quantity": 500, "unit": "g", "category": "pantry"}])
+    menu, entries = planner.split_plan(plan)
+    assert "grocery_list" not in menu and menu["main_courses"] == ["Paella"]
+    assert entries == [{"name": "rice", "quantity": 2.5, "unit": "kg", "category": "pantry"}]
+    assert planner.split_plan(plan.model_copy(update={"desserts": []})) is None
+    assert planner.split_plan(plan.model_copy(update={"grocery_list": []})) is None
+
+
+def test_unknown_mode_is_rejected(planner):
+    response = planner.app.test_client().post("/api/plan", json={**EVENT, "mode": "both"})
+    assert response.status_code == 400
@@ -0,0 +1,97 @@
+from types import SimpleNamespace
+
+import pytest
+
+import dietary
+import ingredient_index
+
+
+@pytest.mark.parametrize("text, restrictions, unknown", [
+    ("none", [], ()),
+    ("", [], ()),
+    ("Vegan, nut-free", ["vegan", "nut-free"], ()),
+    ("no shellfish and lactose intolerant", ["shellfish-free", "dairy-free"], ()),
+    ("strictly vegetarian please", ["vegetarian"], ()),
+    ("allergic to peanuts / gluten free", ["peanut-free", "gluten-free"], ()),
+    ("celiac; sesame allergy", ["gluten-free", "sesame-free"], ()),
+    ("halal, no pork", ["pork-free"], ("halal",)),
+    ("kosher", [], ("kosher",)),
+])
+def test_parse_reads_free_text_restrictions(text, restrictions, unknown):
+    expected = 0
+    for name in restrictions:
+        expected |= dietary.RESTRICTIONS[name]
+    assert dietary.parse(text) == (expected, unknown)
+
+
+@pytest.mark.parametrize("name, tags", [
+    ("Grilled Salmon", ["fish"]),
+    ("Anchovies", ["fish"]),
+    ("coconut milk", []),
+    ("peanut butter cookies", ["peanut", "gluten"]),
+    ("Butternut Squash Soup", []),
+    ("Pasta Carbonara", ["pork", "meat", "dairy", "egg", "gluten"]),
+    ("corn tortilla chips", []),
+    ("soy sauce", ["soy", "gluten"]),
+])
+def test_name_tags_prefer_phrases_over_their_words(name, tags):
+    assert dietary.describe(dietary.name_tags(name)) == [tag for tag in dietary.TAGS if tag in tags]
+
+
+@pytest.fixture
+def diets(tmp_path):
+    index = ingredient_index.IngredientIndex(str(tmp_path / "ingredients.sqlite3"))
+    index.add_dishes({
+        "harvest bowl": [("kale", 50, "g", "produce"), ("heavy cream", 30, "ml", "dairy")],
+        "herb rice": [("rice", 80, "g", "pantry"), ("parsley", 5, "g", "produce")],
+        "lentil stew": [("lentils", 90, "g", "pantry"), ("carrot", 40, "g", "produce")],
+        "garden plate": [("cucumber", 60, "g", "produce")],
+        "cheese board": [("brie", 40, "g", "dairy")],
+    })
+    catalog = SimpleNamespace(version=1, menus={
+        "dinner|italian|casual|1": {"main_courses": ["Lentil Stew", "Cheese Board", "Herb Rice"]},
+        "lunch|italian|casual|1": {"main_courses": ["Herb Rice", "Garden Plate"]},
+        "dinner|thai|casual|1": {"main_courses": ["Garden Plate"]},
+    })
+    return dietary.DietIndex(index, catalog)
+
+
+def test_dish_tags_include_their_ingredients(diets):
+    # Nothing in the name says dairy; the cream in it does
+    assert dietary.describe(diets.dish_tags("Harvest Bowl: kale and cream")) == ["dairy"]
+    assert diets.dish_tags("Garden Plate") == 0
+    assert diets.dish_tags("Mystery Dish") is None
+
+
+def test_adapt_swaps_in_the_most_common_compatible_catalog_dish(diets):
+    menu = {"main_courses": ["Harvest Bowl", "Garden Plate", "Cheese Board", "Mystery Dish"],
+            "desserts": ["Garden Plate"]}
+    adapted = diets.adapt(menu, dietary.parse("vegan")[0], " Italian ")
+
+    # Herb Rice is in two Italian menus, Lentil Stew in one; Garden Plate is already on the menu
+    assert adapted["menu"]["main_courses"] == ["Herb Rice", "Garden Plate", "Lentil Stew", "Mystery Dish"]
+    assert adapted["substituted"] == [
+        {"section": "main_courses", "index": 0, "removed": "Harvest Bowl", "added": "Herb Rice"},
+        {"section": "main_courses", "index": 2, "removed": "Cheese Board", "added": "Lentil Stew"},
+    ]
+    assert adapted["uncovered"] == {"main_courses": [3]}  # unknown dishes cannot be checked
+    assert adapted["menu"]["desserts"] == ["Garden Plate"]
+    assert menu["main_courses"][0] == "Harvest Bowl"
+
+    stats = diets.snapshot()
+    assert (stats["kept"], stats["substituted"], stats["uncovered"], stats["complete"]) == (2, 2, 1, 0)
+
+
+def test_slots_without_a_compatible_dish_are_uncovered(diets):
+    adapted = diets.adapt({"main_courses": ["Cheese Board"]}, dietary.parse("vegan")[0], "thai")
+    assert adapted["menu"]["main_courses"] == ["Garden Plate"]
+    adapted = diets.adapt({"main_courses": ["Cheese Board", "Harvest Bowl"]}, dietary.parse("vegan")[0], "thai")
+    assert adapted["uncovered"] == {"main_courses": [1]}
+
+
+def test_pools_follow_catalog_changes(diets):
+    vegan = dietary.parse("vegan")[0]
+    assert diets.adapt({"main_courses": ["Cheese Board"]}, vegan, "greek")["uncovered"] == {"main_courses": [0]}
+    diets.catalog.menus["dinner|greek|casual|1"] = {"main_courses": ["Lentil Stew"]}
+    diets.catalog.version += 1
+    assert diets.adapt({"main_courses": ["Cheese Board"]}, vegan, "greek")["menu"] == {"main_courses": ["Lentil Stew"]}
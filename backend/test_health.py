@@ -0,0 +1,58 @@
+import threading
+import time
+
+import health
+import llm_router
+
+
+def wait_for(condition, seconds=5):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_probe_records_up_and_down():
+    up = health.HealthProbe("test", lambda: None)
+    assert up.status()["status"] == "unknown"
+    assert up.probe_now()["status"] == "up"
+
+    def refuse():
+        raise ConnectionError("refused")
+
+    down = health.HealthProbe("test", refuse)
+    status = down.probe_now()
+    assert status["status"] == "down" and status["error"] == "ConnectionError: refused"
+    assert down.status() == status
+
+
+def test_background_probe_notices_a_provider_coming_back():
+    calls, recovered = [], threading.Event()
+
+    def check():
+        calls.append(1)
+        if not recovered.is_set():
+            raise ConnectionError("down")
+
+    probe = health.HealthProbe("test", check, interval=60, down_interval=0.02)
+    probe.start()
+    probe.start()  # once per process, however many requests call it
+    assert wait_for(lambda: probe.status()["status"] == "down")
+    recovered.set()
+    assert wait_for(lambda: probe.status()["status"] == "up")
+    assert len([thread for thread in threading.enumerate() if thread.name == "health-test"]) == 1
+
+
+def test_route_clients_are_built_on_first_use():
+    route = llm_router.Route("lazy", "http://127.0.0.1:9", "key", "model")
+    assert route._client is None and route._async_client is None
+    client = route.client()
+    assert route.client() is client
+    assert route.async_client() is route.async_client()
+
+
+def test_healthz_reports_the_stub_provider(planner):
+    response = planner.app.test_client().get("/healthz")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == "ok" and body["providers"]["openrouter"]["status"] == "up"
@@ -0,0 +1,99 @@
+import pytest
+
+import ingredient_index
+
+MENU = {"appetizers": ["Bruschetta"], "main_courses": [], "desserts": [], "beverages": []}
+
+
+def test_reload_swaps_in_a_new_index(tmp_path):
+    index = ingredient_index.IngredientIndex(str(tmp_path / "ingredients.sqlite3"))
+    before = index.ingredients
+    snapshot = dict(before)
+
+    # Garlic in grams folds with the seed's garlic in cloves, which drops an id on reload
+    index.add_dishes({"garlic bread": [("garlic", 40, "g", "produce"), ("baguette", 80, "g", "bakery")]})
+
+    assert index.ingredients is not before
+    assert before == snapshot
+    assert index.knows("Garlic Bread")
+    assert len(index.ingredients) < len(before) + 2
+    garlic = [entry for entry in index.scale(MENU, 10) if entry["name"] == "garlic"]
+    assert garlic[0]["unit"] == "g"
+
+
+def test_readers_never_see_a_partial_index(tmp_path, monkeypatch):
+    index = ingredient_index.IngredientIndex(str(tmp_path / "ingredients.sqlite3"))
+    canonical_name = ingredient_index.grocery.canonical_name
+    seen = []
+
+    def reading_canonical_name(name):
+        # Runs in the middle of _load(): what a concurrent reader would find
+        seen.append(len(index.ingredients))
+        index.scale(MENU, 10)
+        return canonical_name(name)
+
+    monkeypatch.setattr(ingredient_index.grocery, "canonical_name", reading_canonical_name)
+    complete = len(index.ingredients)
+    index.add_dishes({"test dish": [("test spice", 2, "g", "pantry")]})
+
+    assert seen and min(seen) >= complete
+
+
+@pytest.fixture
+def index(tmp_path):
+    return ingredient_index.IngredientIndex(str(tmp_path / "ingredients.sqlite3"))
+
+
+def test_scale_multiplies_per_serving_amounts(index):
+    assert index.scale(MENU, 10) == [
+        {"name": "baguette", "quantity": 600, "unit": "g", "category": "bakery"},
+        {"name": "olive oil", "quantity": 100, "unit": "ml", "category": "pantry"},
+        {"name": "basil", "quantity": 20, "unit": "g", "category": "produce"},
+        {"name": "garlic", "quantity": 10, "unit": "cloves", "category": "produce"},
+        {"name": "tomato", "quantity": 800, "unit": "g", "category": "produce"},
+    ]
+
+
+def test_dishes_of_a_section_share_the_servings(index):
+    entries = {entry["name"]: entry for entry in index.scale({**MENU, "appetizers": ["Bruschetta", "Caprese Salad"]}, 10)}
+    # 1.25 servings per guest across two dishes: 6.25 each; tomatoes from both dishes merge
+    assert entries["baguette"]["quantity"] == 375
+    assert (entries["tomato"]["quantity"], entries["tomato"]["unit"]) == (1.2, "kg")
+
+
+@pytest.mark.parametrize("name, key", [("Tiramisu: classic, with cocoa", "tiramisu"),
+                                       ("Guacamole & Chips", "guacamole and chips"),
+                                       ("Panna Cotta (with berries)", "panna cotta")])
+def test_dish_key(name, key):
+    assert ingredient_index.dish_key(name) == key
+
+
+def test_learned_dishes_are_stored(index, tmp_path):
+    menu = {"main_courses": ["Shakshuka"]}
+    assert index.unknown_dishes(menu) == ["Shakshuka"]
+    reply = """Here you go:
+```json
+{"Shakshuka": [{"name": "Eggs", "quantity": 2, "unit": "pcs", "category": "dairy"},
+               {"name": "tomatoes", "quantity": 150, "unit": "g", "category": "produce"},
+               {"name": "paprika", "quantity": "lots", "unit": "g"}]}
+```"""
+    assert index.learn(reply) == ["Shakshuka"]
+    assert index.unknown_dishes(menu) == []
+    assert index.scale(menu, 4) == [
+        {"name": "egg", "quantity": 8, "unit": "pcs", "category": "dairy"},
+        {"name": "tomato", "quantity": 600, "unit": "g", "category": "produce"},
+    ]
+    assert ingredient_index.IngredientIndex(str(tmp_path / "ingredients.sqlite3")).knows("shakshuka")
+
+
+def test_unparseable_replies_learn_nothing(index):
+    assert index.learn("Sorry, I cannot help with that") == []
+    assert index.learn('["Shakshuka"]') == []
+
+
+def test_batch_scaling_matches_one_menu_at_a_time(index):
+    menus = [{"appetizers": ["Bruschetta", "Caprese Salad"], "desserts": ["Tiramisu"]},
+             {"main_courses": ["Lasagna", "Not A Known Dish"]}, {}]
+    guest_counts = [10, 37, 5]  # 37 guests: 1850 g of lasagna sheets, rounded like format_quantity()
+    assert index.scale_batch(menus, guest_counts) == [
+        index.scale(menu, guests) for menu, guests in zip(menus, guest_counts)]
@@ -0,0 +1,101 @@
+import threading
+import time
+
+import pytest
+
+import job_queue
+
+
+class BlockedWebhook:
+    """Stands in for requests.post: every callback hangs until released"""
+
+    def __init__(self):
+        self.release = threading.Event()
+        self.calls = []
+
+    def __call__(self, url, json, timeout, allow_redirects=True):
+        assert not allow_redirects
+        self.calls.append((url, json["job"]["id"]))
+        self.release.wait(5)
+        return type("Response", (), {"status_code": 200})()
+
+
+def wait_for(condition, seconds=5):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_webhooks_do_not_hold_up_job_workers(tmp_path, monkeypatch):
+    webhook = BlockedWebhook()
+    monkeypatch.setattr(job_queue.requests, "post", webhook)
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"), lambda payload: {"plan": payload["n"]}, workers=1,
+                               callback_hosts=["hook.test"])
+    queue.start()
+    try:
+        jobs = [queue.submit({"n": n}, callback_url=f"http://hook.test/{n}")[0] for n in range(3)]
+
+        # One worker finishes every job while the first webhook is still hanging
+        assert wait_for(lambda: all(queue.get(job["id"])["status"] == "done" for job in jobs))
+        assert queue.snapshot()["callbacks_sent"] == 0
+
+        webhook.release.set()
+        assert wait_for(lambda: queue.snapshot()["callbacks_sent"] == 3)
+        assert sorted(url for url, _ in webhook.calls) == [f"http://hook.test/{n}" for n in range(3)]
+    finally:
+        webhook.release.set()
+        queue.stop(timeout=5)
+
+
+def test_failed_webhook_is_retried_off_the_worker(tmp_path, monkeypatch):
+    attempts = []
+
+    def failing_post(url, json, **kwargs):
+        attempts.append(url)
+        return type("Response", (), {"status_code": 503})()
+
+    monkeypatch.setattr(job_queue.requests, "post", failing_post)
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"), lambda payload: {"plan": 1}, workers=1,
+                               callback_retries=2, callback_hosts=["hook.test"])
+    queue.start()
+    try:
+        job, _ = queue.submit({"n": 1}, callback_url="http://hook.test/down")
+        assert wait_for(lambda: queue.get(job["id"])["status"] == "done")
+        assert wait_for(lambda: queue.snapshot()["callbacks_failed"] == 1)
+        assert attempts == ["http://hook.test/down"] * 2
+    finally:
+        queue.stop(timeout=5)
+
+
+@pytest.mark.parametrize("url", ["ftp://hook.test/", "http:///path", "http://127.0.0.1/", "http://localhost:5000/",
+                                 "http://169.254.169.254/latest/meta-data/", "http://10.0.0.5/", "http://[::1]/",
+                                 "http://[::ffff:192.168.0.1]/", "https://100.64.0.1/", "http://0.0.0.0/"])
+def test_callbacks_to_internal_addresses_are_refused(url):
+    assert job_queue.callback_url_error(url) is not None
+
+
+def test_public_and_allowed_callback_hosts():
+    assert job_queue.callback_url_error("https://93.184.216.34/hook") is None
+    assert job_queue.callback_url_error("http://10.0.0.5/hook", {"10.0.0.5"}) is None
+    assert job_queue.callback_url_error("https://93.184.216.34/hook", {"hooks.internal"}) is not None
+
+
+def test_unsafe_callback_is_never_posted(tmp_path, monkeypatch):
+    posted = []
+    monkeypatch.setattr(job_queue.requests, "post", lambda *args, **kwargs: posted.append(args))
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"), lambda payload: {"plan": 1}, workers=1)
+    queue.start()
+    try:
+        # Stored before the check existed (or by another process): refused at delivery
+        job, _ = queue.submit({"n": 1}, callback_url="http://169.254.169.254/")
+        assert wait_for(lambda: queue.snapshot()["callbacks_failed"] == 1)
+        assert posted == []
+    finally:
+        queue.stop(timeout=5)
+
+
+def test_callback_for_unknown_job_is_not_stored(tmp_path):
+    queue = job_queue.JobQueue(str(tmp_path / "jobs.sqlite3"), lambda payload: {}, callback_hosts=["hook.test"])
+    assert queue.add_callback("missing", "http://hook.test/") is None
+    assert queue._connect().execute("SELECT COUNT(*) FROM job_callbacks").fetchone()[0] == 0
@@ -0,0 +1,53 @@
+import threading
+
+import pytest
+from pydantic import BaseModel
+
+import llm_router
+from stub_llm import make_server
+
+
+class Dishes(BaseModel):
+    dishes: list[str]
+
+
+@pytest.fixture(scope="module")
+def stub_url():
+    server = make_server(0, ttft=0.01, tps=10000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_json_schema_format_is_built_from_the_model():
+    response_format = llm_router.json_schema_format(Dishes)
+    assert response_format["type"] == "json_schema"
+    assert response_format["json_schema"]["name"] == "Dishes"
+    assert response_format["json_schema"]["schema"] == Dishes.model_json_schema()
+
+
+def test_providers_without_structured_outputs_get_json_mode():
+    messages = [{"role": "user", "content": "2 new desserts"}]
+    route = llm_router.Route("deepseek", "http://provider.test", "key", "deepseek-reasoner", structured=False)
+    request = llm_router.Router._request(route, messages, Dishes, {"temperature": 0.7})
+    assert request["response_format"] == {"type": "json_object"}
+    assert request["messages"][0]["role"] == "system" and '"dishes"' in request["messages"][0]["content"]
+    assert request["messages"][1:] == messages and request["temperature"] == 0.7
+
+
+def test_structured_outputs_follow_the_provider_list(monkeypatch):
+    monkeypatch.setattr(llm_router, "STRUCTURED_OUTPUT_PROVIDERS", "openrouter")
+    monkeypatch.setenv("DEEPSEEK_API_KEY", "key")
+    monkeypatch.setenv("DEEPSEEK_DIRECT_API_KEY", "key")
+    monkeypatch.setenv("LLM_MODEL_TIERS", "off")
+    router = llm_router.create_router("openrouter,deepseek")
+    assert {name: route.structured for name, route in router.routes.items()} == {
+        "openrouter": True, "openrouter-fast": True, "deepseek": False, "deepseek-fast": False}
+
+
+@pytest.mark.parametrize("structured", [True, False])
+def test_structured_calls_parse_in_both_modes(stub_url, structured):
+    router = llm_router.Router([llm_router.Route("stub", stub_url, "stub", "stub", structured=structured)],
+                               hedge=False)
+    result = router.complete([{"role": "user", "content": "Suggest 3 new desserts"}], response_format=Dishes)
+    assert isinstance(result, Dishes) and len(result.dishes) == 3
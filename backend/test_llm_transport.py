@@ -0,0 +1,97 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import llm_transport
+
+URL = "http://provider.test/v1/chat/completions"
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(llm_transport, "backoff_delay", lambda attempt, response=None: 0.0)
+
+
+def make_provider():
+    provider = llm_transport.Provider("test", rate=1000)
+    provider.breaker = llm_transport.CircuitBreaker(threshold=2, reset_timeout=0.05)
+    return provider
+
+
+def make_transport(provider, statuses, max_retries=0):
+    """Sync transport whose upstream answers with `statuses` in order"""
+    replies = iter(statuses)
+    transport = llm_transport.ResilientTransport(provider, max_retries=max_retries)
+    transport._transport = httpx.MockTransport(lambda request: httpx.Response(next(replies)))
+    return transport
+
+
+def make_async_transport(provider, statuses, max_retries=0):
+    replies = iter(statuses)
+    transport = llm_transport.AsyncResilientTransport(provider, max_retries=max_retries)
+    transport._transport = httpx.MockTransport(lambda request: httpx.Response(next(replies)))
+    return transport
+
+
+def send(transport):
+    return transport.handle_request(httpx.Request("POST", URL, json={"model": "m"})).status_code
+
+
+def open_breaker(provider):
+    transport = make_transport(provider, [500, 500])
+    assert send(transport) == 500
+    assert send(transport) == 500
+    assert provider.breaker.state == "open"
+    with pytest.raises(llm_transport.CircuitOpenError):
+        send(transport)
+    time.sleep(0.06)
+    assert provider.breaker.state == "half_open"
+
+
+def test_throttled_probe_releases_half_open_breaker():
+    provider = make_provider()
+    open_breaker(provider)
+
+    # A 429 probe is neither a success nor a failure: the breaker stays half open for the next probe
+    assert send(make_transport(provider, [429])) == 429
+    assert provider.breaker.state == "half_open"
+    assert provider.breaker.allow() == "probe"
+    provider.breaker.release("probe")
+
+    assert send(make_transport(provider, [200])) == 200
+    assert provider.breaker.state == "closed"
+
+
+def test_probe_retries_after_throttling_until_recovered():
+    provider = make_provider()
+    open_breaker(provider)
+
+    assert send(make_transport(provider, [429, 429, 200], max_retries=2)) == 200
+    assert provider.breaker.state == "closed"
+    assert provider.stats()["throttled"] == 2
+
+
+def test_failed_probe_stops_retries():
+    provider = make_provider()
+    open_breaker(provider)
+
+    with pytest.raises(llm_transport.CircuitOpenError):
+        send(make_transport(provider, [503, 200], max_retries=2))
+    assert provider.breaker.state == "open"
+
+
+def test_async_throttled_probe_releases_half_open_breaker():
+    provider = make_provider()
+    open_breaker(provider)
+
+    async def send_async(statuses, max_retries=0):
+        transport = make_async_transport(provider, statuses, max_retries)
+        response = await transport.handle_async_request(httpx.Request("POST", URL, json={"model": "m"}))
+        return response.status_code
+
+    assert asyncio.run(send_async([429])) == 429
+    assert provider.breaker.state == "half_open"
+    assert asyncio.run(send_async([429, 200], max_retries=1)) == 200
+    assert provider.breaker.state == "closed"
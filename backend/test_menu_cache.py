@@ -0,0 +1,104 @@
+import threading
+import time
+
+import pytest
+
+import menu_cache
+from stub_redis import make_server
+
+
+@pytest.fixture
+def redis_url():
+    server = make_server(0, password="secret")
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield f"redis://:secret@127.0.0.1:{server.server_address[1]}/2"
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+def backend(request, tmp_path):
+    if request.param == "memory":
+        return menu_cache.MemoryBackend(max_entries=3)
+    if request.param == "sqlite":
+        return menu_cache.SQLiteBackend(str(tmp_path / "responses.sqlite3"), max_entries=3)
+    return menu_cache.RedisBackend(request.getfixturevalue("redis_url"))
+
+
+def test_hit_miss_and_delete(backend):
+    cache = menu_cache.ResponseCache(backend, ttl=60)
+    assert cache.get("menu:a") is None
+    cache.set("menu:a", {"desserts": ["Tiramisu"]})
+    assert cache.get("menu:a") == {"desserts": ["Tiramisu"]}
+    backend.delete("menu:a")
+    assert cache.get("menu:a") is None
+    assert cache.snapshot()["hits"] == 1 and cache.snapshot()["misses"] == 2
+
+
+def test_entries_expire(backend):
+    # Redis expiry is in whole seconds
+    ttl = 1 if isinstance(backend, menu_cache.RedisBackend) else 0.05
+    cache = menu_cache.ResponseCache(backend, ttl=ttl)
+    cache.set("menu:a", "value")
+    assert cache.get("menu:a") == "value"
+    time.sleep(ttl + 0.05)
+    assert cache.get("menu:a") is None
+
+
+@pytest.mark.parametrize("kind", ["memory", "sqlite"])
+def test_least_recently_used_entry_is_evicted(kind, tmp_path):
+    backend = (menu_cache.MemoryBackend(max_entries=2) if kind == "memory"
+               else menu_cache.SQLiteBackend(str(tmp_path / "responses.sqlite3"), max_entries=2))
+    cache = menu_cache.ResponseCache(backend, ttl=60)
+    cache.set("a", 1)
+    time.sleep(0.01)
+    cache.set("b", 2)
+    time.sleep(0.01)
+    assert cache.get("a") == 1  # a is now the most recently used
+    time.sleep(0.01)
+    cache.set("c", 3)
+    assert cache.get("b") is None
+    assert cache.get("a") == 1 and cache.get("c") == 3
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_expired_entries_count_as_evictions(tmp_path):
+    cache = menu_cache.ResponseCache(menu_cache.SQLiteBackend(str(tmp_path / "responses.sqlite3")), ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.05)
+    assert cache.get("a") is None
+    assert cache.snapshot()["evictions"] == 1
+
+
+def test_redis_databases_are_separate(redis_url):
+    other = redis_url.rsplit("/", 1)[0] + "/3"
+    menu_cache.RedisBackend(redis_url).set("k", "two", 60)
+    assert menu_cache.RedisBackend(other).get("k") == (None, False)
+    assert menu_cache.RedisBackend(redis_url).get("k") == ("two", False)
+
+
+def test_redis_errors_are_cache_misses(redis_url):
+    cache = menu_cache.ResponseCache(menu_cache.RedisBackend(redis_url.replace(":secret@", ":wrong@")))
+    assert cache.get("k") is None
+    assert cache.snapshot()["errors"] == 1
+
+
+@pytest.mark.parametrize("guests, bucket", [(1, 2), (2, 2), (3, 6), (48, 50), (50, 50), (51, 100),
+                                            (500, 500), (501, 1000), (1200, 1500), ("12", 12), ("many", 0)])
+def test_guest_count_buckets(guests, bucket):
+    assert menu_cache.bucket_guest_count(guests) == bucket
+
+
+def test_menu_keys_share_a_bucket_and_canonical_fields():
+    event = {"event_type": "Dinner ", "cuisine": "ITALIAN", "formality": "casual", "level": 1, "guest_count": 48}
+    same = {"event_type": "dinner", "cuisine": "italian", "formality": " Casual", "level": "1", "guest_count": 50,
+            "dietary_restrictions": "none"}
+    assert menu_cache.menu_key(event) == menu_cache.menu_key(same)
+    assert menu_cache.menu_key(event) != menu_cache.menu_key({**event, "guest_count": 51})
+    assert menu_cache.menu_key(event) != menu_cache.menu_key({**event, "dietary_restrictions": "vegan"})
+
+
+def test_grocery_keys_use_the_exact_guest_count():
+    menu = {"desserts": ["Tiramisu"], "preparation_notes": "ahead"}
+    assert menu_cache.grocery_key(menu, 48) != menu_cache.grocery_key(menu, 50)
+    assert menu_cache.grocery_key(menu, 48) == menu_cache.grocery_key({**menu, "preparation_notes": ""}, "48")
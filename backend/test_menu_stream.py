@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+from pydantic import BaseModel
+
+import menu_stream
+
+with open(os.path.join(os.path.dirname(__file__), 'data', 'menu_replies.jsonl')) as f:
+    REPLIES = [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize("case", REPLIES, ids=[case["source"] for case in REPLIES])
+def test_recorded_replies(case):
+    if case["menu"] is None:
+        with pytest.raises(menu_stream.ReplyParseError):
+            menu_stream.parse_menu(case["reply"])
+    else:
+        assert menu_stream.parse_menu(case["reply"]).model_dump() == case["menu"]
+
+
+@pytest.mark.parametrize("case", [case for case in REPLIES if case["menu"]], ids=lambda case: case["source"])
+def test_streamed_replies_parse_like_whole_ones(case):
+    parser = menu_stream.MenuStreamParser()
+    events = []
+    reply = case["reply"]
+    for start in range(0, len(reply), 7):
+        events.extend(parser.feed(reply[start:start + 7]))
+    events.extend(parser.close())
+    assert parser.model().model_dump() == case["menu"]
+    dishes = [value for kind, _, value in events if kind == "item"]
+    assert dishes == [dish for section in menu_stream.MENU_SECTIONS for dish in case["menu"][section]]
+
+
+def test_dishes_are_reported_as_they_close():
+    parser = menu_stream.MenuStreamParser()
+    assert parser.feed('<think>{"plan": "x"}</think>{"appetizers": ["Bruschetta", "Ca') == [
+        ("item", "appetizers", "Bruschetta")]
+    assert parser.feed('prese"], "main') == [("item", "appetizers", "Caprese"),
+                                             ("section", "appetizers", ["Bruschetta", "Caprese"])]
+
+
+def test_require_complete_names_the_empty_sections():
+    menu = menu_stream.parse_menu('{"appetizers": ["Bruschetta"], "main_courses": ["Risotto"]}')
+    with pytest.raises(menu_stream.ReplyParseError, match="desserts, beverages"):
+        menu_stream.require_complete(menu)
+
+
+def test_parse_reply_validates_other_models():
+    class Dishes(BaseModel):
+        dishes: list[str]
+
+    reply = 'Sure!\n```json\n{"dishes": ["Gnocchi", "Polenta"]}\n```'
+    assert menu_stream.parse_reply(reply, Dishes).dishes == ["Gnocchi", "Polenta"]
+    with pytest.raises(menu_stream.ReplyParseError):
+        menu_stream.parse_reply('{"meals": []}', Dishes)
+    with pytest.raises(menu_stream.ReplyParseError):
+        menu_stream.parse_reply("<think>{</think> no JSON here", Dishes)
@@ -0,0 +1,71 @@
+import json
+import time
+
+import metrics
+
+
+def stage_seconds(name):
+    """Total exclusive seconds recorded for a stage"""
+    return metrics.STAGE_SECONDS._series[(name,)][1]
+
+
+def test_nested_stages_record_exclusive_time():
+    with metrics.stage("test_outer"):
+        time.sleep(0.02)
+        with metrics.stage("test_inner"):
+            time.sleep(0.05)
+    assert 0.05 <= stage_seconds("test_inner") < 0.1
+    assert 0.02 <= stage_seconds("test_outer") < 0.05
+
+
+def test_histogram_exposition_is_cumulative():
+    histogram = metrics.Histogram("test_seconds", "Test latency", ("route",), buckets=(0.1, 1))
+    for value in (0.05, 0.5, 0.5, 3):
+        histogram.observe(value, route='a"b')
+    assert histogram.render() == [
+        "# HELP test_seconds Test latency",
+        "# TYPE test_seconds histogram",
+        'test_seconds_bucket{route="a\\"b",le="0.1"} 1',
+        'test_seconds_bucket{route="a\\"b",le="1.0"} 3',
+        'test_seconds_bucket{route="a\\"b",le="+Inf"} 4',
+        'test_seconds_sum{route="a\\"b"} 4.050000',
+        'test_seconds_count{route="a\\"b"} 4',
+    ]
+
+
+def test_counter_and_token_usage():
+    counter = metrics.Counter("test_total", "Test events", ("kind",))
+    counter.inc(kind="x")
+    counter.inc(2, kind="x")
+    assert counter.render()[-1] == 'test_total{kind="x"} 3'
+
+    metrics.record_usage("test", "model-a", {"prompt_tokens": 12, "completion_tokens": 30})
+    assert metrics.LLM_TOKENS._values[("test", "model-a", "prompt")] == 12
+    assert metrics.LLM_TOKENS._values[("test", "model-a", "completion")] == 30
+
+
+def test_sampled_trace_prints_stage_timings(monkeypatch, capsys):
+    monkeypatch.setattr(metrics, "TRACE_SAMPLE_RATE", 1.0)
+    token = metrics.start_trace("/api/test")
+    with metrics.stage("parse"):
+        metrics.debug("🍽️ MENU:", {"desserts": ["Tiramisu"]})
+    metrics.finish_trace(token, 200)
+    out = capsys.readouterr().out
+    trace = json.loads(out.split("🔎 TRACE ", 1)[1])
+    assert trace["endpoint"] == "/api/test" and trace["status"] == 200 and "parse" in trace["stages_ms"]
+    assert "Tiramisu" in out
+
+
+def test_untraced_requests_print_nothing(capsys):
+    assert metrics.start_trace("/api/test") is None
+    metrics.debug("🍽️ MENU:", {"desserts": ["Tiramisu"]})
+    assert capsys.readouterr().out == ""
+
+
+def test_metrics_endpoint_renders_collectors(planner):
+    response = planner.app.test_client().get("/metrics")
+    assert response.status_code == 200
+    assert response.mimetype == "text/plain"
+    body = response.get_data(as_text=True)
+    assert "# TYPE plan_stage_duration_seconds histogram" in body
+    assert "# TYPE http_request_duration_seconds histogram" in body
@@ -0,0 +1,46 @@
+import time
+
+import llm_router
+import model_tiers
+
+
+def make_router(policy):
+    routes = [llm_router.Route("test", "http://provider.test", "key", "test-r1"),
+              llm_router.Route("test-fast", "http://provider.test", "key", "test-fast",
+                               tier=model_tiers.FAST, provider="test")]
+    return llm_router.Router(routes, policy=policy)
+
+
+def stream(route, seconds=0.0, tokens=None):
+    """One streamed call under Route.track(); tokens as the usage chunk would set them"""
+    with route.track("menu") as call:
+        time.sleep(seconds)
+        if tokens is not None:
+            call.tokens = tokens
+
+
+def test_choose_with_streamed_samples_without_usage():
+    policy = model_tiers.TierPolicy(threshold=2, min_samples=3, explore=0)
+    router = make_router(policy)
+    for _ in range(3):
+        stream(router.routes["test"], seconds=0.02)
+        stream(router.routes["test-fast"])
+        policy.record("menu", 1, model_tiers.FAST, True)
+
+    costs = router.tier_costs("menu")
+    assert costs[model_tiers.FAST][1] is None and costs[model_tiers.REASONING][1] is None
+    assert policy.choose("menu", 1) == model_tiers.FAST
+    assert policy.snapshot()["kinds"]["menu"]["scores"][1]["tier"] == model_tiers.FAST
+
+
+def test_streamed_usage_prices_the_tiers():
+    policy = model_tiers.TierPolicy(threshold=2, min_samples=3, explore=0)
+    router = make_router(policy)
+    for _ in range(3):
+        stream(router.routes["test"], seconds=0.02, tokens=100)
+        stream(router.routes["test-fast"], tokens=1000)
+        policy.record("menu", 1, model_tiers.FAST, True)
+
+    assert router.tier_costs("menu")[model_tiers.FAST][1] == 1000
+    # Ten times the tokens at half the price is dearer than the reasoning tier
+    assert policy.choose("menu", 1) == model_tiers.REASONING
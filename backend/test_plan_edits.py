@@ -0,0 +1,18 @@
+import pytest
+
+import plan_edits
+
+MENU = {"appetizers": ["Bruschetta"], "main_courses": ["Risotto", "Lasagna"], "desserts": ["Tiramisu"],
+        "beverages": ["Espresso"], "preparation_notes": ""}
+
+
+@pytest.mark.parametrize("index", ["two", "1.5", "", True, False, -1, "-1", 1.0, [1], {"i": 1}])
+def test_bad_index_is_an_edit_error(index):
+    with pytest.raises(plan_edits.EditError):
+        plan_edits.parse_edit({"section": "mains", "index": index, "dish": "Gnocchi"}, MENU)
+
+
+@pytest.mark.parametrize("index, expected", [(1, 1), ("1", 1), (" 0 ", 0)])
+def test_index_field(index, expected):
+    edit = plan_edits.parse_edit({"section": "mains", "index": index, "dish": "Gnocchi"}, MENU)
+    assert edit == {"section": "main_courses", "index": expected, "dish": "Gnocchi", "constraint": None}
@@ -0,0 +1,109 @@
+import json
+import time
+
+import pytest
+
+import plan_history
+
+
+def wait_for(condition, seconds=5):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def plan(cuisine="italian", event_type="dinner", mains=("Grilled Salmon",)):
+    return {"cuisine": cuisine, "event_type": event_type, "guest_count": 8}, {"main_courses": list(mains)}
+
+
+@pytest.fixture
+def history(tmp_path):
+    history = plan_history.PlanHistory(str(tmp_path / "history.sqlite3"), flush_seconds=60, batch_size=3)
+    yield history
+    history.stop(timeout=5)
+
+
+def test_records_are_written_in_batches(history):
+    for n in range(2):
+        assert history.record(f"p{n}", *plan(), "- Salmon (1 kg)")
+    time.sleep(0.05)
+    assert history.snapshot()["written"] == 0 and list(history.search()) == []
+
+    # The batch-size record wakes the writer; all three go in one transaction
+    history.record("p2", *plan(), None)
+    assert wait_for(lambda: history.snapshot()["written"] == 3)
+    assert history.snapshot()["batches"] == 1
+    assert [row["plan_id"] for row in history.search()] == ["p2", "p1", "p0"]
+
+
+def test_full_queue_drops_instead_of_blocking(tmp_path):
+    history = plan_history.PlanHistory(str(tmp_path / "history.sqlite3"), flush_seconds=60, batch_size=10,
+                                       max_pending=2)
+    results = [history.record(f"p{n}", *plan(), None) for n in range(3)]
+    history.stop(timeout=5)
+    assert results == [True, True, False]
+    assert history.snapshot() == {"recorded": 2, "written": 2, "dropped": 1, "batches": 1, "errors": 0, "pending": 0}
+
+
+def test_filters_and_dish_search(history):
+    history.record("salmon", *plan(mains=["Grilled Salmon", "Risotto"]), None)
+    history.record("salad", *plan("greek", mains=["Salad Niçoise"]), None)
+    history.record("brunch", *plan(event_type="brunch", mains=["Salmon Benedict"]), None)
+    history.flush()
+
+    def found(**filters):
+        return [row["plan_id"] for row in history.search(**filters)]
+
+    assert found(cuisine="  Italian ") == ["brunch", "salmon"]
+    assert found(cuisine="italian", event_type="Dinner") == ["salmon"]
+    assert found(dish="salmon") == ["brunch", "salmon"]
+    assert found(dish="grilled salmon") == ["salmon"]
+    assert found(dish="sal") == []  # whole words unless asked for a prefix
+    assert found(dish="sal*") == ["brunch", "salad", "salmon"]
+    assert found(dish="niçoise") == ["salad"]
+    assert found(dish="salmon", event_type="brunch") == ["brunch"]
+    assert found(dish="  *  ") == []
+
+
+def test_keyset_pages_do_not_shift_when_plans_are_added(history):
+    for n in range(7):
+        history.record(f"p{n}", *plan(), None)
+    history.flush()
+
+    pages, cursor = [], None
+    while True:
+        page = list(history.search(cursor=cursor, limit=3))
+        if not page:
+            break
+        pages.append([row["plan_id"] for row in page])
+        if len(pages) == 1:
+            # Newer plans land above the cursor, not in the pages still to come
+            history.record("new", *plan(), None)
+            history.flush()
+        cursor = page[-1]["seq"]
+    assert pages == [["p6", "p5", "p4"], ["p3", "p2", "p1"], ["p0"]]
+
+
+def test_search_endpoint_streams_pages(planner, history, monkeypatch):
+    monkeypatch.setattr(planner, "history", history)
+    for n in range(3):
+        history.record(f"p{n}", *plan(), None)
+    history.record("other", *plan("thai"), None)
+    history.flush()
+    client = planner.app.test_client()
+
+    def page(query):
+        response = client.get(f"/api/plans/search?{query}")
+        assert response.mimetype == "application/x-ndjson"
+        *rows, tail = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+        return [row["plan_id"] for row in rows], tail
+
+    rows, tail = page("cuisine=italian&limit=2")
+    assert rows == ["p2", "p1"] and tail["count"] == 2 and tail["next_cursor"] is not None
+    rows, tail = page(f"cuisine=italian&limit=2&cursor={tail['next_cursor']}")
+    assert rows == ["p0"] and tail == {"next_cursor": None, "count": 1}
+
+    assert client.get("/api/plans/search?limit=many").status_code == 400
+    monkeypatch.setattr(planner, "history", None)
+    assert client.get("/api/plans/search").status_code == 503
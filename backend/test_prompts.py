@@ -0,0 +1,48 @@
+import pytest
+
+import prompts
+
+EVENT = {"event_type": "wedding", "cuisine": "italian", "formality": "formal", "level": "2",
+         "dietary_restrictions": "none", "guest_count": 120}
+MENU = {"appetizers": ["Bruschetta", "Caprese Skewers"], "main_courses": ["Lasagna"], "desserts": [],
+        "beverages": ["Chianti"], "preparation_notes": "Bake ahead"}
+
+
+def test_rendered_prompts_carry_no_indentation_or_blank_lines():
+    text = prompts.menu_prompt(EVENT)
+    assert all(line == line.strip() and line for line in text.splitlines())
+    assert "120 guests" in text and "italian" in text
+
+
+@pytest.mark.parametrize("build", [lambda version: prompts.menu_prompt(EVENT, version),
+                                   lambda version: prompts.grocery_prompt(MENU, 120, version),
+                                   lambda version: prompts.ingredient_prompt(["Lasagna", "Tiramisu"], version)])
+def test_v2_prompts_are_smaller_than_v1(build):
+    assert prompts.estimate_tokens(build("v2")) < prompts.estimate_tokens(build("v1"))
+
+
+def test_oversized_fields_are_clipped_and_collapsed():
+    text = prompts.menu_prompt({**EVENT, "cuisine": "italian \n\n  " + "x" * 500})
+    assert "italian x" in text and "x" * 101 not in text and "…" in text
+
+
+def test_prompt_over_budget_is_refused():
+    with pytest.raises(prompts.PromptTooLongError):
+        prompts.menu_prompt(EVENT, budget=10)
+    with pytest.raises(ValueError):
+        prompts.render("menu", version="v9")
+
+
+def test_menus_are_encoded_one_section_per_line():
+    assert prompts.compact_menu(MENU) == ("Appetizers: Bruschetta; Caprese Skewers\n"
+                                          "Main courses: Lasagna\nBeverages: Chianti")
+    courses = {"courses": [{"name": "Starters", "dishes": [{"name": "Soup", "description": "hot"}]}]}
+    assert prompts.compact_menu(courses) == "Starters: Soup"
+
+
+def test_section_prompt_lists_what_to_keep_and_avoid():
+    text = prompts.section_prompt(EVENT, "main_courses", 2, ["Lasagna"], ["Risotto"], constraint="vegetarian")
+    assert "2 new main courses" in text
+    assert "Already on the menu: Lasagna" in text and "Avoid: Risotto" in text
+    assert "Every dish must be: vegetarian" in text
+    assert "Every dish must be" not in prompts.section_prompt(EVENT, "desserts", 1, [], [])
@@ -0,0 +1,59 @@
+import pytest
+
+import semantic_cache
+
+EVENT = {"event_type": "birthday", "cuisine": "italian", "formality": "casual", "level": "1",
+         "dietary_restrictions": "none", "guest_count": 50}
+MENU = {"appetizers": ["Bruschetta"], "main_courses": ["Lasagna"], "desserts": ["Tiramisu"],
+        "beverages": ["Chianti"], "preparation_notes": ""}
+
+
+@pytest.fixture
+def cache():
+    cache = semantic_cache.SemanticCache(max_entries=3)
+    cache.add(EVENT, MENU)
+    return cache
+
+
+def test_rephrased_event_reuses_the_menu(cache):
+    menu, score = cache.lookup({**EVENT, "event_type": "Birthday Party", "cuisine": "Italian cuisine",
+                                "guest_count": 48})
+    assert menu == MENU and score > 0.99
+    assert cache.snapshot()["hits"] == 1
+
+
+@pytest.mark.parametrize("change", [{"cuisine": "thai"}, {"event_type": "funeral"}, {"level": "3"},
+                                    {"dietary_restrictions": "vegan"}, {"guest_count": 200}])
+def test_different_events_miss(cache, change):
+    menu, _ = cache.lookup({**EVENT, **change})
+    assert menu is None
+    assert cache.snapshot()["misses"] == 1
+
+
+def test_same_event_replaces_its_entry(cache):
+    cache.add({**EVENT, "cuisine": "Italian"}, {**MENU, "desserts": ["Cannoli"]})
+    assert cache.size == 1
+    assert cache.lookup(EVENT)[0]["desserts"] == ["Cannoli"]
+
+
+def test_least_recently_used_entry_is_evicted(cache):
+    cache.add({**EVENT, "cuisine": "mexican"}, MENU)
+    cache.add({**EVENT, "cuisine": "japanese"}, MENU)
+    cache.lookup(EVENT)  # italian is now the most recently used
+    cache.add({**EVENT, "cuisine": "indian"}, MENU)
+    assert cache.snapshot()["evictions"] == 1
+    assert cache.lookup({**EVENT, "cuisine": "mexican"})[0] is None
+    assert cache.lookup(EVENT)[0] == MENU
+
+
+def test_saved_index_loads_in_a_new_process(tmp_path):
+    path = str(tmp_path / "semantic.npz")
+    cache = semantic_cache.SemanticCache(max_entries=10, path=path)
+    cache.add(EVENT, MENU)
+    cache.save()
+    assert semantic_cache.SemanticCache(max_entries=10, path=path).lookup(EVENT)[0] == MENU
+
+
+def test_normalize_drops_filler_and_plurals():
+    assert semantic_cache.normalize("Italian Cuisine, with Desserts") == ["italian", "dessert"]
+    assert semantic_cache.partition({"level": " 2 ", "dietary_restrictions": "None"}) == "2|"
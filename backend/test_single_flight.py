@@ -0,0 +1,69 @@
+import asyncio
+import threading
+
+import pytest
+
+import single_flight
+
+
+@pytest.fixture(params=["in_process", "sqlite"])
+def flights(request, tmp_path):
+    path = str(tmp_path / "singleflight.sqlite3") if request.param == "sqlite" else None
+    return single_flight.SingleFlight(path=path, timeout=5)
+
+
+def test_async_callers_share_one_call(flights):
+    calls = []
+
+    async def call():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return {"menu": "shared"}
+
+    async def main():
+        return await asyncio.gather(*(flights.ado("key", call) for _ in range(5)))
+
+    assert asyncio.run(main()) == [{"menu": "shared"}] * 5
+    assert len(calls) == 1
+    assert flights.snapshot()["shared_in_process"] == 4
+
+
+def test_sync_and_async_callers_share_a_flight(flights):
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def call():
+        started.set()
+        release.wait(5)
+        return {"menu": "sync"}
+
+    leader = threading.Thread(target=lambda: results.append(flights.do("key", call)))
+    leader.start()
+    started.wait(5)
+
+    async def follower():
+        asyncio.get_running_loop().call_later(0.05, release.set)
+        return await flights.ado("key", pytest.fail)
+
+    assert asyncio.run(follower()) == {"menu": "sync"}
+    leader.join()
+    assert results == [{"menu": "sync"}]
+
+
+def test_followers_take_over_from_a_cancelled_leader(flights):
+    async def slow():
+        await asyncio.sleep(5)
+
+    async def fast():
+        return {"menu": "follower"}
+
+    async def main():
+        leader = asyncio.create_task(flights.ado("key", slow))
+        await asyncio.sleep(0.05)
+        follower = asyncio.create_task(flights.ado("key", fast))
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(main()) == {"menu": "follower"}
+    assert flights.snapshot()["takeovers"] == 1
@@ -0,0 +1,40 @@
+import threading
+
+import speculation
+
+
+def blocking_generate(release):
+    def generate(data, cancelled):
+        release.wait(5)
+        return None if cancelled.is_set() else {"desserts": [data["cuisine"]]}
+    return generate
+
+
+def test_full_pool_is_at_capacity_not_upstream_busy():
+    release = threading.Event()
+    menus = speculation.SpeculationCache(blocking_generate(release), max_running=1, busy=lambda: False)
+    try:
+        assert menus.start("tab-1", "10.0.0.1", "k1", {"cuisine": "greek"}) == "started"
+        assert menus.start("tab-2", "10.0.0.2", "k2", {"cuisine": "thai"}) == "at_capacity"
+        stats = menus.snapshot()
+        assert stats["at_capacity"] == 1 and stats["upstream_busy"] == 0
+    finally:
+        release.set()
+        menus.stop()
+
+
+def test_upstream_queueing_is_upstream_busy():
+    menus = speculation.SpeculationCache(blocking_generate(threading.Event()), busy=lambda: True)
+    assert menus.start("tab-1", "10.0.0.1", "k1", {"cuisine": "greek"}) == "upstream_busy"
+    assert menus.snapshot()["upstream_busy"] == 1 and menus.snapshot()["at_capacity"] == 0
+
+
+def test_client_budget_and_claim():
+    release = threading.Event()
+    release.set()
+    menus = speculation.SpeculationCache(blocking_generate(release), client_burst=1, client_rate=0.001)
+    assert menus.start("tab-1", "10.0.0.1", "k1", {"cuisine": "greek"}) == "started"
+    assert menus.claim("tab-1", "k1") == {"desserts": ["greek"]}
+    assert menus.start("tab-1", "10.0.0.1", "k2", {"cuisine": "thai"}) == "over_budget"
+    assert menus.snapshot()["hits"] == 1
+    menus.stop()
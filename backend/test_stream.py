@@ -0,0 +1,52 @@
+import json
+
+import pytest
+
+EVENT = {"event_type": "birthday", "cuisine": "mexican", "formality": "casual", "level": "1",
+         "dietary_restrictions": "none", "guest_count": 12}
+
+
+def events(body):
+    """[(event, data)] of a Server-Sent Events body"""
+    parsed = []
+    for block in body.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if ": " in line)
+        if "event" in fields:
+            parsed.append((fields["event"], json.loads(fields["data"])))
+    return parsed
+
+
+def test_stream_sends_dishes_before_the_menu_and_grocery(planner):
+    response = planner.app.test_client().post("/api/plan/stream", json=EVENT)
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    stream = events(response.get_data(as_text=True))
+    names = [name for name, _ in stream]
+
+    assert names[0] == "item" and names[-1] == "done"
+    assert names.index("menu") < names.index("grocery_item") < names.index("grocery")
+    menu = dict(stream)["menu"]
+    dishes = [data["value"] for name, data in stream if name == "item"]
+    assert dishes == [dish for section in planner.MENU_SECTIONS for dish in menu[section]]
+    grocery = dict(stream)["grocery"]["value"]
+    items = [data["value"] for name, data in stream if name == "grocery_item"]
+    assert items == [line.lstrip("- ") for line in grocery.splitlines()]
+    assert dict(stream)["done"]["plan_id"]
+
+
+def test_known_menu_is_replayed_without_a_call(planner):
+    menu = {"appetizers": ["Elote"], "main_courses": ["Tacos", "Mole"], "desserts": ["Flan"],
+            "beverages": ["Horchata"], "preparation_notes": "Make the mole a day ahead"}
+    before = sum(route["calls"] for route in planner.llm.stats().values())
+    body = "".join(planner.stream_menu_events(EVENT, menu=menu))
+    assert sum(route["calls"] for route in planner.llm.stats().values()) == before
+    replay = events(body)
+    assert [data["value"] for name, data in replay if name == "item"] == ["Elote", "Tacos", "Mole", "Flan", "Horchata"]
+    assert replay[-1] == ("menu", menu)
+
+
+@pytest.mark.parametrize("body", [{**EVENT, "guest_count": 0}, {"cuisine": "mexican"}])
+def test_bad_stream_requests_are_rejected_before_streaming(planner, body):
+    response = planner.app.test_client().post("/api/plan/stream", json=body)
+    assert response.status_code == 400
+    assert response.get_json()["status"] == "error"
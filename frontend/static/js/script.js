@@ -3,121 +3,204 @@ document.addEventListener('DOMContentLoaded', () => {
     const resultsDiv = document.getElementById('results');
     const errorDiv = document.getElementById('error-message');
     
+    const sections = {
+        appetizers: 'Appetizers',
+        main_courses: 'Main Courses',
+        desserts: 'Desserts',
+        beverages: 'Beverages'
+    };
+    
+    // One id per tab, so the submit can claim the menu prefetched while the form was filled in
+    const sessionId = sessionStorage.getItem('plan-session') ||
+        Math.random().toString(36).slice(2) + Date.now().toString(36);
+    sessionStorage.setItem('plan-session', sessionId);
+    let prefetchTimer = null;
+    let lastPrefetch = null;
+    
+    function readForm() {
+        return {
+            event_type: document.getElementById('event-type').value,
+            cuisine: document.getElementById('cuisine').value,
+            formality: document.getElementById('formality').value,
+            guest_count: parseInt(document.getElementById('guest-count').value),
+            level: parseInt(document.querySelector('input[name="level"]:checked').value)
+        };
+    }
+    
+    function schedulePrefetch() {
+        clearTimeout(prefetchTimer);
+        prefetchTimer = setTimeout(prefetch, 800);
+    }
+    
+    function prefetch() {
+        const formData = readForm();
+        if (!formData.event_type || !formData.cuisine || !formData.formality || !formData.guest_count) return;
+        const body = JSON.stringify(formData);
+        if (body === lastPrefetch) return;
+        lastPrefetch = body;
+        // Best effort: if the server declines or fails, the submit generates the menu itself
+        fetch('/api/plan/prefetch', {
+            method: 'POST',
+            headers: {
+                'Content-Type': 'application/json',
+                'X-Plan-Session': sessionId
+            },
+            body
+        }).catch(() => {});
+    }
+    
+    form.addEventListener('change', schedulePrefetch);
+    form.addEventListener('input', schedulePrefetch);
+    
     form.addEventListener('submit', async (e) => {
         e.preventDefault();
+        clearTimeout(prefetchTimer);
         
         // Show loading indicator
         resultsDiv.innerHTML = '<div class="loading">Generating your menu...</div>';
         errorDiv.style.display = 'none';
         
         // Get form data
-        const formData = {
-            event_type: document.getElementById('event-type').value,
-            cuisine: document.getElementById('cuisine').value,
-            formality: document.getElementById('formality').value,
-            guest_count: parseInt(document.getElementById('guest-count').value),
-            level: parseInt(document.querySelector('input[name="level"]:checked').value)
-        };
+        const formData = readForm();
         
         try {
-            const response = await fetch('/api/plan', {
+            const response = await fetch('/api/plan/stream', {
                 method: 'POST',
                 headers: {
-                    'Content-Type': 'application/json'
+                    'Content-Type': 'application/json',
+                    'X-Plan-Session': sessionId
                 },
                 body: JSON.stringify(formData)
             });
             
-            const result = await response.json();
-            
             if (!response.ok) {
+                const result = await response.json();
                 showError(result.message || 'Server error occurred');
                 return;
             }
             
-            if (result.status === 'error') {
-                showError(result.message);
-                return;
-            }
-            
-            // Display results
-            displayResults(result);
+            // Render each event as soon as it arrives
+            const view = createResultsView();
+            await readEvents(response, (event, data) => view.handle(event, data));
             
         } catch (error) {
             showError(`Network error: ${error.message}`);
         }
     });
     
+    async function readEvents(response, onEvent) {
+        const reader = response.body.getReader();
+        const decoder = new TextDecoder();
+        let buffer = '';
+        
+        while (true) {
+            const { done, value } = await reader.read();
+            if (done) break;
+            buffer += decoder.decode(value, { stream: true });
+            
+            // Events are separated by a blank line
+            let boundary;
+            while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+                const frame = buffer.slice(0, boundary);
+                buffer = buffer.slice(boundary + 2);
+                
+                let event = 'message';
+                let data = '';
+                frame.split('\n').forEach(line => {
+                    if (line.startsWith('event:')) event = line.slice(6).trim();
+                    else if (line.startsWith('data:')) data += line.slice(5).trim();
+                });
+                onEvent(event, data ? JSON.parse(data) : null);
+            }
+        }
+    }
+    
     function showError(message) {
         errorDiv.textContent = message;
         errorDiv.style.display = 'block';
         resultsDiv.innerHTML = '';
     }
     
-    function displayResults(result) {
-        let html = `
-            <div class="success-message">
-                <h2>${result.message}</h2>
-            </div>
+    function createResultsView() {
+        resultsDiv.innerHTML = `
+            <div class="loading" id="stream-status">Generating your menu...</div>
             <div class="menu-section">
                 <h3>Your Menu Plan</h3>
+                <div id="menu-sections"></div>
+            </div>
         `;
+        const status = document.getElementById('stream-status');
+        const menuDiv = document.getElementById('menu-sections');
+        const lists = {};
+        let groceryList = null;
         
-        // Display menu sections
-        const sections = {
-            appetizers: 'Appetizers',
-            main_courses: 'Main Courses',
-            desserts: 'Desserts',
-            beverages: 'Beverages'
-        };
-        
-        for (const [key, title] of Object.entries(sections)) {
-            if (result.menu[key] && result.menu[key].length > 0) {
-                html += `<h4>${title}</h4><ul>`;
-                result.menu[key].forEach(item => {
-                    html += `<li>${item}</li>`;
-                });
-                html += '</ul>';
+        function sectionList(key) {
+            if (!lists[key]) {
+                const title = document.createElement('h4');
+                title.textContent = sections[key];
+                lists[key] = document.createElement('ul');
+                menuDiv.append(title, lists[key]);
             }
+            return lists[key];
         }
         
-        // Display preparation notes
-        if (result.menu.preparation_notes) {
-            html += `
-                <h4>Preparation Notes</h4>
-                <p>${result.menu.preparation_notes}</p>
-            `;
+        function addItem(list, text) {
+            const li = document.createElement('li');
+            li.textContent = text;
+            list.appendChild(li);
         }
         
-        html += '</div>'; // Close menu-section
+        function addNotes(text) {
+            const title = document.createElement('h4');
+            title.textContent = 'Preparation Notes';
+            const notes = document.createElement('p');
+            notes.textContent = text;
+            menuDiv.append(title, notes);
+        }
         
-        // Display grocery list if available
-        if (result.grocery_list) {
-            html += `
-                <div class="grocery-section">
-                    <h3>Shopping List</h3>
-                    <ul>`;
-            
-            // Split grocery list into items
-            const groceryItems = result.grocery_list.split('\n')
-                .filter(item => item.trim().startsWith('-'))
-                .map(item => item.replace(/^-/, '').trim());
-            
-            groceryItems.forEach(item => {
-                html += `<li>${item}</li>`;
+        // The final menu can differ from the streamed dishes (a fast model's reply
+        // redone by the reasoning model), so it replaces whatever was drawn
+        function renderMenu(menu) {
+            menuDiv.innerHTML = '';
+            Object.keys(lists).forEach(key => delete lists[key]);
+            Object.keys(sections).forEach(key => {
+                (menu[key] || []).forEach(dish => addItem(sectionList(key), dish));
             });
-            
-            html += `
-                    </ul>
-                </div>
-            `;
+            if (menu.preparation_notes) addNotes(menu.preparation_notes);
         }
         
-        resultsDiv.innerHTML = html;
+        function handle(event, data) {
+            if (event === 'item' && sections[data.section]) {
+                addItem(sectionList(data.section), data.value);
+            } else if (event === 'section' && data.section === 'preparation_notes' && data.value) {
+                addNotes(data.value);
+            } else if (event === 'menu') {
+                renderMenu(data);
+                status.textContent = 'Building your shopping list...';
+            } else if (event === 'grocery_item') {
+                if (!groceryList) {
+                    const grocerySection = document.createElement('div');
+                    grocerySection.className = 'grocery-section';
+                    grocerySection.innerHTML = '<h3>Shopping List</h3>';
+                    groceryList = document.createElement('ul');
+                    grocerySection.appendChild(groceryList);
+                    resultsDiv.appendChild(grocerySection);
+                }
+                addItem(groceryList, data.value);
+            } else if (event === 'done') {
+                status.className = 'success-message';
+                const heading = document.createElement('h2');
+                heading.textContent = data.message;
+                status.replaceChildren(heading);
+            } else if (event === 'error') {
+                showError(data.message);
+            }
+        }
+        
+        return { handle };
     }
 });
 
-
 // Form steps
 // const formSteps = [
 //     {
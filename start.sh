@@ -6,8 +6,7 @@ cd backend
 python -m venv venv
 source venv/bin/activate
 pip install -r requirements.txt
-export FLASK_APP=app.py
-flask run --port=5000 &
+PORT=5000 python server.py app &
 
 # Open in browser (Linux/Mac)
 sleep 2